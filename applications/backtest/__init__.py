@@ -4,4 +4,7 @@
 包含回测引擎、性能分析等功能
 """
 
-__all__ = []
+from .backtest_engine import BacktestEngine, MarketPanel, PanelView
+from .parameter_sweep import SweepRunner, parameter_grid, walk_forward_windows
+
+__all__ = ['BacktestEngine', 'MarketPanel', 'PanelView', 'SweepRunner', 'parameter_grid', 'walk_forward_windows']
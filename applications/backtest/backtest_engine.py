@@ -6,38 +6,507 @@
 2. 事件循环模拟
 3. 策略执行
 4. 结果分析
+
+实现方式：
+- 回测开始时把整个股票池的日线一次性加载为宽表面板（日期 × 股票的 numpy 数组），不再逐日逐股查询数据库
+- 日期游标逐日推进，每个交易日向策略的 on_bar 发送一个 BAR 事件，事件数据中的 PanelView
+  只暴露截至当日的只读切片视图（不复制数据，杜绝未来函数）
+- 策略通过 event.data['broker']（即回测引擎）下单；默认按次日开盘价成交，也可按当日收盘价成交
+- 成交模拟：T+1（当日买入的股票次日才能卖出）、固定手续费（与 Account.Position.update 一致，每笔 3 元）、
+  买入按 100 股整手，卖出清仓时允许零股；停牌（无价格）时订单作废
+- 每日按前向填充的收盘价计算持仓市值，回测结束后对净值序列一次性向量化计算绩效指标
+- 成交和每日收盘价同步到组合风险引擎（PortfolioRiskEngine），每根K线结束时推入滚动窗口，
+  策略可通过 broker.risk_engine 读取滚动 VaR、波动率、夏普和集中度
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union
 from datetime import datetime, timedelta
+import os
+import numpy as np
 import pandas as pd
 import logging
 
+from core.event import Event, EventType
+from core.execution.risk_metrics import PortfolioRiskEngine
+
 logger = logging.getLogger(__name__)
 
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+# 年化使用的交易日数
+TRADING_DAYS_PER_YEAR = 252
+
+
+def _to_date_str(value) -> str:
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+
+class MarketPanel:
+    """
+    日线宽表面板
+
+    每个字段是 (交易日数, 股票数) 的只读 float64 数组（列优先存储，单只股票的历史切片是连续内存），
+    缺失（停牌）为 NaN。面板可以用 save() 保存为 .npy 文件，再用 open() 以只读内存映射方式打开，
+    多个进程共享同一份数据而不必各自查询数据库。
+    """
+
+    def __init__(self, dates, codes, fields: Dict[str, np.ndarray], valuation_close: Optional[np.ndarray] = None):
+        self.dates = np.asarray(dates, dtype=object)
+        self.codes = [str(code) for code in codes]
+        self.code_index = {code: j for j, code in enumerate(self.codes)}
+        self.timestamps = pd.to_datetime(pd.Index(self.dates)).to_pydatetime()
+        self.fields: Dict[str, np.ndarray] = {}
+        for name, values in fields.items():
+            array = np.asfortranarray(values, dtype=np.float64)
+            array.setflags(write=False)
+            self.fields[name] = array
+
+        # 按最近一个有效收盘价计值（停牌日沿用停牌前价格）
+        if valuation_close is None:
+            valuation_close = pd.DataFrame(self.fields['close']).ffill().values
+        self.valuation_close = np.ascontiguousarray(valuation_close, dtype=np.float64)
+        self.valuation_close.setflags(write=False)
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def shape(self):
+        return self.fields['close'].shape
+
+    def save(self, directory: str) -> str:
+        """把面板保存为目录下的 .npy 文件（供 open() 内存映射），返回目录路径"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'dates.npy'), self.dates.astype(str))
+        np.save(os.path.join(directory, 'codes.npy'), np.asarray(self.codes, dtype=str))
+        for name, values in self.fields.items():
+            np.save(os.path.join(directory, f'{name}.npy'), values)
+        np.save(os.path.join(directory, 'valuation_close.npy'), self.valuation_close)
+        return directory
+
+    @classmethod
+    def open(cls, directory: str) -> 'MarketPanel':
+        """以只读内存映射方式打开 save() 保存的面板（不把数据读入进程内存）"""
+        dates = np.load(os.path.join(directory, 'dates.npy'))
+        codes = np.load(os.path.join(directory, 'codes.npy')).tolist()
+        fields = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in PANEL_FIELDS}
+        valuation_close = np.load(os.path.join(directory, 'valuation_close.npy'), mmap_mode='r')
+        return cls(dates, codes, fields, valuation_close)
+
+    @classmethod
+    def from_long(cls, df: pd.DataFrame) -> 'MarketPanel':
+        """由长表（stock_code, trade_date, open, high, low, close, volume）构建面板"""
+        df = df.copy()
+        df['stock_code'] = df['stock_code'].astype(str)
+        df['trade_date'] = pd.to_datetime(df['trade_date']).dt.strftime('%Y-%m-%d')
+        df = df.drop_duplicates(['trade_date', 'stock_code'], keep='last')
+        dates = np.sort(df['trade_date'].unique())
+        codes = sorted(df['stock_code'].unique())
+        fields = {}
+        for name in PANEL_FIELDS:
+            wide = df.pivot(index='trade_date', columns='stock_code', values=name)
+            fields[name] = wide.reindex(index=dates, columns=codes).astype(float).values
+        return cls(dates, codes, fields)
+
+    @classmethod
+    def from_frames(cls, data: Dict[str, pd.DataFrame]) -> 'MarketPanel':
+        """由 {股票代码: 日线DataFrame} 构建面板"""
+        frames = []
+        for code, frame in data.items():
+            if frame is None or frame.empty:
+                continue
+            frame = frame[['trade_date', *PANEL_FIELDS]].copy()
+            frame['stock_code'] = str(code)
+            frames.append(frame)
+        if not frames:
+            raise ValueError("回测数据为空")
+        return cls.from_long(pd.concat(frames, ignore_index=True))
+
+    @classmethod
+    def load(cls, start_date, end_date, stock_codes: Optional[List[str]] = None,
+             warmup_days: int = 120, db_manager=None, chunk_size: int = 500) -> 'MarketPanel':
+        """
+        从 k_daily 一次性加载回测区间（以及之前 warmup_days 个自然日的预热数据）的日线
+
+        Args:
+            start_date: 回测开始日期
+            end_date: 回测结束日期
+            stock_codes: 股票池，None 表示全部股票
+            warmup_days: 预热的自然日数（供策略计算指标）
+            db_manager: 数据库管理器
+            chunk_size: 指定股票池时每次 IN 查询的股票数量
+        """
+        if db_manager is None:
+            from data_management.database_manager import DatabaseManager
+            db_manager = DatabaseManager()
+
+        load_start = pd.Timestamp(_to_date_str(start_date)) - timedelta(days=warmup_days)
+        date_params = (load_start.strftime('%Y-%m-%d'), _to_date_str(end_date) + ' 23:59:59')
+        query = """
+            SELECT stock_code, trade_date, open, high, low, close, volume
+            FROM k_daily
+            WHERE trade_date >= ? AND trade_date <= ?
+        """
+        if stock_codes is None:
+            df = db_manager.execute_query(query, date_params)
+        else:
+            # 股票池在 SQL 中过滤（分批 IN 查询），不读取全市场日线
+            codes = list(dict.fromkeys(str(code) for code in stock_codes))
+            frames = []
+            for i in range(0, len(codes), chunk_size):
+                chunk = codes[i:i + chunk_size]
+                placeholders = ','.join('?' * len(chunk))
+                frame = db_manager.execute_query(f"{query} AND stock_code IN ({placeholders})",
+                                                 (*date_params, *chunk))
+                if frame is not None and not frame.empty:
+                    frames.append(frame)
+            df = pd.concat(frames, ignore_index=True) if frames else None
+        if df is None or df.empty:
+            raise ValueError(f"{_to_date_str(start_date)} 到 {_to_date_str(end_date)} 没有日线数据")
+        logger.info(f"回测面板加载 {df['stock_code'].nunique()} 只股票, {len(df)} 条日线")
+        return cls.from_long(df)
+
+
+class PanelView:
+    """
+    截至某个交易日的面板只读视图
+
+    所有数组都是面板的切片视图，不复制数据，也看不到当日之后的数据。
+    """
+    __slots__ = ('panel', 'index', 'trade_date')
+
+    def __init__(self, panel: MarketPanel, index: int):
+        self.panel = panel
+        self.index = index
+        self.trade_date = panel.dates[index]
+
+    @property
+    def codes(self) -> List[str]:
+        return self.panel.codes
+
+    def field(self, name: str = 'close', window: Optional[int] = None) -> np.ndarray:
+        """(天数, 股票数) 的历史切片；window 为最近的天数"""
+        end = self.index + 1
+        start = 0 if window is None else max(0, end - window)
+        return self.panel.fields[name][start:end]
+
+    def today(self, name: str = 'close') -> np.ndarray:
+        """当日所有股票的某个字段（停牌为 NaN）"""
+        return self.panel.fields[name][self.index]
+
+    def history(self, stock_code: str, name: str = 'close', window: Optional[int] = None) -> np.ndarray:
+        """单只股票的历史序列（连续内存视图）"""
+        j = self.panel.code_index[stock_code]
+        end = self.index + 1
+        start = 0 if window is None else max(0, end - window)
+        return self.panel.fields[name][start:end, j]
+
+    def bar(self, stock_code: str) -> Dict[str, float]:
+        """单只股票当日的K线"""
+        j = self.panel.code_index[stock_code]
+        return {name: float(values[self.index, j]) for name, values in self.panel.fields.items()}
+
+    def frame(self, stock_code: str, window: Optional[int] = None) -> pd.DataFrame:
+        """单只股票的历史K线 DataFrame（会复制数据，只在需要 DataFrame 接口时使用）"""
+        end = self.index + 1
+        start = 0 if window is None else max(0, end - window)
+        j = self.panel.code_index[stock_code]
+        df = pd.DataFrame({name: values[start:end, j] for name, values in self.panel.fields.items()})
+        df.insert(0, 'trade_date', self.panel.dates[start:end])
+        return df.dropna(subset=['close']).reset_index(drop=True)
+
 
 class BacktestEngine:
     """回测引擎"""
     
     def __init__(self, start_date: datetime, end_date: datetime, 
-                 initial_cash: float = 1000000.0):
+                 initial_cash: float = 1000000.0, commission: float = 3.0,
+                 lot_size: int = 100, fill_price: str = 'next_open', db_manager=None):
+        """
+        Args:
+            start_date: 回测开始日期（datetime 或 'YYYY-MM-DD'）
+            end_date: 回测结束日期
+            initial_cash: 初始资金
+            commission: 每笔固定手续费（与 Account.Position.update 一致）
+            lot_size: 买入的整手股数
+            fill_price: 'next_open' 次日开盘价成交，'close' 当日收盘价成交
+            db_manager: 未传入回测数据时从数据库加载所用的数据库管理器
+        """
+        if fill_price not in ('next_open', 'close'):
+            raise ValueError(f"不支持的成交价格: {fill_price}")
         self.start_date = start_date
         self.end_date = end_date
         self.initial_cash = initial_cash
+        self.commission = commission
+        self.lot_size = lot_size
+        self.fill_price = fill_price
+        self.db_manager = db_manager
         self.results: Dict[str, Any] = {}
+        self._reset(None)
+
+    def _reset(self, panel: Optional[MarketPanel]):
+        self.panel = panel
+        n_stocks = len(panel.codes) if panel is not None else 0
+        self.cash = float(self.initial_cash)
+        self.holdings = np.zeros(n_stocks, dtype=np.int64)
+        self.total_cost = np.zeros(n_stocks, dtype=np.float64)
+        self.today_bought = np.zeros(n_stocks, dtype=np.int64)
+        self._pending: List[tuple] = []
+        self._trades: List[tuple] = []
+        self._cursor = -1
+        self.risk_engine = PortfolioRiskEngine(self.initial_cash, periods_per_year=TRADING_DAYS_PER_YEAR,
+                                               curve_capacity=max(1, len(panel) if panel is not None else 1))
+
+    # ---------------- 下单接口（供策略在 on_bar 中调用） ----------------
+
+    def _code_index(self, stock_code: str) -> int:
+        try:
+            return self.panel.code_index[str(stock_code)]
+        except KeyError:
+            raise KeyError(f"股票不在回测股票池中: {stock_code}")
+
+    def _submit(self, stock_code: str, amount: int, reason: str = ''):
+        j = self._code_index(stock_code)
+        if amount == 0:
+            return
+        if self.fill_price == 'close':
+            self._fill(j, int(amount), self.panel.fields['close'][self._cursor, j], reason)
+        else:
+            self._pending.append((j, int(amount), reason))
+
+    def buy(self, stock_code: str, amount: int, reason: str = ''):
+        """买入（数量向下取整到整手，资金不足时按可买整手数成交）"""
+        if amount > 0:
+            self._submit(stock_code, amount, reason)
+
+    def sell(self, stock_code: str, amount: Optional[int] = None, reason: str = ''):
+        """卖出（None 表示全部可卖数量）"""
+        if amount is None:
+            amount = self.get_position(stock_code)
+        if amount > 0:
+            self._submit(stock_code, -amount, reason)
+
+    def order_target_amount(self, stock_code: str, target: int, reason: str = ''):
+        """调整持仓到目标股数"""
+        delta = int(target) - self.get_position(stock_code)
+        if delta > 0:
+            self.buy(stock_code, delta, reason)
+        elif delta < 0:
+            self.sell(stock_code, -delta, reason)
+
+    def order_value(self, stock_code: str, value: float, reason: str = ''):
+        """按金额买入（以当日收盘价估算股数）"""
+        price = self.panel.valuation_close[self._cursor, self._code_index(stock_code)]
+        if not np.isnan(price) and price > 0:
+            self.buy(stock_code, int(value // (price * self.lot_size)) * self.lot_size, reason)
+
+    def order_target_percent(self, stock_code: str, percent: float, reason: str = ''):
+        """调整持仓到总资产的目标比例（以当日收盘价估算）"""
+        j = self._code_index(stock_code)
+        price = self.panel.valuation_close[self._cursor, j]
+        if np.isnan(price) or price <= 0:
+            return
+        target = int(self.total_equity() * percent // (price * self.lot_size)) * self.lot_size
+        self.order_target_amount(stock_code, target, reason)
+
+    def get_position(self, stock_code: str) -> int:
+        """当前持仓股数"""
+        return int(self.holdings[self._code_index(stock_code)])
+
+    def get_closeable_amount(self, stock_code: str) -> int:
+        """当前可卖股数（T+1：扣除当日买入）"""
+        j = self._code_index(stock_code)
+        return int(self.holdings[j] - self.today_bought[j])
+
+    def get_positions(self) -> Dict[str, int]:
+        """所有非零持仓 {股票代码: 股数}"""
+        return {self.panel.codes[j]: int(self.holdings[j]) for j in np.flatnonzero(self.holdings)}
+
+    def total_equity(self) -> float:
+        """当前总资产（现金 + 按当日收盘价计的持仓市值）"""
+        prices = self.panel.valuation_close[self._cursor]
+        return self.cash + float(np.nansum(self.holdings * prices))
+
+    # ---------------- 成交模拟 ----------------
+
+    def _fill(self, j: int, amount: int, price: float, reason: str) -> bool:
+        """按价格成交一笔订单，返回是否成交"""
+        code = self.panel.codes[j]
+        trade_date = self.panel.dates[self._cursor]
+        if np.isnan(price) or price <= 0:
+            logger.debug(f"{trade_date} {code} 停牌，订单作废")
+            return False
+
+        if amount > 0:
+            lots = amount // self.lot_size
+            affordable = int((self.cash - self.commission) // (price * self.lot_size))
+            lots = min(lots, affordable)
+            if lots <= 0:
+                logger.debug(f"{trade_date} {code} 资金不足，买单作废")
+                return False
+            amount = lots * self.lot_size
+            self.cash -= amount * price + self.commission
+            self.holdings[j] += amount
+            self.total_cost[j] += amount * price + self.commission
+            self.today_bought[j] += amount
+            realized = 0.0
+        else:
+            closeable = int(self.holdings[j] - self.today_bought[j])
+            sell_amount = min(-amount, closeable)
+            if sell_amount < self.holdings[j]:
+                sell_amount = sell_amount // self.lot_size * self.lot_size
+            if sell_amount <= 0:
+                logger.debug(f"{trade_date} {code} 无可卖数量（T+1），卖单作废")
+                return False
+            avg_cost = self.total_cost[j] / self.holdings[j]
+            self.cash += sell_amount * price - self.commission
+            realized = sell_amount * (price - avg_cost) - self.commission
+            self.holdings[j] -= sell_amount
+            self.total_cost[j] = 0.0 if self.holdings[j] == 0 else self.total_cost[j] - sell_amount * avg_cost
+            amount = -sell_amount
+
+        self._trades.append((trade_date, code, amount, float(price), self.commission, realized, reason))
+        self.risk_engine.on_fill(code, amount, float(price), self.commission)
+        return True
+
+    def _execute_pending(self):
+        """按当日开盘价执行前一交易日提交的订单（先卖后买，释放资金）"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        opens = self.panel.fields['open']
+        for j, amount, reason in sorted(pending, key=lambda order: order[1]):
+            self._fill(j, amount, opens[self._cursor, j], reason)
         
-    def run_backtest(self, strategy, data: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
-        """运行回测"""
-        # 实现回测逻辑
+    def run_backtest(self, strategy, data: Union[Dict[str, pd.DataFrame], pd.DataFrame, MarketPanel, None] = None,
+                     stock_codes: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        运行回测
+
+        Args:
+            strategy: 策略（BaseStrategy 子类），每个交易日收盘后调用 on_bar(event)，
+                      event.data 包含 trade_date、view（PanelView）和 broker（回测引擎）
+            data: {股票代码: 日线DataFrame}、长表 DataFrame 或 MarketPanel；None 时从数据库加载
+            stock_codes: data 为 None 时加载的股票池
+
+        Returns:
+            Dict: equity（每日净值）、trades（成交记录）、positions（期末持仓）、metrics（绩效指标）、
+                  risk（期末的组合滚动风险指标）
+        """
         logger.info(f"开始回测: {self.start_date} 到 {self.end_date}")
+        if data is None:
+            panel = MarketPanel.load(self.start_date, self.end_date, stock_codes, db_manager=self.db_manager)
+        elif isinstance(data, MarketPanel):
+            panel = data
+        elif isinstance(data, pd.DataFrame):
+            panel = MarketPanel.from_long(data)
+        else:
+            panel = MarketPanel.from_frames(data)
+
+        start, end = _to_date_str(self.start_date), _to_date_str(self.end_date)
+        first = int(np.searchsorted(panel.dates.astype(str), start, side='left'))
+        last = int(np.searchsorted(panel.dates.astype(str), end, side='right'))
+        if first >= last:
+            raise ValueError(f"{start} 到 {end} 之间没有交易日")
+
+        self._reset(panel)
+        if not getattr(strategy, 'initialized', False):
+            strategy.on_init()
+            strategy.initialized = True
+
+        equity = np.empty(last - first, dtype=np.float64)
+        cash = np.empty(last - first, dtype=np.float64)
+        for k, i in enumerate(range(first, last)):
+            self._cursor = i
+            self.today_bought[:] = 0
+            self._execute_pending()
+
+            event = Event(EventType.BAR, {'trade_date': panel.dates[i], 'view': PanelView(panel, i), 'broker': self},
+                          panel.timestamps[i])
+            strategy.on_bar(event)
+
+            cash[k] = self.cash
+            equity[k] = self.cash + float(np.dot(self.holdings, np.nan_to_num(panel.valuation_close[i])))
+
+            # 持仓按当日收盘价标价，本根K线结束，推入风险引擎的滚动窗口
+            for j in np.flatnonzero(self.holdings):
+                price = panel.valuation_close[i, j]
+                if not np.isnan(price):
+                    self.risk_engine.on_price(panel.codes[j], float(price))
+            self.risk_engine.close_period(panel.timestamps[i])
+
+        dates = pd.Index(panel.dates[first:last], name='trade_date')
+        self.results = {
+            'equity': pd.Series(equity, index=dates, name='equity'),
+            'cash': pd.Series(cash, index=dates, name='cash'),
+            'trades': pd.DataFrame(self._trades, columns=['trade_date', 'stock_code', 'amount', 'price',
+                                                          'commission', 'realized_pnl', 'reason']),
+            'positions': self.get_positions(),
+            'risk': self.risk_engine.metrics(),
+        }
+        self.results['metrics'] = self.calculate_performance_metrics()
+        logger.info(f"回测完成: {len(dates)} 个交易日, {len(self._trades)} 笔成交")
         return self.results
         
     def calculate_performance_metrics(self) -> Dict[str, float]:
-        """计算绩效指标"""
-        # 实现绩效指标计算逻辑
-        return {}
+        """计算绩效指标（对每日净值序列向量化计算）"""
+        equity_series = self.results.get('equity')
+        if equity_series is None or equity_series.empty:
+            return {}
+
+        equity = equity_series.values
+        returns = np.diff(equity, prepend=self.initial_cash) / np.concatenate(([self.initial_cash], equity[:-1]))
+        n_days = len(equity)
+        total_return = equity[-1] / self.initial_cash - 1
+        annual_return = (1 + total_return) ** (TRADING_DAYS_PER_YEAR / n_days) - 1 if total_return > -1 else -1.0
+        volatility = float(np.std(returns, ddof=1)) * np.sqrt(TRADING_DAYS_PER_YEAR) if n_days > 1 else 0.0
+        sharpe = float(np.mean(returns)) / float(np.std(returns, ddof=1)) * np.sqrt(TRADING_DAYS_PER_YEAR) \
+            if n_days > 1 and np.std(returns, ddof=1) > 0 else 0.0
+        peak = np.maximum.accumulate(np.concatenate(([self.initial_cash], equity)))[1:]
+        drawdown = equity / peak - 1
+        max_drawdown = float(drawdown.min())
+
+        trades = self.results.get('trades')
+        sells = trades[trades['amount'] < 0] if trades is not None and not trades.empty else pd.DataFrame()
+        win_rate = float((sells['realized_pnl'] > 0).mean()) if not sells.empty else 0.0
+        traded_value = float((trades['amount'].abs() * trades['price']).sum()) if trades is not None else 0.0
+
+        return {
+            'total_return': float(total_return),
+            'annual_return': float(annual_return),
+            'annual_volatility': float(volatility),
+            'sharpe_ratio': float(sharpe),
+            'max_drawdown': max_drawdown,
+            'calmar_ratio': float(annual_return / -max_drawdown) if max_drawdown < 0 else 0.0,
+            'win_rate': win_rate,
+            'trade_count': int(len(trades)) if trades is not None else 0,
+            'total_commission': float(trades['commission'].sum()) if trades is not None else 0.0,
+            'turnover': traded_value / float(np.mean(equity)) if n_days else 0.0,
+            'final_equity': float(equity[-1]),
+        }
         
     def generate_report(self) -> str:
         """生成回测报告"""
-        # 实现报告生成逻辑
-        return ""
+        metrics = self.results.get('metrics')
+        if not metrics:
+            return "尚未运行回测"
+        equity = self.results['equity']
+        lines = [
+            f"回测区间: {equity.index[0]} 至 {equity.index[-1]}（{len(equity)} 个交易日）",
+            f"初始资金: {self.initial_cash:,.2f}",
+            f"期末资产: {metrics['final_equity']:,.2f}",
+            f"总收益率: {metrics['total_return']:.2%}",
+            f"年化收益率: {metrics['annual_return']:.2%}",
+            f"年化波动率: {metrics['annual_volatility']:.2%}",
+            f"夏普比率: {metrics['sharpe_ratio']:.2f}",
+            f"最大回撤: {metrics['max_drawdown']:.2%}",
+            f"卡玛比率: {metrics['calmar_ratio']:.2f}",
+            f"胜率: {metrics['win_rate']:.2%}",
+            f"成交笔数: {metrics['trade_count']}",
+            f"手续费合计: {metrics['total_commission']:,.2f}",
+            f"换手率: {metrics['turnover']:.2f}",
+            f"期末持仓: {len(self.results['positions'])} 只",
+        ]
+        return "\n".join(lines)
@@ -0,0 +1,432 @@
+"""
+参数扫描与滚动窗口（walk-forward）回测
+
+把参数网格 × 回测窗口展开为独立的回测单元，分发到进程池并行运行：
+- 行情面板只加载一次并保存为 .npy 文件，各工作进程以只读内存映射方式打开（MarketPanel.open），
+  不再各自查询数据库，也不会每个进程复制一份数据
+- 每个单元完成后立即把绩效指标和耗时写入结果库（SQLite），中断后重新运行会跳过已完成的单元
+- results() 把所有单元汇总为一张表（参数、窗口、绩效指标、耗时各占一列），
+  walk_forward_report() 在每个窗口的训练段选出最优参数并给出其在测试段的表现
+
+参数网格可以用 config_parameter_grid() 以 config_select_position_100w 中的当前取值为中心生成
+（CX_THRESHOLD、XUANGU_THRESHOLD、CX_TECH_SCORE_THRESHOLD 以及候选股池的 top_percentage、min_stocks、max_stocks），
+命令行默认只取策略 PARAMETER_KEYS 中声明的参数；声明了 PARAMETER_KEYS 的策略不接受网格中的其他参数。
+
+用法示例：
+    python -m applications.backtest.parameter_sweep --start 2023-01-01 --end 2024-12-31 \\
+        --grid '{"lookback": [10, 20, 40], "top_percentage": [0.1, 0.2]}' --train-days 250 --test-days 60 --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import importlib
+import itertools
+import logging
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from applications.backtest.backtest_engine import PANEL_FIELDS, BacktestEngine, MarketPanel
+from strategies.base_strategy import BaseStrategy
+
+logger = logging.getLogger(__name__)
+
+# 从配置模块扫描的全局阈值
+CONFIG_THRESHOLD_KEYS = ('CX_THRESHOLD', 'XUANGU_THRESHOLD', 'CX_TECH_SCORE_THRESHOLD')
+
+# 从候选股池配置扫描的参数
+POOL_PARAMETER_KEYS = ('top_percentage', 'min_stocks', 'max_stocks')
+
+DEFAULT_RESULTS_PATH = os.path.join('databases', 'parameter_sweep.db')
+
+
+def parameter_grid(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """展开参数网格为参数组合列表（按键名排序，保证顺序稳定）"""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def config_parameter_grid(module_name: str = 'config_select_position_100w', pool_key: Optional[str] = None,
+                          scales: Sequence[float] = (0.75, 1.0, 1.25),
+                          keys: Optional[Iterable[str]] = None) -> Dict[str, List[Any]]:
+    """
+    以配置模块中的当前取值为中心生成参数网格
+
+    Args:
+        module_name: 配置模块名
+        pool_key: 读取 top_percentage / min_stocks / max_stocks 的候选股池，None 时使用第一个
+        scales: 相对当前取值的缩放系数
+        keys: 只生成这些参数（通常为策略的 PARAMETER_KEYS），None 时生成全部
+
+    Returns:
+        Dict[str, List]: 参数名到候选取值的映射（整数参数取整并去重）
+    """
+    from core.execution.decision_context import load_pool_configs
+
+    config = importlib.import_module(module_name)
+    current: Dict[str, Any] = {key: getattr(config, key) for key in CONFIG_THRESHOLD_KEYS if hasattr(config, key)}
+    pools = load_pool_configs(module_name)
+    if pools:
+        pool = pools.get(pool_key) if pool_key else next(iter(pools.values()))
+        if pool is None:
+            raise KeyError(f"配置中没有候选股池: {pool_key}")
+        current.update({key: pool[key] for key in POOL_PARAMETER_KEYS if key in pool})
+
+    if keys is not None:
+        keys = set(keys)
+        current = {key: value for key, value in current.items() if key in keys}
+
+    grid = {}
+    for key, value in current.items():
+        if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+            values = [max(1, int(round(value * scale))) for scale in scales]
+        else:
+            values = [round(float(value) * scale, 4) for scale in scales]
+        grid[key] = sorted(set(values))
+    return grid
+
+
+def walk_forward_windows(dates: Sequence[str], train_days: int, test_days: int,
+                         step_days: Optional[int] = None, anchored: bool = False) -> List[Dict[str, str]]:
+    """
+    生成滚动窗口
+
+    Args:
+        dates: 交易日序列（升序）
+        train_days: 训练段交易日数
+        test_days: 测试段交易日数
+        step_days: 窗口每次前移的交易日数，默认等于 test_days
+        anchored: True 时训练段起点固定为第一个交易日（扩展窗口）
+
+    Returns:
+        List[Dict]: [{'window', 'train_start', 'train_end', 'test_start', 'test_end'}, ...]
+    """
+    dates = [str(d)[:10] for d in dates]
+    step_days = step_days or test_days
+    windows = []
+    start = 0
+    while start + train_days + test_days <= len(dates):
+        train_start = 0 if anchored else start
+        train_end = start + train_days - 1
+        windows.append({
+            'window': len(windows),
+            'train_start': dates[train_start],
+            'train_end': dates[train_end],
+            'test_start': dates[train_end + 1],
+            'test_end': dates[train_end + test_days],
+        })
+        start += step_days
+    return windows
+
+
+def _cell_id(params: Dict[str, Any], start: str, end: str, engine_kwargs: Dict[str, Any],
+             factory_path: str, panel_fingerprint: Dict[str, Any]) -> str:
+    """回测单元的标识：换了策略或面板（日期范围、股票池、目录）后不会误用旧结果"""
+    payload = json.dumps({'params': params, 'start': start, 'end': end, 'engine': engine_kwargs,
+                          'factory': factory_path, 'panel': panel_fingerprint},
+                         sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _factory_path(factory: Union[str, Callable]) -> str:
+    """策略工厂的 '模块:名称'（可调用实例取其类）"""
+    if isinstance(factory, str):
+        return factory
+    target = factory if hasattr(factory, '__qualname__') else type(factory)
+    return f"{target.__module__}:{target.__qualname__}"
+
+
+def _panel_fingerprint(panel_dir: str) -> Dict[str, Any]:
+    """面板目录、日期范围、股票池（股票代码列表的摘要）和行情数据的内容摘要"""
+    dates = np.load(os.path.join(panel_dir, 'dates.npy'))
+    codes = np.load(os.path.join(panel_dir, 'codes.npy')).tolist()
+    # 同一目录重新加载（数据修正、复权更新）后日期和股票池不变，按文件内容区分
+    digest = hashlib.sha1()
+    for name in (*PANEL_FIELDS, 'valuation_close'):
+        with open(os.path.join(panel_dir, f'{name}.npy'), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return {
+        'dir': os.path.abspath(panel_dir),
+        'dates': [str(dates[0]), str(dates[-1]), len(dates)] if len(dates) else [],
+        'codes': hashlib.sha1(','.join(codes).encode('utf-8')).hexdigest()[:16],
+        'data': digest.hexdigest()[:16],
+    }
+
+
+def _resolve_factory(factory: Union[str, Callable]) -> Callable[[Dict[str, Any]], BaseStrategy]:
+    """'模块:名称' 形式的策略工厂解析为可调用对象"""
+    if callable(factory):
+        return factory
+    module_name, _, attr = factory.partition(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+# ---------------- 工作进程 ----------------
+
+_WORKER_PANEL: Optional[MarketPanel] = None
+_WORKER_FACTORY: Optional[Callable] = None
+
+
+def _init_worker(panel_dir: str, factory: Union[str, Callable]):
+    """工作进程初始化：内存映射打开共享面板（每个进程只打开一次）"""
+    global _WORKER_PANEL, _WORKER_FACTORY
+    _WORKER_PANEL = MarketPanel.open(panel_dir)
+    _WORKER_FACTORY = _resolve_factory(factory)
+
+
+def _run_cell(cell: Dict[str, Any]) -> Dict[str, Any]:
+    """运行一个回测单元，返回绩效指标和耗时（异常时记录错误信息）"""
+    start_time = time.perf_counter()
+    result = {'cell_id': cell['cell_id'], 'metrics': {}, 'error': None, 'pid': os.getpid()}
+    try:
+        engine = BacktestEngine(cell['start'], cell['end'], **cell['engine_kwargs'])
+        engine.run_backtest(_WORKER_FACTORY(dict(cell['params'])), _WORKER_PANEL)
+        result['metrics'] = engine.results['metrics']
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['runtime_seconds'] = time.perf_counter() - start_time
+    return result
+
+
+class SweepRunner:
+    """参数扫描 / 滚动窗口回测运行器"""
+
+    def __init__(self, panel: Union[MarketPanel, str], strategy_factory: Union[str, Callable],
+                 results_path: str = DEFAULT_RESULTS_PATH, workers: int = None,
+                 engine_kwargs: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            panel: 行情面板，或 MarketPanel.save() 保存的目录（MarketPanel 会保存到结果库旁边的目录）
+            strategy_factory: 由参数字典创建策略的函数（多进程时需为模块级函数/类），或 '模块:名称'
+            results_path: 结果库路径（已完成的单元记录在这里，重新运行时跳过）
+            workers: 进程数，None 为 CPU 核数，0 在当前进程中顺序运行
+            engine_kwargs: 传给 BacktestEngine 的其他参数（initial_cash、fill_price 等）
+        """
+        self.results_path = results_path
+        self.strategy_factory = strategy_factory
+        self.factory_path = _factory_path(strategy_factory)
+        self.workers = os.cpu_count() if workers is None else workers
+        self.engine_kwargs = dict(engine_kwargs or {})
+
+        if isinstance(panel, MarketPanel):
+            panel_dir = os.path.splitext(os.path.abspath(results_path))[0] + '_panel'
+            self.panel_dir = panel.save(panel_dir)
+        else:
+            self.panel_dir = panel
+        self.panel_fingerprint = _panel_fingerprint(self.panel_dir)
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.results_path, timeout=30)
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.results_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sweep_results (
+                    cell_id TEXT PRIMARY KEY,
+                    window INTEGER,
+                    segment TEXT,
+                    start_date TEXT,
+                    end_date TEXT,
+                    params TEXT,
+                    metrics TEXT,
+                    runtime_seconds REAL,
+                    error TEXT,
+                    finished_at TEXT
+                )
+            """)
+
+    def completed_cells(self) -> set:
+        """已成功完成的单元"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT cell_id FROM sweep_results WHERE error IS NULL").fetchall()
+        return {row[0] for row in rows}
+
+    def build_cells(self, grid: Union[Dict[str, Sequence[Any]], List[Dict[str, Any]]],
+                    windows: Optional[List[Dict[str, str]]] = None,
+                    start_date: str = None, end_date: str = None) -> List[Dict[str, Any]]:
+        """
+        展开参数组合 × 窗口为回测单元
+
+        Args:
+            grid: 参数网格（dict）或参数组合列表
+            windows: walk_forward_windows() 生成的窗口；None 时整个区间作为一个窗口
+            start_date / end_date: windows 为 None 时的回测区间
+        """
+        combos = parameter_grid(grid) if isinstance(grid, dict) else list(grid)
+        segments = []
+        if windows:
+            for window in windows:
+                segments.append((window['window'], 'train', window['train_start'], window['train_end']))
+                segments.append((window['window'], 'test', window['test_start'], window['test_end']))
+        else:
+            if start_date is None or end_date is None:
+                raise ValueError("未指定窗口时必须提供 start_date 和 end_date")
+            segments.append((None, 'full', str(start_date)[:10], str(end_date)[:10]))
+
+        # 策略声明了 PARAMETER_KEYS 时，拒绝策略不使用的参数（否则这些维度只会重复运行相同的回测）
+        known = getattr(_resolve_factory(self.strategy_factory), 'PARAMETER_KEYS', None)
+        if known is not None:
+            unused = sorted({key for params in combos for key in params} - set(known))
+            if unused:
+                raise ValueError(f"策略 {self.factory_path} 不使用这些参数: {unused}")
+
+        cells = []
+        for params in combos:
+            for window, segment, start, end in segments:
+                cells.append({
+                    'cell_id': _cell_id(params, start, end, self.engine_kwargs,
+                                        self.factory_path, self.panel_fingerprint),
+                    'window': window, 'segment': segment, 'start': start, 'end': end,
+                    'params': params, 'engine_kwargs': self.engine_kwargs,
+                })
+        return cells
+
+    def _save(self, cell: Dict[str, Any], result: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sweep_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))",
+                (cell['cell_id'], cell['window'], cell['segment'], cell['start'], cell['end'],
+                 json.dumps(cell['params'], sort_keys=True, default=str), json.dumps(result['metrics']),
+                 result['runtime_seconds'], result['error'])
+            )
+
+    def run(self, grid, windows: Optional[List[Dict[str, str]]] = None,
+            start_date: str = None, end_date: str = None) -> pd.DataFrame:
+        """
+        运行参数扫描（跳过已完成的单元），返回全部结果表
+
+        Args:
+            grid: 参数网格（dict）或参数组合列表
+            windows: walk_forward_windows() 生成的窗口
+            start_date / end_date: 不使用滚动窗口时的回测区间
+        """
+        cells = self.build_cells(grid, windows, start_date, end_date)
+        done = self.completed_cells()
+        pending = [cell for cell in cells if cell['cell_id'] not in done]
+        print(f"参数扫描: 共 {len(cells)} 个回测单元, 已完成 {len(cells) - len(pending)} 个, 待运行 {len(pending)} 个")
+        if not pending:
+            return self.results()
+
+        start_time = time.perf_counter()
+        failed = 0
+        if self.workers == 0:
+            _init_worker(self.panel_dir, self.strategy_factory)
+            for i, cell in enumerate(pending, 1):
+                result = _run_cell(cell)
+                failed += result['error'] is not None
+                self._save(cell, result)
+                self._report_progress(i, len(pending), cell, result)
+        else:
+            by_id = {cell['cell_id']: cell for cell in pending}
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.panel_dir, self.strategy_factory)) as executor:
+                futures = [executor.submit(_run_cell, cell) for cell in pending]
+                for i, future in enumerate(as_completed(futures), 1):
+                    result = future.result()
+                    cell = by_id[result['cell_id']]
+                    failed += result['error'] is not None
+                    self._save(cell, result)
+                    self._report_progress(i, len(pending), cell, result)
+
+        print(f"参数扫描完成: {len(pending)} 个单元, 失败 {failed} 个, 耗时 {time.perf_counter() - start_time:.2f} 秒")
+        return self.results()
+
+    @staticmethod
+    def _report_progress(i: int, total: int, cell: Dict[str, Any], result: Dict[str, Any]):
+        if result['error']:
+            print(f"  [{i}/{total}] {cell['params']} {cell['start']}~{cell['end']} 失败: {result['error']}")
+        elif i == total or i % max(1, total // 10) == 0:
+            print(f"  [{i}/{total}] 已完成")
+
+    def results(self) -> pd.DataFrame:
+        """
+        汇总结果表
+
+        每行一个回测单元：window、segment、start_date、end_date、各参数列、各绩效指标列、runtime_seconds、error
+        """
+        with self._connect() as conn:
+            df = pd.read_sql_query("SELECT * FROM sweep_results ORDER BY window, segment, params", conn)
+        if df.empty:
+            return df
+        params = pd.DataFrame([json.loads(p) for p in df['params']], index=df.index)
+        metrics = pd.DataFrame([json.loads(m) for m in df['metrics']], index=df.index)
+        base = df[['cell_id', 'window', 'segment', 'start_date', 'end_date']]
+        tail = df[['runtime_seconds', 'error', 'finished_at']]
+        return pd.concat([base, params, metrics, tail], axis=1)
+
+
+def walk_forward_report(results: pd.DataFrame, param_keys: Iterable[str],
+                        metric: str = 'sharpe_ratio') -> pd.DataFrame:
+    """
+    每个窗口在训练段按 metric 选出最优参数，并给出该参数在测试段的表现
+
+    Returns:
+        pd.DataFrame: window、最优参数、train_<metric>、test_<metric>、test_total_return
+    """
+    param_keys = list(param_keys)
+    ok = results[results['error'].isna() & results['window'].notna()]
+    rows = []
+    for window, group in ok.groupby('window'):
+        train = group[group['segment'] == 'train']
+        test = group[group['segment'] == 'test']
+        if train.empty or test.empty:
+            continue
+        best = train.loc[train[metric].idxmax()]
+        matched = test
+        for key in param_keys:
+            matched = matched[matched[key] == best[key]]
+        if matched.empty:
+            continue
+        row = {'window': int(window), **{key: best[key] for key in param_keys},
+               f'train_{metric}': best[metric], f'test_{metric}': matched.iloc[0][metric],
+               'test_total_return': matched.iloc[0]['total_return']}
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv=None) -> pd.DataFrame:
+    parser = argparse.ArgumentParser(description='参数扫描与滚动窗口回测')
+    parser.add_argument('--start', required=True, help='回测开始日期')
+    parser.add_argument('--end', required=True, help='回测结束日期')
+    parser.add_argument('--grid', default=None, help='参数网格 JSON，默认以配置文件当前取值为中心生成')
+    parser.add_argument('--strategy', default='strategies.rank_rotation_strategy:RankRotationStrategy',
+                        help='策略工厂（模块:名称）')
+    parser.add_argument('--train-days', type=int, default=0, help='滚动窗口训练段交易日数（0 表示不使用滚动窗口）')
+    parser.add_argument('--test-days', type=int, default=60, help='滚动窗口测试段交易日数')
+    parser.add_argument('--workers', type=int, default=None, help='进程数')
+    parser.add_argument('--results', default=DEFAULT_RESULTS_PATH, help='结果库路径')
+    parser.add_argument('--metric', default='sharpe_ratio', help='滚动窗口选优指标')
+    args = parser.parse_args(argv)
+
+    if args.grid:
+        grid = json.loads(args.grid)
+    else:
+        # 配置中的 CX/XUANGU 阈值只有在策略使用时才加入默认网格
+        grid = config_parameter_grid(keys=getattr(_resolve_factory(args.strategy), 'PARAMETER_KEYS', None))
+    print(f"参数网格: {grid}")
+
+    panel = MarketPanel.load(args.start, args.end)
+    runner = SweepRunner(panel, args.strategy, args.results, workers=args.workers)
+    if args.train_days > 0:
+        windows = walk_forward_windows(panel.dates, args.train_days, args.test_days)
+        results = runner.run(grid, windows)
+        print(walk_forward_report(results, grid.keys(), args.metric).to_string(index=False))
+    else:
+        results = runner.run(grid, start_date=args.start, end_date=args.end)
+        columns = [*grid.keys(), 'total_return', 'sharpe_ratio', 'max_drawdown', 'runtime_seconds']
+        print(results.sort_values(args.metric, ascending=False)[columns].head(20).to_string(index=False))
+    return results
+
+
+if __name__ == "__main__":
+    main()
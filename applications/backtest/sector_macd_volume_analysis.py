@@ -8,6 +8,10 @@
 条件2：周MACD1>4 且 周VOL5<VOL30
 
 时间段：2025-08-15到2025-09-19的每个交易日
+
+默认使用面板模式：一次性加载全部成分股的日线和周线，对每只股票只计算一次指标，
+再用 searchsorted 定位每个交易日对应的最后一根K线，一次得到所有交易日的条件结果；
+逐日模式（mode='loop'）保留原来的逐日重新加载、重新计算方式，用于核对结果。
 """
 
 import sys
@@ -324,53 +328,157 @@ def get_trading_days(start_date: str, end_date: str) -> List[str]:
         return []
 
 
-def analyze_sector_conditions(bankuai_name: str, start_date: str, end_date: str) -> pd.DataFrame:
+def load_sector_panel(stock_list: List[str], end_date: str, db_manager: DatabaseManager = None,
+                      chunk_size: int = 500) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
-    分析板块中股票符合条件的占比
+    一次性加载成分股截至 end_date 的全部日线和周线
     
     Args:
-        bankuai_name: 板块名称
-        start_date: 开始日期
-        end_date: 结束日期
+        stock_list: 股票代码列表
+        end_date: 截止日期（包含）
+        db_manager: 数据库管理器
+        chunk_size: 每次查询的股票数量
     
     Returns:
-        pd.DataFrame: 分析结果
+        Tuple[pd.DataFrame, pd.DataFrame]: (日线, 周线)，列为 stock_code, trade_date(datetime64), close, volume
     """
-    print(f"开始分析板块: {bankuai_name}")
-    print(f"分析期间: {start_date} 到 {end_date}")
+    if db_manager is None:
+        db_manager = DatabaseManager()
+    next_day = (pd.Timestamp(end_date) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    
+    panels = []
+    for table in ('k_daily', 'k_weekly'):
+        frames = []
+        for i in range(0, len(stock_list), chunk_size):
+            chunk = [str(code) for code in stock_list[i:i + chunk_size]]
+            placeholders = ','.join('?' * len(chunk))
+            query = f"""
+            SELECT stock_code, trade_date, close, volume
+            FROM {table}
+            WHERE stock_code IN ({placeholders}) AND trade_date < ?
+            ORDER BY stock_code, trade_date
+            """
+            frames.append(db_manager.execute_query(query, (*chunk, next_day)))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if not df.empty:
+            df['stock_code'] = df['stock_code'].astype(str)
+            df['trade_date'] = pd.to_datetime(df['trade_date'])
+            for col in ['close', 'volume']:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype(float)
+        panels.append(df)
+    
+    print(f"板块面板加载完成: 日线 {len(panels[0])} 条, 周线 {len(panels[1])} 条")
+    return panels[0], panels[1]
+
+
+def _stock_conditions(dates: np.ndarray, close: np.ndarray, volume: np.ndarray,
+                      days: np.ndarray, is_weekly: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    单只股票在所有交易日的指标有效性和条件结果（与逐日模式的 calculate_technical_indicators +
+    check_condition1/check_condition2 一致）
     
-    # 获取板块股票列表
-    stock_list_raw = get_bankuai_stocks(bankuai_name)
-    if not stock_list_raw:
-        print(f"未找到板块 {bankuai_name} 的成分股")
-        return pd.DataFrame()
+    MACD（EMA 递推）和成交量均线都只依赖当日及之前的数据，因此在全部历史上计算一次，
+    再取每个交易日对应的最后一根K线即可得到与逐日截取后计算相同的结果。
     
-    print(f"板块原始成分股数量: {len(stock_list_raw)}")
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (指标有效, 满足条件)，长度为交易日数
+    """
+    min_periods = 30 if is_weekly else 50
+    pos = np.searchsorted(dates, days, side='right') - 1
+    p = np.maximum(pos, 0)
+    
+    # 截至每根K线：是否出现过 NaN、收盘价/成交量是否全为 0
+    has_nan = np.logical_or.accumulate(np.isnan(close) | np.isnan(volume))
+    any_close = np.logical_or.accumulate(close != 0)
+    any_volume = np.logical_or.accumulate(volume != 0)
+    valid = (pos + 1 >= min_periods) & ~has_nan[p] & any_close[p] & any_volume[p]
+    if not valid.any():
+        return valid, valid
+    
+    _, _, macd = MACD(close, SHORT=12, LONG=26, M=9)
+    vol5 = MA(volume, 5)
+    vol30 = MA(volume, 30)
+    
+    # MACD 最新值大于 4 根K线前的值
+    macd_up = macd[p] > macd[np.maximum(p - 4, 0)]
+    if is_weekly:
+        cond = macd_up & (vol5[p] < vol30[p])
+    else:
+        # 最近20根K线中 VOL5 > VOL30*2 的个数小于等于2
+        spikes = pd.Series((vol5 > vol30 * 2).astype(float)).rolling(20, min_periods=1).sum().values
+        cond = macd_up & (spikes[p] <= 2)
+    return valid, valid & cond
+
+
+def analyze_conditions_panel(stock_list: List[str], trading_days: List[str],
+                             db_manager: DatabaseManager = None) -> pd.DataFrame:
+    """
+    面板模式：一次性加载板块面板，向量化计算所有交易日、所有股票的条件1/条件2
     
-    # 使用StockXihua过滤股票
-    try:
-        stock_xihua = StockXihua()
-        stock_list = stock_xihua.filter_basic_conditions(stock_list_raw)
-        print(f"经过基础筛选后的成分股数量: {len(stock_list)}")
-        
-        if not stock_list:
-            print("筛选后没有符合条件的股票")
-            return pd.DataFrame()
-            
-    except Exception as e:
-        print(f"股票筛选失败: {e}")
-        print("使用原始股票列表继续分析")
-        stock_list = stock_list_raw
+    Args:
+        stock_list: 股票代码列表
+        trading_days: 交易日列表
+        db_manager: 数据库管理器
     
-    # 获取交易日列表
-    trading_days = get_trading_days(start_date, end_date)
-    if not trading_days:
-        print("未找到交易日数据")
+    Returns:
+        pd.DataFrame: 与逐日模式相同的每日占比表
+    """
+    daily, weekly = load_sector_panel(stock_list, trading_days[-1], db_manager)
+    if daily.empty or weekly.empty:
         return pd.DataFrame()
     
-    print(f"分析交易日数量: {len(trading_days)}")
+    days = pd.to_datetime(pd.Series(trading_days)).dt.normalize().values
+    total = np.zeros(len(days), dtype=np.int64)
+    condition1 = np.zeros(len(days), dtype=np.int64)
+    condition2 = np.zeros(len(days), dtype=np.int64)
+    condition_any = np.zeros(len(days), dtype=np.int64)
+    
+    weekly_groups = {code: group for code, group in weekly.groupby('stock_code', sort=False)}
+    for stock_code, daily_group in daily.groupby('stock_code', sort=False):
+        weekly_group = weekly_groups.get(stock_code)
+        if weekly_group is None:
+            continue
+        valid_daily, cond1 = _stock_conditions(daily_group['trade_date'].values, daily_group['close'].values,
+                                               daily_group['volume'].values, days, is_weekly=False)
+        valid_weekly, cond2 = _stock_conditions(weekly_group['trade_date'].values, weekly_group['close'].values,
+                                                weekly_group['volume'].values, days, is_weekly=True)
+        valid = valid_daily & valid_weekly
+        cond1 &= valid
+        cond2 &= valid
+        total += valid
+        condition1 += cond1
+        condition2 += cond2
+        condition_any += cond1 | cond2
     
-    # 分析每个交易日的条件符合情况
+    results = []
+    for i, trade_date in enumerate(trading_days):
+        if total[i] == 0:
+            print(f"  {trade_date} 无有效股票数据")
+            continue
+        results.append({
+            'trade_date': trade_date,
+            'total_stocks': int(total[i]),
+            'condition1_count': int(condition1[i]),
+            'condition1_ratio': condition1[i] / total[i],
+            'condition2_count': int(condition2[i]),
+            'condition2_ratio': condition2[i] / total[i],
+            'condition_any_count': int(condition_any[i]),
+            'condition_any_ratio': condition_any[i] / total[i]
+        })
+    return pd.DataFrame(results)
+
+
+def analyze_conditions_loop(stock_list: List[str], trading_days: List[str]) -> pd.DataFrame:
+    """
+    逐日模式：每个交易日重新加载全部成分股的日线/周线并逐只计算指标
+    
+    Args:
+        stock_list: 股票代码列表
+        trading_days: 交易日列表
+    
+    Returns:
+        pd.DataFrame: 每日占比表
+    """
     results = []
     print("\n开始分析每日条件符合情况...")
     
@@ -444,8 +552,63 @@ def analyze_sector_conditions(bankuai_name: str, start_date: str, end_date: str)
         else:
             print(f"  当日无有效股票数据")
     
-    # 转换为DataFrame
-    result_df = pd.DataFrame(results)
+    return pd.DataFrame(results)
+
+
+def analyze_sector_conditions(bankuai_name: str, start_date: str, end_date: str, mode: str = 'panel') -> pd.DataFrame:
+    """
+    分析板块中股票符合条件的占比
+    
+    Args:
+        bankuai_name: 板块名称
+        start_date: 开始日期
+        end_date: 结束日期
+        mode: 'panel' 一次性加载板块面板后向量化计算（默认）；'loop' 逐日重新加载并计算
+    
+    Returns:
+        pd.DataFrame: 分析结果
+    """
+    if mode not in ('panel', 'loop'):
+        raise ValueError(f"不支持的分析模式: {mode}")
+    print(f"开始分析板块: {bankuai_name}")
+    print(f"分析期间: {start_date} 到 {end_date}")
+    
+    # 获取板块股票列表
+    stock_list_raw = get_bankuai_stocks(bankuai_name)
+    if not stock_list_raw:
+        print(f"未找到板块 {bankuai_name} 的成分股")
+        return pd.DataFrame()
+    
+    print(f"板块原始成分股数量: {len(stock_list_raw)}")
+    
+    # 使用StockXihua过滤股票
+    try:
+        stock_xihua = StockXihua()
+        stock_list = stock_xihua.filter_basic_conditions(stock_list_raw)
+        print(f"经过基础筛选后的成分股数量: {len(stock_list)}")
+        
+        if not stock_list:
+            print("筛选后没有符合条件的股票")
+            return pd.DataFrame()
+            
+    except Exception as e:
+        print(f"股票筛选失败: {e}")
+        print("使用原始股票列表继续分析")
+        stock_list = stock_list_raw
+    
+    # 获取交易日列表
+    trading_days = get_trading_days(start_date, end_date)
+    if not trading_days:
+        print("未找到交易日数据")
+        return pd.DataFrame()
+    
+    print(f"分析交易日数量: {len(trading_days)}")
+    
+    # 分析每个交易日的条件符合情况
+    if mode == 'panel':
+        result_df = analyze_conditions_panel(stock_list, trading_days)
+    else:
+        result_df = analyze_conditions_loop(stock_list, trading_days)
     
     if not result_df.empty:
         print(f"\n分析完成！共分析了 {len(result_df)} 个交易日")
@@ -21,11 +21,14 @@
 import pandas as pd
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+from dataclasses import asdict
 import sys
 import os
 
 # 导入v2项目的模块
 from data_management.sector_index_calculator import SectorIndexCalculator
+from data_management.point_in_time_store import PointInTimeStore
+from data_management.index_data_writer import IndexDataWriter
 from core.utils.stock_filter import StockXihua
 from data_management.data_processor import get_last_trade_date
 from data_management.database_manager import DatabaseManager
@@ -356,52 +359,41 @@ def get_sector_constituents(sector_code: str) -> List[str]:
         print(f"获取板块成分股失败: {e}")
         return []
 
-def save_incremental_index_data(index_data: pd.DataFrame, index_code: str, index_name: str, table_name: str, update_date: str):
+def save_incremental_index_data(index_data: pd.DataFrame, index_code: str, index_name: str, table_name: str, update_date: str,
+                                writer: Optional[IndexDataWriter] = None):
     """
     【修正版】将增量指数数据保存到数据库，支持不同的表名
-    使用 REPLACE 语句确保操作的幂等性，可以安全地重复执行。
+    按 (index_code, trade_date) 进行 upsert，确保操作的幂等性，可以安全地重复执行。
+    
+    传入 writer 时数据只加入写入缓存，由 writer 在大事务中批量写入；
+    否则立即写入数据库。
     """
     if not isinstance(index_data, pd.DataFrame) or index_data.empty:
         print(f"    ❌ 传入的指数数据为空或格式不正确: {index_code}")
         return
 
     try:
-        # 使用 DatabaseManager 进行数据库操作
-        db_manager = DatabaseManager()
-        
         # 获取指定日期的数据行
-        if update_date in index_data.index:
-            row = index_data.loc[update_date]
-            
-            # 准备单条数据
-            data_to_insert = {
-                'index_code': index_code,
-                'index_name': index_name,
-                'trade_date': update_date,
-                'open': row['open'],
-                'high': row['high'],
-                'low': row['low'],
-                'close': row['close'],
-                'volume': int(row['volume'])
-            }
-            
-            # 转换为DataFrame进行批量插入
-            df_to_insert = pd.DataFrame([data_to_insert])
-            
-            # 使用批量插入方法
-            success = db_manager.batch_insert_dataframe(df_to_insert, table_name)
-            
-            if success:
-                print(f"    ✅ 成功保存/更新增量数据到 {table_name}: {index_code} - {update_date}")
-            else:
-                print(f"    ❌ 保存增量数据失败: {index_code} - {update_date}")
-        else:
+        if update_date not in index_data.index:
             print(f"    ❌ 在计算结果中未找到日期 {update_date} 的数据: {index_code}")
+            return
+        
+        if writer is not None:
+            writer.add_frame(index_data, index_code, index_name, dates=[update_date])
+            return
+        
+        single_writer = IndexDataWriter(table_name=table_name)
+        single_writer.add_frame(index_data, index_code, index_name, dates=[update_date])
+        if single_writer.flush():
+            print(f"    ✅ 成功保存/更新增量数据到 {table_name}: {index_code} - {update_date}")
+        else:
+            print(f"    ❌ 保存增量数据失败: {index_code} - {update_date}")
 
     except Exception as e:
         print(f"    ❌ 保存增量数据到 {table_name} 失败: {e}")
 
-def process_single_standard_index_all_dates(sector_code: str, sector_name: str) -> Tuple[int, List[str]]:
+def process_single_standard_index_all_dates(sector_code: str, sector_name: str,
+                                            writer: Optional[IndexDataWriter] = None) -> Tuple[int, List[str]]:
     """
     【性能优化版】处理单个标准申万板块的所有待更新日期
     
@@ -413,6 +405,7 @@ def process_single_standard_index_all_dates(sector_code: str, sector_name: str)
     Args:
         sector_code (str): 板块代码
         sector_name (str): 板块名称
+        writer (IndexDataWriter): 缓冲写入器，为None时每个日期立即写入
         
     Returns:
         Tuple[int, List[str]]: (成功更新的日期数量, 失败的日期列表)
@@ -438,6 +431,12 @@ def process_single_standard_index_all_dates(sector_code: str, sector_name: str)
     
     print(f"    使用 {len(all_stocks)} 只成分股进行计算")
     
+    # 【点位时间】记录成分股调入/调出，历史日期按当时的成分股计算权重
+    try:
+        PointInTimeStore().snapshot_membership(sector_code, all_stocks, dates_to_update[-1])
+    except Exception as e:
+        print(f"    ⚠️ 记录成分股历史失败: {e}")
+    
     # 3. 【性能关键】只创建一次计算器实例，加载完整日期范围的数据
     try:
         # 获取第一个更新日期的前一天作为起始日期
@@ -458,7 +457,8 @@ def process_single_standard_index_all_dates(sector_code: str, sector_name: str)
         calculator = SectorIndexCalculator(
             stock_list=all_stocks,  # 使用所有成分股
             start_date=start_date,
-            end_date=last_update_date
+            end_date=last_update_date,
+            sector_code=sector_code
         )
         
         print(f"    ✅ 数据加载完成，开始逐日增量计算...")
@@ -480,7 +480,7 @@ def process_single_standard_index_all_dates(sector_code: str, sector_name: str)
             new_index_row = calculator.calculate_incremental(current_last_info)
             
             # 保存到数据库
-            save_incremental_index_data(new_index_row, new_index_code, index_name, 'index_k_daily', update_date)
+            save_incremental_index_data(new_index_row, new_index_code, index_name, 'index_k_daily', update_date, writer)
             
             # 更新当前最新信息，为下一次计算做准备
             if update_date in new_index_row.index:
@@ -500,9 +500,12 @@ def process_single_standard_index_all_dates(sector_code: str, sector_name: str)
     print(f"    标准板块更新完成: 成功 {success_count}/{len(dates_to_update)} 个日期")
     return success_count, failed_dates
 
-def process_standard_sector_incremental(sector_code: str, sector_name: str, update_date: str) -> bool:
+def process_standard_sector_incremental(sector_code: str, sector_name: str, update_date: str,
+                                        writer: Optional[IndexDataWriter] = None) -> bool:
     """
     【兼容版】处理单个标准申万板块的增量更新 - 保持向后兼容
+    
+    传入 writer 时数据只加入写入缓存，由调用方负责 flush/close。
     """
     new_index_code = sector_code.replace('.SI', '.ZS')
     index_name = f"{sector_name}指数"
@@ -543,7 +546,7 @@ def process_standard_sector_incremental(sector_code: str, sector_name: str, upda
         new_index_row = calculator.calculate_incremental(last_day_info)
 
         # 5. 保存新的单行数据到数据库
-        save_incremental_index_data(new_index_row, new_index_code, index_name, 'index_k_daily', update_date)
+        save_incremental_index_data(new_index_row, new_index_code, index_name, 'index_k_daily', update_date, writer)
         
         return True
         
@@ -553,7 +556,8 @@ def process_standard_sector_incremental(sector_code: str, sector_name: str, upda
         traceback.print_exc() # 打印详细错误信息
         return False
 
-def process_single_refined_index_all_dates(sector_code: str, sector_name: str) -> Tuple[int, Dict[str, List[str]]]:
+def process_single_refined_index_all_dates(sector_code: str, sector_name: str,
+                                           writer: Optional[IndexDataWriter] = None) -> Tuple[int, Dict[str, List[str]]]:
     """
     【性能优化版】处理单个申万板块的所有细化板块的所有待更新日期
     
@@ -565,6 +569,7 @@ def process_single_refined_index_all_dates(sector_code: str, sector_name: str) -
     Args:
         sector_code (str): 板块代码
         sector_name (str): 板块名称
+        writer (IndexDataWriter): 缓冲写入器，为None时每个日期立即写入
         
     Returns:
         Tuple[int, Dict[str, List[str]]]: (成功更新的细化指数总数, 失败的日期字典)
@@ -667,7 +672,7 @@ def process_single_refined_index_all_dates(sector_code: str, sector_name: str) -
                         new_index_row = calculator.calculate_incremental(current_last_info)
                         
                         # 保存到数据库
-                        save_incremental_index_data(new_index_row, sub_index_code, sub_index_name, 'index_k_daily', update_date)
+                        save_incremental_index_data(new_index_row, sub_index_code, sub_index_name, 'index_k_daily', update_date, writer)
                         
                         # 更新当前最新信息
                         if update_date in new_index_row.index:
@@ -703,7 +708,8 @@ def process_single_refined_index_all_dates(sector_code: str, sector_name: str) -
         print(f"    ❌ 处理细化板块 {sector_code} 失败: {e}")
         return 0, {}
 
-def process_refined_sector_incremental(sector_code: str, sector_name: str, update_date: str) -> int:
+def process_refined_sector_incremental(sector_code: str, sector_name: str, update_date: str,
+                                       writer: Optional[IndexDataWriter] = None) -> int:
     """
     【兼容版】处理单个申万板块的细化板块的增量更新 - 保持向后兼容
     
@@ -711,6 +717,7 @@ def process_refined_sector_incremental(sector_code: str, sector_name: str, updat
         sector_code (str): 板块代码
         sector_name (str): 板块名称
         update_date (str): 更新日期
+        writer (IndexDataWriter): 缓冲写入器，为None时立即写入
         
     Returns:
         int: 成功生成的细化指数数量
@@ -785,7 +792,7 @@ def process_refined_sector_incremental(sector_code: str, sector_name: str, updat
                 new_index_row = calculator.calculate_incremental(last_day_info)
                 
                 # 4. 保存新的单行数据到数据库
-                save_incremental_index_data(new_index_row, sub_index_code, sub_index_name, 'index_k_daily', update_date)
+                save_incremental_index_data(new_index_row, sub_index_code, sub_index_name, 'index_k_daily', update_date, writer)
                 success_count += 1
                 
             except Exception as e:
@@ -820,6 +827,16 @@ def main_incremental_update_new():
             'failed_indices': {}
         }
     
+    # 【点位时间】记录当日流通股本的变更点（未变化的股本不会重复写入）
+    try:
+        changed = PointInTimeStore().snapshot_circulating_shares(get_last_trade_date())
+        print(f"记录流通股本变更点: {changed} 条")
+    except Exception as e:
+        print(f"⚠️ 记录流通股本历史失败: {e}")
+    
+    # 所有指数的计算结果先进入写入缓存，按行数/时间阈值在大事务中批量写入
+    writer = IndexDataWriter(table_name='index_k_daily')
+    
     # 2. 按指数循环处理标准板块
     print(f"\n>>> 步骤2：处理所有标准申万板块的增量更新")
     total_standard_success = 0
@@ -830,7 +847,7 @@ def main_incremental_update_new():
         print(f"\n[{i}/{len(all_sectors)}] 处理标准板块: {sector_name} ({sector_code})")
         
         try:
-            success_count, failed_dates = process_single_standard_index_all_dates(sector_code, sector_name)
+            success_count, failed_dates = process_single_standard_index_all_dates(sector_code, sector_name, writer)
             if success_count > 0:
                 total_standard_success += 1
                 total_standard_dates += success_count
@@ -857,7 +874,7 @@ def main_incremental_update_new():
         print(f"\n[{i}/{len(all_sectors)}] 处理细化板块: {sector_name} ({sector_code})")
         
         try:
-            success_count, failed_dates_dict = process_single_refined_index_all_dates(sector_code, sector_name)
+            success_count, failed_dates_dict = process_single_refined_index_all_dates(sector_code, sector_name, writer)
             if success_count > 0:
                 total_refined_success += 1
                 total_refined_indices += success_count
@@ -876,6 +893,10 @@ def main_incremental_update_new():
     print(f"\n细化板块增量更新完成: 成功处理 {total_refined_success}/{len(all_sectors)} 个板块")
     print(f"总计生成 {total_refined_indices} 个细化指数")
     
+    # 写入缓存中剩余的数据
+    write_ok = writer.close()
+    print(f"\n批量写入统计: {writer.stats.summary()}")
+    
     # 4. 最终汇总
     print(f"\n{'='*80}")
     print("所有指数的增量更新完成！")
@@ -888,6 +909,8 @@ def main_incremental_update_new():
     all_failed_indices = {}
     all_failed_indices.update(standard_failed_indices)
     all_failed_indices.update(refined_failed_indices)
+    if not write_ok:
+        all_failed_indices['index_k_daily'] = [f"严重错误: 批量写入失败，{writer.pending} 行未写入"]
     
     if all_failed_indices:
         print("\n" + "="*80)
@@ -907,7 +930,8 @@ def main_incremental_update_new():
         'standard_count': total_standard_success,
         'refined_count': total_refined_indices,
         'total_count': total_standard_dates + total_refined_indices,
-        'failed_indices': all_failed_indices
+        'failed_indices': all_failed_indices,
+        'write_stats': asdict(writer.stats)
     }
 
 def main_incremental_update():
@@ -944,6 +968,7 @@ def main_incremental_update():
     total_refined_success = 0
     total_refined_indices = 0
     failed_sectors = {}  # 用于记录失败的板块和原因
+    writer = IndexDataWriter(table_name='index_k_daily')
     
     for day_idx, update_date in enumerate(dates_to_update, 1):
         print(f"\n{'='*20} 正在处理日期: {update_date} ({day_idx}/{len(dates_to_update)}) {'='*20}")
@@ -957,7 +982,7 @@ def main_incremental_update():
             
             try:
                 # 【增加异常捕获】
-                if process_standard_sector_incremental(sector_code, sector_name, update_date):
+                if process_standard_sector_incremental(sector_code, sector_name, update_date, writer):
                     standard_success_count += 1
             except Exception as e:
                 print(f"❌ 处理标准板块 {sector_code} 时发生严重错误: {e}")
@@ -978,7 +1003,7 @@ def main_incremental_update():
             
             try:
                 # 【增加异常捕获】
-                count = process_refined_sector_incremental(sector_code, sector_name, update_date)
+                count = process_refined_sector_incremental(sector_code, sector_name, update_date, writer)
                 if count > 0:
                     refined_success_count += 1
                     day_refined_indices += count
@@ -992,6 +1017,16 @@ def main_incremental_update():
         print(f"当日生成 {day_refined_indices} 个细化指数增量")
         total_refined_success += refined_success_count
         total_refined_indices += day_refined_indices
+        
+        # 下一个日期的增量计算要读取当日的收盘点位，每个日期结束时写入缓存
+        if not writer.flush():
+            failed_sectors.setdefault(update_date, []).append(f"批量写入失败，{writer.pending} 行未写入")
+    
+    # 写入缓存中剩余的数据
+    write_ok = writer.close()
+    print(f"\n批量写入统计: {writer.stats.summary()}")
+    if not write_ok:
+        failed_sectors.setdefault('index_k_daily', []).append(f"严重错误: 批量写入失败，{writer.pending} 行未写入")
     
     # 4. 最终汇总
     print(f"\n{'='*80}")
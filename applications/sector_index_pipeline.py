@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+板块指数数据管道（依赖感知调度版）
+
+将原先手工排序、每次全量重跑的各个步骤组织成一个 DAG：
+
+    daily_ingest → weekly_monthly
+    daily_ingest → constituent_snapshot → sector_indices → index_timeframes
+    daily_ingest → category_indices ─────────────────────→ index_timeframes
+                                          sector_indices → signals
+
+- 每个任务的输入指纹来自其依赖的数据表状态（最新日期、记录数），
+  输入未变化的任务自动跳过
+- 互不依赖的任务并行执行；写入 SQLite 的任务（周/月线转换、成分股快照、分类指数）属于同一互斥组，
+  不会同时写库（避免 "database is locked"）；板块指数任务同样写 index_k_daily，也在该组内
+- 某个任务失败只会阻塞其下游任务，下次运行时已成功的任务不会重跑
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+from core.utils.dag_runner import DagRunner, Task
+from data_management.database_manager import DatabaseManager
+
+# 分类指数代码（与 StockCategoryIndexMapper.index_mapping 保持一致）
+CATEGORY_INDEX_CODES = [f"10000{i}.ZS" for i in range(1, 10)]
+
+
+def _table_state(table_name: str, where: str = "") -> Optional[Dict[str, Any]]:
+    """获取数据表的状态（最新日期和记录数），用作任务的输入/输出指纹"""
+    db_manager = DatabaseManager()
+    df = db_manager.execute_query(f"SELECT MAX(trade_date) AS latest, COUNT(*) AS rows FROM {table_name} {where}")
+    if df.empty:
+        return None
+    return {'latest': df.iloc[0]['latest'], 'rows': int(df.iloc[0]['rows'])}
+
+
+def _query_state(query: str) -> list:
+    """执行统计查询，结果用作任务指纹"""
+    return DatabaseManager().execute_query(query).to_dict('records')
+
+
+def _category_filter(negate: bool = False) -> str:
+    codes = ','.join(f"'{code}'" for code in CATEGORY_INDEX_CODES)
+    return f"WHERE index_code {'NOT IN' if negate else 'IN'} ({codes})"
+
+
+def _file_state(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+
+def _source_latest_trade_date(jqdata_csv_path: str) -> Optional[str]:
+    """日线数据源中实际包含的最新交易日：聚宽文件的最大日期；没有聚宽文件时为交易日历上截至今天的最新交易日"""
+    if os.path.exists(jqdata_csv_path):
+        import pandas as pd
+        dates = pd.read_csv(jqdata_csv_path, usecols=['date'])['date']
+        return pd.to_datetime(dates).max().strftime('%Y-%m-%d') if not dates.empty else None
+    df = DatabaseManager().execute_query(
+        "SELECT MAX(trade_date) AS latest FROM trade_calendar WHERE trade_status = 1 AND trade_date <= ?",
+        (datetime.now().strftime('%Y-%m-%d'),))
+    return df.iloc[0]['latest'] if not df.empty else None
+
+
+def _daily_ingest_fingerprint(jqdata_csv_path: str) -> Dict[str, Any]:
+    """
+    日线入库任务的输入指纹：数据源的最新交易日和聚宽文件状态
+
+    本地日线还没有追上数据源的最新交易日时（例如上次运行时当日数据尚未到达），
+    指纹中加入当前时间，保证任务重跑而不是被跳过
+    """
+    source_latest = _source_latest_trade_date(jqdata_csv_path)
+    state = {'source_latest': source_latest, 'jqdata': _file_state(jqdata_csv_path)}
+    local = _table_state('k_daily')
+    if source_latest is None or not local or not local['latest'] or local['latest'] < source_latest:
+        state['pending_at'] = datetime.now().isoformat(timespec='seconds')
+    return state
+
+
+# ---------------- 任务实现 ----------------
+
+def _get_updater():
+    from data_management.data_updater import DataUpdater
+    return DataUpdater(DatabaseManager())
+
+
+def run_daily_ingest(_upstream: Dict[str, Any]) -> Optional[str]:
+    """原始日线数据入库，返回新数据的起始日期"""
+    success, start_date = _get_updater().update_daily()
+    if not success:
+        raise RuntimeError("所有日线更新方式均失败")
+    return start_date
+
+
+def run_weekly_monthly(upstream: Dict[str, Any]) -> None:
+    """周线/月线增量转换"""
+    start_date = upstream.get('daily_ingest')
+    if start_date is None:
+        # 上游被跳过（或没有新数据）时，从周线表的最新日期开始补算
+        state = _table_state('k_weekly')
+        start_date = state['latest'] if state else None
+    _get_updater().update_resampled(start_date)
+
+
+def run_constituent_snapshot(_upstream: Dict[str, Any]) -> int:
+    """记录板块成分股和流通股本的点位时间快照"""
+    from applications.incremental_sector_index_updater import get_all_sw_sectors, get_sector_constituents
+    from data_management.data_processor import get_last_trade_date
+    from data_management.point_in_time_store import PointInTimeStore
+
+    store = PointInTimeStore()
+    snapshot_date = get_last_trade_date()
+    changed = store.snapshot_circulating_shares(snapshot_date)
+    for sector_code, _ in get_all_sw_sectors():
+        changed += store.snapshot_membership(sector_code, get_sector_constituents(sector_code), snapshot_date)
+    return changed
+
+
+def run_sector_indices(_upstream: Dict[str, Any]) -> Dict[str, Any]:
+    """申万标准/细化板块指数增量更新"""
+    from applications.incremental_sector_index_updater import main_incremental_update_new
+
+    result = main_incremental_update_new()
+    if result['failed_indices']:
+        # 任务标记为失败，下次运行时重试（已成功写入的日期会被增量逻辑自动跳过）
+        raise RuntimeError(f"{len(result['failed_indices'])} 个指数更新失败")
+    return result
+
+
+def run_category_indices(_upstream: Dict[str, Any]) -> Dict[str, Any]:
+    """股票分类指数（从上次的最新日期开始重算）"""
+    from applications.sector_index_workflow import process_stock_category_indices
+
+    state = _table_state('index_k_daily', _category_filter())
+    start_date = state['latest'] if state and state['latest'] else None
+    result = process_stock_category_indices(start_date=start_date, replace_existing=True)
+    if not result['success']:
+        raise RuntimeError(result.get('error', '股票分类指数处理失败'))
+    return result
+
+
+def run_index_timeframes(_upstream: Dict[str, Any]) -> None:
+    """指数日线转周线/月线"""
+    from applications.index_timeframe_converter import IndexDailyToWeeklyMonthlyConverter
+    IndexDailyToWeeklyMonthlyConverter().run_conversion(full_mode=False)
+
+
+def run_signals(_upstream: Dict[str, Any], lookback_days: int = 30) -> str:
+    """计算最近一段时间的申万板块涨幅和120BIAS，保存为信号文件"""
+    from applications.sector_screener import calculate_sw_sector_returns_with_bias
+
+    state = _table_state('index_k_daily', _category_filter(negate=True))
+    if not state or not state['latest']:
+        raise RuntimeError("index_k_daily 中没有板块指数数据")
+    end_date = state['latest']
+    start_date = (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
+
+    results = calculate_sw_sector_returns_with_bias(start_date, end_date)
+    if results.empty:
+        raise RuntimeError("未获取到板块信号计算结果")
+
+    output_dir = os.path.join(project_root, 'databases', 'sector_signals')
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"申万板块信号_{start_date}_{end_date}.csv")
+    results.to_csv(output_file, index=False, encoding='utf-8-sig')
+    return output_file
+
+
+# ---------------- 管道定义 ----------------
+
+def build_sector_index_pipeline(state_path: str = None, max_workers: int = 3,
+                                jqdata_csv_path: str = "databases/daily_update_last.csv") -> DagRunner:
+    """
+    构建板块指数数据管道
+
+    Args:
+        state_path: 任务状态文件路径
+        max_workers: 最大并行任务数（写库任务之间按互斥组串行）
+        jqdata_csv_path: 聚宽日线数据文件，文件变化时重新入库
+
+    Returns:
+        DagRunner: 已注册全部任务的调度器
+    """
+    runner = DagRunner(state_path=state_path, max_workers=max_workers)
+
+    runner.add_task(Task(
+        'daily_ingest', run_daily_ingest,
+        # 数据源出现新的交易日（或聚宽文件变化）时才重新入库
+        fingerprint=lambda: _daily_ingest_fingerprint(jqdata_csv_path),
+        output=lambda: _table_state('k_daily')
+    ))
+    runner.add_task(Task(
+        'weekly_monthly', run_weekly_monthly, deps=['daily_ingest'],
+        output=lambda: {'weekly': _table_state('k_weekly'), 'monthly': _table_state('k_monthly')},
+        exclusive='sqlite'
+    ))
+    runner.add_task(Task(
+        'constituent_snapshot', run_constituent_snapshot, deps=['daily_ingest'],
+        fingerprint=lambda: {
+            'hierarchy': _query_state("SELECT COUNT(*) AS n FROM sw_cfg_hierarchy"),
+            'shares': _query_state("SELECT COUNT(*) AS n, TOTAL(流通A股) AS total FROM stock_basic_pro")
+        },
+        output=lambda: {
+            'shares': _query_state("SELECT COUNT(*) AS n FROM stock_shares_history"),
+            'membership': _query_state("SELECT COUNT(*) AS n FROM sector_membership_history")
+        },
+        exclusive='sqlite'
+    ))
+    runner.add_task(Task(
+        'sector_indices', run_sector_indices, deps=['daily_ingest', 'constituent_snapshot'],
+        output=lambda: _table_state('index_k_daily', _category_filter(negate=True)),
+        exclusive='sqlite'
+    ))
+    runner.add_task(Task(
+        'category_indices', run_category_indices, deps=['daily_ingest'],
+        output=lambda: _table_state('index_k_daily', _category_filter()),
+        exclusive='sqlite'
+    ))
+    runner.add_task(Task(
+        'index_timeframes', run_index_timeframes, deps=['sector_indices', 'category_indices'],
+        output=lambda: {'weekly': _table_state('index_k_weekly'), 'monthly': _table_state('index_k_monthly')}
+    ))
+    runner.add_task(Task(
+        'signals', run_signals, deps=['sector_indices']
+    ))
+    return runner
+
+
+def main_pipeline(force: bool = False, targets=None) -> Dict[str, Any]:
+    """运行板块指数数据管道并打印每个任务的状态和耗时"""
+    print("=" * 80)
+    print("板块指数数据管道（依赖感知调度）")
+    print("=" * 80)
+
+    runner = build_sector_index_pipeline()
+    results = runner.run(targets=targets, force=force)
+
+    print("\n" + DagRunner.summarize(results))
+    failed = [name for name, r in results.items() if r.status in ('failed', 'blocked')]
+    if failed:
+        print(f"\n⚠️ 以下任务未完成，下次运行时将只重跑这些任务: {', '.join(failed)}")
+    return {name: r.status for name, r in results.items()}
+
+
+if __name__ == "__main__":
+    main_pipeline(force='--force' in sys.argv)
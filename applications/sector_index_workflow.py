@@ -23,6 +23,7 @@ if project_root not in sys.path:
 # 导入v2项目的模块
 from data_management.sector_index_calculator import ActiveStockScreener, SectorIndexCalculator
 from data_management.stock_category_mapper import StockCategoryIndexMapper
+from data_management.index_data_writer import IndexDataWriter
 from core.utils.stock_filter import StockXihua
 from data_management.data_processor import get_last_trade_date
 
@@ -190,55 +191,37 @@ def create_index_k_daily_table():
 #     except Exception as e:
 #         print(f"❌ 创建index_k_daily表失败: {e}")
 
-def save_index_data_to_db(index_data: pd.DataFrame, index_code: str, index_name: str, table_name: str):
+def save_index_data_to_db(index_data: pd.DataFrame, index_code: str, index_name: str, table_name: str,
+                          writer: Optional[IndexDataWriter] = None):
     """
-    将指数数据保存到数据库（使用批量插入优化性能）
+    将指数数据保存到数据库（按 (index_code, trade_date) upsert，可重复执行）
     
     Args:
         index_data (pd.DataFrame): 指数数据
         index_code (str): 指数代码
         index_name (str): 指数名称
         table_name (str): 表名
+        writer (IndexDataWriter): 缓冲写入器，传入时数据只加入缓存，由写入器批量写入；
+                                  为None时立即写入
     """
     try:
-        from data_management.database_manager import DatabaseManager
-        db_manager = DatabaseManager()
-        
-        # 准备批量数据
-        batch_data = []
-        for trade_date, row in index_data.iterrows():
-            # 确保trade_date是datetime类型
-            if hasattr(trade_date, 'strftime'):
-                date_str = trade_date.strftime('%Y-%m-%d')
-            else:
-                date_str = str(trade_date)
-            
-            batch_data.append({
-                'index_code': index_code,
-                'index_name': index_name,
-                'trade_date': date_str,
-                'open': row['open'],
-                'high': row['high'],
-                'low': row['low'],
-                'close': row['close'],
-                'volume': int(row['volume'])
-            })
-        
-        # 转换为DataFrame进行批量插入
-        df_to_insert = pd.DataFrame(batch_data)
-        
-        # 使用批量插入方法
-        success = db_manager.batch_insert_dataframe(df_to_insert, table_name)
-        
-        if success:
-            print(f"✅ 成功批量保存 {len(batch_data)} 条记录到 {table_name} 表")
+        if writer is not None:
+            count = writer.add_frame(index_data, index_code, index_name)
+            print(f"✅ {count} 条记录已加入 {table_name} 写入缓存")
+            return
+        
+        single_writer = IndexDataWriter(table_name=table_name)
+        count = single_writer.add_frame(index_data, index_code, index_name)
+        if single_writer.flush():
+            print(f"✅ 成功批量保存 {count} 条记录到 {table_name} 表")
         else:
             print(f"❌ 批量保存数据到 {table_name} 表失败")
         
     except Exception as e:
         print(f"❌ 保存数据到 {table_name} 表失败: {e}")
 
-def process_standard_sector(sector_code: str, sector_name: str, start_date: str, end_date: str) -> bool:
+def process_standard_sector(sector_code: str, sector_name: str, start_date: str, end_date: str,
+                            writer: Optional[IndexDataWriter] = None) -> bool:
     """
     处理单个标准申万板块
     
@@ -247,6 +230,7 @@ def process_standard_sector(sector_code: str, sector_name: str, start_date: str,
         sector_name (str): 板块名称
         start_date (str): 开始日期
         end_date (str): 结束日期
+        writer (IndexDataWriter): 缓冲写入器，为None时立即写入
         
     Returns:
         bool: 是否成功
@@ -286,7 +270,7 @@ def process_standard_sector(sector_code: str, sector_name: str, start_date: str,
         print(f"最新收盘价: {index_df['close'].iloc[-1]:.2f}")
         
         # 保存到数据库
-        save_index_data_to_db(index_df, new_index_code, index_name, 'index_k_daily')
+        save_index_data_to_db(index_df, new_index_code, index_name, 'index_k_daily', writer)
         
         return True
         
@@ -294,7 +278,8 @@ def process_standard_sector(sector_code: str, sector_name: str, start_date: str,
         print(f"❌ 处理标准板块 {sector_code} 失败: {e}")
         return False
 
-def process_refined_sector(sector_code: str, sector_name: str, start_date: str, end_date: str) -> int:
+def process_refined_sector(sector_code: str, sector_name: str, start_date: str, end_date: str,
+                           writer: Optional[IndexDataWriter] = None) -> int:
     """
     处理单个申万板块的细化板块
     
@@ -303,6 +288,7 @@ def process_refined_sector(sector_code: str, sector_name: str, start_date: str,
         sector_name (str): 板块名称
         start_date (str): 开始日期
         end_date (str): 结束日期
+        writer (IndexDataWriter): 缓冲写入器，为None时立即写入
         
     Returns:
         int: 成功生成的细化指数数量
@@ -375,7 +361,7 @@ def process_refined_sector(sector_code: str, sector_name: str, start_date: str,
                 print(f"    最新收盘价: {index_df['close'].iloc[-1]:.2f}")
                 
                 # 保存到数据库
-                save_index_data_to_db(index_df, sub_index_code, sub_index_name, 'index_k_daily')
+                save_index_data_to_db(index_df, sub_index_code, sub_index_name, 'index_k_daily', writer)
                 success_count += 1
                 
             except Exception as e:
@@ -417,6 +403,9 @@ def main_complete_workflow():
         print("❌ 未找到任何申万板块，退出")
         return
     
+    # 所有板块指数先进入写入缓存，按行数/时间阈值在大事务中批量写入
+    writer = IndexDataWriter(table_name='index_k_daily')
+    
     # 3. 处理所有标准申万板块
     print(f"\n>>> 步骤3：处理所有标准申万板块")
     standard_success_count = 0
@@ -424,7 +413,7 @@ def main_complete_workflow():
     for i, (sector_code, sector_name) in enumerate(all_sectors, 1):
         print(f"\n[{i}/{len(all_sectors)}] 处理标准板块: {sector_name} ({sector_code})")
         
-        if process_standard_sector(sector_code, sector_name, start_date, end_date):
+        if process_standard_sector(sector_code, sector_name, start_date, end_date, writer):
             standard_success_count += 1
     
     print(f"\n标准板块处理完成: 成功 {standard_success_count}/{len(all_sectors)}")
@@ -437,7 +426,7 @@ def main_complete_workflow():
     for i, (sector_code, sector_name) in enumerate(all_sectors, 1):
         print(f"\n[{i}/{len(all_sectors)}] 处理细化板块: {sector_name} ({sector_code})")
         
-        count = process_refined_sector(sector_code, sector_name, start_date, end_date)
+        count = process_refined_sector(sector_code, sector_name, start_date, end_date, writer)
         if count > 0:
             refined_success_count += 1
             total_refined_indices += count
@@ -445,6 +434,11 @@ def main_complete_workflow():
     print(f"\n细化板块处理完成: 成功 {refined_success_count}/{len(all_sectors)} 个板块")
     print(f"总计生成 {total_refined_indices} 个细化指数")
     
+    # 写入缓存中剩余的数据
+    if not writer.close():
+        print(f"❌ 批量写入失败，{writer.pending} 条记录未写入")
+    print(f"批量写入统计: {writer.stats.summary()}")
+    
     # 5. 处理股票分类指数
     print(f"\n>>> 步骤5：处理股票分类指数")
     category_result = process_stock_category_indices(
@@ -0,0 +1,685 @@
+"""
+实盘交易系统的确定性离线回放
+
+trading_system_new 只能在交易时段内实盘运行。本模块用录制的（或合成的）盘中行情和数据库快照，
+在虚拟时钟上加速回放一个完整交易日，用于离线压测、定位热点和发现延迟回归：
+
+1. 虚拟时钟：交易系统、账户、决策上下文和仓位管理中的 datetime.now() 都返回虚拟时间，
+   时间只在回放循环推进时前进（speed>0 时按倍速同步等待真实时间）
+2. 调度：交易系统通过 setup_schedule() 把与实盘完全相同的定时任务注册到回放调度器
+   （接口与 schedule 模块兼容），回放按虚拟时间顺序执行
+3. 行情：价格快照服务和仓位决策（CX 买入的 get_latest_price）从回放行情读取价格；实盘数据（update_and_load_*）替换为
+   数据库快照中回放日之前的历史 + 由已回放行情合成的当日K线
+4. 订单：账户交易写入数据库快照的副本（交易系统和仓位管理的默认数据库路径都指向该副本），QMT 订单网关替换为本地订单桩
+5. 事件引擎不启动工作线程，每个任务执行后在主线程同步处理 TICK/ORDER 事件，保证结果可重复
+6. 统计每个任务的真实耗时（p50/p95/max），延迟埋点写入回放目录下的独立指标库
+
+用法：
+    python -m applications.trading_replay --date 2025-09-19 --db snapshot.db --quotes quotes.csv
+    python -m applications.trading_replay --date 2025-09-19 --profile --baseline baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import sqlite3
+import logging
+import argparse
+import tempfile
+import functools
+import traceback
+import importlib
+import datetime as _dt
+from itertools import count
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, time as dtime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+import pandas as pd
+
+from core.event import EventType
+from data_management.database_manager import DatabaseManager
+from data_management.price_snapshot import PriceSnapshotService
+
+logger = logging.getLogger(__name__)
+
+# A股连续竞价时段
+QUOTE_SESSIONS = [(dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0))]
+
+
+# =============================================================================
+# ===== 虚拟时钟 =====
+# =============================================================================
+
+class VirtualClock:
+    """回放用虚拟时钟：时间只在回放循环推进时前进"""
+
+    def __init__(self, start: datetime, speed: float = 0.0, sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            start: 起始虚拟时间
+            speed: 倍速（虚拟秒/真实秒）；0 表示不等待，尽快回放
+            sleep: 等待函数（测试时可替换）
+        """
+        self._now = start
+        self.speed = speed
+        self._sleep = sleep
+
+    def now(self) -> datetime:
+        return self._now
+
+    def advance_to(self, when: datetime):
+        """推进到 when（不会倒退）；speed>0 时按倍速等待对应的真实时间"""
+        if when <= self._now:
+            return
+        if self.speed > 0:
+            self._sleep((when - self._now).total_seconds() / self.speed)
+        self._now = when
+
+
+def virtual_datetime_class(clock: VirtualClock) -> type:
+    """构造 now()/today() 返回虚拟时间的 datetime 子类，用于替换各模块中的 datetime"""
+
+    class VirtualDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            now = clock.now()
+            return now if tz is None else now.replace(tzinfo=tz)
+
+        @classmethod
+        def today(cls):
+            return clock.now()
+
+    return VirtualDatetime
+
+
+# =============================================================================
+# ===== 回放调度器（与 schedule 模块接口兼容） =====
+# =============================================================================
+
+class ReplayJob:
+    """回放任务：支持 every(n).seconds.do(f) 和 every().day.at('HH:MM').do(f)"""
+
+    def __init__(self, scheduler: 'ReplayScheduler', interval: int = 1):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.unit = None
+        self.at_time: Optional[dtime] = None
+        self.job_func: Optional[Callable] = None
+        self.name = ''
+        self.next_run: Optional[datetime] = None
+
+    @property
+    def seconds(self) -> 'ReplayJob':
+        self.unit = 'seconds'
+        return self
+
+    second = seconds
+
+    @property
+    def day(self) -> 'ReplayJob':
+        self.unit = 'days'
+        return self
+
+    days = day
+
+    def at(self, time_str: str) -> 'ReplayJob':
+        if self.unit != 'days':
+            raise ValueError("回放调度器只支持 every().day.at('HH:MM')")
+        self.at_time = datetime.strptime(time_str, '%H:%M').time()
+        return self
+
+    def do(self, job_func: Callable, *args, **kwargs) -> 'ReplayJob':
+        if self.unit is None:
+            raise ValueError("未指定任务周期")
+        self.job_func = functools.partial(job_func, *args, **kwargs)
+        self.name = getattr(job_func, '__name__', repr(job_func))
+        self.scheduler.jobs.append(self)
+        return self
+
+    def schedule_first(self, now: datetime):
+        if self.unit == 'seconds':
+            self.next_run = now + timedelta(seconds=self.interval)
+        else:
+            candidate = datetime.combine(now.date(), self.at_time or now.time())
+            self.next_run = candidate if candidate >= now else candidate + timedelta(days=self.interval)
+
+    def schedule_next(self, last_run: datetime):
+        if self.unit == 'seconds':
+            self.next_run = last_run + timedelta(seconds=self.interval)
+        else:
+            self.next_run = self.next_run + timedelta(days=self.interval)
+
+
+class ReplayScheduler:
+    """按虚拟时间执行任务的调度器；同一时刻到期的任务按注册顺序执行（与 schedule.run_pending 一致）"""
+
+    def __init__(self):
+        self.jobs: List[ReplayJob] = []
+
+    def every(self, interval: int = 1) -> ReplayJob:
+        return ReplayJob(self, interval)
+
+    def start(self, now: datetime):
+        for job in self.jobs:
+            job.schedule_first(now)
+
+    def next_run_time(self) -> Optional[datetime]:
+        return min((job.next_run for job in self.jobs), default=None)
+
+    def due_jobs(self, now: datetime) -> List[ReplayJob]:
+        return sorted((job for job in self.jobs if job.next_run <= now), key=lambda job: job.next_run)
+
+
+# =============================================================================
+# ===== 回放行情 =====
+# =============================================================================
+
+def load_quote_stream(path: str) -> pd.DataFrame:
+    """
+    读取录制的盘中行情（csv 或 parquet）
+
+    必需列: timestamp, stock_code, price；可选列: volume（逐笔成交量）
+    """
+    if path.endswith('.parquet'):
+        quotes = pd.read_parquet(path)
+    else:
+        quotes = pd.read_csv(path, dtype={'stock_code': str})
+    missing = {'timestamp', 'stock_code', 'price'} - set(quotes.columns)
+    if missing:
+        raise ValueError(f"行情文件缺少列: {sorted(missing)}")
+    quotes['timestamp'] = pd.to_datetime(quotes['timestamp'])
+    quotes['stock_code'] = quotes['stock_code'].astype(str).str.zfill(6)
+    if 'volume' not in quotes.columns:
+        quotes['volume'] = 0
+    return quotes.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+
+def synthetic_quote_stream(base_prices: Dict[str, float], trade_date: str, interval_seconds: int = 3,
+                           volatility: float = 0.001, drift: float = 0.0, seed: int = 42) -> pd.DataFrame:
+    """
+    生成合成盘中行情：每只股票在连续竞价时段内每 interval_seconds 秒一笔，价格为几何随机游走
+
+    Args:
+        base_prices: 股票代码到开盘参考价（通常为前一日收盘价）的映射
+        volatility: 每笔对数收益率的标准差
+        drift: 每笔对数收益率的均值
+    """
+    day = pd.Timestamp(trade_date).date()
+    times = []
+    for start, end in QUOTE_SESSIONS:
+        times.append(pd.date_range(datetime.combine(day, start), datetime.combine(day, end),
+                                   freq=f'{interval_seconds}s'))
+    times = times[0].append(times[1])
+
+    rng = np.random.default_rng(seed)
+    frames = []
+    for stock_code, base in sorted(base_prices.items()):
+        steps = rng.normal(drift, volatility, len(times))
+        prices = np.round(base * np.exp(np.cumsum(steps)), 2)
+        frames.append(pd.DataFrame({'timestamp': times, 'stock_code': stock_code, 'price': prices,
+                                    'volume': rng.integers(1, 50, len(times)) * 100}))
+    if not frames:
+        return pd.DataFrame(columns=['timestamp', 'stock_code', 'price', 'volume'])
+    return pd.concat(frames).sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+
+class QuoteFeed:
+    """按虚拟时间回放行情：维护每只股票的最新价和当日K线"""
+
+    def __init__(self, quotes: pd.DataFrame):
+        quotes = quotes.sort_values('timestamp', kind='stable')
+        self._times = pd.to_datetime(quotes['timestamp']).values
+        self._codes = quotes['stock_code'].astype(str).tolist()
+        self._prices = quotes['price'].astype(float).tolist()
+        volumes = quotes['volume'] if 'volume' in quotes.columns else pd.Series(0, index=quotes.index)
+        self._volumes = volumes.fillna(0).astype(float).tolist()
+        self._cursor = 0
+        self.prices: Dict[str, float] = {}
+        self._bars: Dict[str, List[float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    @property
+    def stock_codes(self) -> List[str]:
+        return sorted(set(self._codes))
+
+    def advance_to(self, when: datetime) -> int:
+        """应用时间不晚于 when 的全部行情，返回本次应用的笔数"""
+        end = int(np.searchsorted(self._times, np.datetime64(when), side='right'))
+        for i in range(self._cursor, end):
+            code, price = self._codes[i], self._prices[i]
+            self.prices[code] = price
+            bar = self._bars.get(code)
+            if bar is None:
+                self._bars[code] = [price, price, price, price, self._volumes[i]]
+            else:
+                bar[1] = max(bar[1], price)
+                bar[2] = min(bar[2], price)
+                bar[3] = price
+                bar[4] += self._volumes[i]
+        applied = end - self._cursor
+        self._cursor = max(self._cursor, end)
+        return applied
+
+    def price(self, stock_code: str) -> Optional[float]:
+        """最新价（价格快照服务的取价函数）"""
+        return self.prices.get(str(stock_code))
+
+    def intraday_bar(self, stock_code: str) -> Optional[Dict[str, float]]:
+        """由已回放行情合成的当日K线，尚无行情时返回 None"""
+        bar = self._bars.get(str(stock_code))
+        if bar is None:
+            return None
+        return dict(zip(('open', 'high', 'low', 'close', 'volume'), bar))
+
+
+class StubOrderSink:
+    """本地订单桩：替代 RedisOrderGateway，记录订单（虚拟时间）并立即确认"""
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.orders: List[Dict[str, Any]] = []
+        self._ids = count(1)
+
+    def publish_orders(self, orders: Iterable) -> List[str]:
+        order_ids = []
+        for order in orders:
+            if isinstance(order, dict):
+                action, stock, amount = order['action'], order['stock'], order['amount']
+            else:
+                action, stock, amount = order
+            if action not in ('buy', 'sell'):
+                raise ValueError(f"未知的交易方向: {action}")
+            order_id = f"replay-{next(self._ids)}"
+            self.orders.append({'order_id': order_id, 'time': self.clock.now(), 'action': action,
+                                'stock': stock, 'amount': int(amount), 'status': 'accepted'})
+            order_ids.append(order_id)
+        return order_ids
+
+    def send(self, action: str, stock: str, amount: int) -> str:
+        return self.publish_orders([(action, stock, amount)])[0]
+
+    def wait_for_acks(self, order_ids: Iterable[str], timeout: float = 5.0) -> Dict[str, str]:
+        order_ids = set(order_ids)
+        return {o['order_id']: o['status'] for o in self.orders if o['order_id'] in order_ids}
+
+    def pending(self, older_than: float = 0.0) -> list:
+        return []
+
+    def close(self):
+        pass
+
+
+# =============================================================================
+# ===== 回放结果 =====
+# =============================================================================
+
+@dataclass
+class ReplayResult:
+    """一次回放的结果"""
+    trade_date: str
+    wall_seconds: float
+    virtual_seconds: float
+    jobs: pd.DataFrame
+    trades: pd.DataFrame
+    orders: List[Dict[str, Any]]
+    quotes_applied: int
+    events_processed: int
+    job_errors: List[Dict[str, Any]] = field(default_factory=list)
+    work_dir: str = ''
+
+    @property
+    def speedup(self) -> Optional[float]:
+        return self.virtual_seconds / self.wall_seconds if self.wall_seconds > 0 else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trade_date': self.trade_date,
+            'wall_seconds': round(self.wall_seconds, 3),
+            'virtual_seconds': self.virtual_seconds,
+            'speedup': round(self.speedup, 1) if self.speedup else None,
+            'quotes_applied': self.quotes_applied,
+            'events_processed': self.events_processed,
+            'trades': int(len(self.trades)),
+            'orders': int(len(self.orders)),
+            'job_errors': len(self.job_errors),
+            'jobs': {row['job']: {k: row[k] for k in ('runs', 'total_ms', 'p50_ms', 'p95_ms', 'max_ms')}
+                     for row in self.jobs.to_dict('records')},
+        }
+
+
+def check_regressions(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 1.5,
+                      min_ms: float = 5.0) -> List[str]:
+    """
+    对比任务耗时与基线（均为 ReplayResult.to_dict() 的结果）
+
+    Args:
+        tolerance: p95 超过基线 p95 的倍数阈值
+        min_ms: 基线 p95 低于该值的任务不比较（避免微小耗时的噪声）
+
+    Returns:
+        List[str]: 回归描述，为空表示没有回归
+    """
+    regressions = []
+    for job, stats in result.get('jobs', {}).items():
+        base = baseline.get('jobs', {}).get(job)
+        if not base or base['p95_ms'] < min_ms:
+            continue
+        if stats['p95_ms'] > base['p95_ms'] * tolerance:
+            regressions.append(f"{job}: p95 {stats['p95_ms']:.1f}ms > 基线 {base['p95_ms']:.1f}ms × {tolerance}")
+    return regressions
+
+
+# =============================================================================
+# ===== 回放器 =====
+# =============================================================================
+
+class TradingDayReplay:
+    """在虚拟时钟上回放 trading_system_new 的一个交易日"""
+
+    def __init__(self, trade_date: str, db_snapshot: str = None, quotes: pd.DataFrame = None,
+                 system_module: str = 'applications.trading_system_new', speed: float = 0.0,
+                 start_time: str = '09:15', end_time: str = '15:10', work_dir: str = None,
+                 synthetic_seed: int = 42):
+        """
+        Args:
+            trade_date: 回放日期 YYYY-MM-DD
+            db_snapshot: 数据库快照路径（回放使用其副本，不修改原文件），默认项目数据库
+            quotes: 盘中行情（timestamp, stock_code, price[, volume]）；为 None 时按持仓和操作股票
+                    以前一日收盘价为基准生成合成行情
+            system_module: 交易系统模块名
+            speed: 虚拟时钟倍速，0 表示尽快回放
+            start_time: 回放开始时间（HH:MM）
+            end_time: 回放结束时间（HH:MM），交易系统提前停止时以其为准
+            work_dir: 回放目录（数据库副本、延迟指标库），默认临时目录
+        """
+        self.trade_date = pd.Timestamp(trade_date).strftime('%Y-%m-%d')
+        self.db_snapshot = db_snapshot or os.path.join(project_root, 'databases', 'quant_system.db')
+        self.quotes = quotes
+        self.system_module = system_module
+        self.synthetic_seed = synthetic_seed
+        day = pd.Timestamp(self.trade_date).date()
+        self.start = datetime.combine(day, datetime.strptime(start_time, '%H:%M').time())
+        self.end = datetime.combine(day, datetime.strptime(end_time, '%H:%M').time())
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='trading_replay_')
+        self.clock = VirtualClock(self.start, speed)
+        self.sink = StubOrderSink(self.clock)
+        self.feed: Optional[QuoteFeed] = None
+        self.system = None
+        self._patches: List[tuple] = []
+
+    # ---------------- 环境替换 ----------------
+
+    def _patch(self, target, name: str, value):
+        self._patches.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    def _restore(self):
+        while self._patches:
+            target, name, value = self._patches.pop()
+            setattr(target, name, value)
+
+    def _copy_snapshot(self) -> str:
+        os.makedirs(self.work_dir, exist_ok=True)
+        replay_db = os.path.join(self.work_dir, 'replay.db')
+        if os.path.exists(replay_db):
+            os.remove(replay_db)
+        if os.path.exists(self.db_snapshot):
+            # 使用 SQLite 在线备份，快照库正在被写入时也能得到一致的副本
+            with sqlite3.connect(self.db_snapshot) as src, sqlite3.connect(replay_db) as dst:
+                src.backup(dst)
+        return replay_db
+
+    def _live_daily(self, stock_code: str) -> pd.DataFrame:
+        """实盘日线的回放替代：回放日之前的历史 + 由已回放行情合成的当日K线"""
+        from data_management.data_processor import get_daily_data_for_backtest
+        cutoff = (pd.Timestamp(self.trade_date) - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        history = get_daily_data_for_backtest(stock_code, cutoff)
+        bar = self.feed.intraday_bar(stock_code)
+        if bar is None:
+            return history.copy()
+        today = pd.DataFrame([{'stock_code': stock_code, 'trade_date': pd.Timestamp(self.trade_date), **bar}])
+        if history.empty:
+            return today
+        return pd.concat([history, today[[c for c in history.columns if c in today.columns]]], ignore_index=True)
+
+    def _live_data(self, stock_code: str) -> dict:
+        """prepare_data_for_live 的回放替代"""
+        from data_management.data_processor import convert_daily_to_weekly, convert_daily_to_monthly
+        daily = self._live_daily(stock_code)
+        return {'daily': daily, 'weekly': convert_daily_to_weekly(daily), 'monthly': convert_daily_to_monthly(daily)}
+
+    def _live_daily_batch(self, stock_codes: list) -> dict:
+        """update_and_load_multiple_stocks_daily_data 的回放替代"""
+        result = {}
+        for stock_code in stock_codes:
+            df = self._live_daily(stock_code)
+            if not df.empty:
+                result[stock_code] = df
+        return result
+
+    def _synthetic_quotes(self, stock_codes: Iterable[str]) -> pd.DataFrame:
+        """以前一日收盘价为基准生成合成行情"""
+        codes = sorted({str(code).zfill(6) for code in stock_codes})
+        base_prices = {}
+        if codes:
+            placeholders = ','.join('?' * len(codes))
+            query = f"""
+                SELECT stock_code, close FROM k_daily
+                WHERE stock_code IN ({placeholders}) AND trade_date < ?
+                ORDER BY trade_date
+            """
+            df = DatabaseManager().execute_query(query, (*codes, self.trade_date))
+            if not df.empty:
+                base_prices = df.groupby('stock_code')['close'].last().astype(float).to_dict()
+        print(f"生成合成行情: {len(base_prices)} 只股票")
+        return synthetic_quote_stream(base_prices, self.trade_date, seed=self.synthetic_seed)
+
+    def _install(self, replay_db: str):
+        """把交易系统及其依赖模块切换到回放环境"""
+        system = self.system = importlib.import_module(self.system_module)
+        virtual_datetime = virtual_datetime_class(self.clock)
+        dt_module = types.SimpleNamespace(**{k: getattr(_dt, k) for k in dir(_dt) if not k.startswith('__')})
+        dt_module.datetime = virtual_datetime
+
+        account_module = importlib.import_module('core.execution.account')
+        self._patch(account_module, 'dt', dt_module)
+        self._patch(account_module, 'datetime', virtual_datetime)
+        self._patch(importlib.import_module('core.execution.decision_context'), 'datetime', virtual_datetime)
+        self._patch(importlib.import_module('data_management.sector_signal_analyzer'),
+                    'update_and_load_multiple_stocks_daily_data', self._live_daily_batch)
+        # 仓位决策：CX 买入按回放行情定价，ATR 日期取虚拟时间，未传 db_path 时回退到回放库
+        portfolio_module = importlib.import_module('core.execution.portfolio_manager')
+        self._patch(portfolio_module, 'get_latest_price', lambda stock_code: self.feed.price(stock_code))
+        self._patch(portfolio_module, 'datetime', virtual_datetime)
+        self._patch(portfolio_module, 'get_db_path', lambda: replay_db)
+
+        self._patch(system, 'datetime', virtual_datetime)
+        self._patch(system, 'get_db_path', lambda: replay_db)
+        self._patch(system, 'prepare_data_for_live', self._live_data)
+        self._patch(system, 'ORDER_GATEWAY', self.sink)
+        self._patch(system, 'SHOULD_STOP', False)
+        self._patch(system, 'OPERATING_STOCKS_TODAY', set())
+        self._patch(system, 'PENDING_STOP_ORDERS', type(system.PENDING_STOP_ORDERS)())
+
+        price_service = PriceSnapshotService(price_func=self.feed.price, now_func=self.clock.now, max_concurrency=1)
+        account = system.Account(starting_cash=system.ACCOUNT.starting_cash, db_path=replay_db,
+                                 price_service=price_service)
+        self._patch(system, 'ACCOUNT', account)
+        self._patch(system, 'RISK_ENGINE', system.PortfolioRiskEngine.from_account(account))
+
+        latency = system.LATENCY
+        self._patch(latency, 'db_path', os.path.join(self.work_dir, 'latency_metrics.db'))
+        self._patch(latency, 'now_func', self.clock.now)
+        self._patch(latency, '_initialized', False)
+
+    # ---------------- 回放 ----------------
+
+    def run(self) -> ReplayResult:
+        """回放一个交易日，返回任务耗时、成交和订单"""
+        replay_db = self._copy_snapshot()
+        original_db_path = DatabaseManager().db_path
+        DatabaseManager().switch_database(replay_db)
+        self.feed = QuoteFeed(self.quotes if self.quotes is not None
+                              else pd.DataFrame(columns=['timestamp', 'stock_code', 'price', 'volume']))
+        durations: Dict[str, List[float]] = {}
+        errors: List[Dict[str, Any]] = []
+        quotes_applied = events = 0
+        account = engine = None
+        wall_start = time.perf_counter()
+        try:
+            self._install(replay_db)
+            system, account, engine = self.system, self.system.ACCOUNT, self.system.EVENT_ENGINE
+            if engine.is_running():
+                raise RuntimeError("交易系统的事件引擎正在运行，不能回放")
+            engine.process_pending()
+            engine.register_listener(EventType.ORDER, system.on_stop_order)
+            system.RISK_ENGINE.attach(engine)
+
+            scheduler = ReplayScheduler()
+            system.setup_schedule(scheduler)
+            scheduler.start(self.clock.now())
+
+            # 与实盘启动流程一致：更新操作股票列表，按持仓布防
+            system.update_operating_stocks_list()
+            if self.quotes is None:
+                self.feed = QuoteFeed(self._synthetic_quotes(set(account.positions) | system.OPERATING_STOCKS_TODAY))
+                account.price_service.price_func = self.feed.price
+            system.rearm_stop_monitor()
+            print(f"开始回放 {self.trade_date} {self.start:%H:%M}-{self.end:%H:%M}: "
+                  f"{len(scheduler.jobs)} 个任务, {len(self.feed)} 笔行情")
+
+            while not system.SHOULD_STOP:
+                next_time = scheduler.next_run_time()
+                if next_time is None or next_time > self.end:
+                    break
+                self.clock.advance_to(next_time)
+                quotes_applied += self.feed.advance_to(next_time)
+                for job in scheduler.due_jobs(next_time):
+                    start = time.perf_counter()
+                    try:
+                        job.job_func()
+                    except Exception as e:
+                        errors.append({'job': job.name, 'time': next_time, 'error': repr(e)})
+                        logger.error(f"回放任务 {job.name}@{next_time:%H:%M:%S} 失败: {e}\n{traceback.format_exc()}")
+                    events += engine.process_pending()
+                    durations.setdefault(job.name, []).append((time.perf_counter() - start) * 1000.0)
+                    job.schedule_next(next_time)
+        finally:
+            wall_seconds = time.perf_counter() - wall_start
+            if engine is not None and self.system is not None:
+                engine.unregister_listener(EventType.ORDER, self.system.on_stop_order)
+                self.system.RISK_ENGINE.detach(engine)
+                engine.process_pending()
+                # 撤销回放持仓的布防，避免影响之后的实盘/回放
+                for stock_code in self.system.STOP_MONITOR.symbols:
+                    self.system.STOP_MONITOR.disarm(stock_code)
+            trades = self._read_trades(account)
+            self._restore()
+            if account is not None:
+                account.close()
+            DatabaseManager().switch_database(original_db_path)
+
+        jobs = pd.DataFrame([
+            {'job': name, 'runs': len(values), 'total_ms': round(float(np.sum(values)), 3),
+             'p50_ms': round(float(np.percentile(values, 50)), 3),
+             'p95_ms': round(float(np.percentile(values, 95)), 3),
+             'max_ms': round(float(np.max(values)), 3)}
+            for name, values in durations.items()
+        ], columns=['job', 'runs', 'total_ms', 'p50_ms', 'p95_ms', 'max_ms'])
+        return ReplayResult(
+            trade_date=self.trade_date, wall_seconds=wall_seconds,
+            virtual_seconds=(self.clock.now() - self.start).total_seconds(),
+            jobs=jobs.sort_values('total_ms', ascending=False).reset_index(drop=True),
+            trades=trades, orders=list(self.sink.orders), quotes_applied=quotes_applied,
+            events_processed=events, job_errors=errors, work_dir=self.work_dir,
+        )
+
+    def _read_trades(self, account) -> pd.DataFrame:
+        """回放日写入账户的成交记录"""
+        if account is None:
+            return pd.DataFrame()
+        try:
+            return pd.read_sql_query(f"SELECT * FROM {account.table_name} WHERE trade_time >= ? ORDER BY id",
+                                     account.conn, params=(self.trade_date,))
+        except Exception as e:
+            logger.error(f"读取回放成交记录失败: {e}")
+            return pd.DataFrame()
+
+
+def format_result(result: ReplayResult) -> str:
+    """格式化输出回放结果"""
+    lines = [
+        f"回放 {result.trade_date}: 真实耗时 {result.wall_seconds:.1f} 秒, 虚拟 {result.virtual_seconds:.0f} 秒"
+        + (f" ({result.speedup:.0f} 倍速)" if result.speedup else ""),
+        f"行情 {result.quotes_applied} 笔, 事件 {result.events_processed} 个, "
+        f"成交 {len(result.trades)} 笔, 订单 {len(result.orders)} 笔, 任务错误 {len(result.job_errors)} 个",
+    ]
+    if not result.jobs.empty:
+        with pd.option_context('display.width', 200, 'display.float_format', '{:.1f}'.format):
+            lines.append("\n--- 各任务真实耗时 (ms) ---")
+            lines.append(result.jobs.to_string(index=False))
+    return "\n".join(lines)
+
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description='实盘交易系统离线回放')
+    parser.add_argument('--date', required=True, help='回放日期 YYYY-MM-DD')
+    parser.add_argument('--db', default=None, help='数据库快照路径（默认项目数据库，回放使用副本）')
+    parser.add_argument('--quotes', default=None, help='录制的盘中行情 csv/parquet；不指定时生成合成行情')
+    parser.add_argument('--speed', type=float, default=0.0, help='虚拟时钟倍速，0 表示尽快回放')
+    parser.add_argument('--start', default='09:15', help='回放开始时间')
+    parser.add_argument('--end', default='15:10', help='回放结束时间')
+    parser.add_argument('--output', default=None, help='回放目录（数据库副本、延迟指标库、结果）')
+    parser.add_argument('--profile', action='store_true', help='使用 cProfile 记录热点')
+    parser.add_argument('--baseline', default=None, help='基线结果 JSON，用于检查延迟回归')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='p95 相对基线的回归倍数阈值')
+    args = parser.parse_args(argv)
+
+    quotes = load_quote_stream(args.quotes) if args.quotes else None
+    replay = TradingDayReplay(args.date, db_snapshot=args.db, quotes=quotes, speed=args.speed,
+                              start_time=args.start, end_time=args.end, work_dir=args.output)
+
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        result = profiler.runcall(replay.run)
+        profile_path = os.path.join(replay.work_dir, 'replay.prof')
+        profiler.dump_stats(profile_path)
+        print(f"\n--- 热点函数（累计耗时前30） 完整数据: {profile_path} ---")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(30)
+    else:
+        result = replay.run()
+
+    print(format_result(result))
+    summary = result.to_dict()
+    result_path = os.path.join(replay.work_dir, 'replay_result.json')
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+    print(f"\n结果已保存: {result_path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = check_regressions(summary, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"⚠️  延迟回归 {line}")
+        summary['regressions'] = regressions
+        if regressions:
+            sys.exit(1)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
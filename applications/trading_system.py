@@ -438,7 +438,7 @@ def run_cx_buy_analysis():
                         # 6. 买入成功后，添加CX持仓记录
                         
                         current_date = datetime.now().strftime('%Y-%m-%d')
-                        current_price = get_latest_price(stock_code) or 0
+                        current_price = ACCOUNT.get_current_price(stock_code) or 0
                         source_pool = row['pool_name']  # 从查询结果中获取板块名称
                         
                         add_cx_holding_record(
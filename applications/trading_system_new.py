@@ -13,7 +13,7 @@ import warnings
 import traceback
 import logging
 import sqlite3
-import redis
+import queue
 
 # --- 核心模块导入 ---
 import os
@@ -26,16 +26,26 @@ if current_dir not in sys.path:
 
 # 账户与订单执行核心
 from core.execution.account import Account, Order
+# QMT订单网关（Redis Stream）
+from core.execution.order_gateway import RedisOrderGateway
+# 事件引擎与逐笔止盈止损监控
+from core.event_engine import EventEngine
+from core.event import EventType
+from core.execution.stop_monitor import TickStopMonitor
+from core.execution.risk_metrics import PortfolioRiskEngine
 #from core.execution.order_manager import Order 
 # 板块信号分析
 from data_management.sector_signal_analyzer import SectorSignalAnalyzer
 # 仓位与资金管理
-from core.execution.portfolio_manager_new import get_buy_stocks_from_db, get_individual_stock_buy_signals, get_cx_stock_buy_decision
+from core.execution.portfolio_manager import get_buy_stocks_from_db, get_individual_stock_buy_signals, get_cx_stock_buy_decision
+from core.execution.decision_context import DecisionContext
 # 个股技术指标分析
 from core.technical_analyzer.technical_analyzer import TechnicalAnalyzer
 from core.technical_analyzer.technical_analyzer import prepare_data_for_live
 # 价格获取
 from data_management.data_processor import get_latest_price
+# 延迟埋点
+from core.utils.latency import get_latency_recorder
 
 warnings.filterwarnings('ignore')
 
@@ -53,34 +63,43 @@ logger = logging.getLogger(__name__)
 # =============================================================================
 # ===== 给QMT发送交易信号 =====
 # =============================================================================
+# 订单网关在第一次发单时创建，整个交易脚本生命周期内复用同一个连接池
+ORDER_GATEWAY = None
+
+
+def get_order_gateway():
+    """获取全局QMT订单网关（策略标识 shipan：波段，中级，短线，新股的各类策略）"""
+    global ORDER_GATEWAY
+    if ORDER_GATEWAY is None:
+        ORDER_GATEWAY = RedisOrderGateway(host='127.0.0.1', port=6379, db=0,
+                                          stream='myredis', strategy='shipan')
+    return ORDER_GATEWAY
+
+
 #给QMT发送交易信号
-def push_redis(action,stock,amount): 
-    rs = redis.Redis(host='127.0.0.1', port=6379, db=0)
-    qmt_order = {}
-    qmt_order['strategy'] = 'shipan'#波段，中级，短线，新股的各类策略
-    qmt_order['action'] = action # buy 或者 sell
-    #qmt_order['stock'] = stock[:7] + ('SH' if stock[-1]=='G' else 'SZ')
-    qmt_order['stock'] = stock + ('.SH' if stock.startswith('6') else '.SZ' if stock.startswith(('0', '3')) else '.BJ')
-
-    qmt_order['amount'] = amount
-    rs.xadd('myredis', qmt_order)
-    rs.connection_pool.disconnect()
-    time.sleep(2)
-# # ===== 全局配置与对象初始化 =====
-# REDIS_POOL = redis.ConnectionPool(host='127.0.0.1', port=6379, db=0, decode_responses=True)
-
-# # ===== 给QMT发送交易信号 =====
-# def push_redis(action, stock, amount): 
-#     rs = redis.Redis(connection_pool=REDIS_POOL)
-#     qmt_order = {
-#         'strategy': 'shipan',
-#         'action': action,
-#         'stock': stock + ('.SH' if stock.startswith('6') else '.SZ' if stock.startswith(('0', '3')) else '.BJ'),
-#         'amount': str(amount) # 建议将所有值转为字符串，这是Redis Stream的最佳实践
-#     }
-#     rs.xadd('myredis', qmt_order)
-#     # 不再需要 connection_pool.disconnect()
-#     time.sleep(1) # 可以适当缩短等待时间
+def push_redis(action, stock, amount):
+    """
+    发送单个订单（复用连接池，不再每单断开连接和sleep）
+
+    Returns:
+        str: order_id，可用于 get_order_gateway().wait_for_acks 查询QMT确认
+    """
+    with LATENCY.span('order_publish'):
+        return get_order_gateway().send(action, stock, amount)
+
+
+def push_redis_batch(orders):
+    """
+    批量发送调仓订单（一次pipeline往返）
+
+    Args:
+        orders: [(action, stock, amount), ...]
+
+    Returns:
+        list: 各订单的 order_id
+    """
+    with LATENCY.span('order_publish'):
+        return get_order_gateway().publish_orders(orders)
 
 # =============================================================================
 # ===== 全局配置与对象初始化 =====
@@ -89,6 +108,9 @@ def push_redis(action,stock,amount):
 # DAILY_ANALYSIS_TIMES = ["11:00", "14:40"]
 DAILY_ANALYSIS_TIMES = ["10:05", "10:39","11:00", "11:16", "13:07", "14:00", "14:30", "14:50"]
 
+# --- 延迟埋点：各时段、各阶段耗时写入 databases/latency_metrics.db ---
+LATENCY = get_latency_recorder()
+
 
 def is_trading_hours():
     """
@@ -127,6 +149,14 @@ print(f"✓ OPERATING_STOCKS_TODAY 已初始化: {list(OPERATING_STOCKS_TODAY)}
 
 # *** 添加全局停止标志 ***
 SHOULD_STOP = False
+
+# --- 事件引擎与逐笔止盈止损监控 ---
+EVENT_ENGINE = EventEngine()
+STOP_MONITOR = TickStopMonitor(EVENT_ENGINE, profit_target=PROFIT_TARGET, cx_profit_bonus=0.10,
+                               stop_loss=STOP_LOSS_TARGET)
+PENDING_STOP_ORDERS = queue.Queue()
+# 组合风险引擎：TICK 事件逐笔盯市，15:10 收盘时结算一个周期
+RISK_ENGINE = PortfolioRiskEngine.from_account(ACCOUNT)
 print(f"✓ 全局停止标志已初始化: {SHOULD_STOP}")
 
 
@@ -366,6 +396,7 @@ def mark_cx_signal_as_used(stock_code):
             conn.close()
 
 
+@LATENCY.timed_slot('cx_buy', DAILY_ANALYSIS_TIMES)
 def run_cx_buy_analysis():
     """
     【新增】【逻辑修正版】专门用于处理 is_cx=1 股票的买入决策函数。
@@ -438,7 +469,7 @@ def run_cx_buy_analysis():
                         # 6. 买入成功后，添加CX持仓记录
                         
                         current_date = datetime.now().strftime('%Y-%m-%d')
-                        current_price = get_latest_price(stock_code) or 0
+                        current_price = ACCOUNT.get_current_price(stock_code) or 0
                         source_pool = row['pool_name']  # 从查询结果中获取板块名称
                         
                         add_cx_holding_record(
@@ -469,6 +500,7 @@ def run_cx_buy_analysis():
         logger.error(f"错误详情: {traceback.format_exc()}")
         print(f"❌ 执行CX长线股买入分析时发生严重错误: {e}")
 
+@LATENCY.timed_slot('daily_buy', DAILY_ANALYSIS_TIMES)
 def run_daily_buy_analysis():
     """
     日线级别的买入决策主函数。
@@ -479,50 +511,34 @@ def run_daily_buy_analysis():
         logger.info(f"开始执行日线买入分析 @ {datetime.now().strftime('%H:%M:%S')}")
         print(f"\n{'='*30} 触发日线买入分析 @ {datetime.now().strftime('%H:%M:%S')} {'='*30}")
         
-        # 1. 动态加载配置参数
-        try:
-            from config_select_position_100w import CSV_POOLS_CONFIG, get_csv_pool_config, validate_all_configs
-            logger.info("动态配置参数加载成功")
-            print("✓ 动态配置参数加载成功")
-        except Exception as e:
-            logger.error(f"加载配置参数失败: {e}")
-            print(f"❌ 加载配置参数失败: {e}")
-            return
-        
-        # 2. 确定分析日期和要操作的板块数据
+        # 1. 确定分析日期
         end_date = datetime.now().strftime('%Y-%m-%d')
         
         logger.info(f"分析日期: {end_date}")
-        logger.info(f"从数据库读取板块数据")
+        logger.info(f"从数据库批量加载决策数据")
         
-        # 从数据库获取所有板块数据（去重）
+        # 2. 一次性加载本次分析所需的全部数据（配置参数、各板块最新候选股、CX持仓、账户权益）
         try:
-            conn = sqlite3.connect(get_db_path())
-            # 获取所有板块列表（去重），并获取每个板块的最新数据日期
-            query = """
-                SELECT pool_name, MAX(trade_date) as latest_date
-                FROM daily_selections 
-                GROUP BY pool_name
-                ORDER BY pool_name
-            """
-            pool_data_df = pd.read_sql_query(query, conn)
-            conn.close()
+            with LATENCY.span('data_load'):
+                context = DecisionContext.load(ACCOUNT, get_db_path(), end_date)
+            logger.info("动态配置参数加载成功")
+            print("✓ 动态配置参数加载成功")
             
-            if pool_data_df.empty:
+            if not context.pool_names:
                 logger.warning("数据库中未找到任何板块数据，跳过本次买入分析。")
                 print("数据库中未找到任何板块数据，跳过本次买入分析。")
                 return
             
-            # 创建板块名称到最新日期的映射
-            pool_latest_dates = dict(zip(pool_data_df['pool_name'], pool_data_df['latest_date']))
-            pool_names = pool_data_df['pool_name'].tolist()
+            # 板块名称到最新日期的映射
+            pool_latest_dates = context.pool_latest_dates
+            pool_names = context.pool_names
             
             logger.info(f"发现 {len(pool_names)} 个板块: {pool_names}")
             logger.info(f"各板块最新数据日期: {pool_latest_dates}")
             print(f"发现 {len(pool_names)} 个板块，将使用各板块的最新数据进行分析。")
         except Exception as e:
-            logger.error(f"从数据库读取板块列表失败: {e}")
-            print(f"❌ 从数据库读取板块列表失败: {e}")
+            logger.error(f"加载决策数据失败: {e}")
+            print(f"❌ 加载决策数据失败: {e}")
             return
     except Exception as e:
         logger.error(f"买入分析初始化阶段发生错误: {e}")
@@ -539,7 +555,7 @@ def run_daily_buy_analysis():
         print(f"\n{'*'*25} 正在决策板块: {pool_name.upper()} (数据日期: {pool_latest_date}) {'*'*25}")
 
         # 3.1 获取该板块的动态配置参数
-        pool_config = get_csv_pool_config(pool_name)
+        pool_config = context.get_pool_config(pool_name)
         if not pool_config:
             logger.warning(f"板块 {pool_name} 无配置参数，跳过")
             print(f"✗ 板块 {pool_name} 无配置参数，跳过")
@@ -555,17 +571,11 @@ def run_daily_buy_analysis():
         print(f"✓ 板块配置: 仓位比例={sector_initial_cap*100:.1f}%, 股票数量={min_stocks}-{max_stocks}, 前百分比={top_percentage*100:.1f}%")
 
         try:
-            # --- 宏观分析：从数据库获取当前板块专属信号 ---
-            logger.info(f"从数据库读取板块数据: {pool_name} (日期: {pool_latest_date})")
-            conn = sqlite3.connect(get_db_path())
-            query = """
-                SELECT stock_code, name, is_1bzl, 总得分, 技术得分, 主力得分, 板块得分, 低BIAS得分
-                FROM daily_selections 
-                WHERE pool_name = ? AND trade_date = ?
-            """
-            df = pd.read_sql_query(query, conn, params=[pool_name, pool_latest_date])
-            conn.close()
-            logger.info(f"数据库读取成功，共 {len(df)} 行数据")
+            watch = LATENCY.stopwatch(pool=pool_name)
+            
+            # --- 宏观分析：从决策上下文获取当前板块专属信号 ---
+            df = context.pool_selection(pool_name)
+            logger.info(f"板块 {pool_name} 候选股 {len(df)} 行 (日期: {pool_latest_date})")
             
             # 安全阀 1: 检查总得分，如果全为0则跳过
             if '总得分' in df.columns and (df['总得分'].fillna(0) == 0).all():
@@ -588,9 +598,11 @@ def run_daily_buy_analysis():
                 continue
 
             logger.info(f"开始板块信号分析，股票列表: {sel_1bzl_stocks}")
+            watch.reset()
             sector_analyzer = SectorSignalAnalyzer(sel_1bzl_stocks, 'realtime')
             is_confirmed_bottom = sector_analyzer.get_bankuai_db()
             is_approaching_bottom = sector_analyzer.get_bankuai_jjdb()
+            watch.lap('indicator')
             logger.info(f"板块信号结果 - 明确底部: {is_confirmed_bottom}, 接近底部: {is_approaching_bottom}")
 
 
@@ -598,15 +610,17 @@ def run_daily_buy_analysis():
             # 从cangwei.py获取经过资金和仓位过滤后的买入建议，传入动态配置参数
             logger.info("开始仓位与资金分析...")
             try:
-                buy_signals_from_cangwei = get_individual_stock_buy_signals(
-                    pool_name=pool_name, 
-                    end_date=pool_latest_date, 
-                    sector_initial_cap=sector_initial_cap,
-                    min_stocks=min_stocks,
-                    max_stocks=max_stocks,
-                    top_percentage=top_percentage,
-                    account=ACCOUNT
-                )
+                with LATENCY.span('allocation', pool_name):
+                    buy_signals_from_cangwei = get_individual_stock_buy_signals(
+                        pool_name=pool_name, 
+                        end_date=pool_latest_date, 
+                        sector_initial_cap=sector_initial_cap,
+                        min_stocks=min_stocks,
+                        max_stocks=max_stocks,
+                        top_percentage=top_percentage,
+                        account=ACCOUNT,
+                        context=context
+                    )
                 logger.info(f"仓位分析完成，获得 {len(buy_signals_from_cangwei)} 个买入信号")
             except Exception as e:
                 logger.error(f"仓位分析失败: {e}")
@@ -646,7 +660,9 @@ def run_daily_buy_analysis():
                 try:
                     # 获取实时数据并进行最终的技术信号过滤
                     logger.info(f"为股票 {stock_code} 准备实时数据...")
+                    watch.reset()
                     data = prepare_data_for_live(stock_code)
+                    watch.lap('data_load')
                     
                     if not data or data.get('daily') is None:
                         logger.warning(f"股票 {stock_code} 数据获取失败，跳过")
@@ -656,6 +672,7 @@ def run_daily_buy_analysis():
                     
                     logger.info(f"股票 {stock_code} 数据获取成功，日线数据行数: {len(data['daily'])}")
                     analyzer = TechnicalAnalyzer(data)
+                    watch.lap('indicator')
                     individual_buy_signal = False # 初始化为False
 
                     # --- 应用您的分层买入逻辑 ---
@@ -721,6 +738,8 @@ def run_daily_buy_analysis():
                             print(f"  - {stock_code}: 技术指标检查失败: {e}")
                             continue
                     
+                    watch.lap('signal')
+                    
                     # --- 交易执行 ---
                     logger.info(f"=== 股票 {stock_code} 交易执行判断 ===")
                     logger.info(f"技术信号通过: {individual_buy_signal}")
@@ -735,7 +754,8 @@ def run_daily_buy_analysis():
                         print(f"  => 准备执行买入: {quantity} 股 {stock_code}")
                         try:
                             # push_redis('buy', stock_code, quantity)
-                            ACCOUNT.order_buy(stock_code, quantity)
+                            with LATENCY.span('db_write', pool_name):
+                                ACCOUNT.order_buy(stock_code, quantity)
                             logger.info(f"=== 买入执行成功 ===")
                             logger.info(f"股票: {stock_code}, 数量: {quantity}, 价格: {price:.2f}")
                             print("  => 买入执行完毕。")
@@ -766,6 +786,7 @@ def run_daily_buy_analysis():
 # ===== 卖出决策核心任务函数 (最终修正版) =====
 # =============================================================================
 
+@LATENCY.timed_slot('daily_sell', DAILY_ANALYSIS_TIMES)
 def run_daily_sell_analysis():
     """
     日线级别的卖出决策主函数。
@@ -825,6 +846,8 @@ def run_daily_sell_analysis():
         print(f"\n{'*'*25} 正在决策板块: {pool_name.upper()} (数据日期: {pool_latest_date}) {'*'*25}")
 
         try:
+            watch = LATENCY.stopwatch(pool=pool_name)
+            
             # --- 宏观分析：从数据库获取当前板块专属信号 ---
             conn = sqlite3.connect(get_db_path())
             query = """
@@ -834,6 +857,7 @@ def run_daily_sell_analysis():
             """
             df = pd.read_sql_query(query, conn, params=[pool_name, pool_latest_date])
             conn.close()
+            watch.lap('data_load')
             
             sel_1bzl_stocks = df[df['is_1bzl'] == 1]['stock_code'].astype(str).str.zfill(6).tolist()
             if not sel_1bzl_stocks:
@@ -852,6 +876,7 @@ def run_daily_sell_analysis():
             sector_analyzer = SectorSignalAnalyzer(sel_1bzl_stocks, 'realtime')
             is_sector_confirmed_top = sector_analyzer.get_bankuai_ding()
             is_sector_approaching_top = sector_analyzer.get_bankuai_jjding()
+            watch.lap('indicator')
             
             logger.info(f"=== 板块顶部信号分析 ===")
             logger.info(f"明确顶部信号: {is_sector_confirmed_top}")
@@ -942,6 +967,8 @@ def run_daily_sell_analysis():
                     else:
                         logger.info(f"股票 {stock_code} 未触发双重标准卖出条件")
 
+            watch.lap('signal')
+            
             # --- 交易执行 ---
             logger.info(f"=== 卖出执行阶段 ===")
             logger.info(f"最终卖出清单: {final_sell_list_for_sector}")
@@ -961,7 +988,8 @@ def run_daily_sell_analysis():
                         try:
                             # push_redis('sell', stock_code, sell_quantity)
                             # 【修正】使用带CX持仓记录清理的卖出函数
-                            order = sell_stock_with_cx_cleanup(ACCOUNT, stock_code, sell_quantity)
+                            with LATENCY.span('db_write', pool_name):
+                                order = sell_stock_with_cx_cleanup(ACCOUNT, stock_code, sell_quantity)
                             if order:
                                 logger.info(f"=== 卖出执行成功 ===")
                                 logger.info(f"股票: {stock_code}, 数量: {sell_quantity}")
@@ -987,85 +1015,75 @@ def run_daily_sell_analysis():
     generate_report("每日卖出分析报告")
 
 
-def monitor_positions_for_sell():
+def rearm_stop_monitor():
+    """
+    按当前持仓重新布防逐笔止盈止损监控。
+    只有在daily_selections中存在、且非今日买入（T+1）的持仓会被监控；
+    长线持仓股(cx_strategy_holdings)应用更高的止盈标准。
+    持仓、操作列表或CX名单变化后调用，TICK处理中不再查询数据库。
+    """
+    ACCOUNT.refresh_positions()
+    cx_strategy_holdings = get_cx_strategy_holdings()
+    armed = STOP_MONITOR.sync_positions(ACCOUNT, cx_holdings=cx_strategy_holdings,
+                                        eligible=OPERATING_STOCKS_TODAY)
+    print(f"✓ [秒级监控] 已布防 {armed} 只持仓股: {sorted(STOP_MONITOR.symbols)}")
+
+
+def publish_position_ticks():
     """
-    【已修正】秒级持仓监控函数。
-    对所有在daily_selections中存在的持仓股进行止盈止损监控。
-    对于长线持仓股(cx_strategy_holdings)，应用更高的止盈标准。
+    行情推送：把已布防股票的最新价格（价格快照）作为TICK事件放入事件引擎。
+    止盈止损判断由 STOP_MONITOR 在事件线程中完成。
     """
-    # 检查是否在交易时间内，如果不在交易时间则跳过监控
+    # 检查是否在交易时间内，如果不在交易时间则跳过
     if not is_trading_hours():
         return
-    
-    current_positions = list(ACCOUNT.positions.keys())
-    if not current_positions:
-        return
-    
-    if not OPERATING_STOCKS_TODAY:
-        # 只在第一次显示警告，避免刷屏
-        if not hasattr(monitor_positions_for_sell, '_warning_shown'):
-            print(f"\n⚠️  [秒级监控] OPERATING_STOCKS_TODAY 为空，跳过监控")
-            print(f"   当前持仓: {current_positions}")
-            print(f"   今日操作股票: {list(OPERATING_STOCKS_TODAY)}")
-            monitor_positions_for_sell._warning_shown = True
+
+    symbols = STOP_MONITOR.symbols
+    if not symbols:
         return
 
     print(f".", end='', flush=True)
+    prices = ACCOUNT.price_service.get_prices(symbols)
+    for stock_code, price in prices.items():
+        if price:
+            EVENT_ENGINE.put_tick_event(stock_code, price, 0)
 
-    # 获取CX长线股列表（动态获取，确保实时性）
-    cx_strategy_holdings = get_cx_strategy_holdings()
 
-    for stock_code in current_positions:
-        # *** 核心修正 2: 增加安全检查 ***
-        # 如果当前持仓的股票不在daily_selections中，则直接跳过
-        if stock_code not in OPERATING_STOCKS_TODAY:
-            continue
-            
-        # *** 核心修正 3: 增加T+1检查 ***
-        # 如果股票是今日买进的，T+1制度下不能卖出
-        if ACCOUNT.get_today_bought(stock_code):
+def on_stop_order(event):
+    """ORDER事件监听器（事件线程）：只把卖出单放入待执行队列，由主线程执行"""
+    if event.data.get('direction') == 'sell':
+        PENDING_STOP_ORDERS.put(event)
+
+
+def execute_pending_stop_orders():
+    """
+    在主线程中执行止盈止损卖出单（账户的SQLite连接只能在创建它的线程中使用）。
+    """
+    executed = False
+    while True:
+        try:
+            event = PENDING_STOP_ORDERS.get_nowait()
+        except queue.Empty:
+            break
+
+        stock_code = event.data['stock_code']
+        reason = event.data.get('reason', '')
+        sell_quantity = min(event.data['quantity'], ACCOUNT.get_closeable_amount(stock_code))
+        if sell_quantity <= 0:
             continue
-            
-        pnl_data = ACCOUNT.get_position_pnl(stock_code)
-        #print(pnl_data['stock_code'],pnl_data['pnl_ratio'])
-        
-        if pnl_data:
-            pnl_ratio = pnl_data['pnl_ratio']
-            should_sell = False
-            reason = ""
-
-            # ===================== 差异化止盈逻辑开始 =====================
-            # 检查当前股票是否为长线股，并为其设定特定的止盈目标
-            if stock_code in cx_strategy_holdings:
-                # 如果是长线股，止盈目标在原基础上增加10个百分点
-                current_profit_target = PROFIT_TARGET + 0.10  # 20% + 10% = 30%
-                profit_reason_prefix = "秒级长线止盈"
-            else:
-                # 否则，使用默认的止盈目标
-                current_profit_target = PROFIT_TARGET
-                profit_reason_prefix = "秒级止盈"
-            # ===================== 差异化止盈逻辑结束 =====================
-
-            # 使用动态设定的止盈目标进行判断
-            if pnl_ratio >= current_profit_target:
-                should_sell = True
-                reason = f"{profit_reason_prefix}(收益率 {pnl_ratio:.2%}, 目标 {current_profit_target:.2%})"
-            elif pnl_ratio <= STOP_LOSS_TARGET:
-                should_sell = True
-                reason = f"秒级止损(收益率 {pnl_ratio:.2%})"
-            
-            if should_sell:
-                sell_quantity = ACCOUNT.get_closeable_amount(stock_code)
-                if sell_quantity > 0:
-                    print(f"\n🚨 [秒级监控卖出] {stock_code}: 触发 {reason} 条件！")
-                    # ... 执行卖出 ...
-                    # push_redis('sell', stock_code, sell_quantity)
-                    # 【修正】使用带CX持仓记录清理的卖出函数
-                    order = sell_stock_with_cx_cleanup(ACCOUNT, stock_code, sell_quantity)
-                    if order:
-                        print(f"✅ [秒级监控] {stock_code} 卖出成功")
-                    else:
-                        print(f"❌ [秒级监控] {stock_code} 卖出失败")
+
+        print(f"\n🚨 [秒级监控卖出] {stock_code}: 触发 {reason} 条件！")
+        # push_redis('sell', stock_code, sell_quantity)
+        # 【修正】使用带CX持仓记录清理的卖出函数
+        order = sell_stock_with_cx_cleanup(ACCOUNT, stock_code, sell_quantity)
+        if order:
+            print(f"✅ [秒级监控] {stock_code} 卖出成功")
+        else:
+            print(f"❌ [秒级监控] {stock_code} 卖出失败")
+        executed = True
+
+    if executed:
+        rearm_stop_monitor()
 
 
 def stop_trading_system():
@@ -1079,6 +1097,19 @@ def stop_trading_system():
     print(f"{'='*50}")
     logger.info("交易系统收到15:10分停止信号，准备停止运行")
     generate_report("15:10分自动停止报告")
+    close_risk_period()
+    LATENCY.print_report(since=datetime.now().strftime('%Y-%m-%d'))
+
+def close_risk_period():
+    """
+    日终结算风险引擎：按账户账本校正持仓后记录当日权益，推入收益率滚动窗口。
+    """
+    RISK_ENGINE.sync_account(ACCOUNT)
+    RISK_ENGINE.close_period(datetime.now())
+    metrics = RISK_ENGINE.metrics()
+    print(f"📊 [风险] 权益: {metrics['equity']:,.2f}, 仓位: {metrics['exposure_ratio']:.2%}, "
+          f"最大单票: {metrics['max_position_ratio']:.2%}, 当前回撤: {metrics['current_drawdown_ratio']:.2%}")
+    logger.info(f"风险引擎日终结算: {metrics}")
 
 def generate_report(report_title):
     """
@@ -1092,31 +1123,50 @@ def generate_report(report_title):
 # =============================================================================
 # ===== 主调度器与执行入口 =====
 # =============================================================================
-if __name__ == "__main__":
-    # 1. 启动时，先更新一次今天要操作的股票列表
-    update_operating_stocks_list()
-
-    # 2. 设置日线分析任务
+def setup_schedule(scheduler=schedule):
+    """
+    注册日内定时任务。
+    实盘使用 schedule 模块；离线回放（applications/trading_replay.py）传入接口相同的回放调度器。
+    """
+    # 日线分析任务
     for t in DAILY_ANALYSIS_TIMES:
         # 在执行买卖分析前，先更新一下操作列表，以防盘中有变动
-        schedule.every().day.at(t).do(update_operating_stocks_list) 
+        scheduler.every().day.at(t).do(update_operating_stocks_list) 
 
         # 优先执行高优先级的CX买入分析
-        schedule.every().day.at(t).do(run_cx_buy_analysis)
+        scheduler.every().day.at(t).do(run_cx_buy_analysis)
+
+        scheduler.every().day.at(t).do(run_daily_buy_analysis)
+        scheduler.every().day.at(t).do(run_daily_sell_analysis)
 
-        schedule.every().day.at(t).do(run_daily_buy_analysis)
-        schedule.every().day.at(t).do(run_daily_sell_analysis)
+        # 买卖完成后按最新持仓重新布防
+        scheduler.every().day.at(t).do(rearm_stop_monitor)
     
-    # 3. 设置15:10分自动停止任务
-    schedule.every().day.at("15:10").do(stop_trading_system)
+    # 15:10分自动停止任务
+    scheduler.every().day.at("15:10").do(stop_trading_system)
     
-    # 4. 设置秒级持仓监控任务
-    schedule.every(10).seconds.do(monitor_positions_for_sell)
+    # 秒级持仓监控：行情推送TICK事件，触发后在主线程执行卖出
+    scheduler.every(3).seconds.do(publish_position_ticks)
+    scheduler.every(1).seconds.do(execute_pending_stop_orders)
+
+
+if __name__ == "__main__":
+    # 1. 启动时，先更新一次今天要操作的股票列表
+    update_operating_stocks_list()
+
+    # 2. 启动事件驱动的秒级持仓监控
+    EVENT_ENGINE.register_listener(EventType.ORDER, on_stop_order)
+    RISK_ENGINE.attach(EVENT_ENGINE)
+    EVENT_ENGINE.start()
+    rearm_stop_monitor()
+
+    # 3. 设置日线分析、15:10分自动停止和秒级监控任务
+    setup_schedule(schedule)
     
     print("--- 交易调度器已启动 ---")
     print(f"日线任务执行时间: {DAILY_ANALYSIS_TIMES}")
     print(f"自动停止时间: 15:10")
-    print(f"秒级监控频率: 每10秒")
+    print(f"秒级监控: 每3秒推送一次TICK事件")
     print(f"当前 OPERATING_STOCKS_TODAY: {list(OPERATING_STOCKS_TODAY)} (数量: {len(OPERATING_STOCKS_TODAY)})")
     print(f"当前持仓: {list(ACCOUNT.positions.keys())}")
     
@@ -1144,4 +1194,7 @@ if __name__ == "__main__":
             
     except KeyboardInterrupt:
         print("\n--- 调度器已手动停止 ---")
-        generate_report("手动停止最终账户状态报告")
\ No newline at end of file
+        generate_report("手动停止最终账户状态报告")
+        LATENCY.print_report(since=datetime.now().strftime('%Y-%m-%d'))
+    finally:
+        EVENT_ENGINE.stop()
\ No newline at end of file
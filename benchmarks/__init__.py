@@ -0,0 +1,5 @@
+"""
+性能基准测试模块
+
+基于可复现的合成数据库，测量板块指数计算等核心流程的耗时、吞吐量和内存占用
+"""
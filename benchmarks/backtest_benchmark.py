@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回测引擎性能基准测试
+
+在合成数据库上运行一个截面动量轮动策略（每日按20日涨幅选前N只、等权持有），
+分别记录面板加载耗时和逐日回测耗时（交易日/秒），并以 JSON 格式输出结果：
+
+    python -m benchmarks.backtest_benchmark --stocks 500 --years 3
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+from typing import Dict, Any
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_db import SyntheticConfig, generate_synthetic_database, synthetic_trade_dates
+from applications.backtest.backtest_engine import BacktestEngine, MarketPanel
+from strategies.base_strategy import BaseStrategy
+
+BENCHMARK_VERSION = 1
+
+
+class MomentumRotationStrategy(BaseStrategy):
+    """截面动量轮动：每日按 lookback 日涨幅选前 top_n 只股票等权持有"""
+
+    def __init__(self, lookback: int = 20, top_n: int = 10):
+        super().__init__('momentum_rotation', {'lookback': lookback, 'top_n': top_n})
+        self.lookback = lookback
+        self.top_n = top_n
+
+    def on_init(self):
+        pass
+
+    def on_tick(self, event):
+        pass
+
+    def on_bar(self, event):
+        view, broker = event.data['view'], event.data['broker']
+        closes = view.field('close', self.lookback + 1)
+        if len(closes) <= self.lookback:
+            return
+        with np.errstate(invalid='ignore', divide='ignore'):
+            momentum = closes[-1] / closes[0] - 1
+        momentum = np.where(np.isnan(momentum), -np.inf, momentum)
+        selected = {view.codes[j] for j in np.argsort(-momentum)[:self.top_n] if np.isfinite(momentum[j])}
+
+        for code in broker.get_positions():
+            if code not in selected:
+                broker.sell(code, reason='调出')
+        budget = broker.total_equity() / self.top_n
+        for code in selected:
+            if broker.get_position(code) == 0:
+                broker.order_value(code, budget, reason='调入')
+
+
+def run_benchmark(config: SyntheticConfig, db_path: str = None, top_n: int = 10) -> Dict[str, Any]:
+    """生成合成数据库、加载面板并运行回测，返回结果字典"""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='backtest_bench_'), 'synthetic.db')
+
+    start = time.perf_counter()
+    dataset = generate_synthetic_database(db_path, config)
+    generate_seconds = time.perf_counter() - start
+
+    trade_dates = synthetic_trade_dates(config)
+    # 留出约 30 个交易日作为指标预热
+    backtest_start, backtest_end = trade_dates[min(30, len(trade_dates) - 1)], trade_dates[-1]
+
+    from data_management.database_manager import DatabaseManager
+    original_db_path = DatabaseManager().db_path
+    DatabaseManager().switch_database(db_path)
+    try:
+        start = time.perf_counter()
+        panel = MarketPanel.load(trade_dates[0], backtest_end, warmup_days=0)
+        load_seconds = time.perf_counter() - start
+    finally:
+        DatabaseManager().switch_database(original_db_path)
+
+    engine = BacktestEngine(backtest_start, backtest_end)
+    start = time.perf_counter()
+    results = engine.run_backtest(MomentumRotationStrategy(top_n=top_n), panel)
+    run_seconds = time.perf_counter() - start
+    n_days = len(results['equity'])
+
+    return {
+        'benchmark': 'backtest',
+        'version': BENCHMARK_VERSION,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'pandas': pd.__version__, 'platform': platform.platform()},
+        'config': {**config.to_dict(), 'top_n': top_n},
+        'dataset': dataset,
+        'stages': {
+            'generate': {'seconds': round(generate_seconds, 4)},
+            'load_panel': {'seconds': round(load_seconds, 4), 'shape': list(panel.shape)},
+            'run': {'seconds': round(run_seconds, 4), 'trade_days': n_days,
+                    'days_per_second': round(n_days / run_seconds, 1) if run_seconds > 0 else None,
+                    'trades': int(len(results['trades']))},
+        },
+        'metrics': results['metrics'],
+    }
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    """格式化输出结果"""
+    stages = results['stages']
+    lines = [
+        f"面板加载: {stages['load_panel']['seconds']} 秒, 形状 {stages['load_panel']['shape']}",
+        f"回测运行: {stages['run']['seconds']} 秒, {stages['run']['trade_days']} 个交易日, "
+        f"{stages['run']['days_per_second']} 交易日/秒, {stages['run']['trades']} 笔成交",
+        f"总收益率: {results['metrics']['total_return']:.2%}, 最大回撤: {results['metrics']['max_drawdown']:.2%}",
+    ]
+    return "\n".join(lines)
+
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description='回测引擎性能基准测试')
+    parser.add_argument('--stocks', type=int, default=500, help='股票数量')
+    parser.add_argument('--years', type=float, default=3.0, help='行情年数')
+    parser.add_argument('--top-n', type=int, default=10, help='持仓股票数量')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', default=None, help='结果 JSON 文件路径')
+    args = parser.parse_args(argv)
+
+    config = SyntheticConfig(n_stocks=args.stocks, years=args.years, seed=args.seed)
+    print(f"回测引擎基准测试: {config.n_stocks} 只股票, {config.years} 年")
+    results = run_benchmark(config, top_n=args.top_n)
+    print(format_results(results))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
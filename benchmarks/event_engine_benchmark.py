@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件引擎吞吐量基准测试
+
+对比旧版事件引擎（逐个取事件、每次放入都记录调试日志、列表历史在溢出时整体切片）
+和当前 EventEngine（批量取出、定长 deque 历史加按类型索引、调试日志默认关闭）
+在相同事件流下的吞吐量（事件/秒），以及按类型查询事件历史的耗时，并以 JSON 格式输出结果：
+
+    python -m benchmarks.event_engine_benchmark --events 200000
+    python -m benchmarks.event_engine_benchmark --history-size 10000 --output results/benchmarks/event_engine.json
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import platform
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.event import Event, EventType, TickEvent
+from core.event_engine import EventEngine
+
+BENCHMARK_VERSION = 1
+
+legacy_logger = logging.getLogger('benchmarks.legacy_event_engine')
+
+
+class LegacyEventEngine:
+    """旧版事件引擎的复刻，作为吞吐量对比的基线"""
+
+    def __init__(self, max_history_size: int = 10000):
+        self._event_queue = queue.Queue()
+        self._listeners: Dict[EventType, List] = {}
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._event_history: List[Event] = []
+        self._max_history_size = max_history_size
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while self._running:
+            try:
+                event = self._event_queue.get(timeout=1.0)
+                self._dispatch_event(event)
+            except queue.Empty:
+                continue
+
+    def _dispatch_event(self, event: Event):
+        self._event_history.append(event)
+        if len(self._event_history) > self._max_history_size:
+            self._event_history = self._event_history[-self._max_history_size:]
+        listeners = self._listeners.get(event.event_type, [])
+        if not listeners:
+            legacy_logger.debug(f"没有监听器处理事件: {event.event_type.value}")
+            return
+        for listener in listeners:
+            listener(event)
+
+    def register_listener(self, event_type: EventType, listener):
+        self._listeners.setdefault(event_type, []).append(listener)
+
+    def put_event(self, event: Event):
+        self._event_queue.put(event)
+        legacy_logger.debug(f"放入事件: {event.event_type.value}")
+
+    def get_event_history(self, event_type: EventType = None, limit: int = 100) -> List[Event]:
+        if event_type is None:
+            return self._event_history[-limit:]
+        return [e for e in self._event_history if e.event_type == event_type][-limit:]
+
+
+def _make_events(n_events: int, signal_every: int) -> List[Event]:
+    """生成行情事件流，每隔 signal_every 个插入一个交易信号事件"""
+    now = datetime.now()
+    events = []
+    for i in range(n_events):
+        if signal_every and i % signal_every == 0:
+            events.append(Event(EventType.SIGNAL, {'stock_code': f'{i % 500:06d}'}, now))
+        else:
+            events.append(TickEvent(f'{i % 500:06d}', 10.0 + (i % 100) / 100, 100, now))
+    return events
+
+
+def _measure(engine, events: List[Event], history_queries: int) -> Dict[str, Any]:
+    """放入全部事件并等待分发完成，返回吞吐量和历史查询耗时"""
+    done = threading.Event()
+    counter = {'n': 0}
+    total = len(events)
+
+    def on_event(event):
+        counter['n'] += 1
+        if counter['n'] == total:
+            done.set()
+
+    engine.register_listener(EventType.TICK, on_event)
+    engine.register_listener(EventType.SIGNAL, on_event)
+    engine.start()
+    try:
+        start = time.perf_counter()
+        for event in events:
+            engine.put_event(event)
+        done.wait(timeout=600)
+        seconds = time.perf_counter() - start
+
+        query_start = time.perf_counter()
+        for _ in range(history_queries):
+            engine.get_event_history(EventType.SIGNAL, limit=100)
+        query_seconds = time.perf_counter() - query_start
+    finally:
+        engine.stop()
+
+    return {
+        'seconds': round(seconds, 4),
+        'events_per_second': round(total / seconds, 1) if seconds > 0 else None,
+        'dispatched': counter['n'],
+        'history_query_ms': round(query_seconds / history_queries * 1000, 4) if history_queries else None,
+    }
+
+
+def run_benchmark(n_events: int = 200000, history_size: int = 10000, batch_size: int = 256,
+                  signal_every: int = 50, history_queries: int = 200) -> Dict[str, Any]:
+    """依次运行旧版和当前事件引擎，返回结果字典"""
+    events = _make_events(n_events, signal_every)
+    legacy = _measure(LegacyEventEngine(max_history_size=history_size), events, history_queries)
+    current = _measure(EventEngine(max_history_size=history_size, batch_size=batch_size), events, history_queries)
+
+    speedup = None
+    if legacy['events_per_second'] and current['events_per_second']:
+        speedup = round(current['events_per_second'] / legacy['events_per_second'], 2)
+
+    return {
+        'benchmark': 'event_engine',
+        'version': BENCHMARK_VERSION,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'params': {'events': n_events, 'history_size': history_size, 'batch_size': batch_size,
+                   'signal_every': signal_every, 'history_queries': history_queries},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'legacy': legacy,
+        'current': current,
+        'speedup': speedup,
+    }
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    """格式化输出结果"""
+    lines = [f"{'引擎':<10}{'事件/秒':>14}{'耗时(秒)':>12}{'历史查询(毫秒)':>16}"]
+    for name in ('legacy', 'current'):
+        r = results[name]
+        lines.append(f"{name:<10}{r['events_per_second']:>14}{r['seconds']:>12}{r['history_query_ms']:>16}")
+    lines.append(f"吞吐量提升: {results['speedup']}x")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description='事件引擎吞吐量基准测试')
+    parser.add_argument('--events', type=int, default=200000, help='事件数量')
+    parser.add_argument('--history-size', type=int, default=10000, help='事件历史容量')
+    parser.add_argument('--batch-size', type=int, default=256, help='批量分发大小')
+    parser.add_argument('--signal-every', type=int, default=50, help='每隔多少个行情事件插入一个信号事件')
+    parser.add_argument('--history-queries', type=int, default=200, help='按类型查询事件历史的次数')
+    parser.add_argument('--output', default=None, help='结果 JSON 文件路径')
+    args = parser.parse_args(argv)
+
+    print(f"事件引擎基准测试: {args.events} 个事件, 历史容量 {args.history_size}")
+    results = run_benchmark(args.events, args.history_size, args.batch_size,
+                            args.signal_every, args.history_queries)
+    print(format_results(results))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
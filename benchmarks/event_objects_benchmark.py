@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件对象微基准测试
+
+对比旧版事件对象（dataclass + data 字典 + 属性重复保存 + 构造时 strftime 生成 event_id）、
+当前的 __slots__ 事件对象和 TickEventPool 复用对象，
+在创建 TICK 事件并读取股票代码和价格时的耗时（纳秒/个）和内存占用（字节/个），并以 JSON 格式输出结果：
+
+    python -m benchmarks.event_objects_benchmark --events 200000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.event import EventType, TickEvent, TickEventPool
+
+BENCHMARK_VERSION = 1
+
+
+@dataclass
+class LegacyEvent:
+    """旧版事件基类的复刻"""
+    event_type: EventType
+    data: Dict[str, Any]
+    timestamp: datetime
+    event_id: str = ""
+
+    def __post_init__(self):
+        if not self.event_id:
+            self.event_id = f"{self.event_type.value}_{self.timestamp.strftime('%Y%m%d_%H%M%S_%f')}"
+
+
+class LegacyTickEvent(LegacyEvent):
+    """旧版 TICK 事件的复刻"""
+
+    def __init__(self, stock_code: str, price: float, volume: int, timestamp: datetime = None):
+        super().__init__(EventType.TICK, {"stock_code": stock_code, "price": price, "volume": volume},
+                         timestamp or datetime.now())
+        self.stock_code = stock_code
+        self.price = price
+        self.volume = volume
+
+
+def _time_creation(factory, codes, n_events: int) -> float:
+    """创建 n_events 个事件并读取股票代码和价格，返回纳秒/个"""
+    n_codes = len(codes)
+    now = datetime.now()
+    start = time.perf_counter()
+    for i in range(n_events):
+        event = factory(codes[i % n_codes], 10.0, 100, now)
+        event.stock_code
+        event.price
+    return (time.perf_counter() - start) / n_events * 1e9
+
+
+def _memory_per_event(factory, codes, n_events: int) -> float:
+    """保留 n_events 个事件时每个事件的内存占用（字节）"""
+    now = datetime.now()
+    n_codes = len(codes)
+    tracemalloc.start()
+    try:
+        events = [factory(codes[i % n_codes], 10.0 + i, 100, now) for i in range(n_events)]
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del events
+    return current / n_events
+
+
+def run_benchmark(n_events: int = 200000, n_codes: int = 3000, memory_events: int = 20000) -> Dict[str, Any]:
+    """依次测试旧版事件、当前事件和事件池，返回结果字典"""
+    codes = [f'{i:06d}' for i in range(n_codes)]
+    pool = TickEventPool(4096)
+    factories = {
+        'legacy': LegacyTickEvent,
+        'slots': TickEvent,
+        'pool': pool.acquire,
+    }
+
+    results = {}
+    for name, factory in factories.items():
+        results[name] = {
+            'ns_per_event': round(_time_creation(factory, codes, n_events), 1),
+            # 事件池的对象是预先分配并循环复用的，不单独统计内存
+            'bytes_per_event': None if name == 'pool' else round(_memory_per_event(factory, codes, memory_events), 1),
+        }
+
+    legacy_ns = results['legacy']['ns_per_event']
+    for name in ('slots', 'pool'):
+        ns = results[name]['ns_per_event']
+        results[name]['speedup'] = round(legacy_ns / ns, 2) if ns else None
+
+    return {
+        'benchmark': 'event_objects',
+        'version': BENCHMARK_VERSION,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'params': {'events': n_events, 'codes': n_codes, 'memory_events': memory_events},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'results': results,
+    }
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    """格式化输出结果"""
+    lines = [f"{'事件对象':<10}{'纳秒/个':>12}{'字节/个':>12}{'提升':>8}"]
+    for name, r in results['results'].items():
+        memory = r['bytes_per_event'] if r['bytes_per_event'] is not None else '-'
+        speedup = r.get('speedup') or '-'
+        lines.append(f"{name:<10}{r['ns_per_event']:>12}{memory:>12}{speedup:>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description='事件对象微基准测试')
+    parser.add_argument('--events', type=int, default=200000, help='计时的事件数量')
+    parser.add_argument('--codes', type=int, default=3000, help='股票数量')
+    parser.add_argument('--memory-events', type=int, default=20000, help='统计内存时保留的事件数量')
+    parser.add_argument('--output', default=None, help='结果 JSON 文件路径')
+    args = parser.parse_args(argv)
+
+    print(f"事件对象基准测试: {args.events} 个事件, {args.codes} 只股票")
+    results = run_benchmark(args.events, args.codes, args.memory_events)
+    print(format_results(results))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+板块指数流程性能基准测试
+
+在合成数据库上依次运行以下阶段，并以 JSON 格式输出结果：
+1. generate:       生成合成数据库
+2. full_build:     所有标准板块的全量指数计算（数据加载 / 计算 / 写入）
+3. incremental:    单日增量更新（process_single_standard_index_all_dates）
+4. refined:        细化板块指数计算（细化分类 / 数据加载 / 计算）
+5. active_screener: 活跃股筛选（ActiveStockScreener）
+
+每个阶段记录耗时、吞吐量（指数·日/秒 或 板块/秒）、峰值内存和分步耗时。
+结果文件包含提交号、参数和依赖版本，相同参数在不同提交之间的结果可直接对比：
+
+    python -m benchmarks.sector_index_benchmark --stocks 300 --years 2 --sectors 8
+    python -m benchmarks.sector_index_benchmark --compare results/benchmarks/上次结果.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import warnings
+import contextlib
+from datetime import datetime
+from typing import Dict, Any
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_db import (
+    SyntheticConfig, generate_synthetic_database, synthetic_trade_dates
+)
+
+BENCHMARK_VERSION = 1
+
+
+class StageTimer:
+    """单个阶段的计时器，支持分步累计耗时"""
+
+    def __init__(self, name: str, unit: str, trace_memory: bool):
+        self.name = name
+        self.unit = unit
+        self.trace_memory = trace_memory
+        self.units = 0
+        self.breakdown: Dict[str, float] = {}
+        self.seconds = 0.0
+        self.peak_memory_mb = None
+
+    @contextlib.contextmanager
+    def step(self, name: str):
+        """累计某个分步的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.breakdown[name] = self.breakdown.get(name, 0.0) + time.perf_counter() - start
+
+    def __enter__(self) -> 'StageTimer':
+        if self.trace_memory:
+            tracemalloc.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.seconds = time.perf_counter() - self._start
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.peak_memory_mb = round(peak / 1024 / 1024, 2)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'seconds': round(self.seconds, 4),
+            'units': self.units,
+            'unit': self.unit,
+            'throughput': round(self.units / self.seconds, 2) if self.seconds > 0 else None,
+            'peak_memory_mb': self.peak_memory_mb,
+            'breakdown': {k: round(v, 4) for k, v in self.breakdown.items()},
+        }
+
+
+def _git_info() -> Dict[str, Any]:
+    """当前提交号和工作区是否有未提交修改"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=project_root,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=project_root,
+                               capture_output=True, text=True, timeout=30).stdout.strip() != ''
+        return {'commit': commit or None, 'dirty': dirty}
+    except Exception:
+        return {'commit': None, 'dirty': None}
+
+
+@contextlib.contextmanager
+def _quiet(verbose: bool):
+    """屏蔽被测代码的进度输出，避免打印耗时影响结果"""
+    if verbose:
+        yield
+        return
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _run_pipeline_stages(config: SyntheticConfig, db_path: str, holdout_days: int,
+                         trace_memory: bool, verbose: bool) -> Dict[str, StageTimer]:
+    """在合成数据库上运行全量、增量、细化和活跃股筛选各阶段"""
+    from data_management.sector_index_calculator import SectorIndexCalculator, ActiveStockScreener
+    from data_management.index_data_writer import IndexDataWriter
+    from applications.incremental_sector_index_updater import (
+        get_all_sw_sectors, get_sector_constituents, process_single_standard_index_all_dates, REFINEMENT_MAP
+    )
+    from core.utils.stock_filter import StockXihua
+
+    stages: Dict[str, StageTimer] = {}
+    trade_dates = synthetic_trade_dates(config)
+    start_date, last_date = trade_dates[0], trade_dates[-1]
+    build_end = trade_dates[-1 - holdout_days]
+
+    with _quiet(verbose):
+        sectors = get_all_sw_sectors()
+        constituents = {code: get_sector_constituents(code) for code, _ in sectors}
+
+    # 2. 全量计算（留出最后 holdout_days 个交易日给增量阶段）
+    with StageTimer('full_build', 'index_days', trace_memory) as stage, _quiet(verbose):
+        writer = IndexDataWriter(db_path=db_path)
+        for sector_code, sector_name in sectors:
+            with stage.step('load'):
+                calculator = SectorIndexCalculator(constituents[sector_code], start_date, build_end)
+            with stage.step('compute'):
+                index_df = calculator.calculate_index(start_date)
+            with stage.step('write'):
+                writer.add_frame(index_df, sector_code.replace('.SI', '.ZS'), f"{sector_name}指数")
+            stage.units += len(index_df)
+        with stage.step('write'):
+            writer.close()
+    stages['full_build'] = stage
+
+    # 3. 单日增量更新
+    with StageTimer('incremental', 'index_days', trace_memory) as stage, _quiet(verbose):
+        writer = IndexDataWriter(db_path=db_path)
+        for sector_code, sector_name in sectors:
+            with stage.step('update'):
+                success_count, _ = process_single_standard_index_all_dates(sector_code, sector_name, writer)
+            stage.units += success_count
+        with stage.step('write'):
+            writer.close()
+    stages['incremental'] = stage
+
+    # 4. 细化板块指数
+    with StageTimer('refined', 'index_days', trace_memory) as stage, _quiet(verbose):
+        for sector_code, _ in sectors:
+            with stage.step('classify'):
+                xihua = StockXihua()
+                xihua.calculate_quantile_categories(xihua.create_stock_dataframe(constituents[sector_code]))
+            for info in REFINEMENT_MAP.values():
+                sub_stock_list = getattr(xihua, info['attribute'])
+                if not sub_stock_list or len(sub_stock_list) < 3:
+                    continue
+                with stage.step('load'):
+                    calculator = SectorIndexCalculator(sub_stock_list, start_date, last_date)
+                with stage.step('compute'):
+                    index_df = calculator.calculate_index(start_date)
+                stage.units += len(index_df)
+    stages['refined'] = stage
+
+    # 5. 活跃股筛选
+    with StageTimer('active_screener', 'sectors', trace_memory) as stage, _quiet(verbose):
+        for _, sector_name in sectors:
+            with stage.step('screen'):
+                ActiveStockScreener(sector_name, last_date)
+            stage.units += 1
+    stages['active_screener'] = stage
+
+    return stages
+
+
+def run_benchmark(config: SyntheticConfig, db_path: str = None, holdout_days: int = 1,
+                  trace_memory: bool = True, verbose: bool = False) -> Dict[str, Any]:
+    """
+    运行完整的基准测试
+
+    Args:
+        config: 合成数据库参数
+        db_path: 合成数据库路径，默认使用临时目录
+        holdout_days: 全量计算时留出的最后几个交易日，用于增量更新阶段
+        trace_memory: 是否用 tracemalloc 记录各阶段峰值内存（会增加一定耗时）
+        verbose: 是否显示被测代码的输出
+
+    Returns:
+        Dict[str, Any]: 基准测试结果
+    """
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='sector_bench_'), 'synthetic.db')
+
+    stages: Dict[str, StageTimer] = {}
+
+    # 1. 生成合成数据库
+    with StageTimer('generate', 'k_daily_rows', trace_memory) as stage:
+        dataset = generate_synthetic_database(db_path, config)
+        stage.units = dataset['k_daily_rows']
+    stages['generate'] = stage
+
+    # 所有模块共用 DatabaseManager 单例，切换后全部读写合成数据库，结束后切换回原数据库
+    from data_management.database_manager import DatabaseManager
+    original_db_path = DatabaseManager().db_path
+    DatabaseManager().switch_database(db_path)
+    try:
+        stages.update(_run_pipeline_stages(config, db_path, holdout_days, trace_memory, verbose))
+    finally:
+        DatabaseManager().switch_database(original_db_path)
+
+    peak_rss_mb = None
+    try:
+        import resource
+        # Linux 下 ru_maxrss 单位为 KB
+        peak_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+    except Exception:
+        pass
+
+    return {
+        'benchmark': 'sector_index',
+        'version': BENCHMARK_VERSION,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git': _git_info(),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+        },
+        'config': {**config.to_dict(), 'holdout_days': holdout_days, 'trace_memory': trace_memory},
+        'dataset': dataset,
+        'stages': {name: stage.to_dict() for name, stage in stages.items()},
+        'peak_rss_mb': peak_rss_mb,
+    }
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> str:
+    """生成两次基准结果的对比表（比值 < 1 表示变快）"""
+    lines = []
+    if baseline.get('config') != current.get('config'):
+        lines.append("⚠️ 两次运行的参数不同，结果不可直接比较")
+    lines.append(f"{'阶段':<18} {'基准(s)':>10} {'当前(s)':>10} {'比值':>8} {'内存基准(MB)':>14} {'内存当前(MB)':>14}")
+    for name, stage in current['stages'].items():
+        base = baseline.get('stages', {}).get(name)
+        if not base:
+            continue
+        ratio = stage['seconds'] / base['seconds'] if base['seconds'] else float('nan')
+        lines.append(f"{name:<18} {base['seconds']:>10.3f} {stage['seconds']:>10.3f} {ratio:>8.2f} "
+                     f"{str(base.get('peak_memory_mb')):>14} {str(stage.get('peak_memory_mb')):>14}")
+    return "\n".join(lines)
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    """生成结果摘要"""
+    lines = [f"{'阶段':<18} {'耗时(s)':>10} {'数量':>10} {'吞吐量':>12} {'峰值内存(MB)':>14}  分步耗时"]
+    for name, stage in results['stages'].items():
+        breakdown = ', '.join(f"{k}={v:.2f}s" for k, v in stage['breakdown'].items())
+        lines.append(f"{name:<18} {stage['seconds']:>10.3f} {stage['units']:>10} "
+                     f"{str(stage['throughput']):>12} {str(stage['peak_memory_mb']):>14}  {breakdown}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description='板块指数流程性能基准测试')
+    parser.add_argument('--stocks', type=int, default=300, help='股票数量')
+    parser.add_argument('--years', type=float, default=2.0, help='行情年数')
+    parser.add_argument('--sectors', type=int, default=8, help='板块数量')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--holdout-days', type=int, default=1, help='增量更新的交易日数')
+    parser.add_argument('--no-memory', action='store_true', help='不记录峰值内存（计时更精确）')
+    parser.add_argument('--output', default=None, help='结果 JSON 文件路径')
+    parser.add_argument('--compare', default=None, help='与之前的结果 JSON 对比')
+    parser.add_argument('--verbose', action='store_true', help='显示被测代码的输出')
+    args = parser.parse_args(argv)
+
+    # 被测代码会在每次查询时记录日志，只保留警告以上级别
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    config = SyntheticConfig(n_stocks=args.stocks, years=args.years, n_sectors=args.sectors, seed=args.seed)
+    print(f"板块指数基准测试: {config.n_stocks} 只股票, {config.years} 年, {config.n_sectors} 个板块")
+
+    results = run_benchmark(config, holdout_days=args.holdout_days, trace_memory=not args.no_memory,
+                            verbose=args.verbose)
+    print(format_results(results))
+
+    output = args.output
+    if output is None:
+        commit = (results['git']['commit'] or 'nocommit')[:8]
+        output = os.path.join(project_root, 'results', 'benchmarks',
+                              f"sector_index_{commit}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print("\n" + compare_results(json.load(f), results))
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+合成数据库生成器
+
+按给定的股票数量、年数和板块数量生成一个结构与 quant_system.db 一致的 SQLite 数据库：
+- k_daily: 几何随机游走的日线行情，包含随机停牌（缺失行）和零成交量日
+- stock_basic / stock_basic_pro: 股票基础信息、流通A股、分类标签
+- sw_cfg_hierarchy: 申万一级板块及其成分股
+- tdx_cfg: 空的通达信板块表
+
+相同的参数和随机种子总是生成完全相同的数据，保证不同提交之间的基准结果可比。
+"""
+
+import os
+import sqlite3
+from dataclasses import dataclass, asdict
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class SyntheticConfig:
+    """合成数据库参数"""
+    n_stocks: int = 300
+    years: float = 2.0
+    n_sectors: int = 8
+    seed: int = 42
+    end_date: str = '2024-12-31'
+    suspension_rate: float = 0.01
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def synthetic_trade_dates(config: SyntheticConfig) -> List[str]:
+    """合成数据使用的交易日（工作日）"""
+    end = pd.Timestamp(config.end_date)
+    start = end - pd.Timedelta(days=int(round(config.years * 365)))
+    return list(pd.bdate_range(start, end).strftime('%Y-%m-%d'))
+
+
+def synthetic_sectors(config: SyntheticConfig) -> List[Tuple[str, str]]:
+    """合成的申万一级板块 [(板块代码, 板块名称), ...]"""
+    return [(f"80{1010 + i * 10}.SI", f"合成板块{i + 1:02d}") for i in range(config.n_sectors)]
+
+
+def generate_synthetic_database(db_path: str, config: SyntheticConfig = None) -> dict:
+    """
+    生成合成数据库（已存在的文件会被覆盖）
+
+    Args:
+        db_path: 数据库文件路径
+        config: 合成参数
+
+    Returns:
+        dict: 生成的数据规模 {'stocks', 'trade_dates', 'sectors', 'k_daily_rows'}
+    """
+    config = config or SyntheticConfig()
+    rng = np.random.default_rng(config.seed)
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+    dates = synthetic_trade_dates(config)
+    sectors = synthetic_sectors(config)
+    stocks = [f"{600000 + i:06d}" if i % 2 == 0 else f"{i:06d}" for i in range(config.n_stocks)]
+    n_days, n_stocks = len(dates), len(stocks)
+
+    # 行情：对数收益率随机游走，开高低价围绕收盘价生成
+    start_price = rng.uniform(3, 80, n_stocks)
+    returns = rng.normal(0.0003, 0.022, (n_days, n_stocks))
+    close = start_price * np.exp(np.cumsum(returns, axis=0))
+    open_ = close * np.exp(rng.normal(0, 0.006, close.shape))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, close.shape))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, close.shape))
+    volume = rng.lognormal(13, 0.6, close.shape).astype(np.int64)
+
+    # 随机停牌：停牌日没有行情记录；另有少量零成交量日
+    suspended = rng.random(close.shape) < config.suspension_rate
+    volume[rng.random(close.shape) < config.suspension_rate / 2] = 0
+
+    day_idx, stock_idx = np.nonzero(~suspended)
+    kline_rows = list(zip(
+        np.array(stocks)[stock_idx].tolist(),
+        np.array(dates)[day_idx].tolist(),
+        np.round(open_[day_idx, stock_idx], 2).tolist(),
+        np.round(close[day_idx, stock_idx], 2).tolist(),
+        np.round(high[day_idx, stock_idx], 2).tolist(),
+        np.round(low[day_idx, stock_idx], 2).tolist(),
+        volume[day_idx, stock_idx].tolist(),
+    ))
+
+    circulating = rng.lognormal(19.5, 1.0, n_stocks)
+    last_close = close[-1]
+    # 国企, B股, H股, 老股, 大高, 高价, 低价, 次新, 超强
+    flags = rng.random((n_stocks, 9)) < np.array([0.3, 0.02, 0.05, 0.4, 0.1, 0.2, 0.2, 0.1, 0.1])
+    sector_of = np.arange(n_stocks) % config.n_sectors
+
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute("""
+                CREATE TABLE k_daily (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    stock_code TEXT NOT NULL,
+                    trade_date TEXT NOT NULL,
+                    open REAL NOT NULL,
+                    close REAL NOT NULL,
+                    high REAL NOT NULL,
+                    low REAL NOT NULL,
+                    volume INTEGER NOT NULL,
+                    UNIQUE(stock_code, trade_date)
+                )
+            """)
+            conn.executemany(
+                "INSERT INTO k_daily (stock_code, trade_date, open, close, high, low, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", kline_rows
+            )
+
+            conn.execute("""
+                CREATE TABLE stock_basic (
+                    stock_code TEXT PRIMARY KEY, stock_name TEXT, listing_date TEXT, company_name TEXT,
+                    industry_a TEXT, industry_b TEXT, industry_c TEXT, province TEXT, city TEXT,
+                    ownership_type TEXT, ipo_price REAL, ipo_shares REAL, status_code TEXT
+                )
+            """)
+            conn.executemany(
+                "INSERT INTO stock_basic VALUES (?, ?, '2015-01-05', ?, '', '', '', '合成省', '合成市', ?, 10.0, 1e8, 'L')",
+                [(code, f"合成股票{code}", f"合成公司{code}", '地方国企' if flags[i, 0] else '民营企业')
+                 for i, code in enumerate(stocks)]
+            )
+
+            conn.execute("""
+                CREATE TABLE stock_basic_pro (
+                    stock_code TEXT PRIMARY KEY, stock_name TEXT, 流通A股 REAL, 流通值 REAL, 收盘价 REAL,
+                    国企 INTEGER, B股 INTEGER, H股 INTEGER, 老股 INTEGER, 大高 INTEGER, 高价 INTEGER,
+                    低价 INTEGER, 次新 INTEGER, 非公开多 INTEGER, 非公开 INTEGER,
+                    超20 INTEGER, 超40 INTEGER, 超60 INTEGER, 超强 INTEGER, 超超强 INTEGER
+                )
+            """)
+            conn.executemany(
+                "INSERT INTO stock_basic_pro VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 0, 0, 0, ?, 0)",
+                [(code, f"合成股票{code}", float(circulating[i]), float(circulating[i] * last_close[i]),
+                  float(round(last_close[i], 2)), *[int(f) for f in flags[i, :8]], int(flags[i, 8]))
+                 for i, code in enumerate(stocks)]
+            )
+
+            conn.execute("""
+                CREATE TABLE sw_cfg_hierarchy (
+                    l1_code TEXT, l1_name TEXT, l2_code TEXT, l2_name TEXT,
+                    l3_code TEXT, l3_name TEXT, stock_code TEXT
+                )
+            """)
+            conn.executemany(
+                "INSERT INTO sw_cfg_hierarchy VALUES (?, ?, NULL, NULL, NULL, NULL, ?)",
+                [(sectors[sector_of[i]][0], sectors[sector_of[i]][1], code) for i, code in enumerate(stocks)]
+            )
+
+            # 通达信板块表（按板块名称查询成分股时使用，合成数据中为空）
+            conn.execute("CREATE TABLE tdx_cfg (index_code TEXT, industry_name TEXT, stock_code TEXT)")
+    finally:
+        conn.close()
+
+    return {
+        'stocks': n_stocks,
+        'trade_dates': n_days,
+        'sectors': len(sectors),
+        'k_daily_rows': len(kline_rows),
+    }
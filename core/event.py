@@ -2,12 +2,16 @@
 事件定义
 
 定义系统中所有事件类型和事件数据结构
+
+事件对象使用 __slots__，不创建实例 __dict__：
+- 子类的字段只保存为属性，data 字典在第一次访问时才按属性构建（之后缓存）
+- event_id 在第一次访问时才生成（避免每个事件都调用 strftime）
+- TickEventPool 预先分配一组 TickEvent 循环复用，供超高频行情使用
 """
 
 from enum import Enum
 from datetime import datetime
-from typing import Dict, Any, Optional
-from dataclasses import dataclass
+from typing import Dict, Any, Optional, List
 
 
 class EventType(Enum):
@@ -24,61 +28,125 @@ class EventType(Enum):
     STOCK_SELECTION = "stock_selection"     # 个股选择
 
 
-@dataclass
 class Event:
     """事件基类"""
-    event_type: EventType
-    data: Dict[str, Any]
-    timestamp: datetime
-    event_id: str = ""
-    
-    def __post_init__(self):
-        if not self.event_id:
-            self.event_id = f"{self.event_type.value}_{self.timestamp.strftime('%Y%m%d_%H%M%S_%f')}"
+    __slots__ = ('event_type', '_data', 'timestamp', '_event_id')
+
+    def __init__(self, event_type: EventType, data: Dict[str, Any], timestamp: datetime, event_id: str = ""):
+        self.event_type = event_type
+        self._data = data
+        self.timestamp = timestamp
+        self._event_id = event_id or None
+
+    def _build_data(self) -> Dict[str, Any]:
+        """由子类的属性构建 data 字典"""
+        return {}
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """事件数据（子类第一次访问时按属性构建）"""
+        data = self._data
+        if data is None:
+            data = self._data = self._build_data()
+        return data
+
+    @data.setter
+    def data(self, value: Dict[str, Any]):
+        self._data = value
+
+    @property
+    def event_id(self) -> str:
+        """事件ID（第一次访问时生成）"""
+        event_id = self._event_id
+        if event_id is None:
+            event_id = self._event_id = f"{self.event_type.value}_{self.timestamp.strftime('%Y%m%d_%H%M%S_%f')}"
+        return event_id
+
+    @event_id.setter
+    def event_id(self, value: str):
+        self._event_id = value or None
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.event_type, self.data, self.timestamp, self.event_id) == \
+            (other.event_type, other.data, other.timestamp, other.event_id)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(event_type={self.event_type!r}, data={self.data!r}, "
+                f"timestamp={self.timestamp!r}, event_id={self.event_id!r})")
 
 
 class TickEvent(Event):
     """实时行情事件"""
+    __slots__ = ('stock_code', 'price', 'volume')
     
     def __init__(self, stock_code: str, price: float, volume: int, timestamp: datetime = None):
-        super().__init__(
-            EventType.TICK,
-            {
-                "stock_code": stock_code,
-                "price": price,
-                "volume": volume
-            },
-            timestamp or datetime.now()
-        )
+        self.event_type = EventType.TICK
+        self._data = None
+        self._event_id = None
+        self.timestamp = timestamp or datetime.now()
+        self.stock_code = stock_code
+        self.price = price
+        self.volume = volume
+
+    def reset(self, stock_code: str, price: float, volume: int, timestamp: datetime = None) -> 'TickEvent':
+        """原地更新为新的行情（供 TickEventPool 复用）"""
+        self._data = None
+        self._event_id = None
+        self.timestamp = timestamp or datetime.now()
         self.stock_code = stock_code
         self.price = price
         self.volume = volume
+        return self
+
+    def _build_data(self) -> Dict[str, Any]:
+        return {
+            "stock_code": self.stock_code,
+            "price": self.price,
+            "volume": self.volume
+        }
+
+
+class TickEventPool:
+    """
+    可复用的 TICK 事件池
+
+    预先分配 size 个 TickEvent，acquire() 依次原地更新并返回，第 size 次之后循环复用最早的对象。
+    因此监听器不能保留 TICK 事件对象，事件引擎也不能记录事件历史；
+    size 必须大于同时在途（事件队列和工作线程队列中）的 TICK 事件数量。
+    """
+
+    def __init__(self, size: int = 4096):
+        if size <= 0:
+            raise ValueError("事件池大小必须大于0")
+        self._events: List[TickEvent] = [TickEvent('', 0.0, 0, datetime.min) for _ in range(size)]
+        self._size = size
+        self._next = 0
+
+    def __len__(self):
+        return self._size
+
+    def acquire(self, stock_code: str, price: float, volume: int, timestamp: datetime = None) -> TickEvent:
+        """取出下一个事件对象并更新为新的行情"""
+        index = self._next
+        self._next = index + 1 if index + 1 < self._size else 0
+        return self._events[index].reset(stock_code, price, volume, timestamp)
 
 
 class BarEvent(Event):
     """K线数据事件 - 支持你的数据结构"""
+    __slots__ = ('stock_code', 'trade_date', 'open', 'close', 'high', 'low', 'volume')
     
     def __init__(self, stock_code: str, trade_date: str,
                  open: float, close: float, high: float, low: float, volume: int,
                  timestamp: datetime = None):
-        # 构建bar_data，支持你的数据结构
-        bar_data = {
-            "open": open,
-            "close": close,
-            "high": high,
-            "low": low,
-            "volume": volume,
-            "trade_date": trade_date
-        }
-        
-        super().__init__(
-            EventType.BAR,
-            {
-                "stock_code": stock_code,
-                "bar_data": bar_data
-            },
-            timestamp or datetime.now()
-        )
+        self.event_type = EventType.BAR
+        self._data = None
+        self._event_id = None
+        self.timestamp = timestamp or datetime.now()
         self.stock_code = stock_code
         self.trade_date = trade_date
         self.open = open
@@ -86,106 +154,142 @@ class BarEvent(Event):
         self.high = high
         self.low = low
         self.volume = volume
-        self.bar_data = bar_data
+
+    @property
+    def bar_data(self) -> Dict[str, Any]:
+        """K线数据字典，支持你的数据结构"""
+        return self.data["bar_data"]
+
+    def _build_data(self) -> Dict[str, Any]:
+        return {
+            "stock_code": self.stock_code,
+            "bar_data": {
+                "open": self.open,
+                "close": self.close,
+                "high": self.high,
+                "low": self.low,
+                "volume": self.volume,
+                "trade_date": self.trade_date
+            }
+        }
 
 
 class SignalEvent(Event):
     """交易信号事件"""
+    __slots__ = ('stock_code', 'signal_type', 'strength', 'direction')
     
     def __init__(self, stock_code: str, signal_type: str, strength: float, 
                  direction: str, timestamp: datetime = None):
-        super().__init__(
-            EventType.SIGNAL,
-            {
-                "stock_code": stock_code,
-                "signal_type": signal_type,
-                "strength": strength,
-                "direction": direction
-            },
-            timestamp or datetime.now()
-        )
+        self.event_type = EventType.SIGNAL
+        self._data = None
+        self._event_id = None
+        self.timestamp = timestamp or datetime.now()
         self.stock_code = stock_code
         self.signal_type = signal_type
         self.strength = strength
         self.direction = direction
 
+    def _build_data(self) -> Dict[str, Any]:
+        return {
+            "stock_code": self.stock_code,
+            "signal_type": self.signal_type,
+            "strength": self.strength,
+            "direction": self.direction
+        }
+
 
 class OrderEvent(Event):
     """订单事件"""
+    __slots__ = ('stock_code', 'order_type', 'quantity', 'price', 'direction', 'reason')
     
     def __init__(self, stock_code: str, order_type: str, quantity: int, 
                  price: Optional[float] = None, direction: str = "buy", 
                  timestamp: datetime = None):
-        super().__init__(
-            EventType.ORDER,
-            {
-                "stock_code": stock_code,
-                "order_type": order_type,
-                "quantity": quantity,
-                "price": price,
-                "direction": direction
-            },
-            timestamp or datetime.now()
-        )
+        self.event_type = EventType.ORDER
+        self._data = None
+        self._event_id = None
+        self.timestamp = timestamp or datetime.now()
         self.stock_code = stock_code
         self.order_type = order_type
         self.quantity = quantity
         self.price = price
         self.direction = direction
+        self.reason = None
+
+    def _build_data(self) -> Dict[str, Any]:
+        data = {
+            "stock_code": self.stock_code,
+            "order_type": self.order_type,
+            "quantity": self.quantity,
+            "price": self.price,
+            "direction": self.direction
+        }
+        if self.reason is not None:
+            data["reason"] = self.reason
+        return data
 
 
 class FillEvent(Event):
     """成交回报事件"""
+    __slots__ = ('stock_code', 'quantity', 'price', 'direction', 'commission')
     
     def __init__(self, stock_code: str, quantity: int, price: float, 
                  direction: str, commission: float = 0.0, timestamp: datetime = None):
-        super().__init__(
-            EventType.FILL,
-            {
-                "stock_code": stock_code,
-                "quantity": quantity,
-                "price": price,
-                "direction": direction,
-                "commission": commission
-            },
-            timestamp or datetime.now()
-        )
+        self.event_type = EventType.FILL
+        self._data = None
+        self._event_id = None
+        self.timestamp = timestamp or datetime.now()
         self.stock_code = stock_code
         self.quantity = quantity
         self.price = price
         self.direction = direction
         self.commission = commission
 
+    def _build_data(self) -> Dict[str, Any]:
+        return {
+            "stock_code": self.stock_code,
+            "quantity": self.quantity,
+            "price": self.price,
+            "direction": self.direction,
+            "commission": self.commission
+        }
+
 
 class SectorSelectionEvent(Event):
     """板块选择事件"""
+    __slots__ = ('selected_sectors', 'sector_scores')
     
     def __init__(self, selected_sectors: list, sector_scores: Dict[str, float], 
                  timestamp: datetime = None):
-        super().__init__(
-            EventType.SECTOR_SELECTION,
-            {
-                "selected_sectors": selected_sectors,
-                "sector_scores": sector_scores
-            },
-            timestamp or datetime.now()
-        )
+        self.event_type = EventType.SECTOR_SELECTION
+        self._data = None
+        self._event_id = None
+        self.timestamp = timestamp or datetime.now()
         self.selected_sectors = selected_sectors
         self.sector_scores = sector_scores
 
+    def _build_data(self) -> Dict[str, Any]:
+        return {
+            "selected_sectors": self.selected_sectors,
+            "sector_scores": self.sector_scores
+        }
+
 
 class StockSelectionEvent(Event):
     """个股选择事件"""
+    __slots__ = ('selected_stocks', 'stock_scores')
     
     def __init__(self, selected_stocks: list, stock_scores: Dict[str, float], 
                  timestamp: datetime = None):
-        super().__init__(
-            EventType.STOCK_SELECTION,
-            {
-                "selected_stocks": selected_stocks,
-                "stock_scores": stock_scores
-            },
-            timestamp or datetime.now()
-        )
+        self.event_type = EventType.STOCK_SELECTION
+        self._data = None
+        self._event_id = None
+        self.timestamp = timestamp or datetime.now()
         self.selected_stocks = selected_stocks
         self.stock_scores = stock_scores
+
+    def _build_data(self) -> Dict[str, Any]:
+        return {
+            "selected_stocks": self.selected_stocks,
+            "stock_scores": self.stock_scores
+        }
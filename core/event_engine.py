@@ -12,28 +12,258 @@
 - 异步事件处理
 - 事件优先级管理
 - 事件历史记录
+
+高吞吐设计：
+- 事件循环一次阻塞等待后，批量取出队列中已有的事件再逐个分发，减少唤醒和加锁次数
+- 事件历史使用定长 deque（环形缓冲），并按事件类型维护索引，写入 O(1)，按类型查询不再扫描全部历史
+- 逐事件的调试日志默认关闭（debug_logging=True 时开启）
+- 监听器列表写时复制，分发时无需加锁
+
+优先级与工作线程：
+- 事件队列按事件类型的优先级出队（数值越小越优先）：订单/成交/风险 > 账户/持仓 > 信号 > TICK > BAR > 板块/个股选择，
+  同一优先级内保持放入顺序
+- 耗时的监听器注册时可指定 workers，由独立的工作线程池执行，不阻塞事件循环；
+  同一只股票的事件总是交给同一个工作线程，保证按股票有序
+- get_queue_depths() 返回事件队列和各工作线程池的队列深度，get_listener_metrics() 返回每个监听器的调用次数、耗时和排队等待时间
+
+耗时剖析：
+- 剖析器（core.utils.profiling）开启时，监听器的统计会汇总到剖析报表，进程退出时导出
+- 开启采样时，每个监听器每 sample_every 次调用在 cProfile 下执行一次
 """
 
 import threading
 import queue
 import logging
-from typing import Dict, List, Callable, Any, Optional
+import time
+from collections import deque
+from itertools import count, islice
+from typing import Deque, Dict, List, Callable, Any, Optional
 from datetime import datetime
-from .event import Event, EventType
+from .event import Event, EventType, TickEventPool
+from .utils.profiling import CallbackProfiler, get_profiler
 
 logger = logging.getLogger(__name__)
 
 
+# 停止事件循环的哨兵（让阻塞等待立即返回）
+_STOP = object()
+
+# 事件类型的默认优先级（数值越小越优先）
+DEFAULT_EVENT_PRIORITIES: Dict[EventType, int] = {
+    EventType.ORDER: 0,
+    EventType.FILL: 0,
+    EventType.RISK: 0,
+    EventType.ACCOUNT: 1,
+    EventType.POSITION: 1,
+    EventType.SIGNAL: 2,
+    EventType.TICK: 3,
+    EventType.BAR: 4,
+    EventType.SECTOR_SELECTION: 5,
+    EventType.STOCK_SELECTION: 5,
+}
+
+# 未配置优先级的事件类型
+DEFAULT_PRIORITY = 3
+
+
+def event_symbol(event: Event) -> Optional[str]:
+    """事件对应的股票代码（工作线程按股票分配时使用），没有时返回 None"""
+    stock_code = getattr(event, 'stock_code', None)
+    if stock_code is not None:
+        return stock_code
+    data = event.data
+    if isinstance(data, dict):
+        return data.get('stock_code') or data.get('symbol')
+    return None
+
+
+class _ListenerEntry:
+    """已注册的监听器及其耗时统计"""
+
+    def __init__(self, event_type: EventType, callback: Callable, pool: Optional['_ListenerWorkerPool'] = None,
+                 profiler: Optional[CallbackProfiler] = None):
+        self.event_type = event_type
+        self.callback = callback
+        self.pool = pool
+        self.profiler = profiler
+        self.name = getattr(callback, '__qualname__', None) or repr(callback)
+        # 策略回调（BaseStrategy 子类的 on_bar 等）自身已接入剖析，这里不再采样，报表中也不重复计入
+        self.profiled = getattr(callback, '__profiled__', False)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def invoke(self, event: Event, enqueued_at: float = None) -> bool:
+        """调用监听器并记录耗时，返回是否成功"""
+        start = time.perf_counter()
+        ok = True
+        profiler = self.profiler
+        try:
+            if profiler is not None and profiler.enabled and not self.profiled \
+                    and profiler.should_sample(self.calls + 1):
+                profiler.run_sampled(self.callback, event)
+            else:
+                self.callback(event)
+        except Exception as e:
+            ok = False
+            logger.error(f"事件监听器错误: {self.name}: {e}")
+        elapsed = time.perf_counter() - start
+
+        if self.pool is None:
+            # 只在事件循环线程中调用，无需加锁
+            self._record(elapsed, ok, None)
+        else:
+            with self._lock:
+                self._record(elapsed, ok, start - enqueued_at)
+        return ok
+
+    def _record(self, elapsed: float, ok: bool, wait: Optional[float]):
+        self.calls += 1
+        self.total_seconds += elapsed
+        if elapsed > self.max_seconds:
+            self.max_seconds = elapsed
+        if not ok:
+            self.errors += 1
+        if wait is not None:
+            self.total_wait_seconds += wait
+            if wait > self.max_wait_seconds:
+                self.max_wait_seconds = wait
+
+    def metrics(self) -> Dict[str, Any]:
+        """调用次数、平均/最大耗时（毫秒）以及工作线程池的排队等待时间"""
+        with self._lock:
+            calls = self.calls
+            return {
+                'event_type': self.event_type.value,
+                'listener': self.name,
+                'workers': self.pool.workers if self.pool else 0,
+                'calls': calls,
+                'errors': self.errors,
+                'total_ms': round(self.total_seconds * 1000, 4),
+                'avg_ms': round(self.total_seconds / calls * 1000, 4) if calls else 0.0,
+                'max_ms': round(self.max_seconds * 1000, 4),
+                'avg_wait_ms': round(self.total_wait_seconds / calls * 1000, 4) if calls and self.pool else 0.0,
+                'max_wait_ms': round(self.max_wait_seconds * 1000, 4),
+                'queue_depth': self.pool.queue_depth() if self.pool else 0,
+                'profiled': self.profiled,
+            }
+
+
+class _ListenerWorkerPool:
+    """
+    单个监听器的工作线程池
+
+    每个工作线程有自己的队列，带股票代码的事件按代码固定分配给同一个线程（同一只股票按顺序处理），
+    不带股票代码的事件轮流分配。
+    """
+
+    def __init__(self, name: str, workers: int, on_error: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            name: 工作线程名称前缀
+            workers: 工作线程数量
+            on_error: 监听器调用失败时的回调（用于汇总到事件引擎的 listener_errors）
+        """
+        self.name = name
+        self.workers = workers
+        self.on_error = on_error
+        self._queues: List[queue.Queue] = [queue.Queue() for _ in range(workers)]
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._round_robin = count()
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i, q in enumerate(self._queues):
+                thread = threading.Thread(target=self._run, args=(q,), name=f"{self.name}-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, entry: _ListenerEntry, event: Event):
+        """按股票代码把事件分配给工作线程"""
+        self._ensure_started()
+        symbol = event_symbol(event)
+        if symbol is None:
+            index = next(self._round_robin) % self.workers
+        else:
+            index = hash(symbol) % self.workers
+        self._queues[index].put((entry, event, time.perf_counter()))
+
+    def _run(self, q: queue.Queue):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                break
+            entry, event, enqueued_at = item
+            if not entry.invoke(event, enqueued_at) and self.on_error is not None:
+                self.on_error()
+
+    def stop(self):
+        """处理完已提交的事件后停止工作线程"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for q in self._queues[:len(threads)]:
+            q.put(_STOP)
+        for thread in threads:
+            thread.join()
+
+    def queue_depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+
 class EventEngine:
     """事件驱动引擎"""
     
-    def __init__(self):
-        self._event_queue = queue.Queue()
-        self._listeners: Dict[EventType, List[Callable]] = {}
+    def __init__(self, max_history_size: int = 10000, batch_size: int = 256,
+                 debug_logging: bool = False, record_history: bool = True,
+                 priorities: Optional[Dict[EventType, int]] = None, tick_pool_size: int = 0,
+                 profiler: Optional[CallbackProfiler] = None, name: str = 'event_engine'):
+        """
+        Args:
+            max_history_size: 事件历史（以及每种事件类型的历史）最多保留的事件数量
+            batch_size: 事件循环每次最多批量取出的事件数量
+            debug_logging: 是否记录逐事件的调试日志（高频行情下开销明显）
+            record_history: 是否记录事件历史
+            priorities: 覆盖默认的事件类型优先级（数值越小越优先）
+            tick_pool_size: 大于 0 时 put_tick_event 复用该数量的 TickEvent 对象（见 TickEventPool，
+                            不能同时记录事件历史）
+            profiler: 耗时剖析器，默认使用进程内共享的剖析器（开启时汇总监听器统计、采样 cProfile）
+            name: 剖析报表中使用的引擎名称（与仍存在的引擎重名时追加序号，实际名称见 self.name）
+        """
+        if tick_pool_size > 0 and record_history:
+            raise ValueError("复用TICK事件对象时不能记录事件历史（record_history=False）")
+        self._event_queue = queue.PriorityQueue()
+        self._sequence = count()
+        self._priorities: Dict[EventType, int] = dict(DEFAULT_EVENT_PRIORITIES)
+        if priorities:
+            self._priorities.update(priorities)
+        self._listeners: Dict[EventType, List[_ListenerEntry]] = {}
+        self._listeners_lock = threading.Lock()
         self._running = False
         self._thread: Optional[threading.Thread] = None
-        self._event_history: List[Event] = []
-        self._max_history_size = 10000
+        self._max_history_size = max_history_size
+        self._event_history: Deque[Event] = deque(maxlen=max_history_size)
+        self._history_by_type: Dict[EventType, Deque[Event]] = {}
+        # 事件循环线程写入历史，其他线程读取：deque 在追加时被遍历会抛 RuntimeError
+        self._history_lock = threading.Lock()
+        self.batch_size = max(1, batch_size)
+        self.debug_logging = debug_logging
+        self.record_history = record_history
+        self._tick_pool = TickEventPool(tick_pool_size) if tick_pool_size > 0 else None
+        self.stats = {'events': 0, 'batches': 0, 'listener_errors': 0, 'max_queue_depth': 0}
+        # listener_errors 由事件循环线程和监听器工作线程共同累加
+        self._stats_lock = threading.Lock()
+        self.profiler = profiler or get_profiler()
+        # 弱引用注册，不延长引擎生命周期；每个引擎单独一个来源
+        self.name = self.profiler.add_source(name, self.get_listener_metrics)
         
     def start(self):
         """启动事件引擎"""
@@ -47,80 +277,164 @@ class EventEngine:
         logger.info("事件引擎已启动")
         
     def stop(self):
-        """停止事件引擎"""
+        """停止事件引擎（工作线程池处理完已提交的事件后停止）"""
         if not self._running:
             logger.warning("事件引擎未运行")
             return
             
         self._running = False
+        self._event_queue.put((-1, -1, _STOP))
         if self._thread:
             self._thread.join()
+        for pool in self._worker_pools():
+            pool.stop()
         logger.info("事件引擎已停止")
         
     def _run(self):
-        """事件循环"""
+        """事件循环：阻塞等待第一个事件，再按优先级批量取出队列中已有的事件"""
         while self._running:
             try:
-                event = self._event_queue.get(timeout=1.0)
-                self._dispatch_event(event)
+                batch = [self._event_queue.get(timeout=1.0)]
             except queue.Empty:
                 continue
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._event_queue.get_nowait())
+            except queue.Empty:
+                pass
+            
+            self.stats['batches'] += 1
+            depth = len(batch) + self._event_queue.qsize()
+            if depth > self.stats['max_queue_depth']:
+                self.stats['max_queue_depth'] = depth
+            for _, _, event in batch:
+                if event is _STOP:
+                    continue
+                try:
+                    self._dispatch_event(event)
+                except Exception as e:
+                    logger.error(f"事件处理错误: {e}")
+                
+    def process_pending(self, max_events: int = None) -> int:
+        """
+        在调用线程中同步处理队列中的事件，直到队列为空（引擎未启动时使用，如回放和测试）
+        
+        处理过程中监听器新放入的事件（例如 TICK 触发的 ORDER）也会在本次调用中处理。
+        
+        Args:
+            max_events: 最多处理的事件数量，None 表示不限
+        
+        Returns:
+            int: 处理的事件数量
+        """
+        if self._running:
+            raise RuntimeError("事件引擎运行中，不能同步处理事件")
+        processed = 0
+        while max_events is None or processed < max_events:
+            try:
+                _, _, event = self._event_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is _STOP:
+                continue
+            try:
+                self._dispatch_event(event)
             except Exception as e:
                 logger.error(f"事件处理错误: {e}")
-                
+            processed += 1
+        return processed
+        
     def _dispatch_event(self, event: Event):
         """分发事件"""
+        self.stats['events'] += 1
+        
         # 记录事件历史
-        self._add_to_history(event)
+        if self.record_history:
+            self._add_to_history(event)
         
-        # 获取事件监听器
-        listeners = self._listeners.get(event.event_type, [])
+        # 获取事件监听器（写时复制的列表，分发期间注册/注销不影响本次分发）
+        listeners = self._listeners.get(event.event_type)
         
         if not listeners:
-            logger.debug(f"没有监听器处理事件: {event.event_type.value}")
+            if self.debug_logging:
+                logger.debug(f"没有监听器处理事件: {event.event_type.value}")
             return
             
-        # 分发事件给所有监听器
-        for listener in listeners:
-            try:
-                listener(event)
-            except Exception as e:
-                logger.error(f"事件监听器错误: {e}")
+        # 分发事件给所有监听器（使用工作线程池的监听器只提交，不等待）
+        for entry in listeners:
+            if entry.pool is not None:
+                entry.pool.submit(entry, event)
+            elif not entry.invoke(event):
+                self._count_listener_error()
+
+    def _count_listener_error(self):
+        with self._stats_lock:
+            self.stats['listener_errors'] += 1
                 
     def _add_to_history(self, event: Event):
-        """添加事件到历史记录"""
-        self._event_history.append(event)
-        
-        # 限制历史记录大小
-        if len(self._event_history) > self._max_history_size:
-            self._event_history = self._event_history[-self._max_history_size:]
+        """添加事件到历史记录（定长 deque，超出时自动淘汰最旧的事件）"""
+        with self._history_lock:
+            self._event_history.append(event)
+            
+            by_type = self._history_by_type.get(event.event_type)
+            if by_type is None:
+                by_type = self._history_by_type[event.event_type] = deque(maxlen=self._max_history_size)
+            by_type.append(event)
             
-    def register_listener(self, event_type: EventType, listener: Callable):
-        """注册事件监听器"""
-        if event_type not in self._listeners:
-            self._listeners[event_type] = []
-        self._listeners[event_type].append(listener)
-        logger.info(f"注册事件监听器: {event_type.value}")
+    def register_listener(self, event_type: EventType, listener: Callable, workers: int = 0):
+        """
+        注册事件监听器
+
+        Args:
+            event_type: 事件类型
+            listener: 监听函数
+            workers: 大于 0 时由该数量的工作线程执行监听函数（同一只股票的事件按顺序处理），
+                     默认在事件循环线程中直接调用
+        """
+        name = getattr(listener, '__qualname__', None) or repr(listener)
+        pool = _ListenerWorkerPool(name, workers, self._count_listener_error) if workers > 0 else None
+        entry = _ListenerEntry(event_type, listener, pool, self.profiler)
+        with self._listeners_lock:
+            self._listeners[event_type] = self._listeners.get(event_type, []) + [entry]
+        logger.info(f"注册事件监听器: {event_type.value}" + (f" (工作线程 {workers})" if workers > 0 else ""))
         
     def unregister_listener(self, event_type: EventType, listener: Callable):
         """注销事件监听器"""
-        if event_type in self._listeners:
-            try:
-                self._listeners[event_type].remove(listener)
-                logger.info(f"注销事件监听器: {event_type.value}")
-            except ValueError:
+        with self._listeners_lock:
+            listeners = list(self._listeners.get(event_type, []))
+            entry = next((e for e in listeners if e.callback == listener), None)
+            if entry is None:
                 logger.warning(f"监听器未找到: {event_type.value}")
+                return
+            listeners.remove(entry)
+            self._listeners[event_type] = listeners
+        if entry.pool is not None:
+            entry.pool.stop()
+        logger.info(f"注销事件监听器: {event_type.value}")
+
+    def set_event_priority(self, event_type: EventType, priority: int):
+        """设置事件类型的优先级（数值越小越优先）"""
+        self._priorities[event_type] = priority
+
+    def get_event_priority(self, event_type: EventType) -> int:
+        """获取事件类型的优先级"""
+        return self._priorities.get(event_type, DEFAULT_PRIORITY)
                 
     def put_event(self, event: Event):
         """放入事件"""
-        self._event_queue.put(event)
-        logger.debug(f"放入事件: {event.event_type.value}")
+        priority = self._priorities.get(event.event_type, DEFAULT_PRIORITY)
+        self._event_queue.put((priority, next(self._sequence), event))
+        if self.debug_logging:
+            logger.debug(f"放入事件: {event.event_type.value}")
         
     def put_tick_event(self, symbol: str, price: float, volume: int, 
                       timestamp: datetime = None):
         """放入TICK事件"""
-        from .event import TickEvent
-        event = TickEvent(symbol, price, volume, timestamp)
+        if self._tick_pool is not None:
+            event = self._tick_pool.acquire(symbol, price, volume, timestamp)
+        else:
+            from .event import TickEvent
+            event = TickEvent(symbol, price, volume, timestamp)
         self.put_event(event)
         
     def put_bar_event(self, symbol: str, bar_data: Dict[str, Any], 
@@ -171,12 +485,14 @@ class EventEngine:
         
     def get_event_history(self, event_type: EventType = None, 
                          limit: int = 100) -> List[Event]:
-        """获取事件历史"""
-        if event_type is None:
-            return self._event_history[-limit:]
-        else:
-            filtered_events = [e for e in self._event_history if e.event_type == event_type]
-            return filtered_events[-limit:]
+        """获取事件历史（最近 limit 个，按时间升序）"""
+        with self._history_lock:
+            history = self._event_history if event_type is None else self._history_by_type.get(event_type, ())
+            if limit is None:
+                return list(history)
+            events = list(islice(reversed(history), limit))
+        events.reverse()
+        return events
             
     def get_listener_count(self, event_type: EventType) -> int:
         """获取指定事件类型的监听器数量"""
@@ -189,3 +505,20 @@ class EventEngine:
     def get_queue_size(self) -> int:
         """获取事件队列大小"""
         return self._event_queue.qsize()
+
+    def _worker_pools(self) -> List[_ListenerWorkerPool]:
+        return [entry.pool for entries in list(self._listeners.values()) for entry in entries
+                if entry.pool is not None]
+
+    def get_queue_depths(self) -> Dict[str, int]:
+        """事件队列和各监听器工作线程池的当前队列深度"""
+        depths = {'events': self._event_queue.qsize()}
+        for entries in list(self._listeners.values()):
+            for entry in entries:
+                if entry.pool is not None:
+                    depths[f"{entry.event_type.value}:{entry.name}"] = entry.pool.queue_depth()
+        return depths
+
+    def get_listener_metrics(self) -> List[Dict[str, Any]]:
+        """每个监听器的调用次数、错误数、平均/最大耗时和排队等待时间（毫秒）"""
+        return [entry.metrics() for entries in list(self._listeners.values()) for entry in entries]
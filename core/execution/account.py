@@ -13,26 +13,44 @@ from datetime import datetime
 import logging
 import os
 import sqlite3
+import time
 import datetime as dt
 
+from core.execution.order_manager import Order
+
 logger = logging.getLogger(__name__)
 
 
 
 
 class Account:
-    def __init__(self, starting_cash, db_path=None):
+    def __init__(self, starting_cash, db_path=None, price_service=None, checkpoint_interval=60.0):
         """
         初始化账户，使用SQLite数据库。
 
         参数:
         starting_cash (float): 初始投入资金
         db_path (str): 数据库文件路径
+        price_service (PriceSnapshotService): 价格快照服务，默认使用进程内共享的快照
+        checkpoint_interval (float): 内存持仓账本与数据库同步的检查点间隔（秒）
         """
         self.starting_cash = starting_cash
         self.available_cash = starting_cash
         self.positions = {}
         
+        # 内存持仓账本：启动时全量重放一次，之后每笔交易增量应用
+        self.checkpoint_interval = checkpoint_interval
+        self._last_trade_id = 0          # 已应用到账本的最大交易记录id
+        self._last_trade_time = None     # 已应用到账本的最晚交易时间
+        self._ledger_date = None         # 账本的可卖数量对应的日期
+        self._last_checkpoint = 0.0      # 上一次与数据库同步的时间（monotonic）
+        
+        # 价格快照：所有账户方法都从快照读取价格，避免每次重构持仓都逐只请求网络
+        if price_service is None:
+            from data_management.price_snapshot import get_price_snapshot_service
+            price_service = get_price_snapshot_service()
+        self.price_service = price_service
+        
         # 设置数据库路径 - 适配v2项目结构
         if db_path is None:
             # 使用v2项目的数据库路径
@@ -114,22 +132,26 @@ class Account:
                 self.closeable_amount = 0
                 self.today_bought = 0
 
-    def load_trades(self):
+    def load_trades(self, after_id=0):
         """
-        从SQLite数据库加载所有交易记录
+        从SQLite数据库加载交易记录
+
+        参数:
+        after_id (int): 只加载id大于该值的交易记录（默认加载全部）
 
         返回:
-        list of dict: 所有交易记录
+        list of dict: 交易记录
         """
         trades = []
         
         try:
             cursor = self.conn.cursor()
             cursor.execute(f'''
-                SELECT trade_code, trade_amount, trade_price, commission, trade_time 
+                SELECT id, trade_code, trade_amount, trade_price, commission, trade_time 
                 FROM {self.table_name} 
+                WHERE id > ?
                 ORDER BY trade_time
-            ''')
+            ''', (after_id,))
             
             rows = cursor.fetchall()
             
@@ -137,11 +159,12 @@ class Account:
                 try:
                     # 转换数据类型
                     processed_row = {
-                        'trade_code': str(row[0]).strip(),
-                        'trade_amount': int(row[1]),
-                        'trade_price': float(row[2]),
-                        'commission': float(row[3]),
-                        'trade_time': dt.datetime.strptime(row[4], '%Y-%m-%d %H:%M:%S')
+                        'id': int(row[0]),
+                        'trade_code': str(row[1]).strip(),
+                        'trade_amount': int(row[2]),
+                        'trade_price': float(row[3]),
+                        'commission': float(row[4]),
+                        'trade_time': dt.datetime.strptime(row[5], '%Y-%m-%d %H:%M:%S')
                     }
                     trades.append(processed_row)
                     
@@ -162,7 +185,8 @@ class Account:
             with open('trading_errors.log', 'a', encoding='utf-8') as log_file:
                 log_file.write(f"{dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - 数据库读取错误: {e}\n\n")
         
-        print(f"✅ 成功加载 {len(trades)} 条交易记录")
+        if after_id == 0:
+            print(f"✅ 成功加载 {len(trades)} 条交易记录")
         return trades
 
     def save_trade(self, trade):
@@ -333,60 +357,143 @@ class Account:
 
     def get_current_price(self, trade_code):
         """
-        获取当前价格的函数，调用data_processor的get_latest_price
+        获取当前价格的函数，从价格快照读取（快照过期时才调用data_processor的get_latest_price）
 
         返回:
         float: 实时价格
         """
-        # 导入data_processor的get_latest_price函数
-        import sys
-        import os
-        # 添加项目根目录到Python路径
-        current_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        if current_dir not in sys.path:
-            sys.path.append(current_dir)
-        
-        from data_management.data_processor import get_latest_price
-        return get_latest_price(trade_code)
+        return self.price_service.get_price(trade_code)
 
-    def reconstruct_positions(self): 
+    def _apply_trade(self, positions, trade):
         """
-        根据交易记录重构当前持仓并计算可用资金
+        把一笔交易应用到持仓字典（O(1)），清仓的股票从字典中移除
+
+        返回:
+        float: 可用资金的变动
         """
-        self.positions = {}
-        self.available_cash = self.starting_cash  # 重置可用资金
+        trade_code = trade['trade_code']
+        if trade_code not in positions:
+            positions[trade_code] = self.Position(trade_code)
+        position = positions[trade_code]
+        position.update(trade['trade_amount'], trade['trade_price'], trade['trade_time'])
+        if position.total_amount <= 0:
+            del positions[trade_code]
+        return -(trade['trade_amount'] * trade['trade_price'] + trade['commission'])
+
+    def _replay(self, trades):
+        """按交易时间顺序全量重放交易记录，返回 (持仓字典, 可用资金)"""
+        positions = {}
+        cash = self.starting_cash
+        for trade in sorted(trades, key=lambda x: x['trade_time']):
+            cash += self._apply_trade(positions, trade)
+        return positions, cash
 
+    def reconstruct_positions(self): 
+        """
+        根据交易记录全量重放重构当前持仓并计算可用资金
+        只在启动或显式重新同步（resync_positions）时调用，日常查询使用内存账本
+        """
         trades = self.load_trades()
-        #print(f"加载到的交易记录: {trades}")  # 调试输出
-
-        for trade in sorted(trades, key=lambda x: x['trade_time']):
-            trade_code = trade['trade_code']
-            amount = trade['trade_amount']
-            trade_price = trade['trade_price']
-            trade_time = trade['trade_time']
+        self.positions, self.available_cash = self._replay(trades)
+        self._last_trade_id = max((t['id'] for t in trades), default=0)
+        self._last_trade_time = max((t['trade_time'] for t in trades), default=None)
+        self._ledger_date = dt.date.today()
+        self._last_checkpoint = time.monotonic()
 
-            if trade_code not in self.positions:
-                self.positions[trade_code] = self.Position(trade_code)
+        self.refresh_prices()
+        print(f"当前持仓: {self.positions.keys()}")  # 调试输出
 
-            # 更新可用资金
-            self.available_cash -= (amount * trade_price + trade['commission'])
+    def resync_positions(self):
+        """显式从数据库全量重建持仓账本"""
+        self.reconstruct_positions()
 
-            self.positions[trade_code].update(amount, trade_price, trade_time)
+    def sync_ledger(self):
+        """
+        检查点：把数据库中新增的交易记录（本账户或其他进程写入的）增量应用到内存账本
+        新增记录的交易时间早于账本中最晚的交易时间（补录）时，回退为全量重建
 
-        # 使用 list(self.positions.keys()) 创建键的副本，以避免在迭代时修改字典
-        for trade_code in list(self.positions.keys()):
+        返回:
+        int: 新增的交易记录数
+        """
+        new_trades = self.load_trades(after_id=self._last_trade_id)
+        if new_trades and self._last_trade_time is not None \
+                and min(t['trade_time'] for t in new_trades) < self._last_trade_time:
+            print("⚠️ 发现早于持仓账本的补录交易，全量重建持仓")
+            self.reconstruct_positions()
+            return len(new_trades)
+
+        for trade in new_trades:
+            self.available_cash += self._apply_trade(self.positions, trade)
+            self._last_trade_id = max(self._last_trade_id, trade['id'])
+            self._last_trade_time = trade['trade_time']
+        self._last_checkpoint = time.monotonic()
+        return len(new_trades)
+
+    def _roll_day(self):
+        """跨交易日时，昨日买入的股份变为可卖"""
+        today = dt.date.today()
+        if self._ledger_date != today:
+            for position in self.positions.values():
+                position.today_bought = 0
+                position.closeable_amount = position.total_amount
+            self._ledger_date = today
+
+    def refresh_prices(self):
+        """从价格快照更新所有持仓的当前价格和市值"""
+        # 所有持仓的价格一次批量获取（快照有效期内不会重复请求网络）
+        held_codes = list(self.positions.keys())
+        prices = self.price_service.get_prices(held_codes) if held_codes else {}
+
+        for trade_code in held_codes:
             position = self.positions[trade_code]
-            if position.total_amount > 0:
-                position.current_price = self.get_current_price(trade_code)
-                # 处理current_price为None的情况
-                if position.current_price is None:
-                    print(f"警告: 无法获取 {trade_code} 的当前价格，使用最后交易价格")
-                    position.current_price = position.trade_price if position.trade_price > 0 else 0.0
-                position.value = position.total_amount * position.current_price
-            else:
-                del self.positions[trade_code]
+            position.current_price = prices.get(trade_code)
+            # 处理current_price为None的情况
+            if position.current_price is None:
+                print(f"警告: 无法获取 {trade_code} 的当前价格，使用最后交易价格")
+                position.current_price = position.trade_price if position.trade_price > 0 else 0.0
+            position.value = position.total_amount * position.current_price
+
+    def refresh_positions(self):
+        """
+        查询前刷新持仓：跨日滚动可卖数量，到达检查点间隔时同步数据库新增交易，并从价格快照更新市值
+        """
+        self._roll_day()
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.sync_ledger()
+        self.refresh_prices()
 
-        print(f"当前持仓: {self.positions.keys()}")  # 调试输出
+    def verify_ledger(self, repair=False):
+        """
+        一致性检查：全量重放数据库中的交易记录，与内存账本逐项比较
+
+        参数:
+        repair (bool): 不一致时是否用数据库重建账本
+
+        返回:
+        list of str: 不一致项的描述，一致时为空列表
+        """
+        expected, expected_cash = self._replay(self.load_trades())
+        issues = []
+
+        if abs(expected_cash - self.available_cash) > 0.01:
+            issues.append(f"可用资金: 账本 {self.available_cash:.2f}, 数据库 {expected_cash:.2f}")
+        for trade_code in sorted(set(expected) | set(self.positions)):
+            ledger_pos = self.positions.get(trade_code)
+            db_pos = expected.get(trade_code)
+            if ledger_pos is None or db_pos is None:
+                issues.append(f"{trade_code}: 账本{'缺少' if ledger_pos is None else '多出'}该持仓")
+                continue
+            for field in ('total_amount', 'closeable_amount', 'today_bought'):
+                if getattr(ledger_pos, field) != getattr(db_pos, field):
+                    issues.append(f"{trade_code}.{field}: 账本 {getattr(ledger_pos, field)}, 数据库 {getattr(db_pos, field)}")
+            if abs(ledger_pos.total_cost - db_pos.total_cost) > 0.01:
+                issues.append(f"{trade_code}.total_cost: 账本 {ledger_pos.total_cost:.2f}, 数据库 {db_pos.total_cost:.2f}")
+
+        if issues:
+            print(f"⚠️ 持仓账本与数据库不一致: {len(issues)} 项")
+            if repair:
+                self.reconstruct_positions()
+        return issues
 
     def update_position(self, trade_code, amount, trade_price, trade_time=None):
         """
@@ -412,15 +519,17 @@ class Account:
             'trade_time': trade_time
         }
 
-        self.save_trade(trade)
-
-        # 更新持仓信息
-        if trade_code not in self.positions:
-            self.positions[trade_code] = self.Position(trade_code)
-        self.positions[trade_code].update(amount, trade_price, trade_time)
+        if not self.save_trade(trade):
+            print(f"❌ {trade_code} 交易记录保存失败，持仓未更新")
+            return None
 
-        # 更新可用资金
-        self.available_cash -= (amount * trade_price + 3)  # 3是固定手续费
+        # 把数据库中新增的交易（本笔及其他进程写入的）增量应用到内存账本，同时更新可用资金
+        self.sync_ledger()
+        if trade_code in self.positions:
+            position = self.positions[trade_code]
+            if not position.current_price:
+                position.current_price = trade_price
+                position.value = position.total_amount * trade_price
 
         # 创建并返回订单对象
         direction = 'buy' if amount > 0 else 'sell'
@@ -452,8 +561,8 @@ class Account:
         返回:
         Order: 创建的订单对象，如果无法执行则返回 None
         """
-        # 首先更新持仓情况
-        self.reconstruct_positions()
+        # 首先更新持仓情况（内存账本，不再全量重放）
+        self.refresh_positions()
 
         # 获取可卖出数量
         closeable_amount = self.get_closeable_amount(trade_code)
@@ -488,8 +597,8 @@ class Account:
         返回:
         Order or None: 创建的订单对象，如果无需调整，则返回 None
         """
-        # 重新构建持仓以确保数据最新
-        self.reconstruct_positions()
+        # 刷新持仓以确保数据最新
+        self.refresh_positions()
 
         current_amount = self.positions[trade_code].total_amount if trade_code in self.positions else 0
         delta = target_amount - current_amount
@@ -522,8 +631,8 @@ class Account:
         显示当前持仓的详细情况，包括精确的盈亏分析。
         这是 display_positions 的增强版本。
         """
-        # 首先，必须重构持仓以获取最新的成本和市价信息
-        self.reconstruct_positions()
+        # 首先，刷新持仓以获取最新的成本和市价信息
+        self.refresh_positions()
         
         print("\n" + "="*60)
         print("当前持仓详情 (含盈亏分析)")
@@ -532,7 +641,7 @@ class Account:
         if not self.positions:
             print("当前无任何持仓。")
             # 即使没有持仓，也显示账户总览
-            total_equity = self.get_total_equity() # get_total_equity 会再次调用 reconstruct_positions, 安全但略有冗余
+            total_equity = self.get_total_equity()
             print(f"可用资金: {self.available_cash:,.2f} 元")
             print(f"账户总权益: {total_equity:,.2f} 元")
             print("="*60)
@@ -616,10 +725,8 @@ class Account:
               }
         """
         # 确保持仓数据是基于最新价格的
-        # 注意：为了性能，如果在一个循环中对多只股票调用此函数，
-        # 最好在循环外先调用一次 reconstruct_positions()。
-        # 但为了接口的独立性和安全性，这里保留了调用。
-        self.reconstruct_positions()
+        # 持仓来自内存账本，价格来自价格快照，循环中对多只股票调用也不会重复读库或请求网络
+        self.refresh_positions()
 
         position = self.positions.get(stock_code)
 
@@ -741,7 +848,7 @@ class Account:
         获取账户总权益（可用资金 + 持仓市值），优化后版本
         """
         # 1. 确保所有状态是最新
-        self.reconstruct_positions()
+        self.refresh_positions()
 
         # 2. 直接使用重构后的持仓市值进行加总
         total_position_value = sum(pos.value for pos in self.positions.values())
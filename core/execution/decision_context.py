@@ -0,0 +1,184 @@
+"""
+买入决策上下文
+
+负责：
+1. 每次买入分析开始时一次性批量加载决策所需的数据：
+   - 各板块最新一期的 daily_selections（一次查询）
+   - 板块-股票归属关系（一次查询，用于计算板块已用额度）
+   - CX长线持仓记录（一次查询）
+   - 账户总权益快照
+   - 板块配置参数（配置文件未修改时不重新导入）
+2. 同一次分析中所有板块共用这份上下文，ATR波动率按股票缓存，跨板块不重复计算
+
+portfolio_manager 中的函数接收 context 参数时从上下文读取，不再逐板块、逐股票查询数据库。
+"""
+
+import importlib
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SELECTION_COLUMNS = ['stock_code', 'name', 'is_1bzl', '总得分', '技术得分', '主力得分', '板块得分', '低BIAS得分']
+
+_config_cache = {'module': None, 'mtime': None}
+
+
+def load_pool_configs(module_name: str = 'config_select_position_100w') -> Dict[str, dict]:
+    """
+    加载板块配置参数（CSV_POOLS_CONFIG）
+
+    配置文件未修改时复用已导入的模块，修改后自动重新加载，保持盘中修改配置即时生效
+    """
+    module = _config_cache['module']
+    if module is None or module.__name__ != module_name:
+        module = importlib.import_module(module_name)
+        _config_cache['module'] = module
+        _config_cache['mtime'] = os.path.getmtime(module.__file__)
+    else:
+        mtime = os.path.getmtime(module.__file__)
+        if mtime != _config_cache['mtime']:
+            module = importlib.reload(module)
+            _config_cache['module'] = module
+            _config_cache['mtime'] = mtime
+            logger.info(f"配置文件已修改，重新加载: {module_name}")
+    return dict(module.CSV_POOLS_CONFIG)
+
+
+class DecisionContext:
+    """一次买入分析中所有板块共用的决策数据"""
+
+    def __init__(self, account, db_path: str, end_date: str = None,
+                 pool_configs: Dict[str, dict] = None,
+                 volatility_func: Callable[[str, str], float] = None):
+        """
+        Args:
+            account: 账户对象
+            db_path: 数据库路径
+            end_date: 分析日期（用于ATR计算），默认今天
+            pool_configs: 板块配置参数，默认不加载（调用 load 时从配置文件加载）
+            volatility_func: 单只股票的ATR波动率函数 (stock_code, date) -> float
+        """
+        self.account = account
+        self.db_path = db_path
+        self.end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+        self.pool_configs = pool_configs or {}
+        self.volatility_func = volatility_func
+
+        self.pool_latest_dates: Dict[str, str] = {}
+        self.selections = pd.DataFrame(columns=['pool_name', 'trade_date'] + SELECTION_COLUMNS)
+        self.pool_members: Dict[str, Set[str]] = {}
+        self.cx_holdings: Dict[str, dict] = {}
+        self.total_equity: float = 0.0
+        self.volatility: Dict[str, float] = {}
+        self._pool_frames: Dict[str, pd.DataFrame] = {}
+
+    @classmethod
+    def load(cls, account, db_path: str, end_date: str = None, pool_configs: Dict[str, dict] = None,
+             volatility_func: Callable[[str, str], float] = None) -> 'DecisionContext':
+        """创建上下文并批量加载所有数据"""
+        context = cls(account, db_path, end_date,
+                      pool_configs if pool_configs is not None else load_pool_configs(),
+                      volatility_func)
+        conn = sqlite3.connect(db_path)
+        try:
+            context._load_selections(conn)
+            context._load_pool_members(conn)
+            context._load_cx_holdings(conn)
+        finally:
+            conn.close()
+        context.total_equity = account.get_total_equity()
+        logger.info(f"决策上下文加载完成: {len(context.pool_latest_dates)} 个板块, "
+                    f"{len(context.selections)} 条候选股, {len(context.cx_holdings)} 只CX持仓")
+        return context
+
+    def _load_selections(self, conn):
+        """各板块最新一期的候选股（一次查询）"""
+        columns = ', '.join(f"s.{c}" for c in SELECTION_COLUMNS)
+        query = f"""
+            SELECT s.pool_name, s.trade_date, {columns}
+            FROM daily_selections s
+            JOIN (
+                SELECT pool_name, MAX(trade_date) AS latest_date
+                FROM daily_selections
+                GROUP BY pool_name
+            ) latest ON s.pool_name = latest.pool_name AND s.trade_date = latest.latest_date
+            ORDER BY s.pool_name
+        """
+        df = pd.read_sql_query(query, conn)
+        df['stock_code'] = df['stock_code'].astype(str).str.zfill(6)
+        self.selections = df
+        self.pool_latest_dates = df.groupby('pool_name')['trade_date'].first().to_dict()
+        self._pool_frames = {pool: frame[SELECTION_COLUMNS].reset_index(drop=True)
+                             for pool, frame in df.groupby('pool_name')}
+
+    def _load_pool_members(self, conn):
+        """历史上出现在各板块中的股票（一次查询）"""
+        df = pd.read_sql_query("SELECT DISTINCT pool_name, stock_code FROM daily_selections", conn)
+        df['stock_code'] = df['stock_code'].astype(str).str.zfill(6)
+        self.pool_members = {pool: set(frame['stock_code']) for pool, frame in df.groupby('pool_name')}
+
+    def _load_cx_holdings(self, conn):
+        """CX长线持仓记录（一次查询，表不存在时为空）"""
+        try:
+            df = pd.read_sql_query("""
+                SELECT stock_code, stock_name, source_pool, buy_date, buy_price, buy_quantity
+                FROM cx_strategy_holdings
+            """, conn)
+        except Exception as e:
+            logger.warning(f"读取CX持仓记录失败: {e}")
+            return
+        df['stock_code'] = df['stock_code'].astype(str).str.zfill(6)
+        self.cx_holdings = {row['stock_code']: row for row in df.to_dict('records')}
+
+    @property
+    def pool_names(self) -> List[str]:
+        return sorted(self.pool_latest_dates)
+
+    def get_pool_config(self, pool_name: str) -> Optional[dict]:
+        return self.pool_configs.get(pool_name)
+
+    def pool_selection(self, pool_name: str, trade_date: str = None) -> pd.DataFrame:
+        """
+        板块候选股（最新一期），返回副本
+
+        trade_date 与上下文中的最新日期不一致时返回空表（调用方应回退到直接查询）
+        """
+        if trade_date is not None and self.pool_latest_dates.get(pool_name) != trade_date:
+            return pd.DataFrame(columns=SELECTION_COLUMNS)
+        frame = self._pool_frames.get(pool_name)
+        if frame is None:
+            return pd.DataFrame(columns=SELECTION_COLUMNS)
+        return frame.copy()
+
+    def has_selection(self, pool_name: str, trade_date: str) -> bool:
+        return self.pool_latest_dates.get(pool_name) == trade_date
+
+    def is_pool_member(self, pool_name: str, stock_code: str) -> bool:
+        return stock_code in self.pool_members.get(pool_name, ())
+
+    def get_volatilities(self, stock_codes: List[str], current_date: str = None) -> Dict[str, float]:
+        """
+        一批股票的ATR波动率（同一次分析中每只股票只计算一次）
+
+        未指定 volatility_func 时，缺失的股票合并为一次批量计算（见 core.execution.volatility）
+        """
+        current_date = current_date or self.end_date
+        missing = [code for code in dict.fromkeys(stock_codes) if code not in self.volatility]
+        if missing:
+            if self.volatility_func is None:
+                from core.execution.volatility import get_volatility_service
+                self.volatility.update(get_volatility_service().get_volatilities(missing, current_date))
+            else:
+                for code in missing:
+                    self.volatility[code] = self.volatility_func(code, current_date)
+        return {code: self.volatility[code] for code in stock_codes}
+
+    def get_volatility(self, stock_code: str, current_date: str = None) -> float:
+        """单只股票的ATR波动率"""
+        return self.get_volatilities([stock_code], current_date)[stock_code]
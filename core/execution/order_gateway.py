@@ -0,0 +1,225 @@
+"""
+QMT 订单网关（Redis Stream）
+
+负责：
+1. 复用连接池中的持久连接向 QMT 发送订单，不再每单新建/断开连接
+2. 多个订单（调仓）通过 pipeline 一次往返批量 XADD
+3. 每个订单带唯一 order_id，读取 QMT 消费端写入回执流的确认消息，跟踪订单状态
+4. 等待确认使用 XREAD 阻塞读取，不再固定 sleep
+
+消息格式：
+- 订单流（默认 myredis）：strategy, action, stock, amount, order_id, sent_at（值均为字符串）
+- 回执流（默认 myredis:ack）：order_id, status（accepted/filled/rejected 等）, message（可选）
+"""
+
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OrderTicket:
+    """已发送订单的跟踪记录"""
+    order_id: str
+    action: str
+    stock: str
+    amount: int
+    message_id: str = ""
+    sent_at: float = 0.0
+    status: str = "sent"
+    acked_at: Optional[float] = None
+    ack_message: str = ""
+
+    @property
+    def acked(self) -> bool:
+        return self.status != "sent"
+
+
+class RedisOrderGateway:
+    """基于 Redis Stream 的 QMT 订单网关"""
+
+    def __init__(self, client=None, host: str = '127.0.0.1', port: int = 6379, db: int = 0,
+                 stream: str = 'myredis', ack_stream: str = 'myredis:ack',
+                 strategy: str = 'shipan', maxlen: Optional[int] = None):
+        """
+        Args:
+            client: Redis 客户端（测试时可传入内存中的替代实现），默认按 host/port/db 创建连接池
+            stream: 订单流名称（QMT 消费端读取）
+            ack_stream: 回执流名称（QMT 消费端写入）
+            strategy: 订单中的策略标识
+            maxlen: 订单流的近似最大长度，None 表示不裁剪
+        """
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise ImportError("需要安装 redis 才能向QMT发送订单: pip install redis")
+            pool = redis.ConnectionPool(host=host, port=port, db=db, decode_responses=True)
+            client = redis.Redis(connection_pool=pool)
+
+        self.client = client
+        self.stream = stream
+        self.ack_stream = ack_stream
+        self.strategy = strategy
+        self.maxlen = maxlen
+
+        self.tickets: Dict[str, OrderTicket] = {}
+        self._last_ack_id = '0-0'
+        self._lock = threading.Lock()
+        self.stats = {'orders': 0, 'batches': 0, 'acks': 0, 'rejected': 0, 'publish_seconds': 0.0}
+
+        # 只处理建立网关之后的回执
+        self._init_ack_cursor()
+
+    def _init_ack_cursor(self):
+        try:
+            last = self.client.xrevrange(self.ack_stream, count=1)
+            self._last_ack_id = last[0][0] if last else '0-0'
+        except Exception as e:
+            logger.warning(f"读取回执流位置失败，从头读取: {e}")
+            self._last_ack_id = '0-0'
+
+    @staticmethod
+    def to_qmt_code(stock: str) -> str:
+        """6位股票代码转为QMT格式（600000 -> 600000.SH）"""
+        if '.' in stock:
+            return stock
+        return stock + ('.SH' if stock.startswith('6') else '.SZ' if stock.startswith(('0', '3')) else '.BJ')
+
+    def _build(self, action: str, stock: str, amount: int) -> OrderTicket:
+        if action not in ('buy', 'sell'):
+            raise ValueError(f"未知的交易方向: {action}")
+        return OrderTicket(order_id=uuid.uuid4().hex, action=action, stock=stock, amount=int(amount))
+
+    def _fields(self, ticket: OrderTicket) -> Dict[str, str]:
+        return {
+            'strategy': self.strategy,
+            'action': ticket.action,
+            'stock': self.to_qmt_code(ticket.stock),
+            'amount': str(ticket.amount),
+            'order_id': ticket.order_id,
+            'sent_at': datetime.fromtimestamp(ticket.sent_at).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    def publish_orders(self, orders: Iterable[Union[tuple, dict]]) -> List[str]:
+        """
+        批量发送订单（一次 pipeline 往返）
+
+        Args:
+            orders: (action, stock, amount) 元组或 {'action', 'stock', 'amount'} 字典
+
+        Returns:
+            List[str]: 各订单的 order_id（与输入顺序一致）
+        """
+        tickets = []
+        for order in orders:
+            if isinstance(order, dict):
+                tickets.append(self._build(order['action'], order['stock'], order['amount']))
+            else:
+                tickets.append(self._build(*order))
+        if not tickets:
+            return []
+
+        start = time.perf_counter()
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for ticket in tickets:
+            ticket.sent_at = now
+            if self.maxlen:
+                pipe.xadd(self.stream, self._fields(ticket), maxlen=self.maxlen, approximate=True)
+            else:
+                pipe.xadd(self.stream, self._fields(ticket))
+        message_ids = pipe.execute()
+
+        with self._lock:
+            for ticket, message_id in zip(tickets, message_ids):
+                ticket.message_id = message_id
+                self.tickets[ticket.order_id] = ticket
+            self.stats['orders'] += len(tickets)
+            self.stats['batches'] += 1
+            self.stats['publish_seconds'] += time.perf_counter() - start
+
+        for ticket in tickets:
+            logger.info(f"订单已发送QMT: {ticket.action} {ticket.stock} {ticket.amount}股 (order_id={ticket.order_id})")
+        return [ticket.order_id for ticket in tickets]
+
+    def send(self, action: str, stock: str, amount: int) -> str:
+        """发送单个订单，返回 order_id"""
+        return self.publish_orders([(action, stock, amount)])[0]
+
+    def poll_acks(self, block_ms: Optional[int] = None, count: int = 100) -> int:
+        """
+        读取回执流中的新确认消息并更新订单状态
+
+        Args:
+            block_ms: 没有新回执时阻塞等待的毫秒数，None 表示不阻塞
+
+        Returns:
+            int: 本次处理的回执数量
+        """
+        kwargs = {'count': count}
+        if block_ms is not None:
+            kwargs['block'] = block_ms
+        response = self.client.xread({self.ack_stream: self._last_ack_id}, **kwargs)
+
+        processed = 0
+        for _, messages in response or []:
+            for message_id, fields in messages:
+                self._last_ack_id = message_id
+                order_id = fields.get('order_id')
+                with self._lock:
+                    ticket = self.tickets.get(order_id)
+                    if ticket is None:
+                        continue
+                    ticket.status = fields.get('status', 'accepted')
+                    ticket.ack_message = fields.get('message', '')
+                    ticket.acked_at = time.time()
+                    self.stats['acks'] += 1
+                    if ticket.status == 'rejected':
+                        self.stats['rejected'] += 1
+                        logger.warning(f"QMT拒绝订单 {ticket.stock} {ticket.action}: {ticket.ack_message}")
+                processed += 1
+        return processed
+
+    def wait_for_acks(self, order_ids: Iterable[str], timeout: float = 5.0) -> Dict[str, str]:
+        """
+        阻塞等待一批订单的确认（超时后返回当前状态，未确认的为 'sent'）
+
+        Returns:
+            Dict[str, str]: order_id 到状态的映射
+        """
+        order_ids = list(order_ids)
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                waiting = [oid for oid in order_ids if oid in self.tickets and not self.tickets[oid].acked]
+            remaining = deadline - time.monotonic()
+            if not waiting or remaining <= 0:
+                break
+            self.poll_acks(block_ms=max(1, int(remaining * 1000)))
+
+        with self._lock:
+            return {oid: self.tickets[oid].status for oid in order_ids if oid in self.tickets}
+
+    def pending(self, older_than: float = 0.0) -> List[OrderTicket]:
+        """发送后超过 older_than 秒仍未确认的订单"""
+        now = time.time()
+        with self._lock:
+            return [t for t in self.tickets.values() if not t.acked and now - t.sent_at >= older_than]
+
+    def close(self):
+        """关闭连接池"""
+        try:
+            self.client.close()
+        except Exception as e:
+            logger.warning(f"关闭Redis连接失败: {e}")
@@ -11,8 +11,8 @@ if current_dir not in sys.path:
 
 # 导入v2项目的模块
 from core.execution.account import Account
-from data_management.data_processor import get_latest_price, get_daily_data_for_backtest
-from core.utils.indicators import ATR
+from data_management.data_processor import get_latest_price
+from core.execution.volatility import get_volatility_service
 
 
 # --- 系统参数设定 ---
@@ -35,49 +35,25 @@ def get_atr_volatility(stock_code, current_date, period=14):
     period: ATR计算周期，默认14天
     
     返回:
-    float: ATR值，如果获取失败返回默认值
+    float: ATR相对波动率，如果获取失败返回默认值
+    
+    只读取最近 period+1 根日线，结果按 (日期, 周期) 缓存（见 core.execution.volatility）
     """
     try:
-        # 获取历史数据
-        df = get_daily_data_for_backtest(stock_code, current_date)
-        
-        if df.empty or len(df) < period:
-            print(f"警告: {stock_code} 数据不足，使用默认波动率")
-            return 0.02  # 默认2%的波动率
-        
-        # 确保列名正确
-        df = df.rename(columns={
-            'trade_date': 'date',
-            'open_price': 'open',
-            'high_price': 'high', 
-            'low_price': 'low',
-            'close_price': 'close'
-        })
-        
-        # 计算ATR
-        atr_values, tr_values = ATR(df['close'].values, df['high'].values, df['low'].values, N=period)
-        
-        # 获取最新的ATR值
-        latest_atr = atr_values[-1] if len(atr_values) > 0 else 0.02
-        
-        # 将ATR转换为相对波动率（相对于当前价格）
-        current_price = df['close'].iloc[-1]
-        relative_volatility = latest_atr / current_price if current_price > 0 else 0.02
-        
-        return max(relative_volatility, 0.01)  # 最小波动率1%
-        
+        return get_volatility_service().get_volatility(stock_code, current_date, period)
     except Exception as e:
         print(f"获取 {stock_code} ATR失败: {e}")
         return 0.02  # 默认波动率
 
 
-def calculate_risk_adjusted_allocation(stock_scores, current_date):
+def calculate_risk_adjusted_allocation(stock_scores, current_date, context=None):
     """
     基于ATR指标计算风险调整后的投入比例
     
     参数:
     stock_scores: dict, {股票代码: 评分}
     current_date: 当前日期（回测日期）
+    context (DecisionContext): 决策上下文，提供时波动率在同一次分析中按股票缓存
     
     返回:
     dict: {股票代码: 风险调整后投入比例}
@@ -87,16 +63,22 @@ def calculate_risk_adjusted_allocation(stock_scores, current_date):
     
     print(f"开始计算风险调整后的投入比例，当前日期: {current_date}")
     
-    # 第一步：计算风险调整后分数
+    # 第一步：批量获取所有候选股的ATR波动率（一次查询、一次向量化计算）
+    if context is not None:
+        volatilities = context.get_volatilities(list(stock_scores), current_date)
+    else:
+        volatilities = get_volatility_service().get_volatilities(list(stock_scores), current_date)
+    
+    # 第二步：计算风险调整后分数
     for stock_code, score in stock_scores.items():
-        volatility = get_atr_volatility(stock_code, current_date)
+        volatility = volatilities[str(stock_code)]
         adjusted_score = score / volatility  # 风险调整后分数
         risk_adjusted_scores[stock_code] = adjusted_score
         total_adjusted_score += adjusted_score
         
         print(f"{stock_code}: 原始评分={score:.2f}, ATR波动率={volatility:.4f}, 调整后评分={adjusted_score:.2f}")
     
-    # 第二步：计算最终权重
+    # 第三步：计算最终权重
     final_weights = {}
     for stock_code, adjusted_score in risk_adjusted_scores.items():
         weight = adjusted_score / total_adjusted_score if total_adjusted_score > 0 else 0
@@ -142,11 +124,12 @@ def is_cx_stock_by_holdings_table(stock_code, db_path=None):
         if not cx_df.empty:
             record = cx_df.iloc[0]
             conn.close()
+            buy_price = '未知' if pd.isna(record['buy_price']) else f"{record['buy_price']:.2f}"
             return (
                 True, 
                 record['source_pool'], 
                 record['buy_date'], 
-                f"CX持仓股票 (买入价格: {record['buy_price']:.2f}, 数量: {record['buy_quantity']})"
+                f"CX持仓股票 (买入价格: {buy_price}, 数量: {record['buy_quantity']})"
             )
         
         conn.close()
@@ -159,7 +142,7 @@ def is_cx_stock_by_holdings_table(stock_code, db_path=None):
         return False, None, None, f"查询错误: {e}"
 
 
-def calculate_sector_used_amount(pool_name, account, db_path=None):
+def calculate_sector_used_amount(pool_name, account, db_path=None, context=None):
     """
     计算板块已用额度 - 关键的第二步
     
@@ -175,6 +158,7 @@ def calculate_sector_used_amount(pool_name, account, db_path=None):
     pool_name (str): 板块名称
     account (Account): 账户对象
     db_path (str): 数据库路径
+    context (DecisionContext): 决策上下文，提供时板块归属和CX持仓从上下文读取，不再逐只查询
     
     返回:
     tuple: (板块已用额度, 板块持仓股票列表, 详细信息字典)
@@ -191,30 +175,43 @@ def calculate_sector_used_amount(pool_name, account, db_path=None):
     stock_details = []
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path) if context is None else None
         
         for stock_code, position in current_positions.items():
             belongs_to_sector = False
             reason = ""
             
-            # 方法1：检查历史上是否通过该pool_name买入过
-            history_query = """
-                SELECT COUNT(*) as count, MAX(trade_date) as latest_date
-                FROM daily_selections 
-                WHERE pool_name = ? AND stock_code = ?
-            """
-            history_df = pd.read_sql_query(history_query, conn, params=[pool_name, stock_code])
-            
-            if not history_df.empty and history_df['count'].iloc[0] > 0:
-                belongs_to_sector = True
-                reason = f"历史属于板块{pool_name} (最新日期: {history_df['latest_date'].iloc[0]})"
-            
-            # 方法2：检查是否为CX长线股（使用CX持仓记录表）
-            if not belongs_to_sector:
-                is_cx, cx_pool, cx_date, cx_reason = is_cx_stock_by_holdings_table(stock_code, db_path)
-                if is_cx:
+            if context is not None:
+                # 使用预加载的板块归属和CX持仓记录
+                if context.is_pool_member(pool_name, stock_code):
+                    belongs_to_sector = True
+                    reason = f"历史属于板块{pool_name}"
+                elif stock_code in context.cx_holdings:
+                    cx = context.cx_holdings[stock_code]
+                    belongs_to_sector = True
+                    # 持仓记录缺少买入价格时以持仓成本价显示
+                    buy_price = position.avg_cost if pd.isna(cx['buy_price']) else cx['buy_price']
+                    reason = (f"CX长线股 来源板块: {cx['source_pool']} (买入日期: {cx['buy_date']}) - "
+                              f"CX持仓股票 (买入价格: {buy_price:.2f}, 数量: {cx['buy_quantity']})")
+            else:
+                # 方法1：检查历史上是否通过该pool_name买入过
+                history_query = """
+                    SELECT COUNT(*) as count, MAX(trade_date) as latest_date
+                    FROM daily_selections 
+                    WHERE pool_name = ? AND stock_code = ?
+                """
+                history_df = pd.read_sql_query(history_query, conn, params=[pool_name, stock_code])
+                
+                if not history_df.empty and history_df['count'].iloc[0] > 0:
                     belongs_to_sector = True
-                    reason = f"CX长线股 来源板块: {cx_pool} (买入日期: {cx_date}) - {cx_reason}"
+                    reason = f"历史属于板块{pool_name} (最新日期: {history_df['latest_date'].iloc[0]})"
+                
+                # 方法2：检查是否为CX长线股（使用CX持仓记录表）
+                if not belongs_to_sector:
+                    is_cx, cx_pool, cx_date, cx_reason = is_cx_stock_by_holdings_table(stock_code, db_path)
+                    if is_cx:
+                        belongs_to_sector = True
+                        reason = f"CX长线股 来源板块: {cx_pool} (买入日期: {cx_date}) - {cx_reason}"
             
             # 如果属于该板块，计算仓位
             if belongs_to_sector:
@@ -238,13 +235,15 @@ def calculate_sector_used_amount(pool_name, account, db_path=None):
             else:
                 print(f"  - {stock_code}: 不属于板块{pool_name}")
         
-        conn.close()
+        if conn is not None:
+            conn.close()
         
     except Exception as e:
+        # 不能按 0 返回：已用额度为 0 会让板块按全部额度继续加仓，交给调用方跳过本板块
         print(f"❌ 计算板块已用额度时发生错误: {e}")
-        if 'conn' in locals():
+        if locals().get('conn') is not None:
             conn.close()
-        return 0, [], []
+        raise
     
     print(f"--- 板块 {pool_name} 已用额度计算完成 ---")
     print(f"板块持仓股票: {sector_stocks}")
@@ -253,7 +252,7 @@ def calculate_sector_used_amount(pool_name, account, db_path=None):
     return sector_used_amount, sector_stocks, stock_details
 
 
-def check_sector_position_availability(pool_name, end_date, sector_initial_cap=None, account=None, db_path=None):
+def check_sector_position_availability(pool_name, end_date, sector_initial_cap=None, account=None, db_path=None, context=None):
     """
     判断板块仓位还有多少剩余可操作资金，确定是否板块还有加仓机会
     
@@ -265,6 +264,7 @@ def check_sector_position_availability(pool_name, end_date, sector_initial_cap=N
     sector_initial_cap (float): 板块初始仓位比例，默认使用全局设置
     account (Account): 账户对象，默认使用默认账户
     db_path (str): 数据库路径
+    context (DecisionContext): 决策上下文，提供时总权益、候选股和板块归属从上下文读取
     
     返回:
     dict: 包含仓位信息的字典
@@ -278,8 +278,8 @@ def check_sector_position_availability(pool_name, end_date, sector_initial_cap=N
     if account is None:
         account = DEFAULT_ACCOUNT
     
-    # 实时获取账户总权益
-    total_equity = account.get_total_equity()
+    # 获取账户总权益（有决策上下文时使用本次分析开始时的快照）
+    total_equity = context.total_equity if context is not None else account.get_total_equity()
     
     print(f"\n{'='*60}")
     print("板块仓位管理分析 【修正版】")
@@ -293,24 +293,29 @@ def check_sector_position_availability(pool_name, end_date, sector_initial_cap=N
     print(f"板块总额度: {initial_sector_position:,.2f}")
     
     # 第二步：计算板块已用额度（关键修正）
-    current_sector_position, sector_stocks, stock_details = calculate_sector_used_amount(pool_name, account, db_path)
+    current_sector_position, sector_stocks, stock_details = calculate_sector_used_amount(pool_name, account, db_path, context)
     
     # 2. 从数据库读取候选股数据（用于显示信息）
-    try:
-        conn = sqlite3.connect(db_path)
-        query = """
-            SELECT stock_code
-            FROM daily_selections 
-            WHERE pool_name = ? AND trade_date = ?
-        """
-        df = pd.read_sql_query(query, conn, params=[pool_name, end_date])
-        conn.close()
-        candidate_stocks = df['stock_code'].astype(str).str.zfill(6).tolist()
+    if context is not None and context.has_selection(pool_name, end_date):
+        candidate_stocks = context.pool_selection(pool_name)['stock_code'].tolist()
         print(f"\n当前候选股数量: {len(candidate_stocks)}")
         print(f"当前候选股列表: {candidate_stocks}")
-    except Exception as e:
-        print(f"从数据库读取候选股数据失败: {e}")
-        candidate_stocks = []
+    else:
+        try:
+            conn = sqlite3.connect(db_path)
+            query = """
+                SELECT stock_code
+                FROM daily_selections 
+                WHERE pool_name = ? AND trade_date = ?
+            """
+            df = pd.read_sql_query(query, conn, params=[pool_name, end_date])
+            conn.close()
+            candidate_stocks = df['stock_code'].astype(str).str.zfill(6).tolist()
+            print(f"\n当前候选股数量: {len(candidate_stocks)}")
+            print(f"当前候选股列表: {candidate_stocks}")
+        except Exception as e:
+            print(f"从数据库读取候选股数据失败: {e}")
+            candidate_stocks = []
     
     print(f"\n板块已用额度: {current_sector_position:,.2f}")
     print(f"板块持仓股票: {sector_stocks}")
@@ -363,7 +368,7 @@ def check_sector_position_availability(pool_name, end_date, sector_initial_cap=N
 
 
 # 从数据库读取板块数据，来获取板块的操作个股===========================================
-def get_buy_stocks_from_db(pool_name, end_date, min_stocks=3, max_stocks=5, top_percentage=0.2, db_path=None):
+def get_buy_stocks_from_db(pool_name, end_date, min_stocks=3, max_stocks=5, top_percentage=0.2, db_path=None, context=None):
     """
     从数据库获取操作个股
     
@@ -374,6 +379,7 @@ def get_buy_stocks_from_db(pool_name, end_date, min_stocks=3, max_stocks=5, top_
     max_stocks (int): 最多股票数量，默认5只
     top_percentage (float): 前百分比，默认0.2（20%）
     db_path (str): 数据库路径
+    context (DecisionContext): 决策上下文，提供时直接使用预加载的板块候选股
     
     返回:
     tuple: (选中的股票代码列表, 筛选后的DataFrame)
@@ -382,15 +388,18 @@ def get_buy_stocks_from_db(pool_name, end_date, min_stocks=3, max_stocks=5, top_
         db_path = get_db_path()
     
     try:
-        # 1. 从数据库读取数据
-        conn = sqlite3.connect(db_path)
-        query = """
-            SELECT stock_code, name, is_1bzl, 总得分, 技术得分, 主力得分, 板块得分, 低BIAS得分
-            FROM daily_selections 
-            WHERE pool_name = ? AND trade_date = ?
-        """
-        df = pd.read_sql_query(query, conn, params=[pool_name, end_date])
-        conn.close()
+        # 1. 从数据库读取数据（有决策上下文时使用预加载的数据）
+        if context is not None and context.has_selection(pool_name, end_date):
+            df = context.pool_selection(pool_name)
+        else:
+            conn = sqlite3.connect(db_path)
+            query = """
+                SELECT stock_code, name, is_1bzl, 总得分, 技术得分, 主力得分, 板块得分, 低BIAS得分
+                FROM daily_selections 
+                WHERE pool_name = ? AND trade_date = ?
+            """
+            df = pd.read_sql_query(query, conn, params=[pool_name, end_date])
+            conn.close()
         
         print(f"从数据库读取板块 {pool_name} 在 {end_date} 的数据:")
         print(f"原始数据行数: {len(df)}")
@@ -436,7 +445,8 @@ def get_buy_stocks_from_db(pool_name, end_date, min_stocks=3, max_stocks=5, top_
 
 
 
-def calculate_individual_stock_allocation(pool_name, end_date, sector_initial_cap=None, account=None, use_risk_adjustment=True, db_path=None):
+def calculate_individual_stock_allocation(pool_name, end_date, sector_initial_cap=None, account=None, use_risk_adjustment=True, db_path=None,
+                                          min_stocks=3, max_stocks=5, top_percentage=0.2, context=None):
     """
     计算个股资金分配和买入判断
     
@@ -447,6 +457,10 @@ def calculate_individual_stock_allocation(pool_name, end_date, sector_initial_ca
     account (Account): 账户对象，默认使用默认账户
     use_risk_adjustment (bool): 是否使用ATR风险调整，默认True
     db_path (str): 数据库路径
+    min_stocks (int): 最少股票数量
+    max_stocks (int): 最多股票数量
+    top_percentage (float): 前百分比
+    context (DecisionContext): 决策上下文（同一次分析中所有板块共用的预加载数据）
     
     返回:
     dict: 包含个股分配信息的字典
@@ -460,8 +474,8 @@ def calculate_individual_stock_allocation(pool_name, end_date, sector_initial_ca
     if account is None:
         account = DEFAULT_ACCOUNT
     
-    # 实时获取账户总权益
-    total_equity = account.get_total_equity()
+    # 获取账户总权益（有决策上下文时使用本次分析开始时的快照）
+    total_equity = context.total_equity if context is not None else account.get_total_equity()
     
     print(f"\n{'='*60}")
     print("个股资金分配分析")
@@ -469,7 +483,8 @@ def calculate_individual_stock_allocation(pool_name, end_date, sector_initial_ca
     print(f"使用账户: {account.table_name}")
     
     # 1. 获取板块操作个股和筛选后的DataFrame（避免重复读取数据库）
-    buy_stocks, operation_stocks_df = get_buy_stocks_from_db(pool_name, end_date, db_path=db_path)
+    buy_stocks, operation_stocks_df = get_buy_stocks_from_db(pool_name, end_date, min_stocks, max_stocks, top_percentage,
+                                                             db_path=db_path, context=context)
     
     if not buy_stocks or operation_stocks_df.empty:
         print("❌ 无操作个股，无法进行资金分配")
@@ -503,7 +518,7 @@ def calculate_individual_stock_allocation(pool_name, end_date, sector_initial_ca
         current_date = datetime.now().strftime('%Y-%m-%d')
         
         # 计算风险调整后的投入比例
-        risk_adjusted_weights = calculate_risk_adjusted_allocation(stock_scores_dict, current_date)
+        risk_adjusted_weights = calculate_risk_adjusted_allocation(stock_scores_dict, current_date, context)
         
         for _, row in operation_stocks_df.iterrows():  # type: ignore
             stock_code = row['stock_code']
@@ -547,7 +562,7 @@ def calculate_individual_stock_allocation(pool_name, end_date, sector_initial_ca
             print(f"  {stock_code}: 得分={stock_score:.2f}, 占比={allocation_ratio*100:.1f}%, 投入资金={stock_investment:,.2f}")
     
     # 5. 检查板块可用资金
-    position_result = check_sector_position_availability(pool_name, end_date, sector_initial_cap, account, db_path)
+    position_result = check_sector_position_availability(pool_name, end_date, sector_initial_cap, account, db_path, context)
     sector_available_cash = position_result['sector_available_cash']
     
     print(f"\n板块可用资金: {sector_available_cash:,.2f}")
@@ -609,7 +624,8 @@ def calculate_individual_stock_allocation(pool_name, end_date, sector_initial_ca
         'position_result': position_result
     }
 
-def get_individual_stock_buy_signals(pool_name, end_date, sector_initial_cap=None, account=None, db_path=None):
+def get_individual_stock_buy_signals(pool_name, end_date, sector_initial_cap=None, account=None, db_path=None,
+                                     min_stocks=3, max_stocks=5, top_percentage=0.2, context=None):
     """
     获取个股待买入信号
     
@@ -619,13 +635,19 @@ def get_individual_stock_buy_signals(pool_name, end_date, sector_initial_cap=Non
     sector_initial_cap (float): 板块初始仓位比例
     account (Account): 账户对象，默认使用默认账户
     db_path (str): 数据库路径
+    min_stocks (int): 最少股票数量
+    max_stocks (int): 最多股票数量
+    top_percentage (float): 前百分比
+    context (DecisionContext): 决策上下文（同一次分析中所有板块共用的预加载数据）
     
     返回:
     list: 买入信号列表，每个信号包含股票代码、买入数量、买入价格等信息
     """
     if db_path is None:
         db_path = get_db_path()
-    allocation_result = calculate_individual_stock_allocation(pool_name, end_date, sector_initial_cap, account, use_risk_adjustment=True, db_path=db_path)
+    allocation_result = calculate_individual_stock_allocation(pool_name, end_date, sector_initial_cap, account, use_risk_adjustment=True, db_path=db_path,
+                                                              min_stocks=min_stocks, max_stocks=max_stocks,
+                                                              top_percentage=top_percentage, context=context)
     
     if not allocation_result['can_buy']:
         print(f"❌ 无法生成买入信号: {allocation_result['reason']}")
@@ -633,13 +655,19 @@ def get_individual_stock_buy_signals(pool_name, end_date, sector_initial_cap=Non
     
     buy_signals = []
     
+    # 所有可买股票的当前价格一次批量获取（价格快照）
+    price_service = (account or DEFAULT_ACCOUNT).price_service
+    prices = price_service.get_prices(
+        [s['stock_code'] for s in allocation_result['stock_allocations'] if s['can_buy']]
+    )
+    
     for stock_info in allocation_result['stock_allocations']:
         if stock_info['can_buy']:
             stock_code = stock_info['stock_code']
             investment_amount = stock_info['investment_amount']
             
-            # 获取当前价格（这里需要实现获取实时价格的函数）
-            current_price = get_latest_price(stock_code)
+            # 获取当前价格
+            current_price = prices.get(stock_code)
             
             if current_price and current_price > 0:
                 # 计算买入数量（按手计算，1手=100股）
@@ -687,7 +715,7 @@ def get_cx_stock_buy_decision(stock_code, account):
     # === 在这里定义您对CX股票的仓位管理规则 ===
     # 规则: 按总资金的10%买入，且不低于100股
     percentage_of_total = 0.10
-    total_assets = account.available_cash + account.total_market_value  # 总资产 = 可用现金 + 持仓市值
+    total_assets = account.get_total_equity()  # 总资产 = 可用现金 + 持仓市值
     amount_to_buy = total_assets * percentage_of_total
     
     print(f"📊 总资产: {total_assets:,.2f} 元, 按10%计算买入金额: {amount_to_buy:,.2f} 元")
@@ -6,13 +6,18 @@
 2. 风险控制规则
 3. 风险预警
 4. 风险报告
+
+组合的滚动风险指标（VaR、回撤、夏普、集中度）由 PortfolioRiskEngine 随成交和价格增量维护，
+RiskManager 直接读取其缓存结果；calculate_* 方法用于对任意序列做一次性（向量化）计算。
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence
 from datetime import datetime
 import logging
 import numpy as np
 
+from .risk_metrics import PortfolioRiskEngine
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,17 +25,45 @@ class RiskManager:
     """风险管理器"""
     
     def __init__(self, account, max_position_ratio: float = 0.1, 
-                 max_total_risk: float = 0.2, stop_loss_ratio: float = 0.05):
+                 max_total_risk: float = 0.2, stop_loss_ratio: float = 0.05,
+                 risk_engine: Optional[PortfolioRiskEngine] = None):
         self.account = account
         self.max_position_ratio = max_position_ratio  # 单个持仓最大比例
         self.max_total_risk = max_total_risk  # 总风险敞口
         self.stop_loss_ratio = stop_loss_ratio  # 止损比例
         self.risk_alerts: List[Dict[str, Any]] = []
+        # 账户有内存持仓账本（positions / available_cash）时，以其初始化组合风险引擎，
+        # 并在每次风险检查前按账本校正（账户成交不经过事件引擎）
+        self._ledger_account = hasattr(account, 'positions') and hasattr(account, 'available_cash')
+        if risk_engine is None and self._ledger_account:
+            risk_engine = PortfolioRiskEngine.from_account(account)
+        self.risk_engine = risk_engine
+        
+    def _sync_engine(self):
+        """按账户内存账本校正风险引擎的资金和持仓"""
+        if self.risk_engine is not None and self._ledger_account:
+            self.risk_engine.sync_account(self.account)
+        
+    def _total_value(self, prices: Dict[str, float]) -> float:
+        """账户总权益：优先使用风险引擎的增量权益（传入的价格只用于本次估算，不改变引擎的标价和回撤）"""
+        if self.risk_engine is not None:
+            self._sync_engine()
+            return self.risk_engine.equity_with(prices)
+        if hasattr(self.account, 'get_total_value'):
+            return self.account.get_total_value(prices)
+        return self.account.get_total_equity()
+        
+    def _positions(self) -> Dict[str, float]:
+        """股票代码到持仓数量的映射"""
+        if self.risk_engine is not None:
+            self._sync_engine()
+            return self.risk_engine.quantities
+        return self.account.get_positions()
         
     def check_position_risk(self, symbol: str, quantity: int, price: float) -> Dict[str, Any]:
         """检查持仓风险"""
         position_value = quantity * price
-        total_value = self.account.get_total_value({symbol: price})
+        total_value = self._total_value({symbol: price})
         position_ratio = position_value / total_value if total_value > 0 else 0
         
         risk_info = {
@@ -50,7 +83,7 @@ class RiskManager:
         """检查总风险"""
         total_position_value = sum(positions.get(symbol, 0) * prices.get(symbol, 0) 
                                  for symbol in positions.keys() if symbol in prices)
-        total_value = self.account.get_total_value(prices)
+        total_value = self._total_value(prices)
         total_risk_ratio = total_position_value / total_value if total_value > 0 else 0
         
         risk_info = {
@@ -88,53 +121,58 @@ class RiskManager:
             
         return stop_info
         
-    def calculate_var(self, returns: List[float], confidence_level: float = 0.05) -> float:
+    def calculate_var(self, returns: Sequence[float], confidence_level: float = 0.05) -> float:
         """计算风险价值(VaR)"""
-        if not returns:
+        returns = np.asarray(returns, dtype=float)
+        if returns.size == 0:
             return 0.0
             
         return np.percentile(returns, confidence_level * 100)
         
-    def calculate_max_drawdown(self, values: List[float]) -> Dict[str, float]:
-        """计算最大回撤"""
-        if not values:
+    def calculate_max_drawdown(self, values: Sequence[float]) -> Dict[str, float]:
+        """计算最大回撤（向量化：累计峰值减当前值）"""
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
             return {"max_drawdown": 0.0, "max_drawdown_ratio": 0.0}
             
-        peak = values[0]
-        max_dd = 0.0
-        max_dd_ratio = 0.0
-        
-        for value in values:
-            if value > peak:
-                peak = value
-            else:
-                drawdown = peak - value
-                drawdown_ratio = drawdown / peak if peak > 0 else 0
-                if drawdown > max_dd:
-                    max_dd = drawdown
-                    max_dd_ratio = drawdown_ratio
+        peaks = np.maximum.accumulate(values)
+        drawdowns = peaks - values
+        # argmax 取第一个最大回撤点，与逐点比较（只在严格更大时更新）一致
+        i = int(np.argmax(drawdowns))
+        max_dd = float(drawdowns[i])
+        if max_dd <= 0:
+            return {"max_drawdown": 0.0, "max_drawdown_ratio": 0.0}
                     
         return {
             "max_drawdown": max_dd,
-            "max_drawdown_ratio": max_dd_ratio
+            "max_drawdown_ratio": max_dd / peaks[i] if peaks[i] > 0 else 0
         }
         
-    def calculate_sharpe_ratio(self, returns: List[float], risk_free_rate: float = 0.03) -> float:
+    def calculate_sharpe_ratio(self, returns: Sequence[float], risk_free_rate: float = 0.03) -> float:
         """计算夏普比率"""
-        if not returns or len(returns) < 2:
+        returns = np.asarray(returns, dtype=float)
+        if returns.size < 2:
             return 0.0
             
-        excess_returns = [r - risk_free_rate / 252 for r in returns]  # 日收益率
-        if np.std(excess_returns) == 0:
+        excess_returns = returns - risk_free_rate / 252  # 日收益率
+        std = np.std(excess_returns)
+        if std == 0:
             return 0.0
             
-        return np.mean(excess_returns) / np.std(excess_returns) * np.sqrt(252)
+        return np.mean(excess_returns) / std * np.sqrt(252)
+        
+    def get_portfolio_metrics(self) -> Dict[str, Any]:
+        """组合滚动风险指标（风险引擎缓存的结果，O(1)）"""
+        if self.risk_engine is None:
+            return {}
+        self._sync_engine()
+        return self.risk_engine.metrics()
         
     def get_risk_metrics(self, prices: Dict[str, float], 
                         returns: Dict[str, List[float]] = None) -> Dict[str, Any]:
         """获取风险指标"""
-        positions = self.account.get_positions()
-        total_value = self.account.get_total_value(prices)
+        total_value = self._total_value(prices)
+        positions = self._positions()
         
         # 计算持仓风险
         position_risks = {}
@@ -156,14 +194,15 @@ class RiskManager:
             "risk_level": total_risk["risk_level"],
             "alerts_count": len(self.risk_alerts)
         }
+        if self.risk_engine is not None:
+            risk_metrics["portfolio"] = self.risk_engine.metrics()
         
         # 如果有收益率数据，计算高级风险指标
         if returns:
-            all_returns = []
-            for symbol_returns in returns.values():
-                all_returns.extend(symbol_returns)
+            all_returns = np.concatenate([np.asarray(r, dtype=float) for r in returns.values()]) \
+                if returns else np.array([])
                 
-            if all_returns:
+            if all_returns.size:
                 risk_metrics.update({
                     "var_5pct": self.calculate_var(all_returns, 0.05),
                     "max_drawdown": self.calculate_max_drawdown(all_returns),
@@ -0,0 +1,379 @@
+"""
+组合风险指标引擎
+
+负责：
+1. 以 NumPy 数组保存组合权益曲线和每个持仓的周期收益率序列
+2. 每笔成交（FILL）或价格更新（TICK）时 O(1) 增量更新权益、回撤和集中度
+3. 每个周期结束（实盘每日收盘、回测每根K线）时把组合和持仓收益率推入定长滚动窗口，
+   滚动 VaR、波动率、夏普比率由窗口维护的和/平方和直接得到
+4. 指标结果缓存，交易循环和看板读取时不重新计算
+
+设计特点：
+- 滚动窗口为环形缓冲区，追加 O(1)，不复制历史
+- 最大回撤按每次权益更新（逐笔）跟踪，比只看周期收盘更准确
+- TICK 可能来自事件线程，成交来自主线程，状态更新在锁内完成
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from core.event import EventType
+
+logger = logging.getLogger(__name__)
+
+
+class RollingWindow:
+    """定长滚动窗口（NumPy 环形缓冲区），O(1) 追加并维护和与平方和"""
+
+    def __init__(self, size: int):
+        if size <= 0:
+            raise ValueError("窗口长度必须大于0")
+        self.size = size
+        self._buffer = np.zeros(size, dtype=float)
+        self._next = 0
+        self.count = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._pushes = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, value: float):
+        value = float(value)
+        if self.count == self.size:
+            old = self._buffer[self._next]
+            self._sum -= old
+            self._sumsq -= old * old
+        else:
+            self.count += 1
+        self._buffer[self._next] = value
+        self._next = (self._next + 1) % self.size
+        self._sum += value
+        self._sumsq += value * value
+
+        # 每滚动一整圈按窗口重新求和，消除增量加减的浮点误差累积
+        self._pushes += 1
+        if self._pushes % self.size == 0:
+            window = self._buffer[:self.count]
+            self._sum = float(window.sum())
+            self._sumsq = float(np.dot(window, window))
+
+    def values(self) -> np.ndarray:
+        """按时间顺序（旧 -> 新）返回窗口内的值"""
+        if self.count < self.size:
+            return self._buffer[:self.count].copy()
+        return np.concatenate((self._buffer[self._next:], self._buffer[:self._next]))
+
+    def mean(self) -> float:
+        return self._sum / self.count if self.count else 0.0
+
+    def std(self) -> float:
+        """总体标准差（与 np.std 一致）"""
+        if not self.count:
+            return 0.0
+        mean_sq = self._sumsq / self.count
+        variance = mean_sq - self.mean() ** 2
+        # 常数序列的方差在浮点运算下可能残留极小的正数，按 0 处理
+        if variance <= 1e-14 * mean_sq:
+            return 0.0
+        return float(np.sqrt(variance))
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        return float(np.percentile(self._buffer[:self.count], q))
+
+
+class PortfolioRiskEngine:
+    """组合风险指标引擎"""
+
+    def __init__(self, cash: float, positions: Dict[str, int] = None, prices: Dict[str, float] = None,
+                 window: int = 252, var_confidence: float = 0.05, risk_free_rate: float = 0.03,
+                 periods_per_year: int = 252, curve_capacity: int = 1024):
+        """
+        Args:
+            cash: 可用资金
+            positions: 股票代码到持仓数量的映射
+            prices: 股票代码到当前价格的映射
+            window: 滚动窗口长度（周期数）
+            var_confidence: VaR 的分位数（0.05 表示 95% 置信度）
+            risk_free_rate: 年化无风险利率
+            periods_per_year: 每年的周期数（日频为 252）
+            curve_capacity: 权益曲线数组的初始容量（不足时自动扩容）
+        """
+        self.window = window
+        self.var_confidence = var_confidence
+        self.risk_free_rate = risk_free_rate
+        self.periods_per_year = periods_per_year
+        self._lock = threading.Lock()
+
+        self.cash = float(cash)
+        self._quantities: Dict[str, int] = {}
+        self._prices: Dict[str, float] = dict(prices or {})
+        self._values: Dict[str, float] = {}
+        self._market_value = 0.0
+        self._value_sumsq = 0.0
+        for stock_code, quantity in (positions or {}).items():
+            if quantity:
+                self._quantities[stock_code] = int(quantity)
+                self._set_value(stock_code)
+
+        # 权益与回撤（逐笔更新）
+        self.equity_peak = self.equity
+        self.max_drawdown = 0.0
+        self.max_drawdown_ratio = 0.0
+
+        # 周期收盘的权益曲线和收益率窗口
+        self._curve = np.empty(max(1, curve_capacity), dtype=float)
+        self._curve_len = 0
+        self.curve_times = []
+        self.returns = RollingWindow(window)
+        self.position_returns: Dict[str, RollingWindow] = {}
+        self._period_equity: Optional[float] = None
+        self._period_prices: Dict[str, float] = {}
+
+        self._metrics: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def _account_state(account):
+        """账户内存账本的可用资金、持仓数量和价格"""
+        positions, prices = {}, {}
+        for stock_code, position in account.positions.items():
+            positions[stock_code] = getattr(position, 'total_amount', position)
+            price = getattr(position, 'current_price', None) or getattr(position, 'trade_price', None)
+            if price:
+                prices[stock_code] = price
+        return account.available_cash, positions, prices
+
+    @classmethod
+    def from_account(cls, account, **kwargs) -> 'PortfolioRiskEngine':
+        """以账户当前的可用资金、持仓和价格初始化"""
+        cash, positions, prices = cls._account_state(account)
+        return cls(cash, positions, prices, **kwargs)
+
+    def sync_account(self, account) -> bool:
+        """
+        按账户内存账本校正可用资金和持仓（只重算数量有变化的持仓，权益曲线和滚动窗口保留）
+
+        账户的成交（order_buy / order_sell，或 sync_ledger 读到的其他进程写入的交易）不经过事件引擎，
+        风险检查前调用，避免引擎停留在创建时的持仓
+
+        Returns:
+            bool: 资金或持仓是否有变化
+        """
+        cash, positions, prices = self._account_state(account)
+        with self._lock:
+            changed = [code for code in set(self._quantities) | set(positions)
+                       if self._quantities.get(code, 0) != int(positions.get(code) or 0)]
+            if not changed and abs(float(cash) - self.cash) < 1e-9:
+                return False
+            self.cash = float(cash)
+            for stock_code in changed:
+                quantity = int(positions.get(stock_code) or 0)
+                if quantity:
+                    self._quantities[stock_code] = quantity
+                    if stock_code not in self._prices and stock_code in prices:
+                        self._prices[stock_code] = float(prices[stock_code])
+                else:
+                    self._quantities.pop(stock_code, None)
+                self._set_value(stock_code)
+            self._mark_equity()
+            return True
+
+    # ---------------- 增量更新 ----------------
+
+    def _set_value(self, stock_code: str):
+        """按数量和价格重算单个持仓市值，增量更新总市值和市值平方和"""
+        value = self._quantities.get(stock_code, 0) * self._prices.get(stock_code, 0.0)
+        old = self._values.get(stock_code, 0.0)
+        self._market_value += value - old
+        self._value_sumsq += value * value - old * old
+        if stock_code in self._quantities:
+            self._values[stock_code] = value
+        else:
+            self._values.pop(stock_code, None)
+
+    def _mark_equity(self):
+        """权益变化后更新峰值和最大回撤"""
+        equity = self.equity
+        if equity > self.equity_peak:
+            self.equity_peak = equity
+        else:
+            drawdown = self.equity_peak - equity
+            if drawdown > self.max_drawdown:
+                self.max_drawdown = drawdown
+                self.max_drawdown_ratio = drawdown / self.equity_peak if self.equity_peak > 0 else 0
+        self._metrics = None
+
+    def on_price(self, stock_code: str, price: float):
+        """价格更新（O(1)）"""
+        if not price or price <= 0:
+            return
+        with self._lock:
+            self._prices[stock_code] = float(price)
+            if stock_code in self._quantities:
+                self._set_value(stock_code)
+                self._mark_equity()
+
+    def on_fill(self, stock_code: str, quantity: int, price: float, commission: float = 0.0):
+        """
+        成交更新（O(1)）
+
+        Args:
+            quantity: 成交数量（正数为买入，负数为卖出）
+        """
+        with self._lock:
+            self.cash -= quantity * price + commission
+            self._prices[stock_code] = float(price)
+            remaining = self._quantities.get(stock_code, 0) + int(quantity)
+            if remaining:
+                self._quantities[stock_code] = remaining
+            else:
+                self._quantities.pop(stock_code, None)
+            self._set_value(stock_code)
+            self._mark_equity()
+
+    def close_period(self, timestamp: datetime = None) -> float:
+        """
+        周期结束：记录权益曲线，把组合和持仓的周期收益率推入滚动窗口
+
+        Returns:
+            float: 组合本周期收益率（第一个周期为 0）
+        """
+        with self._lock:
+            equity = self.equity
+            if self._curve_len == len(self._curve):
+                self._curve = np.concatenate((self._curve, np.empty(len(self._curve), dtype=float)))
+            self._curve[self._curve_len] = equity
+            self._curve_len += 1
+            self.curve_times.append(timestamp or datetime.now())
+
+            period_return = 0.0
+            if self._period_equity is not None and self._period_equity > 0:
+                period_return = equity / self._period_equity - 1
+                self.returns.push(period_return)
+            self._period_equity = equity
+
+            for stock_code in self._quantities:
+                price, last = self._prices.get(stock_code), self._period_prices.get(stock_code)
+                if price and last:
+                    window = self.position_returns.get(stock_code)
+                    if window is None:
+                        window = self.position_returns[stock_code] = RollingWindow(self.window)
+                    window.push(price / last - 1)
+            self._period_prices = {code: self._prices[code] for code in self._quantities if self._prices.get(code)}
+            for stock_code in [code for code in self.position_returns if code not in self._quantities]:
+                del self.position_returns[stock_code]
+
+            self._metrics = None
+            return period_return
+
+    # ---------------- 事件引擎 ----------------
+
+    def attach(self, event_engine):
+        """订阅事件引擎的 TICK 和 FILL 事件"""
+        event_engine.register_listener(EventType.TICK, self.on_tick)
+        event_engine.register_listener(EventType.FILL, self.on_fill_event)
+
+    def detach(self, event_engine):
+        event_engine.unregister_listener(EventType.TICK, self.on_tick)
+        event_engine.unregister_listener(EventType.FILL, self.on_fill_event)
+
+    def on_tick(self, event):
+        self.on_price(event.stock_code, event.price)
+
+    def on_fill_event(self, event):
+        quantity = abs(event.quantity) if event.direction == 'buy' else -abs(event.quantity)
+        self.on_fill(event.stock_code, quantity, event.price, event.commission or 0.0)
+
+    # ---------------- 查询 ----------------
+
+    @property
+    def equity(self) -> float:
+        return self.cash + self._market_value
+
+    @property
+    def market_value(self) -> float:
+        return self._market_value
+
+    def equity_with(self, prices: Dict[str, float]) -> float:
+        """按给定价格（如拟下单价）估算的权益，只读，不改变持仓标价和回撤"""
+        with self._lock:
+            equity = self.equity
+            for stock_code, price in prices.items():
+                quantity = self._quantities.get(stock_code)
+                if quantity and price and price > 0:
+                    equity += quantity * float(price) - self._values.get(stock_code, 0.0)
+            return equity
+
+    @property
+    def quantities(self) -> Dict[str, int]:
+        return dict(self._quantities)
+
+    @property
+    def equity_curve(self) -> np.ndarray:
+        """各周期收盘的权益（只读视图）"""
+        curve = self._curve[:self._curve_len]
+        curve.setflags(write=False)
+        return curve
+
+    def position_weights(self) -> Dict[str, float]:
+        equity = self.equity
+        return {code: value / equity if equity > 0 else 0.0 for code, value in self._values.items()}
+
+    def sharpe_ratio(self, window: RollingWindow = None) -> float:
+        """滚动夏普比率（与 RiskManager.calculate_sharpe_ratio 口径一致）"""
+        window = window or self.returns
+        if len(window) < 2:
+            return 0.0
+        std = window.std()
+        if std == 0:
+            return 0.0
+        excess = window.mean() - self.risk_free_rate / self.periods_per_year
+        return excess / std * np.sqrt(self.periods_per_year)
+
+    def position_metrics(self, stock_code: str) -> Dict[str, float]:
+        """单个持仓的滚动风险指标"""
+        window = self.position_returns.get(stock_code)
+        if window is None:
+            return {'periods': 0, 'var': 0.0, 'volatility': 0.0, 'sharpe_ratio': 0.0}
+        return {
+            'periods': len(window),
+            'var': window.percentile(self.var_confidence * 100),
+            'volatility': window.std() * np.sqrt(self.periods_per_year),
+            'sharpe_ratio': self.sharpe_ratio(window),
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        """当前风险指标；结果缓存到下一次更新，重复读取为 O(1)"""
+        metrics = self._metrics
+        if metrics is not None:
+            return metrics
+        with self._lock:
+            equity = self.equity
+            max_value = max(self._values.values(), default=0.0)
+            metrics = {
+                'equity': equity,
+                'cash': self.cash,
+                'market_value': self._market_value,
+                'exposure_ratio': self._market_value / equity if equity > 0 else 0.0,
+                'positions': len(self._quantities),
+                'max_position_ratio': max_value / equity if equity > 0 else 0.0,
+                # 赫芬达尔指数：持仓市值占比的平方和，越大越集中
+                'concentration_hhi': self._value_sumsq / self._market_value ** 2 if self._market_value > 0 else 0.0,
+                'current_drawdown_ratio': 1 - equity / self.equity_peak if self.equity_peak > 0 else 0.0,
+                'max_drawdown': self.max_drawdown,
+                'max_drawdown_ratio': self.max_drawdown_ratio,
+                'periods': len(self.returns),
+                'var': self.returns.percentile(self.var_confidence * 100),
+                'var_amount': -self.returns.percentile(self.var_confidence * 100) * equity if len(self.returns) else 0.0,
+                'volatility': self.returns.std() * np.sqrt(self.periods_per_year),
+                'sharpe_ratio': self.sharpe_ratio(),
+            }
+            self._metrics = metrics
+        return metrics
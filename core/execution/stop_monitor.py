@@ -0,0 +1,188 @@
+"""
+事件驱动的逐笔止盈止损监控
+
+负责：
+1. 订阅 TICK 事件，只处理已布防的持仓股票
+2. 为每个持仓预先计算止盈/止损触发价，按价格排序存放，
+   每个 TICK 只需一次字典查找加二分查找（O(log n)）
+3. 价格穿越触发价时发出 ORDER 卖出事件，并撤防该股票，避免重复下单
+
+设计特点：
+- 触发价在布防时一次算好，TICK 处理中不再查询数据库或重构持仓
+- 同一股票可以有多档止盈/止损（按价格排序），穿越时取最远的一档
+- 监控本身不下单，由 ORDER 事件的监听器决定如何执行
+"""
+
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from core.event import Event, EventType, OrderEvent, TickEvent
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StopLevel:
+    """一档触发价"""
+    price: float
+    target: float      # 对应的收益率阈值
+    reason: str
+
+
+@dataclass
+class _ThresholdBook:
+    """单只股票的触发价表（按价格升序）"""
+    quantity: int
+    avg_cost: float
+    upper: List[StopLevel] = field(default_factory=list)    # 价格 >= 触发价时触发（止盈）
+    lower: List[StopLevel] = field(default_factory=list)    # 价格 <= 触发价时触发（止损）
+    upper_prices: List[float] = field(default_factory=list)
+    lower_prices: List[float] = field(default_factory=list)
+
+    def add(self, level: StopLevel, above: bool):
+        levels, prices = (self.upper, self.upper_prices) if above else (self.lower, self.lower_prices)
+        idx = bisect_left(prices, level.price)
+        prices.insert(idx, level.price)
+        levels.insert(idx, level)
+
+    def crossed(self, price: float) -> Optional[StopLevel]:
+        """返回被穿越的最远一档触发价，没有穿越时返回 None"""
+        idx = bisect_right(self.upper_prices, price)
+        if idx > 0:
+            return self.upper[idx - 1]
+        idx = bisect_left(self.lower_prices, price)
+        if idx < len(self.lower_prices):
+            return self.lower[idx]
+        return None
+
+
+class TickStopMonitor:
+    """逐笔止盈止损监控"""
+
+    def __init__(self, event_engine, profit_target: float = 0.20, cx_profit_bonus: float = 0.10,
+                 stop_loss: float = -0.15):
+        """
+        Args:
+            event_engine: 事件引擎
+            profit_target: 普通持仓的止盈收益率
+            cx_profit_bonus: CX长线持仓在普通止盈基础上增加的收益率（默认 20% + 10% = 30%）
+            stop_loss: 止损收益率（负数）
+        """
+        self.event_engine = event_engine
+        self.profit_target = profit_target
+        self.cx_profit_bonus = cx_profit_bonus
+        self.stop_loss = stop_loss
+
+        self._books: Dict[str, _ThresholdBook] = {}
+        self._lock = threading.Lock()
+        self.stats = {'ticks': 0, 'checked': 0, 'orders': 0}
+
+        event_engine.register_listener(EventType.TICK, self.on_tick)
+
+    @property
+    def symbols(self) -> List[str]:
+        """当前已布防的股票（TICK 数据源只需要推送这些股票）"""
+        with self._lock:
+            return list(self._books.keys())
+
+    def arm(self, stock_code: str, avg_cost: float, quantity: int, is_cx: bool = False):
+        """
+        为一只持仓布防
+
+        Args:
+            stock_code: 股票代码
+            avg_cost: 持仓平均成本
+            quantity: 触发时卖出的数量
+            is_cx: 是否为CX长线持仓（使用更高的止盈目标）
+        """
+        if avg_cost <= 0 or quantity <= 0:
+            self.disarm(stock_code)
+            return
+
+        profit_target = self.profit_target + (self.cx_profit_bonus if is_cx else 0.0)
+        profit_prefix = "秒级长线止盈" if is_cx else "秒级止盈"
+
+        book = _ThresholdBook(quantity=quantity, avg_cost=avg_cost)
+        book.add(StopLevel(avg_cost * (1 + profit_target), profit_target, profit_prefix), above=True)
+        book.add(StopLevel(avg_cost * (1 + self.stop_loss), self.stop_loss, "秒级止损"), above=False)
+
+        with self._lock:
+            self._books[stock_code] = book
+
+    def disarm(self, stock_code: str):
+        with self._lock:
+            self._books.pop(stock_code, None)
+
+    def sync_positions(self, account, cx_holdings: Iterable[str] = (), eligible: Iterable[str] = None) -> int:
+        """
+        按账户当前持仓重新布防（持仓或CX名单变化后调用）
+
+        只有可卖数量大于0、且今日没有买入（T+1）的持仓会被布防
+
+        Args:
+            account: 账户对象
+            cx_holdings: CX长线持仓代码
+            eligible: 允许监控的股票代码，None 表示全部持仓
+
+        Returns:
+            int: 布防的股票数量
+        """
+        cx_holdings = set(cx_holdings)
+        eligible = None if eligible is None else set(eligible)
+
+        books = {}
+        for stock_code, position in list(account.positions.items()):
+            if eligible is not None and stock_code not in eligible:
+                continue
+            if account.get_today_bought(stock_code):
+                continue
+            closeable = account.get_closeable_amount(stock_code)
+            if closeable <= 0 or position.avg_cost <= 0:
+                continue
+            books[stock_code] = (position.avg_cost, closeable, stock_code in cx_holdings)
+
+        with self._lock:
+            self._books.clear()
+        for stock_code, (avg_cost, quantity, is_cx) in books.items():
+            self.arm(stock_code, avg_cost, quantity, is_cx)
+
+        logger.info(f"止盈止损监控已布防 {len(books)} 只股票")
+        return len(books)
+
+    def on_tick(self, event: Event):
+        """TICK 事件处理：O(1) 查找持仓，O(log n) 判断是否穿越触发价"""
+        self.stats['ticks'] += 1
+        if isinstance(event, TickEvent):
+            stock_code, price = event.stock_code, event.price
+        else:
+            stock_code = event.data.get('stock_code')
+            price = event.data.get('price')
+        if price is None:
+            return
+
+        with self._lock:
+            book = self._books.get(stock_code)
+            if book is None:
+                return
+            self.stats['checked'] += 1
+            level = book.crossed(price)
+            if level is None:
+                return
+            # 触发后立即撤防，避免后续 TICK 重复下单
+            del self._books[stock_code]
+
+        pnl_ratio = price / book.avg_cost - 1
+        if level.target >= 0:
+            reason = f"{level.reason}(收益率 {pnl_ratio:.2%}, 目标 {level.target:.2%})"
+        else:
+            reason = f"{level.reason}(收益率 {pnl_ratio:.2%})"
+
+        order = OrderEvent(stock_code, "market", book.quantity, price=price, direction="sell",
+                           timestamp=event.timestamp)
+        order.reason = reason
+        self.stats['orders'] += 1
+        logger.info(f"{stock_code} 触发 {reason}，发出卖出订单 {book.quantity} 股")
+        self.event_engine.put_event(order)
@@ -0,0 +1,180 @@
+"""
+批量ATR波动率服务
+
+负责：
+1. 一次查询取出一批候选股各自最近 N+1 根日线（窗口函数按股票取最后几行），
+   不再逐只加载全部历史
+2. 一次向量化计算所有股票的 ATR / 收盘价（相对波动率）
+3. 结果按 (日期, N) 缓存，同一次分析中各板块、各分配函数共用
+
+计算口径与 portfolio_manager.get_atr_volatility 一致：
+- TR = max(最高-最低, |昨收-最高|, |昨收-最低|)，ATR 为最近 N 个 TR 的简单平均（保留3位小数）
+- 相对波动率 = ATR / 最新收盘价，最小 1%
+- 数据不足或收盘价无效时使用默认波动率 2%
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VOLATILITY = 0.02
+MIN_VOLATILITY = 0.01
+
+
+def compute_atr_volatility(bars: pd.DataFrame, period: int = 14) -> pd.Series:
+    """
+    向量化计算每只股票的相对ATR波动率
+
+    Args:
+        bars: 包含 stock_code, trade_date, high, low, close 的日线数据（可包含多只股票）
+        period: ATR计算周期
+
+    Returns:
+        pd.Series: 股票代码到相对波动率的映射（只包含数据足够的股票）
+    """
+    if bars.empty:
+        return pd.Series(dtype=float)
+
+    bars = bars.sort_values(['stock_code', 'trade_date'])
+    prev_close = bars.groupby('stock_code')['close'].shift(1)
+    tr = np.maximum(bars['high'] - bars['low'],
+                    np.maximum((prev_close - bars['high']).abs(), (prev_close - bars['low']).abs()))
+
+    # 每只股票最近 period 个有效TR
+    frame = pd.DataFrame({'stock_code': bars['stock_code'], 'tr': tr}).dropna()
+    recent = frame.groupby('stock_code').tail(period).groupby('stock_code')['tr']
+    atr = recent.mean().round(3)
+    counts = recent.count()
+    atr = atr[counts >= period]
+
+    last_close = bars.groupby('stock_code')['close'].last().reindex(atr.index)
+    volatility = (atr / last_close).where(last_close > 0, DEFAULT_VOLATILITY)
+    return volatility.clip(lower=MIN_VOLATILITY)
+
+
+class VolatilityService:
+    """批量ATR波动率（按日期和周期缓存）"""
+
+    def __init__(self, db_manager=None, max_cached_dates: int = 8, chunk_size: int = 500):
+        """
+        Args:
+            db_manager: 数据库管理器（需要 execute_query），默认使用 DatabaseManager
+            max_cached_dates: 最多缓存的 (日期, 周期) 组数，超出后淘汰最早使用的
+            chunk_size: 单次查询的股票数量上限（SQLite 参数个数限制）
+        """
+        self._db_manager = db_manager
+        self.max_cached_dates = max_cached_dates
+        self.chunk_size = chunk_size
+
+        self._cache: "OrderedDict[Tuple[str, int], Dict[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'queries': 0}
+
+    @property
+    def db_manager(self):
+        if self._db_manager is None:
+            from data_management.database_manager import DatabaseManager
+            self._db_manager = DatabaseManager()
+        return self._db_manager
+
+    def _load_bars(self, stock_codes, current_date: str, bars: int) -> pd.DataFrame:
+        """一次查询取出每只股票截至 current_date 的最后 bars 根日线"""
+        # 用"小于次日"而不是"小于等于当日"，兼容带时间部分的日期字符串
+        next_day = (pd.to_datetime(current_date) + timedelta(days=1)).strftime('%Y-%m-%d')
+        frames = []
+        for start in range(0, len(stock_codes), self.chunk_size):
+            chunk = stock_codes[start:start + self.chunk_size]
+            params = {f"c{i}": code for i, code in enumerate(chunk)}
+            placeholders = ', '.join(f":{name}" for name in params)
+            params.update({'next_day': next_day, 'bars': bars})
+            query = f"""
+                SELECT stock_code, trade_date, high, low, close FROM (
+                    SELECT stock_code, trade_date, high, low, close,
+                           ROW_NUMBER() OVER (PARTITION BY stock_code ORDER BY trade_date DESC) AS rn
+                    FROM k_daily
+                    WHERE stock_code IN ({placeholders}) AND trade_date < :next_day
+                )
+                WHERE rn <= :bars
+            """
+            frames.append(self.db_manager.execute_query(query, params))
+            self.stats['queries'] += 1
+        frames = [f for f in frames if f is not None and not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=['stock_code', 'trade_date', 'high', 'low', 'close'])
+        return pd.concat(frames, ignore_index=True)
+
+    def get_volatilities(self, stock_codes: Iterable[str], current_date, period: int = 14) -> Dict[str, float]:
+        """
+        获取一批股票的相对ATR波动率
+
+        缓存中没有的股票合并为一次查询、一次计算
+
+        Args:
+            stock_codes: 股票代码列表
+            current_date: 当前日期（回测日期），字符串或日期对象
+            period: ATR计算周期
+
+        Returns:
+            Dict[str, float]: 股票代码到波动率的映射（数据不足的为默认波动率）
+        """
+        codes = list(dict.fromkeys(str(code) for code in stock_codes))
+        if isinstance(current_date, datetime):
+            current_date = current_date.strftime('%Y-%m-%d')
+        key = (str(current_date)[:10], period)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is None:
+                cached = self._cache[key] = {}
+                while len(self._cache) > self.max_cached_dates:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(key)
+
+            missing = [code for code in codes if code not in cached]
+            self.stats['hits'] += len(codes) - len(missing)
+            self.stats['misses'] += len(missing)
+
+            if missing:
+                try:
+                    volatility = compute_atr_volatility(self._load_bars(missing, key[0], period + 1), period)
+                except Exception as e:
+                    logger.error(f"批量计算ATR波动率失败: {e}")
+                    volatility = pd.Series(dtype=float)
+                for code in missing:
+                    value = volatility.get(code)
+                    if value is None or pd.isna(value):
+                        logger.warning(f"{code} 数据不足，使用默认波动率")
+                        value = DEFAULT_VOLATILITY
+                    cached[code] = float(value)
+
+            return {code: cached[code] for code in codes}
+
+    def get_volatility(self, stock_code: str, current_date, period: int = 14) -> float:
+        """获取单只股票的相对ATR波动率"""
+        return self.get_volatilities([stock_code], current_date, period)[str(stock_code)]
+
+    def clear(self):
+        """清空缓存（日线数据更新后调用）"""
+        with self._lock:
+            self._cache.clear()
+
+
+_default_service = None
+_default_service_lock = threading.Lock()
+
+
+def get_volatility_service() -> VolatilityService:
+    """进程内共享的波动率服务"""
+    global _default_service
+    with _default_service_lock:
+        if _default_service is None:
+            _default_service = VolatilityService()
+        return _default_service
@@ -65,24 +65,18 @@ class StockTechnicalAnalyzer:
         """
         try:
             # 获取各周期数据 - 使用与quant_cur相同的方式
-            from data_management.data_processor import get_daily_data_for_backtest, get_weekly_data_for_backtest, get_monthly_data_for_backtest
+            from data_management.data_processor import get_multi_period_data_for_backtest
             
             db_manager = self._get_shared_db_manager()
-            df_daily = get_daily_data_for_backtest(stock_code, date, db_manager)
-            df_weekly = get_weekly_data_for_backtest(stock_code, date, db_manager)
-            df_monthly = get_monthly_data_for_backtest(stock_code, date, db_manager)
+            data_dict = get_multi_period_data_for_backtest(stock_code, date, db_manager)
             
             # 检查数据是否足够
-            if df_daily.empty or df_weekly.empty or df_monthly.empty:
+            if any(df.empty for df in data_dict.values()):
                 print(f"警告：股票 {stock_code} 的数据不足，跳过分析")
                 return None
             
-            # 返回数据字典
-            return {
-                'daily': df_daily,
-                'weekly': df_weekly,
-                'monthly': df_monthly
-            }
+            # 返回数据字典（各周期为只读快照视图）
+            return data_dict
             
         except Exception as e:
             print(f"为股票 {stock_code} 准备技术数据失败: {e}")
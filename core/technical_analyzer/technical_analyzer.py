@@ -8,7 +8,7 @@ from pandas.core.nanops import F
 from core.utils.indicators import *
 import datetime
 import time
-from data_management.data_processor import get_monthly_data_for_backtest, get_weekly_data_for_backtest, get_daily_data_for_backtest, update_and_load_data_daily, update_and_load_data_weekly, update_and_load_data_monthly
+from data_management.data_processor import get_monthly_data_for_backtest, get_weekly_data_for_backtest, get_daily_data_for_backtest, get_multi_period_data_for_backtest, update_and_load_data_daily, update_and_load_data_weekly, update_and_load_data_monthly
 
 
 class TechnicalAnalyzer:
@@ -749,19 +749,9 @@ def prepare_data_for_backtest(stock_code: str, date: str) -> dict:
     """
     print(f"\n[数据准备-回测模式]: 为 {stock_code} 加载 {date} 的历史数据...")
     
-    # 调用我们之前设计的快速加载函数
-    df_M = get_monthly_data_for_backtest(stock_code, date)
-    df_w = get_weekly_data_for_backtest(stock_code, date)
-    df_d = get_daily_data_for_backtest(stock_code, date)
+    # 调用快照加载函数：各周期返回截至date的只读视图，TechnicalAnalyzer 中的 zhibiao 会先复制再计算指标
     # fundamentals = ...
-    
-    # 将所有数据打包成一个字典返回
-    return {
-        "monthly": df_M,
-        "daily": df_d,
-        "weekly": df_w,
-        # "fundamentals": fundamentals
-    }
+    return get_multi_period_data_for_backtest(stock_code, date)
 
 def prepare_data_for_live(stock_code: str) -> dict:
     """
@@ -0,0 +1,294 @@
+"""
+轻量级依赖感知任务调度器（DAG）
+
+负责：
+1. 按依赖关系调度任务，互不依赖的任务并行执行
+2. 基于内容寻址的任务输出判断任务是否需要重跑
+3. 记录每个任务的运行耗时和状态，部分失败时只重跑失败及其下游任务
+
+设计特点：
+- 任务的"输入键" = 任务名 + 版本 + 输入指纹 + 上游任务的输出摘要
+- 输入键与上次成功运行时一致则跳过任务，直接复用上次的输出摘要
+- 运行状态持久化到 JSON 文件，进程重启后依然有效
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Dict, List, Callable, Any, Optional
+
+from .logger import get_logger
+
+logger = get_logger("utils.dag_runner")
+
+
+def content_digest(value: Any) -> str:
+    """计算任意可JSON序列化对象的内容摘要"""
+    payload = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+@dataclass
+class Task:
+    """
+    DAG 中的一个任务节点
+
+    Attributes:
+        name: 任务名称（唯一）
+        func: 任务函数，接收上游任务结果字典 {上游任务名: 返回值}；
+              上游任务被跳过时传入其上次成功运行的返回值（不可JSON序列化的返回值为None）
+        deps: 上游任务名称列表
+        fingerprint: 返回任务外部输入状态的函数（如数据文件、数据表最新日期），为None表示无外部输入
+        output: 返回任务输出状态的函数，用于计算输出摘要；为None时使用任务返回值
+        version: 任务逻辑版本，修改任务实现后递增即可强制重跑
+        exclusive: 互斥组名称，同组任务不会同时运行（如写同一个 SQLite 数据库的任务）
+    """
+    name: str
+    func: Callable[[Dict[str, Any]], Any]
+    deps: List[str] = field(default_factory=list)
+    fingerprint: Optional[Callable[[], Any]] = None
+    output: Optional[Callable[[], Any]] = None
+    version: str = "1"
+    exclusive: Optional[str] = None
+
+
+@dataclass
+class TaskResult:
+    """任务运行结果"""
+    name: str
+    status: str  # success / skipped / failed / blocked
+    duration: float = 0.0
+    input_key: str = ""
+    output_digest: str = ""
+    value: Any = None
+    error: str = ""
+
+
+class DagRunner:
+    """依赖感知任务调度器"""
+
+    def __init__(self, state_path: str = None, max_workers: int = 4):
+        """
+        Args:
+            state_path: 运行状态文件路径，默认为 databases/dag_state.json
+            max_workers: 最大并行任务数
+        """
+        if state_path is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            state_path = os.path.join(project_root, 'databases', 'dag_state.json')
+        self.state_path = state_path
+        self.max_workers = max_workers
+        self._tasks: Dict[str, Task] = {}
+        self._state: Dict[str, Dict[str, Any]] = self._load_state()
+        self._lock = threading.Lock()
+
+    # ---------------- 任务注册 ----------------
+
+    def add_task(self, task: Task) -> 'DagRunner':
+        """注册任务"""
+        if task.name in self._tasks:
+            raise ValueError(f"任务已存在: {task.name}")
+        self._tasks[task.name] = task
+        return self
+
+    def task(self, name: str, deps: List[str] = None, fingerprint: Callable[[], Any] = None,
+             output: Callable[[], Any] = None, version: str = "1", exclusive: str = None):
+        """装饰器形式注册任务"""
+        def decorator(func):
+            self.add_task(Task(name, func, list(deps or []), fingerprint, output, version, exclusive))
+            return func
+        return decorator
+
+    def topological_order(self) -> List[str]:
+        """返回任务的拓扑顺序，检查缺失依赖和环"""
+        order, visiting, visited = [], set(), set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"任务依赖存在环: {name}")
+            if name not in self._tasks:
+                raise ValueError(f"依赖的任务不存在: {name}")
+            visiting.add(name)
+            for dep in self._tasks[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+            order.append(name)
+
+        for name in self._tasks:
+            visit(name)
+        return order
+
+    # ---------------- 状态持久化 ----------------
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取任务状态失败，将全部重新运行: {e}")
+            return {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def get_task_state(self, name: str) -> Dict[str, Any]:
+        """获取任务最近一次运行的状态（输入键、输出摘要、耗时等）"""
+        return dict(self._state.get(name, {}))
+
+    def invalidate(self, name: str = None):
+        """使任务（默认全部任务）失效，下次运行时强制重跑"""
+        with self._lock:
+            if name is None:
+                self._state.clear()
+            else:
+                self._state.pop(name, None)
+            self._save_state()
+
+    # ---------------- 执行 ----------------
+
+    def _input_key(self, task: Task, results: Dict[str, TaskResult]) -> str:
+        external = task.fingerprint() if task.fingerprint else None
+        upstream = {dep: results[dep].output_digest for dep in task.deps}
+        return content_digest({'name': task.name, 'version': task.version,
+                               'input': external, 'upstream': upstream})
+
+    def _execute(self, task: Task, results: Dict[str, TaskResult], force: bool) -> TaskResult:
+        try:
+            input_key = self._input_key(task, results)
+        except Exception as e:
+            return TaskResult(task.name, 'failed', error=f"计算输入指纹失败: {e}")
+
+        previous = self._state.get(task.name, {})
+        if not force and previous.get('status') == 'success' and previous.get('input_key') == input_key:
+            logger.info(f"[DAG] {task.name}: 输入未变化，跳过")
+            return TaskResult(task.name, 'skipped', input_key=input_key,
+                              output_digest=previous.get('output_digest', ''), value=previous.get('value'))
+
+        logger.info(f"[DAG] {task.name}: 开始运行")
+        start = time.perf_counter()
+        try:
+            value = task.func({dep: results[dep].value for dep in task.deps})
+            output_state = task.output() if task.output else value
+            duration = time.perf_counter() - start
+            logger.info(f"[DAG] {task.name}: 完成，耗时 {duration:.2f}s")
+            return TaskResult(task.name, 'success', duration, input_key, content_digest(output_state), value)
+        except Exception as e:
+            duration = time.perf_counter() - start
+            logger.error(f"[DAG] {task.name}: 失败，耗时 {duration:.2f}s: {e}")
+            return TaskResult(task.name, 'failed', duration, input_key, error=str(e))
+
+    @staticmethod
+    def _serializable(value: Any) -> Any:
+        """任务返回值可JSON序列化时随状态保存，供跳过该任务时的下游任务使用"""
+        try:
+            json.dumps(value, ensure_ascii=False)
+            return value
+        except (TypeError, ValueError):
+            return None
+
+    def _record(self, result: TaskResult):
+        with self._lock:
+            entry = self._state.get(result.name, {})
+            entry['last_status'] = result.status
+            entry['last_run_at'] = datetime.now().isoformat(timespec='seconds')
+            if result.status == 'success':
+                entry.update({'status': 'success', 'input_key': result.input_key,
+                              'output_digest': result.output_digest, 'duration': round(result.duration, 4),
+                              'value': self._serializable(result.value)})
+            elif result.status in ('failed', 'blocked'):
+                # 失败的任务下次必须重跑，但保留上次成功的输出摘要供排查
+                entry['status'] = result.status
+                entry['error'] = result.error
+                if result.status == 'failed':
+                    entry['duration'] = round(result.duration, 4)
+            self._state[result.name] = entry
+            self._save_state()
+
+    def run(self, targets: List[str] = None, force: bool = False) -> Dict[str, TaskResult]:
+        """
+        运行 DAG
+
+        Args:
+            targets: 只运行这些任务及其上游任务，默认运行全部
+            force: 忽略缓存，强制运行所有任务
+
+        Returns:
+            Dict[str, TaskResult]: 每个任务的运行结果
+        """
+        order = self.topological_order()
+        if targets:
+            needed = set()
+            stack = list(targets)
+            while stack:
+                name = stack.pop()
+                if name in needed:
+                    continue
+                if name not in self._tasks:
+                    raise ValueError(f"任务不存在: {name}")
+                needed.add(name)
+                stack.extend(self._tasks[name].deps)
+            order = [name for name in order if name in needed]
+
+        results: Dict[str, TaskResult] = {}
+        pending = list(order)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                # 上游失败的任务直接标记为阻塞
+                for name in list(pending):
+                    bad = [d for d in self._tasks[name].deps
+                           if d in results and results[d].status in ('failed', 'blocked')]
+                    if bad:
+                        pending.remove(name)
+                        result = TaskResult(name, 'blocked', error=f"上游任务失败: {', '.join(bad)}")
+                        results[name] = result
+                        self._record(result)
+                        logger.warning(f"[DAG] {name}: 上游任务失败，跳过")
+
+                # 提交所有依赖已完成、且互斥组空闲的任务
+                busy = {self._tasks[name].exclusive for name in running.values()} - {None}
+                for name in list(pending):
+                    task = self._tasks[name]
+                    if all(d in results for d in task.deps) and task.exclusive not in busy:
+                        pending.remove(name)
+                        running[executor.submit(self._execute, task, results, force)] = name
+                        if task.exclusive is not None:
+                            busy.add(task.exclusive)
+
+                if not running:
+                    continue
+
+                done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    result = future.result()
+                    results[name] = result
+                    self._record(result)
+
+        return results
+
+    @staticmethod
+    def summarize(results: Dict[str, TaskResult]) -> str:
+        """生成运行结果摘要"""
+        lines = [f"{'任务':<24} {'状态':<10} {'耗时(s)':>10}"]
+        for name, result in results.items():
+            line = f"{name:<24} {result.status:<10} {result.duration:>10.2f}"
+            if result.error:
+                line += f"  {result.error}"
+            lines.append(line)
+        return "\n".join(lines)
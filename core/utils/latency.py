@@ -0,0 +1,356 @@
+"""
+交易循环延迟埋点
+
+负责：
+1. 按"时段（slot）→ 阶段（stage）"记录耗时：
+   - slot：一次定时任务的完整执行（例如 10:05 的买入分析），记录总耗时和可用预算（距下一个时段的时间）
+   - span：slot 内的一个阶段（数据加载、指标计算、信号判断、仓位分配、数据库写入、订单发送），可按板块区分
+2. 耗时先缓存在内存，时段结束时一次批量写入本地 SQLite 指标库
+3. 报表：按 时段/阶段/板块 统计 p50 / p95 / max，以及每次时段执行占预算的比例，
+   用于发现分析任务是否有挤占下一个时段的风险
+
+用法：
+    LATENCY = get_latency_recorder()
+
+    @LATENCY.timed_slot('daily_buy', DAILY_ANALYSIS_TIMES)
+    def run_daily_buy_analysis():
+        with LATENCY.span('data_load'):
+            ...
+        watch = LATENCY.stopwatch(pool=pool_name)   # 适合包含 continue 的循环体
+        ...
+        watch.lap('allocation')
+
+报表：python -m core.utils.latency [--since 2024-01-01] [--db 路径]
+"""
+
+import functools
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+from core.utils.logger import get_logger
+
+logger = get_logger("core.utils.latency")
+
+# 标准阶段名称
+STAGES = ('data_load', 'indicator', 'signal', 'allocation', 'db_write', 'order_publish')
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                               'databases', 'latency_metrics.db')
+
+
+def seconds_until_next(schedule_times: Iterable[str], now: datetime) -> Optional[float]:
+    """距离当天下一个定时时间点（HH:MM）的秒数，已是最后一个时间点时返回 None"""
+    upcoming = []
+    for t in schedule_times:
+        hour, minute = map(int, t.split(':'))
+        candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate > now:
+            upcoming.append(candidate)
+    if not upcoming:
+        return None
+    return (min(upcoming) - now).total_seconds()
+
+
+class Stopwatch:
+    """连续计时：每次 lap 记录距上一次 lap（或创建时）的耗时"""
+
+    def __init__(self, recorder: 'LatencyRecorder', pool: str = None):
+        self.recorder = recorder
+        self.pool = pool
+        self._last = recorder.clock()
+
+    def lap(self, stage: str, pool: str = None) -> float:
+        now = self.recorder.clock()
+        elapsed = now - self._last
+        self._last = now
+        self.recorder.record(stage, elapsed, pool=pool or self.pool)
+        return elapsed
+
+    def reset(self):
+        """重新开始计时（跳过不需要记录的部分）"""
+        self._last = self.recorder.clock()
+
+
+class LatencyRecorder:
+    """延迟记录器"""
+
+    def __init__(self, db_path: str = None, enabled: bool = True, flush_size: int = 200,
+                 clock=time.perf_counter, now_func=datetime.now):
+        """
+        Args:
+            db_path: 指标库路径，默认 databases/latency_metrics.db
+            enabled: 是否启用（关闭时 span/slot 不做任何记录）
+            flush_size: 时段之外记录的 span 累计到该数量时写入一次
+            clock: 计时函数（单调时钟）
+            now_func: 当前时间函数（测试时可替换）
+        """
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self.enabled = enabled
+        self.flush_size = flush_size
+        self.clock = clock
+        self.now_func = now_func
+
+        self._local = threading.local()
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    # ---------------- 存储 ----------------
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        if not self._initialized:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS latency_spans (
+                    run_id TEXT,
+                    slot TEXT,
+                    slot_time TEXT,
+                    stage TEXT,
+                    pool TEXT,
+                    started_at TEXT,
+                    duration_ms REAL,
+                    status TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS latency_slots (
+                    run_id TEXT PRIMARY KEY,
+                    slot TEXT,
+                    slot_time TEXT,
+                    started_at TEXT,
+                    duration_ms REAL,
+                    budget_ms REAL,
+                    status TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_latency_spans_started ON latency_spans (started_at)")
+            self._initialized = True
+        return conn
+
+    def flush(self):
+        """把缓存的 span 写入指标库"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT INTO latency_spans VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.close()
+        except Exception as e:
+            logger.error(f"写入延迟指标失败: {e}")
+
+    def _save_slot(self, row: tuple):
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO latency_slots VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            conn.close()
+        except Exception as e:
+            logger.error(f"写入时段指标失败: {e}")
+
+    # ---------------- 记录 ----------------
+
+    @property
+    def current_slot(self) -> Optional[dict]:
+        return getattr(self._local, 'slot', None)
+
+    def record(self, stage: str, seconds: float, pool: str = None, status: str = 'ok',
+               started_at: datetime = None):
+        """记录一个阶段的耗时（秒）"""
+        if not self.enabled:
+            return
+        slot = self.current_slot or {}
+        started_at = started_at or (self.now_func() - timedelta(seconds=seconds))
+        row = (slot.get('run_id', ''), slot.get('name', ''), slot.get('slot_time', ''), stage, pool or '',
+               started_at.strftime('%Y-%m-%d %H:%M:%S.%f'), seconds * 1000.0, status)
+        with self._lock:
+            self._pending.append(row)
+            should_flush = not slot and len(self._pending) >= self.flush_size
+        if should_flush:
+            self.flush()
+
+    @contextmanager
+    def span(self, stage: str, pool: str = None):
+        """记录一个阶段的耗时（异常时状态为 error，异常照常抛出）"""
+        if not self.enabled:
+            yield
+            return
+        started_at = self.now_func()
+        start = self.clock()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            self.record(stage, self.clock() - start, pool=pool, status=status, started_at=started_at)
+
+    def stopwatch(self, pool: str = None) -> Stopwatch:
+        return Stopwatch(self, pool)
+
+    @contextmanager
+    def slot(self, name: str, budget_seconds: float = None):
+        """
+        记录一次定时任务的完整执行
+
+        Args:
+            name: 任务名称（如 daily_buy）
+            budget_seconds: 可用时间（距下一个时段），超出时记录警告
+        """
+        if not self.enabled:
+            yield
+            return
+        started_at = self.now_func()
+        slot = {'run_id': uuid.uuid4().hex, 'name': name, 'slot_time': started_at.strftime('%H:%M')}
+        outer = self.current_slot
+        self._local.slot = slot
+        start = self.clock()
+        status = 'ok'
+        try:
+            yield slot
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            elapsed = self.clock() - start
+            self._local.slot = outer
+            budget_ms = budget_seconds * 1000.0 if budget_seconds else None
+            self.flush()
+            self._save_slot((slot['run_id'], name, slot['slot_time'],
+                             started_at.strftime('%Y-%m-%d %H:%M:%S.%f'), elapsed * 1000.0, budget_ms, status))
+            if budget_seconds and elapsed > budget_seconds:
+                logger.warning(f"{name}@{slot['slot_time']} 耗时 {elapsed:.1f}s，超出下一个时段前的可用时间 {budget_seconds:.0f}s")
+            else:
+                logger.info(f"{name}@{slot['slot_time']} 耗时 {elapsed:.2f}s")
+
+    def timed_slot(self, name: str, schedule_times: Iterable[str] = None):
+        """
+        装饰器：函数每次执行记录为一个时段
+
+        Args:
+            schedule_times: 定时时间点列表（HH:MM），用于计算距下一个时段的可用时间
+        """
+        schedule_times = list(schedule_times) if schedule_times else []
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                budget = seconds_until_next(schedule_times, self.now_func()) if schedule_times else None
+                with self.slot(name, budget):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # ---------------- 报表 ----------------
+
+    def _read(self, query: str, params=()) -> pd.DataFrame:
+        self.flush()
+        if not os.path.exists(self.db_path):
+            return pd.DataFrame()
+        conn = self._connect()
+        try:
+            return pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
+
+    def report(self, since: str = None, slot: str = None) -> pd.DataFrame:
+        """
+        按 时段/阶段/板块 统计耗时
+
+        Returns:
+            pd.DataFrame: slot, stage, pool, count, p50_ms, p95_ms, max_ms, errors
+        """
+        query = "SELECT slot, stage, pool, duration_ms, status FROM latency_spans WHERE started_at >= ?"
+        params = [since or '']
+        if slot:
+            query += " AND slot = ?"
+            params.append(slot)
+        df = self._read(query, params)
+        columns = ['slot', 'stage', 'pool', 'count', 'p50_ms', 'p95_ms', 'max_ms', 'errors']
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+        grouped = df.groupby(['slot', 'stage', 'pool'])
+        result = grouped['duration_ms'].agg(
+            count='count',
+            p50_ms=lambda s: s.quantile(0.5),
+            p95_ms=lambda s: s.quantile(0.95),
+            max_ms='max',
+        )
+        result['errors'] = grouped['status'].apply(lambda s: int((s != 'ok').sum()))
+        return result.reset_index()[columns]
+
+    def slot_report(self, since: str = None) -> pd.DataFrame:
+        """
+        按 任务/时间点 统计每次执行的总耗时和占预算比例
+
+        Returns:
+            pd.DataFrame: slot, slot_time, runs, p50_ms, p95_ms, max_ms, budget_ms, max_utilization
+        """
+        df = self._read("SELECT * FROM latency_slots WHERE started_at >= ?", [since or ''])
+        columns = ['slot', 'slot_time', 'runs', 'p50_ms', 'p95_ms', 'max_ms', 'budget_ms', 'max_utilization']
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+        df['utilization'] = df['duration_ms'] / df['budget_ms']
+        result = df.groupby(['slot', 'slot_time']).agg(
+            runs=('duration_ms', 'count'),
+            p50_ms=('duration_ms', lambda s: s.quantile(0.5)),
+            p95_ms=('duration_ms', lambda s: s.quantile(0.95)),
+            max_ms=('duration_ms', 'max'),
+            budget_ms=('budget_ms', 'min'),
+            max_utilization=('utilization', 'max'),
+        )
+        return result.reset_index()[columns]
+
+    def print_report(self, since: str = None):
+        """打印延迟报表"""
+        slots = self.slot_report(since)
+        spans = self.report(since)
+        print(f"\n{'='*30} 交易循环延迟报表 {'='*30}")
+        if slots.empty and spans.empty:
+            print("暂无延迟数据")
+            return
+        with pd.option_context('display.width', 200, 'display.max_rows', 500, 'display.float_format', '{:.1f}'.format):
+            if not slots.empty:
+                print("\n--- 各时段总耗时 (ms) ---")
+                print(slots.to_string(index=False))
+                risky = slots[slots['max_utilization'] > 0.8]
+                for row in risky.itertuples(index=False):
+                    print(f"⚠️  {row.slot}@{row.slot_time} 最长耗时占可用时间 {row.max_utilization:.0%}，有挤占下一个时段的风险")
+            if not spans.empty:
+                print("\n--- 各阶段耗时 (ms) ---")
+                print(spans.to_string(index=False))
+
+
+_default_recorder = None
+_default_recorder_lock = threading.Lock()
+
+
+def get_latency_recorder() -> LatencyRecorder:
+    """进程内共享的延迟记录器"""
+    global _default_recorder
+    with _default_recorder_lock:
+        if _default_recorder is None:
+            _default_recorder = LatencyRecorder()
+        return _default_recorder
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='交易循环延迟报表')
+    parser.add_argument('--since', default=None, help='起始日期，如 2024-01-01')
+    parser.add_argument('--db', default=None, help='指标库路径')
+    args = parser.parse_args()
+    LatencyRecorder(db_path=args.db).print_report(args.since)
@@ -0,0 +1,280 @@
+"""
+策略回调与事件监听器的耗时剖析
+
+负责：
+1. 统计每个策略回调（on_bar/on_tick/on_signal/on_order/on_fill）的调用次数、错误数、累计/平均/最大耗时
+2. 可选的采样 cProfile：每个回调每 sample_every 次调用用 cProfile 完整记录一次，定位回调内部的热点
+3. 汇总事件引擎各监听器的耗时统计（EventEngine.get_listener_metrics）
+4. 进程退出时导出报表（CSV + cProfile 数据），找出占用事件循环时间最多的策略和监听器
+
+默认关闭，关闭时每次回调只多一次属性判断。开启方式：
+    环境变量 QUANT_PROFILE=1（QUANT_PROFILE_SAMPLE=100 开启采样 cProfile）
+    或在代码中 get_profiler().enable(sample_every=100)
+
+报表：python -m core.utils.profiling [--dir 报表目录]
+"""
+
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from core.utils.logger import get_logger
+
+logger = get_logger("core.utils.profiling")
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                  'logs', 'profiles')
+
+
+class _CallStats:
+    """单个回调的耗时统计"""
+
+    __slots__ = ('calls', 'errors', 'total_seconds', 'max_seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class CallbackProfiler:
+    """回调耗时剖析器"""
+
+    def __init__(self, enabled: bool = False, sample_every: int = 0, output_dir: str = None):
+        """
+        Args:
+            enabled: 是否统计回调耗时
+            sample_every: 大于 0 时，每个回调每 sample_every 次调用用 cProfile 记录一次
+            output_dir: 报表导出目录
+        """
+        self.enabled = enabled
+        self.sample_every = sample_every
+        self.output_dir = output_dir or DEFAULT_OUTPUT_DIR
+        self._stats: Dict[str, _CallStats] = {}
+        self._lock = threading.Lock()
+        # cProfile 同一时刻只能记录一个调用，其他线程的采样直接跳过
+        self._sampling_lock = threading.Lock()
+        self._profile: Optional[cProfile.Profile] = None
+        self.samples = 0
+        self._sources: Dict[str, Callable[[], Optional[List[Dict[str, Any]]]]] = {}
+        self._source_refs: Dict[str, Optional[weakref.WeakMethod]] = {}
+        self._exit_registered = False
+
+    def enable(self, sample_every: int = None, output_dir: str = None, export_at_exit: bool = True):
+        """开启统计；export_at_exit 为 True 时在进程退出时导出报表"""
+        self.enabled = True
+        if sample_every is not None:
+            self.sample_every = sample_every
+        if output_dir is not None:
+            self.output_dir = output_dir
+        if export_at_exit and not self._exit_registered:
+            atexit.register(self._export_at_exit)
+            self._exit_registered = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """清空统计和采样数据"""
+        with self._lock:
+            self._stats.clear()
+            self._profile = None
+            self.samples = 0
+
+    # ---------------- 记录 ----------------
+
+    def _entry(self, name: str) -> _CallStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(name, _CallStats())
+        return stats
+
+    def should_sample(self, calls: int) -> bool:
+        return self.sample_every > 0 and calls % self.sample_every == 0
+
+    def run_sampled(self, func: Callable, *args, **kwargs):
+        """在 cProfile 下执行一次调用（已有采样进行中时直接执行）"""
+        if not self._sampling_lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+        try:
+            if self._profile is None:
+                self._profile = cProfile.Profile()
+            self.samples += 1
+            return self._profile.runcall(func, *args, **kwargs)
+        finally:
+            self._sampling_lock.release()
+
+    def call(self, name: str, func: Callable, *args, **kwargs):
+        """执行 func 并记录到 name 名下（异常照常抛出）"""
+        stats = self._entry(name)
+        sampled = self.should_sample(stats.calls + 1)
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = self.run_sampled(func, *args, **kwargs) if sampled else func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats.calls += 1
+                stats.total_seconds += elapsed
+                if elapsed > stats.max_seconds:
+                    stats.max_seconds = elapsed
+                if not ok:
+                    stats.errors += 1
+
+    # ---------------- 外部统计来源 ----------------
+
+    def add_source(self, name: str, metrics_func: Callable[[], List[Dict[str, Any]]]) -> str:
+        """
+        注册外部统计来源（如事件引擎的 get_listener_metrics），导出报表时一并汇总
+
+        绑定方法以弱引用保存，不会延长事件引擎等对象的生命周期。
+        同名来源仍然有效时（如多个使用默认名称的事件引擎）在名称后追加序号，各自单独汇总
+
+        Returns:
+            str: 实际使用的来源名称
+        """
+        ref = weakref.WeakMethod(metrics_func) if hasattr(metrics_func, '__self__') else None
+        with self._lock:
+            label, n = name, 1
+            while self._source_alive(label):
+                n += 1
+                label = f"{name}#{n}"
+            self._source_refs[label] = ref
+            if ref is not None:
+                self._sources[label] = lambda: (ref() or (lambda: None))()
+            else:
+                self._sources[label] = metrics_func
+        return label
+
+    def _source_alive(self, name: str) -> bool:
+        if name not in self._sources:
+            return False
+        ref = self._source_refs.get(name)
+        return ref is None or ref() is not None
+
+    def remove_source(self, name: str):
+        with self._lock:
+            self._sources.pop(name, None)
+            self._source_refs.pop(name, None)
+
+    # ---------------- 报表 ----------------
+
+    def summary(self) -> pd.DataFrame:
+        """
+        策略回调与事件监听器的耗时汇总，按累计耗时降序
+
+        列: kind, name, calls, errors, total_ms, avg_ms, max_ms, share（占全部累计耗时的比例）
+        """
+        rows = []
+        with self._lock:
+            for name, stats in self._stats.items():
+                rows.append({'kind': 'callback', 'name': name, 'calls': stats.calls, 'errors': stats.errors,
+                             'total_ms': stats.total_seconds * 1000, 'max_ms': stats.max_seconds * 1000})
+        for source, metrics_func in list(self._sources.items()):
+            for m in metrics_func() or []:
+                if m.get('profiled'):
+                    # 注册为监听器的策略回调已按回调统计，不重复计入
+                    continue
+                rows.append({'kind': 'listener', 'name': f"{source}:{m['event_type']}:{m['listener']}",
+                             'calls': m['calls'], 'errors': m['errors'],
+                             'total_ms': m.get('total_ms', m['avg_ms'] * m['calls']), 'max_ms': m['max_ms']})
+
+        df = pd.DataFrame(rows, columns=['kind', 'name', 'calls', 'errors', 'total_ms', 'max_ms'])
+        df['avg_ms'] = (df['total_ms'] / df['calls'].where(df['calls'] > 0)).fillna(0.0)
+        total = df['total_ms'].sum()
+        df['share'] = df['total_ms'] / total if total > 0 else 0.0
+        df = df[['kind', 'name', 'calls', 'errors', 'total_ms', 'avg_ms', 'max_ms', 'share']]
+        return df.sort_values('total_ms', ascending=False, kind='stable').reset_index(drop=True)
+
+    def hotspots(self, limit: int = 30) -> str:
+        """采样 cProfile 中累计耗时最多的函数"""
+        if self._profile is None:
+            return ''
+        stream = io.StringIO()
+        with self._sampling_lock:
+            pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    def export(self, output_dir: str = None) -> Dict[str, str]:
+        """
+        导出报表：summary CSV，以及采样得到的 cProfile 数据（.prof，可用 snakeviz 等工具查看）
+
+        Returns:
+            Dict[str, str]: 导出的文件路径
+        """
+        output_dir = output_dir or self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        paths = {'summary': os.path.join(output_dir, f'profile_{stamp}.csv')}
+        self.summary().to_csv(paths['summary'], index=False, encoding='utf-8-sig')
+        if self._profile is not None:
+            paths['cprofile'] = os.path.join(output_dir, f'profile_{stamp}.prof')
+            with self._sampling_lock:
+                self._profile.dump_stats(paths['cprofile'])
+        logger.info(f"耗时剖析报表已导出: {paths}")
+        return paths
+
+    def format_summary(self, limit: int = 20) -> str:
+        df = self.summary().head(limit)
+        if df.empty:
+            return "没有耗时剖析数据"
+        with pd.option_context('display.width', 200, 'display.max_colwidth', 80):
+            return df.to_string(index=False, float_format=lambda v: f'{v:.3f}')
+
+    def _export_at_exit(self):
+        if not self.enabled:
+            return
+        try:
+            self.export()
+        except Exception as e:
+            logger.error(f"导出耗时剖析报表失败: {e}")
+
+
+_default_profiler = None
+_default_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> CallbackProfiler:
+    """进程内共享的剖析器（环境变量 QUANT_PROFILE=1 时开启，QUANT_PROFILE_SAMPLE 为采样间隔）"""
+    global _default_profiler
+    with _default_profiler_lock:
+        if _default_profiler is None:
+            _default_profiler = CallbackProfiler()
+            if os.environ.get('QUANT_PROFILE', '').lower() in ('1', 'true', 'yes'):
+                _default_profiler.enable(sample_every=int(os.environ.get('QUANT_PROFILE_SAMPLE', '0') or 0))
+        return _default_profiler
+
+
+if __name__ == '__main__':
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description='查看最近一次导出的耗时剖析报表')
+    parser.add_argument('--dir', default=DEFAULT_OUTPUT_DIR, help='报表目录')
+    parser.add_argument('--limit', type=int, default=30, help='显示的行数')
+    args = parser.parse_args()
+
+    summaries = sorted(glob.glob(os.path.join(args.dir, 'profile_*.csv')))
+    if not summaries:
+        print(f"{args.dir} 下没有耗时剖析报表")
+    else:
+        print(f"--- {summaries[-1]} ---")
+        print(pd.read_csv(summaries[-1]).head(args.limit).to_string(index=False))
+        prof = summaries[-1][:-4] + '.prof'
+        if os.path.exists(prof):
+            print(f"\n--- 采样热点 {prof} ---")
+            pstats.Stats(prof).sort_stats('cumulative').print_stats(args.limit)
@@ -0,0 +1,274 @@
+"""
+分钟K线环形缓冲区存储
+
+负责：
+1. 每只股票每个周期一个固定容量的环形缓冲区（内存映射的 NumPy 文件），
+   追加和淘汰最旧的K线都是 O(1)，不再每次写入后 COUNT(*) + DELETE
+2. 缓冲区采用"镜像"布局：长度为 2*容量，每根K线同时写入 slot 和 slot+容量 两个位置，
+   最近 K 根K线始终是一段连续内存，读取时无需拼接
+3. 追加5分钟K线时增量维护 15/30/60 分钟K线：只重算最新一根派生K线所在的时间桶，
+   不再每次从全部5分钟数据重采样
+
+文件布局（root_dir 下）：
+    {周期}/{股票代码}.npy        K线数据（结构化数组，长度 2*容量）
+    {周期}/{股票代码}.count.npy  已写入的K线总数（int64[1]）
+
+时间桶口径与 pandas resample 一致：按自然日零点对齐，K线时间向下取整到周期起点
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.utils.logger import get_logger
+
+logger = get_logger("data_management.bar_ring_buffer")
+
+BAR_DTYPE = np.dtype([
+    ('ts', 'datetime64[s]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+])
+
+# 派生周期（分钟）
+DERIVED_TIMEFRAMES = {'15min': 15, '30min': 30, '60min': 60}
+
+BAR_COLUMNS = ['stock_code', 'trade_date', 'trade_time', 'open', 'close', 'high', 'low', 'volume']
+
+
+class BarRingBuffer:
+    """单只股票、单个周期的固定容量K线环形缓冲区"""
+
+    def __init__(self, path: str, capacity: int):
+        """
+        Args:
+            path: 数据文件路径（.npy），计数文件为同名的 .count.npy
+            capacity: 最多保留的K线数量
+        """
+        self.path = path
+        self.capacity = capacity
+        self._count_path = path[:-len('.npy')] + '.count.npy'
+
+        if os.path.exists(path) and os.path.exists(self._count_path):
+            data = np.load(path, mmap_mode='r+')
+            count = np.load(self._count_path, mmap_mode='r+')
+            if data.shape == (2 * capacity,) and data.dtype == BAR_DTYPE:
+                self._data, self._count = data, count
+                return
+            # 容量变化：保留最近的K线迁移到新缓冲区
+            old_capacity = data.shape[0] // 2
+            keep = min(int(count[0]), old_capacity, capacity)
+            end = (int(count[0]) - 1) % old_capacity + old_capacity
+            bars = np.array(data[end - keep + 1:end + 1]) if keep else np.empty(0, BAR_DTYPE)
+            del data, count
+            logger.info(f"{path} 容量由 {old_capacity} 调整为 {capacity}，迁移 {keep} 根K线")
+            self._create()
+            for bar in bars:
+                self._write(bar, new=True)
+            self.flush()
+        else:
+            self._create()
+
+    def _create(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._data = np.lib.format.open_memmap(self.path, mode='w+', dtype=BAR_DTYPE, shape=(2 * self.capacity,))
+        self._count = np.lib.format.open_memmap(self._count_path, mode='w+', dtype=np.int64, shape=(1,))
+        self._count[0] = 0
+
+    def __len__(self) -> int:
+        return min(int(self._count[0]), self.capacity)
+
+    @property
+    def total_written(self) -> int:
+        """累计写入的K线数量（含已被淘汰的）"""
+        return int(self._count[0])
+
+    @property
+    def last_ts(self) -> Optional[np.datetime64]:
+        if self._count[0] == 0:
+            return None
+        return self._data['ts'][self._end()]
+
+    def _end(self) -> int:
+        """最新一根K线在镜像数组上半部分的位置"""
+        return (int(self._count[0]) - 1) % self.capacity + self.capacity
+
+    def _write(self, bar, new: bool):
+        """写入一根K线：new=True 时追加（淘汰最旧的一根），否则覆盖最新一根"""
+        if new:
+            slot = int(self._count[0]) % self.capacity
+        else:
+            slot = self._end() - self.capacity
+        self._data[slot] = bar
+        self._data[slot + self.capacity] = bar
+        if new:
+            self._count[0] += 1
+
+    def append(self, bar) -> bool:
+        """
+        追加一根K线（O(1)）
+
+        时间与最新一根相同时视为修订（盘中未走完的K线），原位覆盖；
+        早于最新一根的K线忽略
+
+        Returns:
+            bool: 是否写入
+        """
+        last = self.last_ts
+        if last is not None:
+            if bar['ts'] < last:
+                return False
+            if bar['ts'] == last:
+                self._write(bar, new=False)
+                return True
+        self._write(bar, new=True)
+        return True
+
+    def last(self, k: int = None) -> np.ndarray:
+        """最近 k 根K线（连续内存的只读视图，按时间升序）"""
+        n = len(self)
+        k = n if k is None else max(0, min(k, n))
+        if k == 0:
+            return self._data[:0]
+        end = self._end()
+        view = self._data[end - k + 1:end + 1]
+        view = view.view(np.ndarray)
+        view.flags.writeable = False
+        return view
+
+    def flush(self):
+        self._data.flush()
+        self._count.flush()
+
+
+def frame_to_bars(df: pd.DataFrame) -> np.ndarray:
+    """DataFrame（trade_time, open, high, low, close, volume）转为按时间升序的结构化数组"""
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    bars['ts'] = pd.to_datetime(df['trade_time']).values.astype('datetime64[s]')
+    for field in ('open', 'high', 'low', 'close', 'volume'):
+        bars[field] = df[field].astype(float).values
+    return np.sort(bars, order='ts')
+
+
+def bars_to_frame(stock_code: str, bars: np.ndarray) -> pd.DataFrame:
+    """结构化数组转为与 k_5min 表相同列的 DataFrame"""
+    ts = pd.to_datetime(bars['ts'])
+    return pd.DataFrame({
+        'stock_code': stock_code,
+        'trade_date': ts.strftime('%Y-%m-%d'),
+        'trade_time': ts.strftime('%Y-%m-%d %H:%M:%S'),
+        'open': bars['open'],
+        'close': bars['close'],
+        'high': bars['high'],
+        'low': bars['low'],
+        'volume': bars['volume'],
+    }, columns=BAR_COLUMNS)
+
+
+def _bucket_start(ts: np.datetime64, minutes: int) -> np.datetime64:
+    """K线所在时间桶的起点（按自然日零点对齐）"""
+    day = ts.astype('datetime64[D]')
+    offset = (ts - day).astype('timedelta64[s]').astype(np.int64)
+    step = minutes * 60
+    return (day + np.timedelta64(offset // step * step, 's')).astype('datetime64[s]')
+
+
+class IntradayBarStore:
+    """所有监控股票的5分钟K线及增量派生的15/30/60分钟K线"""
+
+    def __init__(self, root_dir: str, capacity: int = 1000,
+                 timeframes: Iterable[str] = tuple(DERIVED_TIMEFRAMES)):
+        """
+        Args:
+            root_dir: 存储目录
+            capacity: 每只股票每个周期最多保留的K线数量
+            timeframes: 需要增量维护的派生周期
+        """
+        unknown = [tf for tf in timeframes if tf not in DERIVED_TIMEFRAMES]
+        if unknown:
+            raise ValueError(f"不支持的时间周期: {unknown}")
+        self.root_dir = root_dir
+        self.capacity = capacity
+        self.timeframes = list(timeframes)
+        self._buffers: Dict[tuple, BarRingBuffer] = {}
+        self._lock = threading.RLock()
+
+    def _buffer(self, stock_code: str, timeframe: str, create: bool = True) -> Optional[BarRingBuffer]:
+        """
+        打开股票某个周期的缓冲区
+
+        只有写入（create=True）才新建缓冲区文件；读取不存在的股票返回 None，
+        避免为未知代码生成空文件后又出现在 symbols() 中
+        """
+        key = (stock_code, timeframe)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            path = os.path.join(self.root_dir, timeframe, f"{stock_code}.npy")
+            if not create and not os.path.exists(path):
+                return None
+            buffer = self._buffers[key] = BarRingBuffer(path, self.capacity)
+        return buffer
+
+    def append(self, stock_code: str, data_df: pd.DataFrame) -> int:
+        """
+        追加一批5分钟K线，并增量更新派生周期
+
+        Returns:
+            int: 写入（含修订）的5分钟K线数量
+        """
+        if data_df is None or data_df.empty:
+            return 0
+        written = 0
+        with self._lock:
+            base = self._buffer(stock_code, '5min')
+            for bar in frame_to_bars(data_df):
+                if not base.append(bar):
+                    continue
+                written += 1
+                for timeframe in self.timeframes:
+                    self._update_derived(stock_code, timeframe, base, bar['ts'])
+            base.flush()
+            for timeframe in self.timeframes:
+                self._buffer(stock_code, timeframe).flush()
+        return written
+
+    def _update_derived(self, stock_code: str, timeframe: str, base: BarRingBuffer, ts: np.datetime64):
+        """重算最新5分钟K线所在的派生K线（最多 周期/5 根5分钟K线）"""
+        minutes = DERIVED_TIMEFRAMES[timeframe]
+        start = _bucket_start(ts, minutes)
+        recent = base.last(minutes // 5 + 1)
+        members = recent[(recent['ts'] >= start) & (recent['ts'] <= ts)]
+        bar = np.empty((), dtype=BAR_DTYPE)
+        bar['ts'] = start
+        bar['open'] = members['open'][0]
+        bar['high'] = members['high'].max()
+        bar['low'] = members['low'].min()
+        bar['close'] = members['close'][-1]
+        bar['volume'] = members['volume'].sum()
+        self._buffer(stock_code, timeframe).append(bar)
+
+    def last(self, stock_code: str, k: int = None, timeframe: str = '5min') -> np.ndarray:
+        """最近 k 根K线（结构化数组）"""
+        with self._lock:
+            buffer = self._buffer(stock_code, timeframe, create=False)
+            if buffer is None:
+                return np.empty(0, dtype=BAR_DTYPE)
+            return np.array(buffer.last(k))
+
+    def get_frame(self, stock_code: str, k: int = None, timeframe: str = '5min') -> pd.DataFrame:
+        """最近 k 根K线（DataFrame，列与 k_5min 表一致）"""
+        return bars_to_frame(stock_code, self.last(stock_code, k, timeframe))
+
+    def symbols(self) -> List[str]:
+        """已有5分钟数据的股票"""
+        directory = os.path.join(self.root_dir, '5min')
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len('.npy')] for name in os.listdir(directory)
+                      if name.endswith('.npy') and not name.endswith('.count.npy'))
@@ -0,0 +1,257 @@
+"""
+并发批量数据获取引擎
+
+负责：
+1. 将一批股票代码的网络请求并发执行，避免整个监控列表串行等待网络延迟
+2. 每个数据源独立的并发上限、超时和带退避的重试
+3. 数据源失败或无数据时按顺序回退到下一个数据源
+4. 结果按完成顺序逐个交付（迭代器或回调）
+
+设计特点：
+- 数据源可插拔：继承 FetchSource 实现 fetch(key)，失败时抛出异常，无数据时返回 None
+- 使用线程池而不是 asyncio：adata / akshare 都是同步阻塞接口
+- 超时的调用无法被中断，会继续占用该数据源的一个并发名额直到返回，
+  因此单个慢请求不会让该数据源的实际并发数超过上限
+"""
+
+import time
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from core.utils.logger import get_logger
+
+logger = get_logger("data_management.concurrent_fetcher")
+
+
+def is_empty_result(value: Any) -> bool:
+    """判断数据源返回的是否为"无数据" """
+    if value is None:
+        return True
+    if isinstance(value, pd.DataFrame):
+        return value.empty
+    if isinstance(value, (dict, list)):
+        return len(value) == 0
+    return False
+
+
+class FetchSource:
+    """
+    数据源基类
+
+    子类实现 fetch(key)：请求失败时抛出异常（会重试），没有数据时返回 None（直接回退到下一个数据源）
+    """
+
+    name = 'base'
+
+    def __init__(self, max_concurrency: int = 4, timeout: float = 5.0,
+                 retries: int = 2, backoff: float = 0.5):
+        """
+        Args:
+            max_concurrency: 该数据源同时进行的最大请求数
+            timeout: 单次请求超时（秒）
+            retries: 失败后的重试次数
+            backoff: 首次重试前的等待时间（秒），之后每次翻倍
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix=f"fetch-{self.name}")
+
+    def fetch(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def submit(self, key: str, timeout: float = None):
+        """
+        在数据源自己的线程池中发起请求，调用结束（而不是超时）时才释放并发名额
+
+        Args:
+            timeout: 等待并发名额的最长时间（秒），默认为单次请求超时；
+                     名额被挂起的请求占满时抛出 FutureTimeoutError，不会无限阻塞
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if not self._semaphore.acquire(timeout=timeout):
+            raise FutureTimeoutError(f"{self.name}: 等待并发名额超时({timeout}s)")
+        try:
+            future = self._executor.submit(self.fetch, key)
+        except Exception:
+            self._semaphore.release()
+            raise
+        future.add_done_callback(lambda _: self._semaphore.release())
+        return future
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class CallableSource(FetchSource):
+    """用普通函数构造的数据源"""
+
+    def __init__(self, name: str, func: Callable[[str], Any], **kwargs):
+        self.name = name
+        self.func = func
+        super().__init__(**kwargs)
+
+    def fetch(self, key: str) -> Any:
+        return self.func(key)
+
+
+@dataclass
+class FetchResult:
+    """单个代码的获取结果"""
+    key: str
+    value: Any = None
+    source: Optional[str] = None
+    attempts: int = 0
+    elapsed: float = 0.0
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.source is not None
+
+
+class ConcurrentFetcher:
+    """并发批量获取引擎"""
+
+    def __init__(self, sources: List[FetchSource], max_workers: int = None,
+                 is_empty: Callable[[Any], bool] = is_empty_result):
+        """
+        Args:
+            sources: 按优先级排列的数据源列表
+            max_workers: 同时处理的代码数量，默认为各数据源并发上限之和
+            is_empty: 判断返回值是否为"无数据"的函数
+        """
+        if not sources:
+            raise ValueError("至少需要一个数据源")
+        self.sources = sources
+        self.max_workers = max_workers or sum(s.max_concurrency for s in sources)
+        self.is_empty = is_empty
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {
+            s.name: {'calls': 0, 'success': 0, 'empty': 0, 'errors': 0, 'timeouts': 0} for s in sources
+        }
+
+    def _count(self, source: FetchSource, field: str):
+        with self._stats_lock:
+            self.stats[source.name][field] += 1
+
+    def _fetch_one(self, key: str) -> FetchResult:
+        """依次尝试各数据源，每个数据源失败时带退避重试"""
+        start = time.perf_counter()
+        result = FetchResult(key)
+        errors = []
+
+        for source in self.sources:
+            for attempt in range(source.retries + 1):
+                if attempt > 0:
+                    time.sleep(source.backoff * (2 ** (attempt - 1)))
+                result.attempts += 1
+                self._count(source, 'calls')
+                try:
+                    future = source.submit(key)
+                    value = future.result(timeout=source.timeout)
+                except FutureTimeoutError:
+                    self._count(source, 'timeouts')
+                    errors.append(f"{source.name}: 超时({source.timeout}s)")
+                    continue
+                except Exception as e:
+                    self._count(source, 'errors')
+                    errors.append(f"{source.name}: {e}")
+                    continue
+
+                if self.is_empty(value):
+                    # 无数据不是临时故障，不重试，直接回退到下一个数据源
+                    self._count(source, 'empty')
+                    errors.append(f"{source.name}: 无数据")
+                    break
+
+                self._count(source, 'success')
+                result.value = value
+                result.source = source.name
+                result.elapsed = time.perf_counter() - start
+                return result
+
+        result.error = "; ".join(errors)
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def iter_fetch(self, keys: Iterable[str]) -> Iterator[FetchResult]:
+        """并发获取，按完成顺序逐个返回结果"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(keys)),
+                                thread_name_prefix="fetch-worker") as executor:
+            futures = [executor.submit(self._fetch_one, key) for key in keys]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def fetch_all(self, keys: Iterable[str],
+                  on_result: Callable[[FetchResult], None] = None) -> Dict[str, FetchResult]:
+        """
+        并发获取所有代码
+
+        Args:
+            keys: 股票代码列表
+            on_result: 每个结果到达时的回调（在调用线程中执行）
+
+        Returns:
+            Dict[str, FetchResult]: 代码到获取结果的映射
+        """
+        results = {}
+        for result in self.iter_fetch(keys):
+            results[result.key] = result
+            if on_result is not None:
+                try:
+                    on_result(result)
+                except Exception as e:
+                    logger.error(f"处理 {result.key} 的获取结果失败: {e}")
+        return results
+
+    def close(self):
+        for source in self.sources:
+            source.close()
+
+
+# ---------------- 实时报价数据源 ----------------
+
+class AkshareQuoteSource(FetchSource):
+    """akshare 实时报价（五档盘口中的最新价）"""
+
+    name = 'akshare'
+
+    def fetch(self, key: str) -> Optional[Dict]:
+        import akshare as ak
+        df = ak.stock_bid_ask_em(symbol=key)
+        if df.empty or df[df['item'] == '最新'].empty:
+            return None
+        return {
+            'stock_code': key,
+            'current_price': df[df['item'] == '最新']['value'].iloc[0],
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+
+class AdataQuoteSource(FetchSource):
+    """adata 实时报价（五档行情中的s1价格）"""
+
+    name = 'adata'
+
+    def fetch(self, key: str) -> Optional[Dict]:
+        import adata
+        df = adata.stock.market.get_market_five(stock_code=key)
+        if df.empty or 's1' not in df.columns:
+            return None
+        return {
+            'stock_code': key,
+            'current_price': df['s1'].iloc[0],
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
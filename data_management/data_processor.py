@@ -10,6 +10,7 @@ from sqlalchemy import create_engine, text
 import adata
 import akshare as ak
 from .Ashare import get_price
+from .history_snapshot import HistorySnapshotStore
 
 # 导入 quant_v2 项目的数据管理模块
 try:
@@ -792,56 +793,56 @@ def update_and_load_data_monthly(symbol: str) -> pd.DataFrame:
     
     return full_monthly_df
 
+# 回测用历史K线快照：每只股票每个周期的全部历史只加载一次，按日期返回只读视图
+backtest_snapshots = HistorySnapshotStore({
+    'daily': load_daily_data_from_db,
+    'weekly': load_weekly_data_from_db,
+    'monthly': load_monthly_data_from_db,
+})
+
 #设计专门用于回测用的获取日线行情数据：
 def get_daily_data_for_backtest(stock_code: str, current_date: str, db_manager: DatabaseManager = None) -> pd.DataFrame:
     """
     为策略提供在特定日期所需的数据。
     在回测模式下，它只从本地快速读取和切片，不进行任何更新操作。
-    """
-    # 1. 从本地加载该股票的【全部】历史数据
-    #    (优化：可以在回测开始时一次性加载所有股票到内存)
-    full_local_df = load_daily_data_from_db(stock_code, db_manager=db_manager) 
-
-    # 2. 严格截取截至 current_date 的数据，防止未来函数
-    # 确保 trade_date 列是 datetime 类型
-    if not full_local_df.empty:
-        full_local_df['trade_date'] = pd.to_datetime(full_local_df['trade_date'])
-        df_snapshot = full_local_df[full_local_df['trade_date'] <= pd.to_datetime(current_date)].copy()
-    else:
-        df_snapshot = pd.DataFrame()
     
-    return df_snapshot
+    返回截至 current_date（含）的只读快照视图（不复制），原地修改会抛出 ValueError，
+    需要修改数据时请先 .copy()。
+    """
+    return backtest_snapshots.snapshot('daily', stock_code, current_date, db_manager)
 
 #设计专门用于回测用的获取周线行情数据：
 def get_weekly_data_for_backtest(stock_code: str, current_date: str, db_manager: DatabaseManager = None) -> pd.DataFrame:
     """
     为策略提供在特定日期所需的数据。
     在回测模式下，它只从本地快速读取和切片，不进行任何更新操作。
+    
+    返回截至 current_date（含）的只读快照视图，见 get_daily_data_for_backtest。
     """
-    # 获取所有周线数据，然后按日期过滤
-    full_local_df = load_weekly_data_from_db(stock_code, db_manager=db_manager)
-    # 确保 trade_date 列是 datetime 类型
-    if not full_local_df.empty:
-        full_local_df['trade_date'] = pd.to_datetime(full_local_df['trade_date'])
-        df_snapshot = full_local_df[full_local_df['trade_date'] <= pd.to_datetime(current_date)].copy()
-    else:
-        df_snapshot = pd.DataFrame()
-    return df_snapshot
+    return backtest_snapshots.snapshot('weekly', stock_code, current_date, db_manager)
 
 #设计专门用于回测用的获取月线行情数据：
 def get_monthly_data_for_backtest(stock_code: str, current_date: str, db_manager: DatabaseManager = None) -> pd.DataFrame:
     """
     为策略提供在特定日期所需的数据。
     在回测模式下，它只从本地快速读取和切片，不进行任何更新操作。
+    
+    返回截至 current_date（含）的只读快照视图，见 get_daily_data_for_backtest。
     """
-    full_local_df = load_monthly_data_from_db(stock_code, db_manager=db_manager)
-    # 确保 trade_date 列是 datetime 类型
-    if not full_local_df.empty:
-        full_local_df['trade_date'] = pd.to_datetime(full_local_df['trade_date'])
-        df_snapshot = full_local_df[full_local_df['trade_date'] <= pd.to_datetime(current_date)].copy()
-    else:
-        df_snapshot = pd.DataFrame()
-    return df_snapshot
+    return backtest_snapshots.snapshot('monthly', stock_code, current_date, db_manager)
+
+def get_multi_period_data_for_backtest(stock_code: str, current_date: str, db_manager: DatabaseManager = None) -> dict:
+    """
+    为 TechnicalAnalyzer 准备截至 current_date 的日线、周线、月线只读快照
+    
+    Returns:
+        dict: {'daily': DataFrame, 'weekly': DataFrame, 'monthly': DataFrame}
+    """
+    return {
+        'daily': get_daily_data_for_backtest(stock_code, current_date, db_manager),
+        'weekly': get_weekly_data_for_backtest(stock_code, current_date, db_manager),
+        'monthly': get_monthly_data_for_backtest(stock_code, current_date, db_manager),
+    }
 
 #设计专门用于回测用的批量获取多只股票日线行情数据：
 def get_multiple_stocks_daily_data_for_backtest(stock_codes: list, current_date: str) -> dict:
@@ -1222,6 +1223,37 @@ def get_last_trade_date(today_date=None):
         return datetime.now().strftime('%Y-%m-%d')
 
 
+def get_trade_dates_between(start_date: str, end_date: str) -> list:
+    """
+    获取两个日期之间（含首尾）的所有交易日
+    
+    Args:
+        start_date: 开始日期，格式为 'YYYY-MM-DD'
+        end_date: 结束日期，格式为 'YYYY-MM-DD'
+        
+    Returns:
+        list: 交易日列表，格式为 ['YYYY-MM-DD', ...]，按日期升序排列
+    """
+    try:
+        # 以日线数据表中出现过的日期作为交易日
+        query = """
+        SELECT DISTINCT trade_date
+        FROM k_daily
+        WHERE trade_date >= :start_date AND trade_date <= :end_date
+        ORDER BY trade_date
+        """
+        
+        result = db_manager.execute_query(query, {"start_date": start_date, "end_date": end_date})
+        
+        if result.empty:
+            return []
+        return [str(d)[:10] for d in result['trade_date']]
+            
+    except Exception as e:
+        print(f"获取交易日列表失败: {e}")
+        return []
+
+
 # if __name__ == "__main__":
 #     # 测试单只股票数据获取
 #     dd = db_manager.get_last_trade_date(today_date=None)
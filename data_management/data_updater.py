@@ -249,18 +249,13 @@ class DataUpdater:
         logger.info("=============================================")
         
         try:
-            # 步骤1: 优先尝试从聚宽数据更新
-            success, start_date = self.update_from_jqdata()
-
-            # 步骤2: 如果聚宽数据更新失败或未执行，则回退到Akshare
-            if not success:
-                logger.warning("聚宽数据更新失败或未执行，回退到Akshare更新模式...")
-                success, start_date = self.update_from_akshare()
+            # 步骤1-2: 更新日线（聚宽优先，失败回退到Akshare）
+            success, start_date = self.update_daily()
             
             # 步骤3: 如果日线更新成功，则触发周期数据转换
             if success:
                 logger.info("日线数据更新成功，开始更新周线和月线...")
-                self._update_resampled_data(start_date)
+                self.update_resampled(start_date)
                 logger.info("🎉 所有更新流程执行完毕！")
             else:
                 logger.error("❌ 所有日线更新方式均失败，流程终止。")
@@ -268,6 +263,26 @@ class DataUpdater:
         except Exception as e:
             logger.error(f"❌ 更新流程执行过程中发生未预期的错误: {e}")
             logger.error("建议检查数据库连接和数据完整性")
+
+    def update_daily(self):
+        """
+        只执行日线更新（聚宽数据优先，失败回退到Akshare），供任务调度器单独调度
+        
+        Returns:
+            Tuple[bool, Optional[str]]: (是否成功, 新数据的起始日期)
+        """
+        # 步骤1: 优先尝试从聚宽数据更新
+        success, start_date = self.update_from_jqdata()
+
+        # 步骤2: 如果聚宽数据更新失败或未执行，则回退到Akshare
+        if not success:
+            logger.warning("聚宽数据更新失败或未执行，回退到Akshare更新模式...")
+            success, start_date = self.update_from_akshare()
+        return success, start_date
+
+    def update_resampled(self, start_date):
+        """只执行周线/月线的增量转换，供任务调度器单独调度"""
+        self._update_resampled_data(start_date)
     
     # --- 数据验证 ---
     def check_recent_data(self, stock_code='000029', days=5):
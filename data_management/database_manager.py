@@ -51,6 +51,22 @@ class DatabaseManager:
         self._create_tables()
         self._initialized = True
     
+    def switch_database(self, db_path: str):
+        """
+        切换单例使用的数据库文件
+
+        各模块持有的都是同一个单例，切换后全部生效（用于基准测试等需要使用独立数据库的场景）
+
+        Args:
+            db_path: 新的数据库文件路径
+        """
+        self.engine.dispose()
+        self.db_path = os.path.abspath(db_path)
+        self.engine = create_engine(f'sqlite:///{self.db_path}')
+        self._ensure_database_directory()
+        self._create_tables()
+        logger.info(f"已切换数据库: {self.db_path}")
+
     def _ensure_database_directory(self):
         """确保数据库目录存在"""
         db_dir = Path(self.db_path).parent
@@ -0,0 +1,145 @@
+"""
+回测用历史K线快照
+
+get_daily/weekly/monthly_data_for_backtest 原先每次调用都要从数据库加载该股票的全部历史、
+对整列做 pd.to_datetime、构建布尔掩码再 .copy() 切片，回测中每只股票每个交易日都要重复一遍。
+
+本模块把每只股票每个周期的历史只加载一次：
+1. trade_date 转换为 datetime64 并按日期排序，各列保存为只读 numpy 数组
+2. 按日期取快照时用 searchsorted 定位截止位置，返回共享底层内存的只读视图（不复制）
+3. 对快照的任何原地修改（loc/iloc/values 赋值）都会抛出 ValueError，
+   避免策略意外改写缓存的历史数据，进而污染后续交易日（引入未来函数）；
+   新增列、整列替换等操作只影响快照本身，不受限制
+
+查询日期不早于加载当日时视为实盘查询（数据可能已在当日更新），直接重新加载。
+"""
+
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .database_manager import DatabaseManager
+
+
+class FrozenHistory:
+    """
+    单只股票单个周期的只读历史K线。
+
+    各列保存为只读 numpy 数组，trade_date 为升序的 datetime64[ns]。
+    """
+
+    __slots__ = ('columns', 'arrays', 'dates', 'loaded_on')
+
+    def __init__(self, df: pd.DataFrame, loaded_on: date = None):
+        self.loaded_on = loaded_on or date.today()
+        if df is None or df.empty or 'trade_date' not in df.columns:
+            self.columns = []
+            self.arrays = {}
+            self.dates = np.array([], dtype='datetime64[ns]')
+            return
+
+        df = df.copy()
+        df['trade_date'] = pd.to_datetime(df['trade_date'])
+        if not df['trade_date'].is_monotonic_increasing:
+            df = df.sort_values('trade_date', kind='stable')
+
+        self.columns = list(df.columns)
+        self.arrays = {}
+        for col in self.columns:
+            values = df[col].to_numpy(copy=True)
+            values.setflags(write=False)
+            self.arrays[col] = values
+        self.dates = self.arrays['trade_date']
+
+    @property
+    def empty(self) -> bool:
+        return not self.columns
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def cutoff(self, current_date) -> int:
+        """截至 current_date（含）的K线数量"""
+        return int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(current_date)), side='right'))
+
+    def upto(self, current_date) -> pd.DataFrame:
+        """返回截至 current_date（含）的只读快照视图"""
+        if self.empty:
+            return pd.DataFrame()
+        return self.head(self.cutoff(current_date))
+
+    def head(self, n: int) -> pd.DataFrame:
+        """返回前 n 根K线的只读快照视图"""
+        return pd.DataFrame({col: self.arrays[col][:n] for col in self.columns}, copy=False)
+
+
+class HistorySnapshotStore:
+    """
+    按 (周期, 股票代码, 数据库) 缓存 FrozenHistory 的快照存储。
+
+    缓存按最近使用顺序淘汰，最多保留 max_entries 条历史。
+    """
+
+    def __init__(self, loaders: Dict[str, Callable[..., pd.DataFrame]], max_entries: int = 4096):
+        """
+        Args:
+            loaders: 周期到加载函数的映射，加载函数签名为 loader(stock_code, db_manager=...)，
+                     返回该股票的全部历史K线
+            max_entries: 最多缓存的历史条数
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries 必须大于0")
+        self.loaders = dict(loaders)
+        self.max_entries = max_entries
+        self._cache: 'OrderedDict[Tuple[str, str, str], FrozenHistory]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, freq: str, stock_code: str, db_manager) -> Tuple[str, str, str]:
+        db_path = getattr(db_manager or DatabaseManager(), 'db_path', None)
+        return freq, str(stock_code), str(db_path)
+
+    def history(self, freq: str, stock_code: str, current_date=None, db_manager: DatabaseManager = None) -> FrozenHistory:
+        """
+        获取股票某周期的只读历史，必要时从数据库加载
+
+        Args:
+            freq: 周期，'daily' / 'weekly' / 'monthly'
+            stock_code: 股票代码
+            current_date: 查询日期；不早于缓存加载当日时重新加载
+            db_manager: 数据库管理器
+        """
+        if freq not in self.loaders:
+            raise ValueError(f"不支持的周期: {freq}")
+        key = self._key(freq, stock_code, db_manager)
+        cached = self._cache.get(key)
+        if cached is not None and (current_date is None or pd.Timestamp(current_date).date() < cached.loaded_on):
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        cached = FrozenHistory(self.loaders[freq](stock_code, db_manager=db_manager))
+        self._cache[key] = cached
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return cached
+
+    def snapshot(self, freq: str, stock_code: str, current_date, db_manager: DatabaseManager = None) -> pd.DataFrame:
+        """返回截至 current_date（含）的只读快照视图，无数据时返回空 DataFrame"""
+        return self.history(freq, stock_code, current_date, db_manager).upto(current_date)
+
+    def invalidate(self, stock_codes: Iterable[str] = None, freq: Optional[str] = None):
+        """清除缓存；stock_codes 为 None 时清除全部（数据库写入新K线后调用）"""
+        codes = None if stock_codes is None else {str(code) for code in stock_codes}
+        for key in list(self._cache):
+            if (freq is None or key[0] == freq) and (codes is None or key[1] in codes):
+                del self._cache[key]
+
+    def cache_info(self) -> Dict[str, int]:
+        """缓存命中统计"""
+        return {'entries': len(self._cache), 'hits': self.hits, 'misses': self.misses}
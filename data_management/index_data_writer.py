@@ -0,0 +1,223 @@
+"""
+指数K线缓冲写入器
+
+负责：
+1. 汇总多个指数的计算结果，缓存在内存中
+2. 缓存行数或距上次写入时间超过阈值时，在一个大事务中批量写入 index_k_daily
+3. 以 (index_code, trade_date) 为键进行 upsert，重复执行不会产生重复行
+4. 记录写入统计（写入次数、行数、耗时），便于评估写入开销
+
+设计特点：
+- 同一 (index_code, trade_date) 在缓存中只保留最后一次的结果
+- 写入失败时数据保留在缓存中，下次写入时重试
+- 支持 with 语句，退出时自动写入剩余数据
+"""
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Tuple, Optional, Iterable
+
+import pandas as pd
+
+from core.utils.logger import get_logger
+
+logger = get_logger("data_management.index_data_writer")
+
+INDEX_COLUMNS = ['index_code', 'index_name', 'trade_date', 'open', 'high', 'low', 'close', 'volume']
+
+
+@dataclass
+class WriterStats:
+    """写入统计"""
+    rows_added: int = 0
+    rows_written: int = 0
+    flushes: int = 0
+    failed_flushes: int = 0
+    total_flush_seconds: float = 0.0
+    max_flush_seconds: float = 0.0
+    last_flush_rows: int = 0
+    triggers: Dict[str, int] = field(default_factory=lambda: {'size': 0, 'time': 0, 'manual': 0})
+
+    @property
+    def avg_flush_seconds(self) -> float:
+        return self.total_flush_seconds / self.flushes if self.flushes else 0.0
+
+    @property
+    def avg_rows_per_flush(self) -> float:
+        return self.rows_written / self.flushes if self.flushes else 0.0
+
+    def summary(self) -> str:
+        return (f"写入 {self.rows_written}/{self.rows_added} 行，{self.flushes} 次事务"
+                f"（失败 {self.failed_flushes} 次），平均每次 {self.avg_rows_per_flush:.0f} 行 / "
+                f"{self.avg_flush_seconds * 1000:.1f}ms，最长 {self.max_flush_seconds * 1000:.1f}ms")
+
+
+class IndexDataWriter:
+    """指数K线缓冲写入器"""
+
+    def __init__(self, db_path: str = None, table_name: str = 'index_k_daily',
+                 max_rows: int = 5000, max_interval: float = 30.0):
+        """
+        Args:
+            db_path: 数据库路径，默认使用 DatabaseManager 的数据库
+            table_name: 目标表名
+            max_rows: 缓存行数达到该值时写入
+            max_interval: 距上次写入超过该秒数时写入（在下一次添加数据时检查）
+        """
+        if db_path is None:
+            from data_management.database_manager import DatabaseManager
+            db_path = DatabaseManager().db_path
+        self.db_path = db_path
+        self.table_name = table_name
+        self.max_rows = max_rows
+        self.max_interval = max_interval
+        self.stats = WriterStats()
+        self._buffer: Dict[Tuple[str, str], tuple] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._table_ready = False
+
+    # ---------------- 写入缓存 ----------------
+
+    def add_frame(self, index_data: pd.DataFrame, index_code: str, index_name: str,
+                  dates: Iterable[str] = None) -> int:
+        """
+        添加一个指数的计算结果（以交易日为索引，包含 open/high/low/close/volume 列）
+
+        Args:
+            index_data: 指数数据
+            index_code: 指数代码
+            index_name: 指数名称
+            dates: 只添加这些日期的数据，默认添加全部
+
+        Returns:
+            int: 添加的行数
+        """
+        if index_data is None or index_data.empty:
+            return 0
+        if dates is not None:
+            wanted = list(dates)
+            if isinstance(index_data.index, pd.DatetimeIndex):
+                # 字符串与 DatetimeIndex 直接比较已被 pandas 弃用，先统一转换为日期
+                wanted = pd.to_datetime(wanted)
+            index_data = index_data[index_data.index.isin(wanted)]
+
+        trade_dates = [d.strftime('%Y-%m-%d') if hasattr(d, 'strftime') else str(d) for d in index_data.index]
+        rows = [
+            (index_code, index_name, trade_date, float(o), float(h), float(l), float(c), int(v))
+            for trade_date, o, h, l, c, v in zip(
+                trade_dates, index_data['open'], index_data['high'], index_data['low'],
+                index_data['close'], index_data['volume']
+            )
+        ]
+        return self.add_rows(rows)
+
+    def add_rows(self, rows: Iterable[tuple]) -> int:
+        """添加 (index_code, index_name, trade_date, open, high, low, close, volume) 元组"""
+        count = 0
+        with self._lock:
+            for row in rows:
+                self._buffer[(row[0], row[2])] = tuple(row)
+                count += 1
+            self.stats.rows_added += count
+
+        if self.pending >= self.max_rows:
+            self.flush(trigger='size')
+        elif self.pending and time.monotonic() - self._last_flush >= self.max_interval:
+            self.flush(trigger='time')
+        return count
+
+    @property
+    def pending(self) -> int:
+        """缓存中待写入的行数"""
+        return len(self._buffer)
+
+    # ---------------- 写入数据库 ----------------
+
+    def _ensure_table(self, conn: sqlite3.Connection):
+        if self._table_ready:
+            return
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                index_code TEXT NOT NULL,
+                index_name TEXT NOT NULL,
+                trade_date TEXT NOT NULL,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                volume INTEGER,
+                UNIQUE(index_code, trade_date)
+            )
+        """)
+        # 旧表可能没有唯一约束，upsert 需要 (index_code, trade_date) 唯一索引
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{self.table_name}_code_date "
+                     f"ON {self.table_name}(index_code, trade_date)")
+        self._table_ready = True
+
+    def flush(self, trigger: str = 'manual') -> bool:
+        """
+        将缓存中的所有数据在一个事务中写入数据库
+
+        Returns:
+            bool: 写入是否成功（缓存为空时返回True）
+        """
+        with self._lock:
+            if not self._buffer:
+                self._last_flush = time.monotonic()
+                return True
+            rows = list(self._buffer.values())
+
+            upsert_sql = f"""
+                INSERT INTO {self.table_name}
+                ({', '.join(INDEX_COLUMNS)})
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(index_code, trade_date) DO UPDATE SET
+                    index_name = excluded.index_name,
+                    open = excluded.open,
+                    high = excluded.high,
+                    low = excluded.low,
+                    close = excluded.close,
+                    volume = excluded.volume
+            """
+
+            start = time.perf_counter()
+            try:
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    with conn:
+                        self._ensure_table(conn)
+                        conn.executemany(upsert_sql, rows)
+                finally:
+                    conn.close()
+            except Exception as e:
+                # 数据保留在缓存中，下次写入时重试
+                self.stats.failed_flushes += 1
+                logger.error(f"写入 {self.table_name} 失败（{len(rows)} 行保留在缓存中）: {e}")
+                return False
+
+            duration = time.perf_counter() - start
+            self._buffer.clear()
+            self._last_flush = time.monotonic()
+            self.stats.flushes += 1
+            self.stats.rows_written += len(rows)
+            self.stats.last_flush_rows = len(rows)
+            self.stats.total_flush_seconds += duration
+            self.stats.max_flush_seconds = max(self.stats.max_flush_seconds, duration)
+            self.stats.triggers[trigger] = self.stats.triggers.get(trigger, 0) + 1
+            logger.info(f"写入 {self.table_name}: {len(rows)} 行，耗时 {duration * 1000:.1f}ms（触发: {trigger}）")
+            return True
+
+    def close(self) -> bool:
+        """写入剩余数据"""
+        return self.flush()
+
+    def __enter__(self) -> 'IndexDataWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
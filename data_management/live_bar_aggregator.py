@@ -0,0 +1,301 @@
+"""
+实时K线聚合器
+
+负责：
+1. 每只股票在内存中保存日/周/月线的已收盘K线（首次使用时从本地数据库加载一次）
+2. 盘中的5分钟K线或逐笔TICK直接更新当日未收盘的日线，
+   当周/当月未收盘的周线、月线由本周/本月已收盘日线加当日日线合成
+3. 分析请求直接从内存返回"已收盘K线 + 当前未收盘K线"，不再每次请求都重新拉取历史和实时数据
+4. 跨日时当日日线自动转为已收盘K线（跨周/跨月时同样处理周线、月线）
+
+注意：
+- 同一只股票只应使用一种盘中数据源（5分钟K线或TICK），两者同时喂入会重复累计成交量
+- 与最新一根5分钟K线时间相同的K线视为修订（盘中未走完），替换而不是累加
+- TICK 的 volume 视为该笔成交量（增量）
+"""
+
+import threading
+from datetime import datetime, timedelta, time as dtime
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from core.event import Event, EventType, TickEvent
+from core.utils.logger import get_logger
+
+logger = get_logger("data_management.live_bar_aggregator")
+
+KLINE_COLUMNS = ['stock_code', 'trade_date', 'open', 'close', 'high', 'low', 'volume']
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+# 第一根5分钟K线的时间（9:30-9:35），不晚于该时间开始聚合的当日日线才是完整的
+FIRST_BAR_TIME = dtime(9, 35)
+
+
+def period_start(trade_date: str, frequency: str) -> str:
+    """K线所在周期的起始日期（周线为周一，月线为1日）"""
+    day = datetime.strptime(trade_date[:10], '%Y-%m-%d')
+    if frequency == 'weekly':
+        day -= timedelta(days=day.weekday())
+    elif frequency == 'monthly':
+        day = day.replace(day=1)
+    return day.strftime('%Y-%m-%d')
+
+
+def _merge(bar: Optional[dict], other: Optional[dict]) -> Optional[dict]:
+    """合并两根按时间先后排列的K线"""
+    if bar is None:
+        return None if other is None else dict(other)
+    if other is None:
+        return dict(bar)
+    return {
+        'open': bar['open'],
+        'high': max(bar['high'], other['high']),
+        'low': min(bar['low'], other['low']),
+        'close': other['close'],
+        'volume': bar['volume'] + other['volume'],
+    }
+
+
+class _SymbolBars:
+    """单只股票的已收盘K线和当日未收盘K线"""
+
+    def __init__(self):
+        self.closed: Dict[str, pd.DataFrame] = {}
+        self.primed = False
+        self.live_date: Optional[str] = None
+        self.first_ts: Optional[datetime] = None
+        self.folded: Optional[dict] = None      # 当日已确定的部分
+        self.last_bar: Optional[dict] = None    # 最新一根5分钟K线（可能被修订）
+        self.last_ts: Optional[datetime] = None
+
+    def live_bar(self) -> Optional[dict]:
+        return _merge(self.folded, self.last_bar)
+
+
+class LiveBarAggregator:
+    """由盘中数据增量维护的日/周/月线"""
+
+    def __init__(self, history_loader: Callable[[str, str, int], pd.DataFrame] = None,
+                 history_periods: int = 64, max_periods: int = 250):
+        """
+        Args:
+            history_loader: 已收盘K线加载函数 (stock_code, frequency, periods) -> DataFrame，
+                            一般为 RealtimeKlineProvider.get_historical_kline（本地数据库，无网络请求）
+            history_periods: 首次加载的历史周期数
+            max_periods: 内存中每个周期最多保留的已收盘K线数量
+        """
+        self.history_loader = history_loader
+        self.history_periods = history_periods
+        self.max_periods = max_periods
+        self._symbols: Dict[str, _SymbolBars] = {}
+        self._lock = threading.RLock()
+        self.stats = {'bars': 0, 'ticks': 0, 'requests': 0, 'history_loads': 0}
+
+    def _state(self, stock_code: str) -> _SymbolBars:
+        state = self._symbols.get(stock_code)
+        if state is None:
+            state = self._symbols[stock_code] = _SymbolBars()
+        return state
+
+    # ---------------- 已收盘K线 ----------------
+
+    def load_history(self, stock_code: str, frequency: str, df: pd.DataFrame):
+        """
+        加载某个周期的已收盘K线
+
+        与内存中已有的K线合并（同一日期以内存中的为准，内存中的是盘中聚合后转入的最新数据）
+        """
+        frames = [] if df is None or df.empty else [df[KLINE_COLUMNS].copy()]
+        with self._lock:
+            state = self._state(stock_code)
+            existing = state.closed.get(frequency)
+            if existing is not None and not existing.empty:
+                frames.append(existing)
+            if not frames:
+                state.closed[frequency] = pd.DataFrame(columns=KLINE_COLUMNS)
+                return
+            merged = pd.concat(frames, ignore_index=True)
+            merged['trade_date'] = merged['trade_date'].astype(str).str[:10]
+            merged = merged.drop_duplicates('trade_date', keep='last').sort_values('trade_date')
+            state.closed[frequency] = merged.tail(self.max_periods).reset_index(drop=True)
+
+    def _prime(self, stock_code: str, state: _SymbolBars):
+        """首次请求时从本地数据库加载一次已收盘K线"""
+        if state.primed or self.history_loader is None:
+            return
+        for frequency in FREQUENCIES:
+            try:
+                df = self.history_loader(stock_code, frequency, self.history_periods)
+            except Exception as e:
+                logger.error(f"加载{stock_code} {frequency}历史K线失败: {e}")
+                df = None
+            self.load_history(stock_code, frequency, df)
+        state.primed = True
+        self.stats['history_loads'] += 1
+
+    def _closed(self, state: _SymbolBars, frequency: str) -> pd.DataFrame:
+        return state.closed.get(frequency, pd.DataFrame(columns=KLINE_COLUMNS))
+
+    def _append_closed(self, stock_code: str, state: _SymbolBars, frequency: str, trade_date: str, bar: dict):
+        row = pd.DataFrame([{'stock_code': stock_code, 'trade_date': trade_date, **bar}], columns=KLINE_COLUMNS)
+        closed = self._closed(state, frequency)
+        closed = closed[closed['trade_date'] < period_start(trade_date, frequency)]
+        frames = [closed, row] if not closed.empty else [row]
+        state.closed[frequency] = pd.concat(frames, ignore_index=True).tail(self.max_periods).reset_index(drop=True)
+
+    # ---------------- 盘中数据 ----------------
+
+    def _roll_day(self, stock_code: str, state: _SymbolBars, trade_date: str):
+        """跨日：当日日线转为已收盘K线，跨周/跨月时同样处理周线、月线"""
+        if state.live_date is not None and state.live_date != trade_date:
+            prev_date = state.live_date
+            for frequency in ('weekly', 'monthly'):
+                if period_start(prev_date, frequency) != period_start(trade_date, frequency):
+                    bar = self._period_bar(state, frequency)
+                    if bar is not None:
+                        self._append_closed(stock_code, state, frequency, prev_date, bar)
+            bar = state.live_bar()
+            if bar is not None:
+                self._append_closed(stock_code, state, 'daily', prev_date, bar)
+            state.folded = state.last_bar = state.last_ts = state.first_ts = None
+        if state.live_date != trade_date:
+            state.live_date = trade_date
+
+    def on_bar(self, stock_code: str, ts, open_price: float, high: float, low: float,
+               close: float, volume: float) -> bool:
+        """
+        用一根5分钟K线更新当日日线
+
+        Returns:
+            bool: 是否被采用（早于最新一根的K线会被忽略）
+        """
+        ts = pd.Timestamp(ts).to_pydatetime()
+        bar = {'open': float(open_price), 'high': float(high), 'low': float(low),
+               'close': float(close), 'volume': float(volume)}
+        with self._lock:
+            state = self._state(stock_code)
+            trade_date = ts.strftime('%Y-%m-%d')
+            if state.live_date is not None and trade_date < state.live_date:
+                return False
+            self._roll_day(stock_code, state, trade_date)
+
+            if state.last_ts is not None:
+                if ts < state.last_ts:
+                    return False
+                if ts > state.last_ts:
+                    state.folded = _merge(state.folded, state.last_bar)
+            if state.first_ts is None:
+                state.first_ts = ts
+            state.last_bar = bar
+            state.last_ts = ts
+            self.stats['bars'] += 1
+            return True
+
+    def on_bars(self, stock_code: str, df: pd.DataFrame) -> int:
+        """用一批5分钟K线（trade_time, open, high, low, close, volume）更新当日日线"""
+        if df is None or df.empty:
+            return 0
+        df = df.assign(bar_ts=pd.to_datetime(df['trade_time'])).sort_values('bar_ts')
+        applied = 0
+        for row in df.itertuples(index=False):
+            applied += self.on_bar(stock_code, row.bar_ts, row.open, row.high, row.low, row.close, row.volume)
+        return applied
+
+    def on_tick(self, stock_code: str, price: float, volume: float, ts) -> bool:
+        """用一笔TICK更新当日日线"""
+        ts = pd.Timestamp(ts).to_pydatetime()
+        tick = {'open': float(price), 'high': float(price), 'low': float(price),
+                'close': float(price), 'volume': float(volume or 0)}
+        with self._lock:
+            state = self._state(stock_code)
+            trade_date = ts.strftime('%Y-%m-%d')
+            if state.live_date is not None and trade_date < state.live_date:
+                return False
+            self._roll_day(stock_code, state, trade_date)
+            if state.first_ts is None:
+                state.first_ts = ts
+            state.folded = _merge(state.folded, _merge(state.last_bar, tick))
+            state.last_bar = None
+            self.stats['ticks'] += 1
+            return True
+
+    def handle_tick_event(self, event: Event):
+        """TICK 事件监听器"""
+        if isinstance(event, TickEvent):
+            self.on_tick(event.stock_code, event.price, event.volume, event.timestamp)
+            return
+        data = event.data
+        self.on_tick(data.get('stock_code'), data.get('price'), data.get('volume', 0), event.timestamp)
+
+    def attach(self, event_engine):
+        """订阅事件引擎的 TICK 事件"""
+        event_engine.register_listener(EventType.TICK, self.handle_tick_event)
+
+    # ---------------- 查询 ----------------
+
+    def is_complete(self, stock_code: str, trade_date: str = None) -> bool:
+        """
+        当日日线是否从开盘开始聚合（中途才开始接收数据时开盘价和成交量不完整）
+
+        Args:
+            trade_date: 交易日期，默认今天
+        """
+        trade_date = trade_date or datetime.now().strftime('%Y-%m-%d')
+        with self._lock:
+            state = self._symbols.get(stock_code)
+            return (state is not None and state.live_date == trade_date
+                    and state.first_ts is not None and state.first_ts.time() <= FIRST_BAR_TIME)
+
+    def live_bar(self, stock_code: str) -> Optional[dict]:
+        """当日未收盘的日线"""
+        with self._lock:
+            state = self._symbols.get(stock_code)
+            if state is None or state.live_bar() is None:
+                return None
+            return {'stock_code': stock_code, 'trade_date': state.live_date, **state.live_bar()}
+
+    def _period_bar(self, state: _SymbolBars, frequency: str) -> Optional[dict]:
+        """当前未收盘的周线/月线 = 本周期内已收盘日线 + 当日日线"""
+        live = state.live_bar()
+        if live is None:
+            return None
+        start = period_start(state.live_date, frequency)
+        daily = self._closed(state, 'daily')
+        days = daily[(daily['trade_date'] >= start) & (daily['trade_date'] < state.live_date)]
+        bar = None
+        for row in days.itertuples(index=False):
+            bar = _merge(bar, {'open': row.open, 'high': row.high, 'low': row.low,
+                               'close': row.close, 'volume': row.volume})
+        return _merge(bar, live)
+
+    def get_kline(self, stock_code: str, frequency: str = 'daily', periods: int = 64) -> pd.DataFrame:
+        """
+        已收盘K线 + 当前未收盘K线（纯内存计算）
+
+        Args:
+            stock_code: 股票代码
+            frequency: 'daily' / 'weekly' / 'monthly'
+            periods: 返回的周期数
+
+        Returns:
+            pd.DataFrame: 列为 stock_code, trade_date, open, close, high, low, volume
+        """
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"不支持的频率: {frequency}")
+        with self._lock:
+            self.stats['requests'] += 1
+            state = self._state(stock_code)
+            self._prime(stock_code, state)
+            closed = self._closed(state, frequency)
+
+            bar = state.live_bar() if frequency == 'daily' else self._period_bar(state, frequency)
+            if bar is None:
+                return closed.tail(periods).reset_index(drop=True)
+
+            # 去掉与未收盘K线同一周期的行（数据库中可能已有盘中写入的当日/当周数据）
+            closed = closed[closed['trade_date'] < period_start(state.live_date, frequency)]
+            row = pd.DataFrame([{'stock_code': stock_code, 'trade_date': state.live_date, **bar}],
+                               columns=KLINE_COLUMNS)
+            frames = [closed.tail(periods - 1), row] if periods > 1 and not closed.empty else [row]
+            return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,410 @@
+"""
+点位时间（Point-in-Time）股本与成分股存储
+
+负责：
+1. 以"变更事件"的形式紧凑存储流通股本（stock_shares_history 表）
+2. 以"调入/调出事件"的形式存储板块成分股（sector_membership_history 表）
+3. 在计算时通过对变更点的向前填充（as-of 查询）惰性展开，
+   避免构建"每只股票 × 每个交易日"的稠密股本面板
+
+设计特点：
+- 每只股票只保存股本发生变化的日期，存储量与变更次数成正比
+- 查询某一日期的股本使用 searchsorted 定位变更点，避免未来函数
+- 没有历史记录的股票回退到 stock_basic_pro 表中的最新流通A股
+"""
+
+import os
+import sqlite3
+from typing import Dict, List, Optional, Iterable
+
+import numpy as np
+import pandas as pd
+
+
+class ShareHistory:
+    """
+    紧凑的股本变更历史（阶梯函数）。
+
+    每只股票保存一组按日期升序排列的 (生效日期, 股本) 变更点，
+    任意日期的股本等于该日期之前（含当日）最近一次变更的值。
+    早于首个变更点的日期使用首个变更点的值（与原先 bfill 行为一致）。
+    """
+
+    def __init__(self, events: pd.DataFrame = None):
+        """
+        Args:
+            events (pd.DataFrame): 变更事件，包含 stock_code, effective_date, shares 三列
+        """
+        self._dates: Dict[str, np.ndarray] = {}
+        self._values: Dict[str, np.ndarray] = {}
+        if events is not None and not events.empty:
+            self.add_events(events)
+
+    @classmethod
+    def from_scalars(cls, shares: Dict[str, float]) -> 'ShareHistory':
+        """由单一股本值（无历史）构建，每只股票只有一个变更点"""
+        history = cls()
+        for stock_code, value in shares.items():
+            if value is None or pd.isna(value):
+                continue
+            history._dates[stock_code] = np.array(['1970-01-01'], dtype='datetime64[ns]')
+            history._values[stock_code] = np.array([float(value)])
+        return history
+
+    def add_events(self, events: pd.DataFrame):
+        """合并变更事件，同一股票同一日期以后加入的为准"""
+        events = events.dropna(subset=['shares']).copy()
+        events['effective_date'] = pd.to_datetime(events['effective_date'])
+        for stock_code, group in events.groupby('stock_code', sort=False):
+            if stock_code in self._dates:
+                existing = pd.DataFrame({
+                    'effective_date': self._dates[stock_code],
+                    'shares': self._values[stock_code]
+                })
+                group = pd.concat([existing, group[['effective_date', 'shares']]])
+            group = group.drop_duplicates('effective_date', keep='last').sort_values('effective_date')
+            self._dates[stock_code] = group['effective_date'].values.astype('datetime64[ns]')
+            self._values[stock_code] = group['shares'].values.astype(float)
+
+    def fill_missing(self, shares: Dict[str, float]):
+        """为没有任何变更记录的股票补充单一股本值"""
+        missing = {code: value for code, value in shares.items() if code not in self._dates}
+        if missing:
+            fallback = ShareHistory.from_scalars(missing)
+            self._dates.update(fallback._dates)
+            self._values.update(fallback._values)
+
+    def __contains__(self, stock_code: str) -> bool:
+        return stock_code in self._dates
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    @property
+    def stock_codes(self) -> List[str]:
+        return list(self._dates.keys())
+
+    @property
+    def event_count(self) -> int:
+        """变更点总数（即实际存储的数据量）"""
+        return int(sum(len(v) for v in self._values.values()))
+
+    def _lookup(self, stock_code: str, dates: np.ndarray) -> np.ndarray:
+        """向前填充查找：返回每个日期对应的股本"""
+        change_dates = self._dates[stock_code]
+        values = self._values[stock_code]
+        positions = np.searchsorted(change_dates, dates, side='right') - 1
+        # 早于首个变更点的日期使用首个值
+        np.clip(positions, 0, len(values) - 1, out=positions)
+        return values[positions]
+
+    def asof(self, date, stock_codes: Iterable[str] = None) -> pd.Series:
+        """
+        获取某一日期各股票的股本（不构建面板）
+
+        Args:
+            date: 查询日期
+            stock_codes: 股票列表，默认全部
+
+        Returns:
+            pd.Series: 以股票代码为索引的股本
+        """
+        codes = [c for c in (stock_codes if stock_codes is not None else self._dates) if c in self._dates]
+        target = np.array([pd.Timestamp(date).to_datetime64()], dtype='datetime64[ns]')
+        return pd.Series({code: self._lookup(code, target)[0] for code in codes}, dtype=float)
+
+    def multiply(self, panel: pd.DataFrame) -> pd.DataFrame:
+        """
+        计算 panel × 股本（如收盘价 × 股本 = 市值），股本按列惰性展开，
+        不保留任何中间的稠密股本面板。
+
+        Args:
+            panel (pd.DataFrame): 日期为索引、股票代码为列的面板
+
+        Returns:
+            pd.DataFrame: 相乘结果；没有股本记录的股票结果为 NaN
+        """
+        dates = panel.index.values.astype('datetime64[ns]')
+        result = panel.to_numpy(dtype=float, copy=True)
+        for j, stock_code in enumerate(panel.columns):
+            if stock_code in self._dates:
+                result[:, j] *= self._lookup(stock_code, dates)
+            else:
+                result[:, j] = np.nan
+        return pd.DataFrame(result, index=panel.index, columns=panel.columns)
+
+    def expand(self, index: pd.Index, stock_codes: Iterable[str] = None) -> pd.DataFrame:
+        """
+        展开为稠密面板（仅用于兼容旧接口或调试，计算路径不应调用）
+        """
+        codes = [c for c in (stock_codes if stock_codes is not None else self._dates) if c in self._dates]
+        dates = pd.DatetimeIndex(index).values.astype('datetime64[ns]')
+        return pd.DataFrame({code: self._lookup(code, dates) for code in codes}, index=index)
+
+
+class MembershipHistory:
+    """
+    紧凑的板块成分股变更历史。
+
+    每只股票保存一组按日期升序排列的 (生效日期, 是否成分股) 事件。
+    没有任何事件的股票视为始终是成分股（兼容只维护当前成分股快照的情况）。
+    """
+
+    def __init__(self, events: pd.DataFrame = None):
+        """
+        Args:
+            events (pd.DataFrame): 成分股事件，包含 stock_code, effective_date, is_member 三列
+        """
+        self._dates: Dict[str, np.ndarray] = {}
+        self._flags: Dict[str, np.ndarray] = {}
+        if events is not None and not events.empty:
+            events = events.copy()
+            events['effective_date'] = pd.to_datetime(events['effective_date'])
+            for stock_code, group in events.groupby('stock_code', sort=False):
+                group = group.drop_duplicates('effective_date', keep='last').sort_values('effective_date')
+                self._dates[stock_code] = group['effective_date'].values.astype('datetime64[ns]')
+                self._flags[stock_code] = group['is_member'].values.astype(bool)
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def _lookup(self, stock_code: str, dates: np.ndarray) -> np.ndarray:
+        if stock_code not in self._dates:
+            return np.ones(len(dates), dtype=bool)
+        positions = np.searchsorted(self._dates[stock_code], dates, side='right') - 1
+        # 早于首个事件的日期不是成分股
+        flags = self._flags[stock_code][np.clip(positions, 0, None)]
+        flags[positions < 0] = False
+        return flags
+
+    def members_asof(self, date, stock_codes: Iterable[str]) -> List[str]:
+        """获取某一日期仍为成分股的股票"""
+        target = np.array([pd.Timestamp(date).to_datetime64()], dtype='datetime64[ns]')
+        return [code for code in stock_codes if self._lookup(code, target)[0]]
+
+    def apply(self, panel: pd.DataFrame, fill_value: float = 0.0) -> pd.DataFrame:
+        """将非成分股期间的数据置为 fill_value（不构建稠密布尔面板）"""
+        if not self._dates:
+            return panel
+        dates = panel.index.values.astype('datetime64[ns]')
+        result = panel.to_numpy(dtype=float, copy=True)
+        for j, stock_code in enumerate(panel.columns):
+            if stock_code in self._dates:
+                result[~self._lookup(stock_code, dates), j] = fill_value
+        return pd.DataFrame(result, index=panel.index, columns=panel.columns)
+
+
+class PointInTimeStore:
+    """点位时间股本与成分股存储（SQLite）"""
+
+    def __init__(self, db_path: str = None):
+        """
+        Args:
+            db_path (str): 数据库路径，默认使用 DatabaseManager 的数据库
+        """
+        if db_path is None:
+            from data_management.database_manager import DatabaseManager
+            db_path = DatabaseManager().db_path
+        self.db_path = db_path
+        self.ensure_tables()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def ensure_tables(self):
+        """创建股本变更表和成分股变更表（如果不存在）"""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stock_shares_history (
+                    stock_code TEXT NOT NULL,
+                    effective_date TEXT NOT NULL,
+                    shares REAL NOT NULL,
+                    PRIMARY KEY (stock_code, effective_date)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sector_membership_history (
+                    sector_code TEXT NOT NULL,
+                    stock_code TEXT NOT NULL,
+                    effective_date TEXT NOT NULL,
+                    is_member INTEGER NOT NULL,
+                    PRIMARY KEY (sector_code, stock_code, effective_date)
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---------------- 写入 ----------------
+
+    def record_shares_changes(self, events: pd.DataFrame) -> int:
+        """
+        批量写入股本变更事件。与上一次记录相同的股本会被跳过，只保存真正的变更点。
+
+        Args:
+            events (pd.DataFrame): 包含 stock_code, effective_date, shares 三列
+
+        Returns:
+            int: 实际写入的变更点数量
+        """
+        if events is None or events.empty:
+            return 0
+
+        events = events.dropna(subset=['shares']).copy()
+        events['effective_date'] = pd.to_datetime(events['effective_date']).dt.strftime('%Y-%m-%d')
+        events = events.sort_values(['stock_code', 'effective_date'])
+
+        # 当前已知的最新股本，用于去除冗余记录
+        latest = self.load_shares_events(events['stock_code'].unique().tolist())
+        last_known = {}
+        if not latest.empty:
+            for row in latest.itertuples(index=False):
+                last_known[row.stock_code] = (row.effective_date.strftime('%Y-%m-%d'), row.shares)
+
+        rows = []
+        for row in events.itertuples(index=False):
+            previous = last_known.get(row.stock_code)
+            if previous is not None and previous[0] <= row.effective_date and previous[1] == float(row.shares):
+                continue
+            rows.append((row.stock_code, row.effective_date, float(row.shares)))
+            last_known[row.stock_code] = (row.effective_date, float(row.shares))
+
+        if rows:
+            conn = self._connect()
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO stock_shares_history (stock_code, effective_date, shares) VALUES (?, ?, ?)",
+                    rows
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        return len(rows)
+
+    def snapshot_circulating_shares(self, effective_date: str) -> int:
+        """
+        将 stock_basic_pro 表中当前的流通A股作为 effective_date 的变更点写入历史。
+        每日数据更新后调用即可逐步积累股本历史（未变化的股本不会重复写入）。
+        """
+        conn = self._connect()
+        try:
+            df = pd.read_sql_query("SELECT stock_code, 流通A股 AS shares FROM stock_basic_pro", conn)
+        finally:
+            conn.close()
+        df['effective_date'] = effective_date
+        return self.record_shares_changes(df)
+
+    def record_membership_changes(self, sector_code: str, events: pd.DataFrame) -> int:
+        """
+        批量写入成分股调入/调出事件
+
+        Args:
+            sector_code (str): 板块代码
+            events (pd.DataFrame): 包含 stock_code, effective_date, is_member 三列
+
+        Returns:
+            int: 写入的事件数量
+        """
+        if events is None or events.empty:
+            return 0
+        rows = [
+            (sector_code, row.stock_code, pd.Timestamp(row.effective_date).strftime('%Y-%m-%d'), int(bool(row.is_member)))
+            for row in events.itertuples(index=False)
+        ]
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sector_membership_history "
+                "(sector_code, stock_code, effective_date, is_member) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return len(rows)
+
+    def snapshot_membership(self, sector_code: str, stock_list: List[str], effective_date: str) -> int:
+        """
+        将当前成分股快照与已记录的历史比较，只写入调入和调出的差异事件。
+
+        板块首次建档时不知道成分股的实际调入日期，初始成分股按"一直是成分股"处理
+        （生效日期记为 1970-01-01），与只使用当前成分股快照的旧逻辑保持一致。
+        """
+        current = set(stock_list)
+        history = self.load_membership(sector_code)
+        if len(history) == 0:
+            effective_date = '1970-01-01'
+        known = set(history._dates.keys())
+        previous = set(history.members_asof(effective_date, known))
+
+        events = [(code, effective_date, 1) for code in sorted(current - previous)]
+        events += [(code, effective_date, 0) for code in sorted(previous - current)]
+        if not events:
+            return 0
+        return self.record_membership_changes(
+            sector_code, pd.DataFrame(events, columns=['stock_code', 'effective_date', 'is_member'])
+        )
+
+    # ---------------- 读取 ----------------
+
+    def load_shares_events(self, stock_list: List[str], end_date: str = None,
+                           latest_only: bool = False) -> pd.DataFrame:
+        """
+        读取股本变更事件（紧凑形式）
+
+        Args:
+            stock_list (List[str]): 股票列表
+            end_date (str): 只返回该日期（含）之前生效的事件
+            latest_only (bool): 每只股票只返回最新的一条
+
+        Returns:
+            pd.DataFrame: stock_code, effective_date, shares
+        """
+        columns = ['stock_code', 'effective_date', 'shares']
+        if not stock_list:
+            return pd.DataFrame(columns=columns)
+
+        placeholders = ','.join('?' for _ in stock_list)
+        params = list(stock_list)
+        query = f"SELECT stock_code, effective_date, shares FROM stock_shares_history WHERE stock_code IN ({placeholders})"
+        if end_date is not None:
+            query += " AND effective_date <= ?"
+            params.append(pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+        query += " ORDER BY stock_code, effective_date"
+
+        conn = self._connect()
+        try:
+            df = pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
+
+        df['effective_date'] = pd.to_datetime(df['effective_date'])
+        if latest_only and not df.empty:
+            df = df.groupby('stock_code', sort=False).tail(1).reset_index(drop=True)
+        return df
+
+    def load_share_history(self, stock_list: List[str], end_date: str = None,
+                           fallback: Optional[Dict[str, float]] = None) -> ShareHistory:
+        """
+        读取股本历史，没有历史记录的股票使用 fallback 中的单一股本值
+        """
+        history = ShareHistory(self.load_shares_events(stock_list, end_date))
+        if fallback:
+            history.fill_missing(fallback)
+        return history
+
+    def load_membership(self, sector_code: str, end_date: str = None) -> MembershipHistory:
+        """读取板块成分股变更历史"""
+        query = "SELECT stock_code, effective_date, is_member FROM sector_membership_history WHERE sector_code = ?"
+        params = [sector_code]
+        if end_date is not None:
+            query += " AND effective_date <= ?"
+            params.append(pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+
+        conn = self._connect()
+        try:
+            df = pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
+        return MembershipHistory(df)
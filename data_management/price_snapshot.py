@@ -0,0 +1,208 @@
+"""
+价格快照服务
+
+负责：
+1. 一次批量（并发）获取所有持仓/监控股票的最新价格
+2. 按有效期缓存价格快照：交易时段内短有效期（默认3秒），
+   收盘后价格不再变化，快照一直有效到下一个交易时段开始
+3. 账户的持仓重构、总权益、盈亏查询等都从快照读取，
+   一次监控循环中同一只股票只请求一次网络
+4. 网络请求在锁外进行：读取新鲜快照不会被慢请求阻塞，
+   多个线程同时请求同一只过期股票时只发起一次请求，其余线程等待其结果
+"""
+
+import threading
+from datetime import datetime, timedelta, time as dtime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from core.utils.logger import get_logger
+from data_management.concurrent_fetcher import ConcurrentFetcher, CallableSource
+
+logger = get_logger("data_management.price_snapshot")
+
+# A股交易时段（含集合竞价）
+TRADING_SESSIONS = [(dtime(9, 15), dtime(11, 30)), (dtime(13, 0), dtime(15, 0))]
+
+
+def is_trading_session(now: datetime) -> bool:
+    """判断给定时间是否处于交易时段（周一到周五）"""
+    if now.weekday() >= 5:
+        return False
+    current = now.time()
+    return any(start <= current <= end for start, end in TRADING_SESSIONS)
+
+
+def next_session_start(now: datetime) -> datetime:
+    """给定时间之后最近的一个交易时段开始时间"""
+    day = now.date()
+    while True:
+        if day.weekday() < 5:
+            for start, _ in TRADING_SESSIONS:
+                candidate = datetime.combine(day, start)
+                if candidate > now:
+                    return candidate
+        day += timedelta(days=1)
+
+
+def _default_price_func(stock_code: str) -> Optional[float]:
+    from data_management.data_processor import get_latest_price
+    return get_latest_price(stock_code)
+
+
+class PriceSnapshotService:
+    """带有效期的批量价格快照"""
+
+    def __init__(self, price_func: Callable[[str], Optional[float]] = None,
+                 trading_ttl: float = 3.0, max_concurrency: int = 8, timeout: float = 15.0,
+                 now_func: Callable[[], datetime] = datetime.now):
+        """
+        Args:
+            price_func: 单只股票取价函数，默认 data_processor.get_latest_price（内部已有多数据源回退）
+            trading_ttl: 交易时段内快照的有效期（秒）
+            max_concurrency: 批量取价的最大并发数
+            timeout: 单只股票取价超时（秒）
+            now_func: 当前时间函数（测试时可替换）
+        """
+        self.price_func = price_func or _default_price_func
+        self.trading_ttl = trading_ttl
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.now_func = now_func
+
+        self._prices: Dict[str, float] = {}
+        self._expires: Dict[str, datetime] = {}
+        self._watched = set()
+        # 正在请求中的股票 -> 请求完成事件（同一批次共用一个事件）
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.RLock()
+        self.stats = {'hits': 0, 'misses': 0, 'batches': 0, 'failures': 0, 'coalesced': 0}
+
+    def _expiry(self, now: datetime) -> datetime:
+        if is_trading_session(now):
+            return now + timedelta(seconds=self.trading_ttl)
+        # 收盘后使用收盘价，直到下一个交易时段开始
+        return next_session_start(now)
+
+    def watch(self, stock_codes: Iterable[str]):
+        """加入监控列表，之后每次批量刷新都会一起获取这些股票的价格"""
+        with self._lock:
+            self._watched.update(str(code) for code in stock_codes)
+
+    def unwatch(self, stock_codes: Iterable[str]):
+        with self._lock:
+            self._watched.difference_update(str(code) for code in stock_codes)
+
+    def invalidate(self, stock_codes: Iterable[str] = None):
+        """使快照失效（不传参数时清空全部）"""
+        with self._lock:
+            if stock_codes is None:
+                self._expires.clear()
+            else:
+                for code in stock_codes:
+                    self._expires.pop(str(code), None)
+
+    def _is_fresh(self, code: str, now: datetime) -> bool:
+        expires = self._expires.get(code)
+        return expires is not None and now < expires
+
+    def _fetch_batch(self, codes: List[str]) -> Dict[str, float]:
+        """并发获取一批股票的价格，只返回获取成功的部分"""
+        source = CallableSource('latest_price', self.price_func,
+                                max_concurrency=self.max_concurrency, timeout=self.timeout, retries=0)
+        fetcher = ConcurrentFetcher([source])
+        prices = {}
+        try:
+            for result in fetcher.iter_fetch(codes):
+                if result.ok:
+                    try:
+                        prices[result.key] = float(result.value)
+                    except (TypeError, ValueError):
+                        logger.warning(f"{result.key} 价格格式错误: {result.value}")
+        finally:
+            fetcher.close()
+        return prices
+
+    def get_prices(self, stock_codes: Iterable[str], force: bool = False) -> Dict[str, Optional[float]]:
+        """
+        获取一批股票的价格
+
+        快照中过期或缺失的股票（连同监控列表中过期的股票）合并为一次批量请求；
+        其他线程正在请求的股票不重复请求，等待该请求完成后读取快照（force 时仍单独请求）；
+        获取失败时沿用上一次的价格，从未获取成功的返回 None
+
+        Args:
+            stock_codes: 股票代码列表
+            force: 是否忽略有效期强制刷新
+
+        Returns:
+            Dict[str, Optional[float]]: 股票代码到价格的映射
+        """
+        codes = list(dict.fromkeys(str(code) for code in stock_codes))
+        batch, waiting = [], set()
+        with self._lock:
+            now = self.now_func()
+            stale = [c for c in codes if force or not self._is_fresh(c, now)]
+            self.stats['hits'] += len(codes) - len(stale)
+            self.stats['misses'] += len(stale)
+
+            if stale:
+                requested = set(stale)
+                for code in dict.fromkeys(stale + [c for c in self._watched if not self._is_fresh(c, now)]):
+                    event = self._inflight.get(code)
+                    if event is None or (force and code in requested):
+                        batch.append(code)
+                    elif code in requested:
+                        # 其他线程正在请求，等待其结果
+                        waiting.add(event)
+                        self.stats['coalesced'] += 1
+                done = threading.Event()
+                for code in batch:
+                    self._inflight.setdefault(code, done)
+
+        if batch:
+            fetched = {}
+            try:
+                fetched = self._fetch_batch(batch)
+            finally:
+                with self._lock:
+                    self.stats['batches'] += 1
+                    self.stats['failures'] += len(batch) - len(fetched)
+                    expires = self._expiry(self.now_func())
+                    for code, price in fetched.items():
+                        self._prices[code] = price
+                        self._expires[code] = expires
+                    for code in batch:
+                        if self._inflight.get(code) is done:
+                            del self._inflight[code]
+                        if code not in fetched:
+                            logger.warning(f"无法获取 {code} 的最新价格"
+                                           + ("，沿用上一次的价格" if code in self._prices else ""))
+                done.set()
+
+        for event in waiting:
+            event.wait()
+
+        with self._lock:
+            return {code: self._prices.get(code) for code in codes}
+
+    def get_price(self, stock_code: str, force: bool = False) -> Optional[float]:
+        """获取单只股票的价格"""
+        return self.get_prices([stock_code], force=force)[str(stock_code)]
+
+    def snapshot(self) -> Dict[str, float]:
+        """当前快照中的全部价格（不触发网络请求）"""
+        with self._lock:
+            return dict(self._prices)
+
+
+_default_service = None
+_default_service_lock = threading.Lock()
+
+
+def get_price_snapshot_service() -> PriceSnapshotService:
+    """进程内共享的价格快照服务（多个账户共用同一份快照）"""
+    global _default_service
+    with _default_service_lock:
+        if _default_service is None:
+            _default_service = PriceSnapshotService()
+        return _default_service
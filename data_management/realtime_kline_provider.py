@@ -10,6 +10,7 @@
 4. 专为技术指标计算优化
 """
 
+import os
 import pandas as pd
 import sqlite3
 from datetime import datetime, timedelta, time
@@ -18,6 +19,12 @@ import logging
 import schedule
 import threading
 
+from data_management.concurrent_fetcher import (
+    ConcurrentFetcher, FetchSource, CallableSource, AkshareQuoteSource, AdataQuoteSource
+)
+from data_management.bar_ring_buffer import IntradayBarStore, DERIVED_TIMEFRAMES
+from data_management.live_bar_aggregator import LiveBarAggregator, FREQUENCIES
+
 # 数据源导入
 try:
     import adata
@@ -40,10 +47,24 @@ class RealtimeKlineProvider:
     专注于提供技术指标计算所需的K线数据
     """
     
-    def __init__(self, db_path: str = "databases/quant_system.db"):
+    def __init__(self, db_path: str = "databases/quant_system.db",
+                 quote_sources: List[FetchSource] = None, max_concurrency: int = 8,
+                 bar_store_dir: str = None):
+        """
+        Args:
+            db_path: 数据库路径
+            quote_sources: 实时报价数据源（按优先级排列），默认 akshare 优先、adata 备用
+            max_concurrency: 批量获取K线/5分钟数据时的最大并发数
+            bar_store_dir: 5分钟K线环形缓冲区目录，默认为数据库所在目录下的 k_5min_ring
+        """
         self.db_path = db_path
         self.default_periods = 64  # 默认64个周期
         
+        # 并发获取设置
+        self.max_concurrency = max_concurrency
+        self._quote_sources = quote_sources
+        self._quote_fetcher = None
+        
         # 数据表名称
         self.daily_table = "k_daily"
         self.weekly_table = "k_weekly"
@@ -55,6 +76,9 @@ class RealtimeKlineProvider:
         
         # 5分钟数据设置
         self.max_5min_periods = 1000  # 最大保存1000个周期
+        self.bar_store_dir = bar_store_dir or os.path.join(os.path.dirname(db_path) or '.', 'k_5min_ring')
+        self._bar_store = None
+        self._live_bars = None
         
         # 监控股票列表
         self.watch_stocks = []
@@ -225,49 +249,72 @@ class RealtimeKlineProvider:
             return pd.DataFrame()
         
         try:
-            # 计算开始日期（获取最近几天的数据以确保有足够的5分钟数据）
-            end_date = datetime.now().strftime('%Y-%m-%d')
-            start_date = (datetime.now() - timedelta(days=3)).strftime('%Y-%m-%d')
-            
-            # 使用adata获取5分钟K线数据
-            df = adata.stock.market.get_market(
-                stock_code=stock_code,
-                k_type='5',  # 5分钟
-                start_date=start_date,
-                end_date=end_date
-            )
-            
+            df = self._fetch_5min_kline(stock_code, count)
             if not df.empty:
-                # 按时间排序并取最新的count条记录
-                df = df.sort_values('trade_time').tail(count).reset_index(drop=True)
-                
-                # 标准化列名（adata已经返回正确的列名）
-                # 确保包含必要的列
-                required_columns = ['stock_code', 'trade_date', 'trade_time', 'open', 'close', 'high', 'low', 'volume']
-                
-                # 检查并添加缺失的列
-                for col in required_columns:
-                    if col not in df.columns:
-                        if col == 'stock_code':
-                            df['stock_code'] = stock_code
-                        elif col == 'trade_date':
-                            # 从trade_time提取日期
-                            df['trade_date'] = pd.to_datetime(df['trade_time']).dt.strftime('%Y-%m-%d')
-                
-                # 重新排列列顺序
-                df = df[required_columns]
-                
                 self.logger.info(f"获取{stock_code} 5分钟数据成功: {len(df)}条")
-            
             return df
             
         except Exception as e:
             self.logger.error(f"获取{stock_code} 5分钟数据失败: {e}")
             return pd.DataFrame()
     
+    def _fetch_5min_kline(self, stock_code: str, count: int = 5) -> pd.DataFrame:
+        """
+        从adata获取5分钟K线数据，请求失败时抛出异常（供并发获取引擎重试）
+        """
+        # 计算开始日期（获取最近几天的数据以确保有足够的5分钟数据）
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        start_date = (datetime.now() - timedelta(days=3)).strftime('%Y-%m-%d')
+        
+        # 使用adata获取5分钟K线数据
+        df = adata.stock.market.get_market(
+            stock_code=stock_code,
+            k_type='5',  # 5分钟
+            start_date=start_date,
+            end_date=end_date
+        )
+        
+        if not df.empty:
+            # 按时间排序并取最新的count条记录
+            df = df.sort_values('trade_time').tail(count).reset_index(drop=True)
+            
+            # 标准化列名（adata已经返回正确的列名）
+            # 确保包含必要的列
+            required_columns = ['stock_code', 'trade_date', 'trade_time', 'open', 'close', 'high', 'low', 'volume']
+            
+            # 检查并添加缺失的列
+            for col in required_columns:
+                if col not in df.columns:
+                    if col == 'stock_code':
+                        df['stock_code'] = stock_code
+                    elif col == 'trade_date':
+                        # 从trade_time提取日期
+                        df['trade_date'] = pd.to_datetime(df['trade_time']).dt.strftime('%Y-%m-%d')
+            
+            # 重新排列列顺序
+            df = df[required_columns]
+        
+        return df
+    
+    @property
+    def bar_store(self) -> IntradayBarStore:
+        """5分钟K线环形缓冲区（首次使用时创建）"""
+        if self._bar_store is None:
+            self._bar_store = IntradayBarStore(self.bar_store_dir, capacity=self.max_5min_periods)
+        return self._bar_store
+    
+    @property
+    def live_bars(self) -> LiveBarAggregator:
+        """由5分钟数据增量维护的日/周/月线（已收盘部分从本地数据库加载一次）"""
+        if self._live_bars is None:
+            self._live_bars = LiveBarAggregator(self.get_historical_kline, history_periods=self.default_periods)
+        return self._live_bars
+    
     def save_5min_data(self, stock_code: str, data_df: pd.DataFrame) -> bool:
         """
-        保存5分钟数据到数据库，并维护1000个周期的限制
+        保存5分钟数据到环形缓冲区（固定保留1000个周期），并增量更新15/30/60分钟K线和当日日/周/月线
+        
+        与已保存的最新一根K线时间相同的数据视为修订，原位覆盖；更早的数据忽略
         
         Args:
             stock_code: 股票代码
@@ -280,75 +327,24 @@ class RealtimeKlineProvider:
             return True
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            
-            # 保存新数据
-            data_df.to_sql(self.min5_table, conn, if_exists='append', index=False)
-            
-            # 检查并清理超过1000个周期的数据
-            self.cleanup_5min_data(stock_code, conn)
+            written = self.bar_store.append(stock_code, data_df)
             
-            conn.commit()
-            conn.close()
+            # 当日第一次更新时用已保存的当日全部5分钟K线初始化（一个交易日最多48根），之后只喂入新数据
+            live = self.live_bars.live_bar(stock_code)
+            if live is None or live['trade_date'] != str(data_df['trade_time'].max())[:10]:
+                feed = self.bar_store.get_frame(stock_code, 48)
+                feed = feed[feed['trade_date'] == feed['trade_date'].iloc[-1]]
+            else:
+                feed = data_df
+            self.live_bars.on_bars(stock_code, feed)
             
-            self.logger.info(f"保存{stock_code} 5分钟数据成功: {len(data_df)}条")
+            self.logger.info(f"保存{stock_code} 5分钟数据成功: {written}条")
             return True
             
         except Exception as e:
             self.logger.error(f"保存{stock_code} 5分钟数据失败: {e}")
             return False
     
-    def cleanup_5min_data(self, stock_code: str, conn=None):
-        """
-        清理5分钟数据，保持最多1000个周期
-        
-        Args:
-            stock_code: 股票代码
-            conn: 数据库连接（可选）
-        """
-        should_close = False
-        if conn is None:
-            conn = sqlite3.connect(self.db_path)
-            should_close = True
-        
-        try:
-            cursor = conn.cursor()
-            
-            # 获取当前数据量
-            cursor.execute(f"""
-                SELECT COUNT(*) 
-                FROM {self.min5_table} 
-                WHERE stock_code = ?
-            """, (stock_code,))
-            
-            count = cursor.fetchone()[0]
-            
-            if count > self.max_5min_periods:
-                # 删除最旧的数据
-                delete_count = count - self.max_5min_periods
-                cursor.execute(f"""
-                    DELETE FROM {self.min5_table} 
-                    WHERE stock_code = ? 
-                    AND trade_time IN (
-                        SELECT trade_time 
-                        FROM {self.min5_table} 
-                        WHERE stock_code = ? 
-                        ORDER BY trade_time 
-                        LIMIT ?
-                    )
-                """, (stock_code, stock_code, delete_count))
-                
-                self.logger.info(f"清理{stock_code}旧5分钟数据: {delete_count}条，保持{self.max_5min_periods}个周期")
-            
-            if should_close:
-                conn.commit()
-                conn.close()
-            
-        except Exception as e:
-            self.logger.error(f"清理{stock_code} 5分钟数据失败: {e}")
-            if should_close and conn:
-                conn.close()
-    
     def update_5min_data_for_stock(self, stock_code: str):
         """
         更新单只股票的5分钟数据
@@ -509,7 +505,9 @@ class RealtimeKlineProvider:
     def get_kline_for_analysis(self, stock_code: str, frequency: str = 'daily', periods: int = 64) -> pd.DataFrame:
         """
         获取用于技术指标分析的K线数据
-        直接从adata获取最新的指定周期数据
+        
+        当日5分钟数据从开盘起完整时，直接由内存中的已收盘K线 + 盘中聚合的当前K线返回（无网络请求），
+        否则从adata获取最新的指定周期数据
         
         Args:
             stock_code: 股票代码
@@ -520,6 +518,12 @@ class RealtimeKlineProvider:
             pd.DataFrame: 用于分析的K线数据
         """
         try:
+            if frequency in FREQUENCIES and self.live_bars.is_complete(stock_code):
+                df = self.live_bars.get_kline(stock_code, frequency, periods)
+                if not df.empty:
+                    self.logger.info(f"✅ 从内存获取{stock_code} {frequency} K线数据: {len(df)}个周期")
+                    return df
+            
             self.logger.info(f"从adata获取{stock_code} {frequency} K线数据，周期数: {periods}")
             
             if not ADATA_AVAILABLE:
@@ -607,16 +611,21 @@ class RealtimeKlineProvider:
         """
         results = {}
         
-        for stock_code in stock_codes:
-            try:
-                kline_df = self.get_kline_for_analysis(stock_code, k_type, periods, force_realtime)
-                if not kline_df.empty:
-                    results[stock_code] = kline_df
+        # 【并发】各股票的历史+实时K线并发获取，不再串行等待网络延迟
+        source = CallableSource(
+            f'kline_{k_type}',
+            lambda stock_code: self.get_kline_for_analysis(stock_code, k_type, periods, force_realtime),
+            max_concurrency=self.max_concurrency, timeout=30.0, retries=0
+        )
+        fetcher = ConcurrentFetcher([source])
+        try:
+            for result in fetcher.iter_fetch(stock_codes):
+                if result.ok:
+                    results[result.key] = result.value
                 else:
-                    self.logger.warning(f"⚠️ {stock_code}数据获取失败")
-            
-            except Exception as e:
-                self.logger.error(f"获取{stock_code}数据异常: {e}")
+                    self.logger.warning(f"⚠️ {result.key}数据获取失败: {result.error}")
+        finally:
+            fetcher.close()
         
         self.logger.info(f"批量获取完成: {len(results)}/{len(stock_codes)}只股票")
         return results
@@ -658,14 +667,25 @@ class RealtimeKlineProvider:
         
         self.logger.info(f"开始5分钟数据更新: {datetime.now().strftime('%H:%M:%S')}")
         
-        # 更新所有监控股票的5分钟数据
+        if not ADATA_AVAILABLE:
+            self.logger.warning("adata不可用，无法获取5分钟K线数据")
+            return
+        
+        # 【并发】所有监控股票的5分钟数据并发获取（带超时和重试），
+        # 数据到达后在当前线程中逐个写入数据库，避免SQLite并发写入
+        source = CallableSource('adata_5min', lambda stock_code: self._fetch_5min_kline(stock_code, 5),
+                                max_concurrency=self.max_concurrency, timeout=10.0, retries=2)
+        fetcher = ConcurrentFetcher([source])
         success_count = 0
-        for stock_code in self.watch_stocks:
-            try:
-                self.update_5min_data_for_stock(stock_code)
-                success_count += 1
-            except Exception as e:
-                self.logger.error(f"更新{stock_code} 5分钟数据失败: {e}")
+        try:
+            for result in fetcher.iter_fetch(self.watch_stocks):
+                if not result.ok:
+                    self.logger.warning(f"⚠️ {result.key} 5分钟数据获取失败: {result.error}")
+                    continue
+                if self.save_5min_data(result.key, result.value):
+                    success_count += 1
+        finally:
+            fetcher.close()
         
         self.logger.info(f"5分钟数据更新完成: {success_count}/{len(self.watch_stocks)}只股票")
     
@@ -713,35 +733,53 @@ class RealtimeKlineProvider:
             # 非交易时间，跳过
             pass
     
-    def get_realtime_quotes(self, stock_codes: List[str]) -> Dict[str, Dict]:
+    @property
+    def quote_fetcher(self) -> Optional[ConcurrentFetcher]:
+        """
+        实时报价并发获取引擎（首次使用时创建）
+        默认 akshare 优先、adata 备用，可通过构造参数 quote_sources 替换
+        """
+        if self._quote_fetcher is None:
+            sources = self._quote_sources
+            if sources is None:
+                sources = []
+                if AKSHARE_AVAILABLE:
+                    sources.append(AkshareQuoteSource(max_concurrency=self.max_concurrency, timeout=5.0))
+                if ADATA_AVAILABLE:
+                    sources.append(AdataQuoteSource(max_concurrency=self.max_concurrency, timeout=5.0))
+            if not sources:
+                return None
+            self._quote_fetcher = ConcurrentFetcher(sources)
+        return self._quote_fetcher
+    
+    def get_realtime_quotes(self, stock_codes: List[str], on_quote=None) -> Dict[str, Dict]:
         """
-        获取实时报价数据
+        获取实时报价数据（并发获取，失败时重试并回退到备用数据源）
         
         Args:
             stock_codes: 股票代码列表
+            on_quote: 可选回调 on_quote(stock_code, quote)，每只股票的报价到达时立即调用
         
         Returns:
             Dict: 实时报价数据
         """
         quotes = {}
         
-        for stock_code in stock_codes:
-            try:
-                # 优先使用akshare
-                if AKSHARE_AVAILABLE:
-                    quote_data = self.get_quote_from_akshare(stock_code)
-                    if quote_data:
-                        quotes[stock_code] = quote_data
-                        continue
-                
-                # 备用adata
-                if ADATA_AVAILABLE:
-                    quote_data = self.get_quote_from_adata(stock_code)
-                    if quote_data:
-                        quotes[stock_code] = quote_data
-                
-            except Exception as e:
-                self.logger.error(f"获取{stock_code}实时报价失败: {e}")
+        fetcher = self.quote_fetcher
+        if fetcher is None:
+            self.logger.warning("没有可用的实时报价数据源")
+            return quotes
+        
+        for result in fetcher.iter_fetch(stock_codes):
+            if not result.ok:
+                self.logger.error(f"获取{result.key}实时报价失败: {result.error}")
+                continue
+            quotes[result.key] = result.value
+            if on_quote is not None:
+                try:
+                    on_quote(result.key, result.value)
+                except Exception as e:
+                    self.logger.error(f"处理{result.key}实时报价失败: {e}")
         
         return quotes
     
@@ -800,78 +838,31 @@ class RealtimeKlineProvider:
     
     def convert_5min_to_other_timeframes(self, stock_code: str, timeframes: List[str] = ['15min', '30min', '60min']) -> Dict[str, pd.DataFrame]:
         """
-        将5分钟K线数据转换为其他时间周期（内存中转换，不存储到数据库）
+        获取由5分钟K线合成的其他时间周期K线
+        
+        派生K线在保存5分钟数据时已增量维护，这里直接读取，不再重采样
         
         Args:
             stock_code: 股票代码
-            timeframes: 要转换的时间周期列表
+            timeframes: 要获取的时间周期列表
         
         Returns:
             Dict[str, pd.DataFrame]: 各时间周期的K线数据
         """
         try:
-            # 从数据库获取5分钟数据
-            conn = sqlite3.connect(self.db_path)
-            query = f"""
-            SELECT * FROM {self.min5_table}
-            WHERE stock_code = ?
-            ORDER BY trade_time
-            """
-            
-            df_5min = pd.read_sql_query(query, conn, params=[stock_code])
-            conn.close()
-            
-            if df_5min.empty:
+            if not len(self.bar_store.last(stock_code, 1)):
                 self.logger.warning(f"{stock_code} 没有5分钟数据")
                 return {}
             
-            # 转换时间格式
-            df_5min['datetime'] = pd.to_datetime(df_5min['trade_time'])
-            df_5min = df_5min.set_index('datetime')
-            
             results = {}
             
             for timeframe in timeframes:
                 try:
-                    if timeframe == '15min':
-                        # 转换为15分钟
-                        df_converted = df_5min.resample('15T').agg({
-                            'open': 'first',
-                            'high': 'max',
-                            'low': 'min',
-                            'close': 'last',
-                            'volume': 'sum'
-                        }).dropna()
-                    elif timeframe == '30min':
-                        # 转换为30分钟
-                        df_converted = df_5min.resample('30T').agg({
-                            'open': 'first',
-                            'high': 'max',
-                            'low': 'min',
-                            'close': 'last',
-                            'volume': 'sum'
-                        }).dropna()
-                    elif timeframe == '60min':
-                        # 转换为60分钟
-                        df_converted = df_5min.resample('60T').agg({
-                            'open': 'first',
-                            'high': 'max',
-                            'low': 'min',
-                            'close': 'last',
-                            'volume': 'sum'
-                        }).dropna()
-                    else:
+                    if timeframe not in DERIVED_TIMEFRAMES:
                         self.logger.warning(f"不支持的时间周期: {timeframe}")
                         continue
                     
-                    # 重置索引并格式化
-                    df_converted = df_converted.reset_index()
-                    df_converted['stock_code'] = stock_code
-                    df_converted['trade_date'] = df_converted['datetime'].dt.strftime('%Y-%m-%d')
-                    df_converted['trade_time'] = df_converted['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    # 重新排列列
-                    df_converted = df_converted[['stock_code', 'trade_date', 'trade_time', 'open', 'close', 'high', 'low', 'volume']]
+                    df_converted = self.bar_store.get_frame(stock_code, timeframe=timeframe)
                     
                     results[timeframe] = df_converted
                     self.logger.info(f"5分钟转{timeframe}完成: {len(df_converted)}条记录")
@@ -888,7 +879,7 @@ class RealtimeKlineProvider:
     
     def get_5min_data_from_db(self, stock_code: str, limit: int = None) -> pd.DataFrame:
         """
-        从数据库获取5分钟K线数据
+        从环形缓冲区获取5分钟K线数据（最近 limit 条为一段连续读取）
         
         Args:
             stock_code: 股票代码
@@ -898,26 +889,7 @@ class RealtimeKlineProvider:
             pd.DataFrame: 5分钟K线数据
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            
-            if limit:
-                query = f"""
-                SELECT * FROM {self.min5_table}
-                WHERE stock_code = ?
-                ORDER BY trade_time DESC
-                LIMIT ?
-                """
-                df = pd.read_sql_query(query, conn, params=[stock_code, limit])
-                df = df.sort_values('trade_time').reset_index(drop=True)
-            else:
-                query = f"""
-                SELECT * FROM {self.min5_table}
-                WHERE stock_code = ?
-                ORDER BY trade_time
-                """
-                df = pd.read_sql_query(query, conn, params=[stock_code])
-            
-            conn.close()
+            df = self.bar_store.get_frame(stock_code, limit or None)
             
             if not df.empty:
                 self.logger.info(f"从数据库获取{stock_code} 5分钟数据: {len(df)}条")
@@ -1075,20 +1047,9 @@ def main():
                 
                 if stock_code:
                     try:
-                        conn = sqlite3.connect(provider.db_path)
-                        query = f"""
-                        SELECT trade_date, trade_time, open, close, high, low, volume
-                        FROM {provider.min5_table}
-                        WHERE stock_code = ?
-                        ORDER BY trade_time DESC
-                        LIMIT ?
-                        """
-                        
-                        df = pd.read_sql_query(query, conn, params=[stock_code, periods])
-                        conn.close()
+                        df = provider.get_5min_data_from_db(stock_code, periods)
                         
                         if not df.empty:
-                            df = df.sort_values('trade_time').reset_index(drop=True)
                             print(f"\n📊 {stock_code} 5分钟K线数据:")
                             print(f"周期数: {len(df)}")
                             print(f"时间范围: {df['trade_time'].iloc[0]} 至 {df['trade_time'].iloc[-1]}")
@@ -7,6 +7,8 @@ import os
 
 # 导入v2项目的模块
 from data_management.data_processor import get_multiple_stocks_daily_data_for_backtest
+from data_management.point_in_time_store import PointInTimeStore, ShareHistory
+from data_management.database_manager import DatabaseManager
 from core.utils.indicators import zhibiao
 
 
@@ -136,7 +138,7 @@ class ActiveStockScreener:
         
         try:
             # 连接数据库
-            db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'databases', 'quant_system.db')
+            db_path = DatabaseManager().db_path
             conn = sqlite3.connect(db_path)
             
             # 【安全修复】使用参数化查询，避免SQL注入风险
@@ -204,7 +206,7 @@ class ActiveStockScreener:
         """
         try:
             # 连接数据库
-            db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'databases', 'quant_system.db')
+            db_path = DatabaseManager().db_path
             conn = sqlite3.connect(db_path)
             
             # 【安全修复】使用参数化查询，避免SQL注入风险
@@ -341,7 +343,8 @@ class SectorIndexCalculator:
     一个用于计算自定义板块指数（流通市值加权）的工具类。
     可以计算完整的指数 OHLCV 数据。
     """
-    def __init__(self, stock_list: list, start_date: str, end_date: str):
+    def __init__(self, stock_list: list, start_date: str, end_date: str,
+                 sector_code: str = None, pit_store: PointInTimeStore = None):
         """
         初始化指数计算器。
 
@@ -349,6 +352,8 @@ class SectorIndexCalculator:
             stock_list (list): 股票代码列表
             start_date (str): 开始日期，格式 'YYYY-MM-DD'
             end_date (str): 结束日期，格式 'YYYY-MM-DD'
+            sector_code (str, optional): 板块代码，提供时按点位时间成分股历史剔除非成分股
+            pit_store (PointInTimeStore, optional): 点位时间存储，默认使用系统数据库
         """
         print("1. 板块指数计算器初始化...")
         print(f"   股票数量: {len(stock_list)}")
@@ -357,6 +362,8 @@ class SectorIndexCalculator:
         self.stock_list = stock_list
         self.start_date = start_date
         self.end_date = end_date
+        self.sector_code = sector_code
+        self.pit_store = pit_store
         
         # 初始化面板属性
         self.open_panel = None
@@ -364,7 +371,11 @@ class SectorIndexCalculator:
         self.low_panel = None
         self.close_panel = None
         self.volume_panel = None
-        self.shares_panel = None
+        
+        # 【点位时间】股本和成分股以变更事件形式保存，计算时惰性展开
+        self.share_history = None
+        self.membership = None
+        self._shares_panel_cache = None
         
         # 初始化计算结果属性
         self.market_cap_panel = None
@@ -391,8 +402,8 @@ class SectorIndexCalculator:
             self.end_date
         )
         
-        # 获取流通股数据
-        self._get_circulating_shares()
+        # 获取流通股数据（点位时间变更历史，无历史的股票回退到当前流通A股）
+        self._load_share_history()
         
         # 【修改】初始化所有需要的面板 - 使用字典收集数据，最后一次性合并
         self.open_data = {}
@@ -400,11 +411,10 @@ class SectorIndexCalculator:
         self.low_data = {}
         self.close_data = {}
         self.volume_data = {}
-        self.shares_data = {}
         
         # 使用 all_stock_data 填充面板
         for stock_code, df in all_stock_data.items():
-            if stock_code in self.circulating_shares and not df.empty:
+            if stock_code in self.share_history and not df.empty:
                 df['trade_date'] = pd.to_datetime(df['trade_date'])
                 df_filtered = df[(df['trade_date'] >= self.start_date) & 
                                (df['trade_date'] <= self.end_date)]
@@ -418,32 +428,26 @@ class SectorIndexCalculator:
                     self.low_data[stock_code] = df_indexed['low']
                     self.close_data[stock_code] = df_indexed['close']
                     self.volume_data[stock_code] = df_indexed['volume']
-                    
-                    shares_value = self.circulating_shares[stock_code]
-                    shares_series = pd.Series([shares_value] * len(df_indexed), 
-                                            index=df_indexed.index, 
-                                            name=stock_code)
-                    self.shares_data[stock_code] = shares_series
         
         # 【优化】一次性创建所有面板，避免DataFrame碎片化
+        # 股本不再展开为稠密面板，而是在计算市值时按变更点向前填充
         print("   创建数据面板...")
         self.open_panel = pd.DataFrame(self.open_data)
         self.high_panel = pd.DataFrame(self.high_data)
         self.low_panel = pd.DataFrame(self.low_data)
         self.close_panel = pd.DataFrame(self.close_data)
         self.volume_panel = pd.DataFrame(self.volume_data)
-        self.shares_panel = pd.DataFrame(self.shares_data)
         
         # 清理临时数据字典
-        del self.open_data, self.high_data, self.low_data, self.close_data, self.volume_data, self.shares_data
+        del self.open_data, self.high_data, self.low_data, self.close_data, self.volume_data
         
         # 【关键修正】处理停牌数据
         print("   处理停牌数据...")
 
-        # 1. 对价格和股本数据进行向前填充
-        print("   - 填充价格和股本数据 (ffill)...")
-        price_share_cols = ['open_panel', 'high_panel', 'low_panel', 'close_panel', 'shares_panel']
-        for col_name in price_share_cols:
+        # 1. 对价格数据进行向前填充（股本历史本身就是向前填充的阶梯函数）
+        print("   - 填充价格数据 (ffill)...")
+        price_cols = ['open_panel', 'high_panel', 'low_panel', 'close_panel']
+        for col_name in price_cols:
             panel = getattr(self, col_name)
             if panel is not None and not panel.empty:
                 panel_filled = panel.fillna(method='ffill')
@@ -454,9 +458,54 @@ class SectorIndexCalculator:
         print("   - 填充成交量数据为 0...")
         if self.volume_panel is not None and not self.volume_panel.empty:
             self.volume_panel = self.volume_panel.fillna(0)
+            # 非成分股期间的成交量不计入指数
+            if self.membership is not None:
+                self.volume_panel = self.membership.apply(self.volume_panel)
         
         print(f"   成功处理 {len(self.close_panel.columns)} 只股票的OHLCV数据")
 
+    def _load_share_history(self):
+        """
+        【点位时间】加载股本变更历史和成分股变更历史。
+        没有股本历史记录的股票使用 stock_basic_pro 中的当前流通A股作为单一变更点。
+        """
+        self._get_circulating_shares()
+        
+        try:
+            if self.pit_store is None:
+                self.pit_store = PointInTimeStore()
+            self.share_history = self.pit_store.load_share_history(
+                self.stock_list, end_date=self.end_date, fallback=self.circulating_shares
+            )
+            if self.sector_code:
+                membership = self.pit_store.load_membership(self.sector_code, end_date=self.end_date)
+                self.membership = membership if len(membership) > 0 else None
+        except Exception as e:
+            print(f"   读取点位时间股本历史失败，使用当前流通A股: {e}")
+            self.share_history = ShareHistory.from_scalars(self.circulating_shares)
+            self.membership = None
+        
+        print(f"   股本历史: {len(self.share_history)} 只股票, {self.share_history.event_count} 个变更点")
+
+    @property
+    def shares_panel(self) -> pd.DataFrame:
+        """
+        【兼容接口】稠密流通股面板，仅在被访问时才由股本变更历史展开。
+        指数计算本身不使用该面板。
+        """
+        if self.share_history is None or self.close_panel is None:
+            return None
+        if self._shares_panel_cache is None:
+            self._shares_panel_cache = self.share_history.expand(self.close_panel.index, self.close_panel.columns)
+        return self._shares_panel_cache
+
+    def _calculate_market_cap(self, close_panel: pd.DataFrame) -> pd.DataFrame:
+        """按点位时间股本计算市值面板，非成分股期间市值为0（权重为0）"""
+        market_cap = self.share_history.multiply(close_panel)
+        if self.membership is not None:
+            market_cap = self.membership.apply(market_cap)
+        return market_cap
+
     def _get_circulating_shares(self):
         """
         【安全版】从数据库获取流通A股数据
@@ -465,7 +514,7 @@ class SectorIndexCalculator:
         
         try:
             # 连接数据库
-            db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'databases', 'quant_system.db')
+            db_path = DatabaseManager().db_path
             conn = sqlite3.connect(db_path)
             
             # 【安全修正】使用参数化查询防止SQL注入
@@ -506,11 +555,11 @@ class SectorIndexCalculator:
         print("3. 正在计算完整的板块指数(OHLCV)...")
         
         # 检查面板数据是否已准备
-        if self.close_panel is None or self.shares_panel is None:
+        if self.close_panel is None or self.share_history is None:
             raise ValueError("面板数据未准备，请先调用 _prepare_data() 方法")
         
-        # 1. 计算每日收盘市值和总市值 (用于计算权重)
-        self.market_cap_panel = self.close_panel * self.shares_panel
+        # 1. 计算每日收盘市值和总市值 (用于计算权重)，股本取各日期当时有效的值
+        self.market_cap_panel = self._calculate_market_cap(self.close_panel)
         self.total_market_cap = self.market_cap_panel.sum(axis=1)
         
         # 2. 计算权重：使用前一天的市值占比作为当天的权重
@@ -599,18 +648,25 @@ class SectorIndexCalculator:
         
         print(f"   执行增量计算: 基准日期={last_date_str}, 基准点位={last_close_price:.2f}")
         
-        # 确保市值已计算
+        # 确保市值已计算：增量计算只需要昨日和今日两行市值，无需计算整个面板
         if self.market_cap_panel is None or self.total_market_cap is None:
-            if self.close_panel is None or self.shares_panel is None:
-                raise ValueError("错误：价格面板或股本面板数据未准备。")
-            self.market_cap_panel = self.close_panel * self.shares_panel
-            self.total_market_cap = self.market_cap_panel.sum(axis=1)
+            if self.close_panel is None or self.share_history is None:
+                raise ValueError("错误：价格面板或股本数据未准备。")
+            try:
+                needed_rows = self.close_panel.loc[[pd.Timestamp(last_date_str), self.close_panel.index[-1]]]
+            except KeyError:
+                raise ValueError(f"错误：数据中不包含上一个交易日 '{last_date_str}' 的市值。")
+            market_cap_panel = self._calculate_market_cap(needed_rows)
+            total_market_cap = market_cap_panel.sum(axis=1)
+        else:
+            market_cap_panel = self.market_cap_panel
+            total_market_cap = self.total_market_cap
 
         # 获取今日日期和数据
         try:
-            today_date = self.total_market_cap.index[-1]  # 最后一天（当前更新日）
-            last_day_cap = self.total_market_cap.loc[last_date_str]
-            today_cap = self.total_market_cap.loc[today_date]
+            today_date = total_market_cap.index[-1]  # 最后一天（当前更新日）
+            last_day_cap = total_market_cap.loc[last_date_str]
+            today_cap = total_market_cap.loc[today_date]
         except KeyError:
             raise ValueError(f"错误：数据中不包含上一个交易日 '{last_date_str}' 的市值。")
         
@@ -620,13 +676,13 @@ class SectorIndexCalculator:
         print(f"   昨日总市值: {last_day_cap:.2f}, 今日总市值: {today_cap:.2f}")
 
         # 检查必要的面板数据
-        if (self.market_cap_panel is None or self.open_panel is None or 
+        if (self.open_panel is None or 
             self.high_panel is None or self.low_panel is None or 
             self.close_panel is None or self.volume_panel is None):
             raise ValueError("错误：必要的面板数据未准备。")
 
         # 【关键修正】计算权重：使用昨日的市值占比作为今日的权重
-        last_day_market_cap = self.market_cap_panel.loc[last_date_str]
+        last_day_market_cap = market_cap_panel.loc[last_date_str]
         last_day_weights = last_day_market_cap / last_day_cap
         
         # 【核心改进】分别计算今日指数的OHLC价格（基于成分股OHLC的加权平均）
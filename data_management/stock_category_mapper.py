@@ -24,6 +24,9 @@ import numpy as np
 class StockCategoryIndexMapper:
     """股票分类指数映射器"""
     
+    # 单次 IN 查询的最大股票数量
+    QUERY_CHUNK_SIZE = 500
+    
     def __init__(self, db_path=None):
         """
         初始化映射器
@@ -147,14 +150,18 @@ class StockCategoryIndexMapper:
         
         return stock_codes
     
-    def get_all_category_summary(self):
+    def get_all_category_summary(self, df_stocks=None):
         """
         获取所有分类的统计摘要
         
+        Args:
+            df_stocks: 已读取的股票分类信息，为None时从数据库读取
+        
         Returns:
             pd.DataFrame: 分类统计摘要
         """
-        df_stocks = self.get_stock_categories()
+        if df_stocks is None:
+            df_stocks = self.get_stock_categories()
         
         if df_stocks.empty:
             return pd.DataFrame()
@@ -291,30 +298,40 @@ class StockCategoryIndexMapper:
             if not stock_codes:
                 return pd.DataFrame()
             
-            # 构建查询条件
-            placeholders = ','.join(['?' for _ in stock_codes])
-            query = f"""
-                SELECT stock_code, trade_date, open, high, low, close, volume
-                FROM k_daily 
-                WHERE stock_code IN ({placeholders})
-            """
-            params = list(stock_codes)
-            
-            if start_date:
-                query += " AND trade_date >= ?"
-                params.append(start_date)
-            
-            if end_date:
-                query += " AND trade_date <= ?"
-                params.append(end_date)
-            
-            query += " ORDER BY trade_date, stock_code"
+            stock_codes = list(stock_codes)
+            frames = []
             
             # 使用sqlite3直接连接而不是pandas的read_sql_query
             conn = sqlite3.connect(self.db_path)
-            df = pd.read_sql_query(query, conn, params=params)
+            
+            # 分块查询，避免超过SQLite参数数量上限（全部分类的股票合并查询时可能有数千只）
+            for i in range(0, len(stock_codes), self.QUERY_CHUNK_SIZE):
+                chunk = stock_codes[i:i + self.QUERY_CHUNK_SIZE]
+                
+                # 构建查询条件
+                placeholders = ','.join(['?' for _ in chunk])
+                query = f"""
+                    SELECT stock_code, trade_date, open, high, low, close, volume
+                    FROM k_daily 
+                    WHERE stock_code IN ({placeholders})
+                """
+                params = list(chunk)
+                
+                if start_date:
+                    query += " AND trade_date >= ?"
+                    params.append(start_date)
+                
+                if end_date:
+                    query += " AND trade_date <= ?"
+                    params.append(end_date)
+                
+                frames.append(pd.read_sql_query(query, conn, params=params))
+            
             conn.close()
             
+            df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            df = df.sort_values(['trade_date', 'stock_code']).reset_index(drop=True)
+            
             print(f"✓ 获取K线数据成功，共{len(df)}条记录")
             
             return df
@@ -351,41 +368,11 @@ class StockCategoryIndexMapper:
             print(f"⚠ {index_name}没有K线数据，跳过计算")
             return pd.DataFrame()
         
-        # 按日期分组计算指数
-        index_data = []
-        
-        for trade_date, group in df_kline.groupby('trade_date'):
-            # 过滤掉停牌股票（成交量为0或缺失）
-            active_stocks = group[group['volume'] > 0].copy()
-            
-            if len(active_stocks) == 0:
-                continue
-            
-            # 计算市值加权平均价格
-            # 使用收盘价作为权重（简化处理，实际应该用流通市值）
-            weights = active_stocks['close'] / active_stocks['close'].sum()
-            
-            # 计算加权平均的开高低收
-            index_open = (active_stocks['open'] * weights).sum()
-            index_high = (active_stocks['high'] * weights).sum()
-            index_low = (active_stocks['low'] * weights).sum()
-            index_close = (active_stocks['close'] * weights).sum()
-            
-            # 计算总成交量
-            index_volume = active_stocks['volume'].sum()
-            
-            index_data.append({
-                'index_code': index_code,
-                'index_name': index_name,
-                'trade_date': trade_date,
-                'open': round(index_open, 2),
-                'high': round(index_high, 2),
-                'low': round(index_low, 2),
-                'close': round(index_close, 2),
-                'volume': int(index_volume)
-            })
-        
-        df_index = pd.DataFrame(index_data)
+        # 【向量化】透视为 日期×股票 面板后一次性计算所有交易日
+        panels = self._build_kline_panels(df_kline)
+        df_index = self._calculate_indices_from_panels(
+            panels, {index_code: (index_name, stock_codes)}
+        ).get(index_code, pd.DataFrame())
         
         if not df_index.empty:
             print(f"✓ {index_name}指数计算完成，共{len(df_index)}个交易日")
@@ -394,6 +381,82 @@ class StockCategoryIndexMapper:
         
         return df_index
     
+    @staticmethod
+    def _build_kline_panels(df_kline):
+        """
+        将长表K线数据透视为 日期×股票 面板（只透视一次）
+        
+        Args:
+            df_kline: 包含 stock_code, trade_date, open, high, low, close, volume 的K线数据
+            
+        Returns:
+            dict: 字段名 -> 以 trade_date 为索引、stock_code 为列的面板
+        """
+        fields = ['open', 'high', 'low', 'close', 'volume']
+        wide = df_kline.pivot(index='trade_date', columns='stock_code', values=fields).sort_index()
+        return {field: wide[field] for field in fields}
+    
+    @staticmethod
+    def _calculate_indices_from_panels(panels, index_members):
+        """
+        基于K线面板一次性计算多个指数的全部交易日K线
+        
+        计算口径与逐日计算一致：
+        - 过滤停牌股票（成交量为0或缺失）
+        - 使用收盘价作为权重（简化处理，实际应该用流通市值）
+        - 开高低收为加权平均，成交量为求和
+        
+        各指数的加权求和通过 (日期×股票) @ (股票×指数) 的矩阵乘法同时完成。
+        
+        Args:
+            panels: _build_kline_panels 返回的面板字典
+            index_members: {index_code: (index_name, stock_codes)}
+            
+        Returns:
+            dict: {index_code: 指数K线DataFrame}
+        """
+        close_panel = panels['close']
+        stocks = close_panel.columns
+        dates = close_panel.index
+        
+        # 成分股矩阵：股票 × 指数
+        index_codes = list(index_members.keys())
+        membership = np.zeros((len(stocks), len(index_codes)))
+        for j, index_code in enumerate(index_codes):
+            membership[stocks.isin(index_members[index_code][1]), j] = 1.0
+        
+        volume = panels['volume'].to_numpy(dtype=float)
+        active = np.nan_to_num(volume) > 0
+        
+        # 停牌股票权重为0
+        weight_base = np.where(active, np.nan_to_num(close_panel.to_numpy(dtype=float)), 0.0)
+        weight_sum = weight_base @ membership
+        active_count = active.astype(float) @ membership
+        index_volume = np.where(active, volume, 0.0) @ membership
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            index_prices = {
+                field: ((np.nan_to_num(panels[field].to_numpy(dtype=float)) * weight_base) @ membership) / weight_sum
+                for field in ['open', 'high', 'low', 'close']
+            }
+        
+        results = {}
+        for j, index_code in enumerate(index_codes):
+            valid = active_count[:, j] > 0
+            df_index = pd.DataFrame({
+                'index_code': index_code,
+                'index_name': index_members[index_code][0],
+                'trade_date': dates[valid],
+                'open': np.round(index_prices['open'][valid, j], 2),
+                'high': np.round(index_prices['high'][valid, j], 2),
+                'low': np.round(index_prices['low'][valid, j], 2),
+                'close': np.round(index_prices['close'][valid, j], 2),
+                'volume': index_volume[valid, j].astype(np.int64)
+            })
+            results[index_code] = df_index
+        
+        return results
+    
     def save_index_data_to_db(self, index_data, table_name='index_k_daily', replace_existing=True):
         """
         保存指数数据到数据库
@@ -411,24 +474,28 @@ class StockCategoryIndexMapper:
             # 确保表存在
             self.create_index_k_daily_table()
             
+            columns = ['index_code', 'index_name', 'trade_date', 'open', 'high', 'low', 'close', 'volume']
+            rows = list(index_data[columns].itertuples(index=False, name=None))
+            
+            # 【批量写入】所有行在同一个事务中写入，避免逐行删除和多次提交
+            # replace_existing 时 INSERT OR REPLACE 按 (index_code, trade_date) 唯一键替换已有数据
+            verb = "INSERT OR REPLACE" if replace_existing else "INSERT"
+            insert_sql = f"""
+                {verb} INTO {table_name} 
+                (index_code, index_name, trade_date, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """
+            
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:
+                    conn.executemany(insert_sql, rows)
+            finally:
+                conn.close()
+            
             if replace_existing:
-                # 先删除已存在的数据，再插入新数据
-                for _, row in index_data.iterrows():
-                    delete_query = """
-                        DELETE FROM index_k_daily 
-                        WHERE index_code = ? AND trade_date = ?
-                    """
-                    conn = sqlite3.connect(self.db_path)
-                    conn.execute(delete_query, (row['index_code'], row['trade_date']))
-                    conn.commit()
-                    conn.close()
-                
-                # 插入新数据
-                index_data.to_sql(table_name, self.engine, if_exists='append', index=False)
                 print(f"✓ 成功保存{len(index_data)}条指数数据到{table_name}表（已替换重复数据）")
             else:
-                # 直接追加，遇到重复会报错
-                index_data.to_sql(table_name, self.engine, if_exists='append', index=False)
                 print(f"✓ 成功保存{len(index_data)}条指数数据到{table_name}表")
             
             return True
@@ -452,37 +519,64 @@ class StockCategoryIndexMapper:
         """
         print("🚀 开始计算所有分类指数...")
         
+        # 只读取一次股票分类信息
+        df_stocks = self.get_stock_categories()
+        if df_stocks.empty:
+            print("✗ 没有分类数据可计算")
+            return {}
+        
         # 获取所有分类的统计信息
-        summary = self.get_all_category_summary()
+        summary = self.get_all_category_summary(df_stocks)
         
         if summary.empty:
             print("✗ 没有分类数据可计算")
             return {}
         
-        all_index_data = {}
-        total_records = 0
-        
-        # 计算每个分类的指数
+        # 收集各分类的成分股
+        index_members = {}
+        category_by_index = {}
         for _, row in summary.iterrows():
             category = row['category']
-            index_code = row['index_code']
-            index_name = row['index_name']
-            
-            # 获取该分类的股票列表
-            stock_codes = self.get_stocks_by_category(category)
-            
-            # 计算指数K线数据
-            index_data = self.calculate_index_kline(
-                stock_codes, index_code, index_name, start_date, end_date
+            stock_codes = df_stocks.loc[
+                (df_stocks[category] == 1) | (df_stocks[category] == True), 'stock_code'
+            ].tolist()
+            if not stock_codes:
+                print(f"⚠ {row['index_name']}没有成分股，跳过计算")
+                continue
+            index_members[row['index_code']] = (row['index_name'], stock_codes)
+            category_by_index[row['index_code']] = category
+        
+        if not index_members:
+            print("✗ 没有分类数据可计算")
+            return {}
+        
+        # 【单次处理】一次查询所有分类成分股的K线，透视一次，同时计算所有分类指数
+        all_stocks = sorted({code for _, codes in index_members.values() for code in codes})
+        df_kline = self.get_stock_kline_data(all_stocks, start_date, end_date)
+        if df_kline.empty:
+            print("⚠ 没有K线数据，跳过计算")
+            return {}
+        
+        panels = self._build_kline_panels(df_kline)
+        index_results = self._calculate_indices_from_panels(panels, index_members)
+        
+        all_index_data = {}
+        total_records = 0
+        for index_code, index_data in index_results.items():
+            index_name = index_members[index_code][0]
+            if index_data.empty:
+                print(f"⚠ {index_name}指数计算失败，无有效数据")
+                continue
+            print(f"✓ {index_name}指数计算完成，共{len(index_data)}个交易日")
+            all_index_data[category_by_index[index_code]] = index_data
+            total_records += len(index_data)
+        
+        # 【批量写入】所有分类指数一次性写入
+        if save_to_db and all_index_data:
+            self.save_index_data_to_db(
+                pd.concat(all_index_data.values(), ignore_index=True),
+                replace_existing=replace_existing
             )
-            
-            if not index_data.empty:
-                all_index_data[category] = index_data
-                total_records += len(index_data)
-                
-                # 保存到数据库
-                if save_to_db:
-                    self.save_index_data_to_db(index_data, replace_existing=replace_existing)
         
         print(f"✅ 所有分类指数计算完成！")
         print(f"   共计算{len(all_index_data)}个指数")
@@ -2,18 +2,59 @@
 策略基类
 
 定义所有策略必须实现的接口
+
+子类实现的 on_bar/on_tick/on_signal/on_order/on_fill 会自动接入耗时剖析（core.utils.profiling），
+剖析器关闭时只多一次属性判断；开启后按 "策略名.回调名" 统计调用次数和耗时。
 """
 
+import functools
+import threading
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from core.event_engine import EventEngine, EventType
 from core.event import Event
+from core.utils.profiling import get_profiler
+
+# 接入耗时剖析的策略回调
+PROFILED_CALLBACKS = ('on_bar', 'on_tick', 'on_signal', 'on_order', 'on_fill')
+
+_profiler = get_profiler()
+_active_callbacks = threading.local()
+
+
+def _profiled_callback(callback_name: str, func):
+    """包装策略回调：剖析器开启时记录耗时（子类通过 super() 调用父类回调时只记录最外层）"""
+    @functools.wraps(func)
+    def wrapper(self, event):
+        if not _profiler.enabled:
+            return func(self, event)
+        active = getattr(_active_callbacks, 'keys', None)
+        if active is None:
+            active = _active_callbacks.keys = set()
+        key = (id(self), callback_name)
+        if key in active:
+            return func(self, event)
+        active.add(key)
+        try:
+            return _profiler.call(f"{self.name}.{callback_name}", func, self, event)
+        finally:
+            active.discard(key)
+
+    wrapper.__profiled__ = True
+    return wrapper
 
 
 class BaseStrategy(ABC):
     """策略基类"""
     
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for callback_name in PROFILED_CALLBACKS:
+            func = cls.__dict__.get(callback_name)
+            if callable(func) and not getattr(func, '__profiled__', False):
+                setattr(cls, callback_name, _profiled_callback(callback_name, func))
+    
     def __init__(self, name: str, config: Dict[str, Any] = None):
         self.name = name
         self.config = config or {}
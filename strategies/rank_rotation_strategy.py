@@ -0,0 +1,60 @@
+"""
+排名轮动策略
+
+按回看期涨幅排名等权持有前几名，作为回测引擎和参数扫描（applications.backtest.parameter_sweep）的示例策略
+"""
+
+from typing import Any, Dict
+
+import numpy as np
+
+from strategies.base_strategy import BaseStrategy
+
+
+class RankRotationStrategy(BaseStrategy):
+    """
+    排名轮动策略（参数扫描的示例策略）
+
+    每个交易日按 lookback 日涨幅排名，持有 n = 股票数 × top_percentage 只（限制在 min_stocks ~ max_stocks 之间，
+    与 get_buy_stocks_from_db 的取数规则一致），等权配置，涨幅不超过 entry_threshold 的股票不买入。
+    """
+
+    # 策略使用的参数，参数扫描会拒绝网格中的其他参数
+    PARAMETER_KEYS = ('lookback', 'top_percentage', 'min_stocks', 'max_stocks', 'entry_threshold')
+
+    def __init__(self, params: Dict[str, Any] = None):
+        params = dict(params or {})
+        super().__init__('rank_rotation', params)
+        self.lookback = int(params.get('lookback', 20))
+        self.top_percentage = float(params.get('top_percentage', 0.2))
+        self.min_stocks = int(params.get('min_stocks', 3))
+        self.max_stocks = int(params.get('max_stocks', 5))
+        self.entry_threshold = float(params.get('entry_threshold', 0.0))
+
+    def on_init(self):
+        pass
+
+    def on_tick(self, event):
+        pass
+
+    def on_bar(self, event):
+        view, broker = event.data['view'], event.data['broker']
+        closes = view.field('close', self.lookback + 1)
+        if len(closes) <= self.lookback:
+            return
+        with np.errstate(invalid='ignore', divide='ignore'):
+            momentum = closes[-1] / closes[0] - 1
+        valid = np.flatnonzero(~np.isnan(momentum))
+        n = min(max(int(len(valid) * self.top_percentage), self.min_stocks), self.max_stocks)
+        ranked = valid[np.argsort(-momentum[valid])][:n]
+        selected = {view.codes[j] for j in ranked if momentum[j] > self.entry_threshold}
+
+        for code in broker.get_positions():
+            if code not in selected:
+                broker.sell(code, reason='调出')
+        if not selected:
+            return
+        budget = broker.total_equity() / n
+        for code in selected:
+            if broker.get_position(code) == 0:
+                broker.order_value(code, budget, reason='调入')
@@ -0,0 +1,106 @@
+"""
+账户内存持仓账本测试
+
+测试增量记账、检查点同步、跨日滚动和账本一致性检查
+"""
+
+import os
+import tempfile
+import datetime as dt
+import pytest
+from data_management.price_snapshot import PriceSnapshotService
+from core.execution.account import Account
+
+
+class TestAccountLedger:
+    """账户内存持仓账本测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.db_path = os.path.join(tempfile.mkdtemp(), 'account.db')
+        self.service = PriceSnapshotService(price_func=lambda code: 10.0, trading_ttl=60.0,
+                                            now_func=lambda: dt.datetime(2024, 6, 3, 10, 0))
+        self.yesterday = dt.datetime.now().replace(microsecond=0) - dt.timedelta(days=1)
+
+    def _account(self, checkpoint_interval=3600.0):
+        return Account(100000.0, db_path=self.db_path, price_service=self.service,
+                       checkpoint_interval=checkpoint_interval)
+
+    def test_incremental_matches_full_replay(self):
+        """测试增量记账与全量重放结果一致"""
+        account = self._account()
+        account.update_position('600000', 1000, 10.0, self.yesterday)
+        account.update_position('000001', 500, 8.0, self.yesterday + dt.timedelta(minutes=5))
+        account.update_position('600000', -400, 11.0, self.yesterday + dt.timedelta(minutes=10))
+        account.update_position('000001', -500, 9.0, self.yesterday + dt.timedelta(minutes=20))
+
+        assert account.verify_ledger() == []
+        assert set(account.positions) == {'600000'}
+        assert account.positions['600000'].total_amount == 600
+
+        rebuilt = self._account()
+        assert rebuilt.available_cash == pytest.approx(account.available_cash)
+        assert rebuilt.positions['600000'].total_cost == pytest.approx(account.positions['600000'].total_cost)
+        account.close()
+        rebuilt.close()
+
+    def test_queries_do_not_reload_trades(self):
+        """测试检查点间隔内的查询不重新读取交易表"""
+        account = self._account()
+        account.update_position('600000', 1000, 10.0, self.yesterday)
+
+        loads = []
+        original = account.load_trades
+        account.load_trades = lambda after_id=0: loads.append(after_id) or original(after_id)
+        for _ in range(5):
+            account.get_total_equity()
+            account.get_position_pnl('600000')
+
+        assert loads == []
+        assert account.get_total_equity() == pytest.approx(100000.0 - 10003 + 10000)
+        account.close()
+
+    def test_checkpoint_picks_up_external_trades(self):
+        """测试检查点同步其他进程写入的交易"""
+        account = self._account(checkpoint_interval=0)
+        other = self._account()
+        other.update_position('600000', 200, 10.0, self.yesterday)
+
+        account.get_total_equity()
+        assert account.positions['600000'].total_amount == 200
+        assert account.verify_ledger() == []
+        account.close()
+        other.close()
+
+    def test_backfilled_trade_triggers_full_rebuild(self):
+        """测试补录的更早交易触发全量重建"""
+        account = self._account()
+        account.update_position('600000', 1000, 10.0, self.yesterday)
+        account.update_position('600000', 100, 9.0, self.yesterday - dt.timedelta(days=1))
+
+        assert account.positions['600000'].total_amount == 1100
+        assert account.verify_ledger() == []
+        account.close()
+
+    def test_roll_day_makes_shares_closeable(self):
+        """测试跨日后今日买入的股份变为可卖"""
+        account = self._account()
+        account.update_position('600000', 1000, 10.0, dt.datetime.now().replace(microsecond=0))
+        assert account.get_closeable_amount('600000') == 0
+
+        account._ledger_date = dt.date.today() - dt.timedelta(days=1)
+        account.refresh_positions()
+        assert account.get_closeable_amount('600000') == 1000
+        account.close()
+
+    def test_verify_ledger_detects_and_repairs_drift(self):
+        """测试一致性检查发现并修复账本偏差"""
+        account = self._account()
+        account.update_position('600000', 1000, 10.0, self.yesterday)
+        account.positions['600000'].total_amount = 900
+
+        issues = account.verify_ledger(repair=True)
+        assert any('total_amount' in issue for issue in issues)
+        assert account.positions['600000'].total_amount == 1000
+        assert account.verify_ledger() == []
+        account.close()
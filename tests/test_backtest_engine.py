@@ -0,0 +1,219 @@
+"""
+回测引擎测试
+
+测试宽表面板与只读切片视图、T+1 和整手成交模拟、固定手续费、停牌、绩效指标以及从数据库一次性加载面板
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from applications.backtest.backtest_engine import BacktestEngine, MarketPanel, PanelView
+from strategies.base_strategy import BaseStrategy
+
+
+def _frames():
+    """两只股票 5 个交易日；000002 在 01-04 停牌"""
+    dates = ['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05', '2024-01-08']
+    a = pd.DataFrame({'trade_date': dates, 'open': [10.0, 10.5, 11.0, 11.5, 12.0],
+                      'close': [10.2, 10.8, 11.2, 11.8, 12.2]})
+    b = a.drop(index=2).copy()
+    b[['open', 'close']] = b[['open', 'close']] * 2
+    for df in (a, b):
+        df['high'] = df['close'] + 0.5
+        df['low'] = df['open'] - 0.5
+        df['volume'] = 1000.0
+    return {'000001': a, '000002': b}
+
+
+class ScriptedStrategy(BaseStrategy):
+    """按日期执行预先设定的下单动作，并记录每日看到的视图"""
+
+    def __init__(self, actions):
+        super().__init__('scripted')
+        self.actions = actions
+        self.views = []
+
+    def on_init(self):
+        pass
+
+    def on_tick(self, event):
+        pass
+
+    def on_bar(self, event):
+        self.views.append(event.data['view'])
+        for action in self.actions.get(event.data['trade_date'], []):
+            action(event.data['broker'])
+
+
+class SqliteQuery:
+    """只提供 execute_query 的简单数据库访问对象"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def execute_query(self, query, params=None):
+        with sqlite3.connect(self.db_path) as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+
+class TestMarketPanel:
+    """宽表面板和只读视图测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.panel = MarketPanel.from_frames(_frames())
+
+    def test_panel_layout(self):
+        """测试面板按日期 × 股票对齐，停牌为 NaN，估值价格前向填充"""
+        assert self.panel.shape == (5, 2)
+        assert self.panel.codes == ['000001', '000002']
+        assert np.isnan(self.panel.fields['close'][2, 1])
+        assert self.panel.valuation_close[2, 1] == pytest.approx(21.6)
+
+    def test_view_is_readonly_slice(self):
+        """测试视图是面板的只读切片，看不到当日之后的数据"""
+        view = PanelView(self.panel, 2)
+        history = view.history('000001')
+        assert history.tolist() == [10.2, 10.8, 11.2]
+        assert np.shares_memory(history, self.panel.fields['close'])
+        assert history.flags['C_CONTIGUOUS']
+        assert not history.flags.writeable
+        assert view.field('close', window=2).shape == (2, 2)
+        assert view.bar('000001')['open'] == 11.0
+        assert view.frame('000002')['trade_date'].tolist() == ['2024-01-02', '2024-01-03']
+
+
+class TestBacktestEngine:
+    """回测引擎测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.data = _frames()
+
+    def _run(self, actions, fill_price='next_open', initial_cash=100000.0):
+        engine = BacktestEngine('2024-01-02', '2024-01-08', initial_cash=initial_cash, fill_price=fill_price)
+        strategy = ScriptedStrategy(actions)
+        results = engine.run_backtest(strategy, self.data)
+        return engine, strategy, results
+
+    def test_next_open_fill_lot_and_commission(self):
+        """测试次日开盘成交、整手取整和固定手续费"""
+        engine, strategy, results = self._run({'2024-01-02': [lambda b: b.buy('000001', 250)]})
+        trade = results['trades'].iloc[0]
+        assert (trade['trade_date'], trade['amount'], trade['price'], trade['commission']) == \
+            ('2024-01-03', 200, 10.5, 3.0)
+        assert results['cash'].iloc[-1] == pytest.approx(100000 - 200 * 10.5 - 3)
+        assert results['equity'].iloc[-1] == pytest.approx(100000 - 2103 + 200 * 12.2)
+        assert len(strategy.views) == 5 and strategy.views[0].index == 0
+
+    def test_t_plus_one(self):
+        """测试当日买入不能当日卖出，次日可以卖出"""
+        engine, _, results = self._run({
+            '2024-01-02': [lambda b: b.buy('000001', 100), lambda b: b.sell('000001', 100)],
+            '2024-01-03': [lambda b: b.sell('000001')],
+        }, fill_price='close')
+        trades = results['trades']
+        assert trades['amount'].tolist() == [100, -100]
+        assert trades['trade_date'].tolist() == ['2024-01-02', '2024-01-03']
+        sell = trades.iloc[1]
+        assert sell['realized_pnl'] == pytest.approx(100 * 10.8 - (100 * 10.2 + 3) - 3)
+        assert engine.get_positions() == {}
+
+    def test_suspended_and_insufficient_cash(self):
+        """测试停牌日订单作废、资金不足时按可买整手数成交"""
+        _, _, results = self._run({
+            '2024-01-03': [lambda b: b.buy('000002', 100)],
+            '2024-01-04': [lambda b: b.buy('000001', 10000)],
+        }, initial_cash=5000.0)
+        trades = results['trades']
+        # 000002 在 01-04 停牌，买单作废；000001 资金只够 400 股
+        assert trades['stock_code'].tolist() == ['000001']
+        assert trades['amount'].tolist() == [400]
+
+    def test_target_percent_and_metrics(self):
+        """测试目标仓位下单和绩效指标"""
+        engine, _, results = self._run({'2024-01-02': [lambda b: b.order_target_percent('000001', 0.5)]})
+        assert results['trades'].iloc[0]['amount'] == 4900
+        metrics = results['metrics']
+        equity = results['equity'].values
+        assert metrics['total_return'] == pytest.approx(equity[-1] / 100000 - 1)
+        assert metrics['max_drawdown'] <= 0
+        assert metrics['trade_count'] == 1
+        assert '总收益率' in engine.generate_report()
+
+    def test_risk_engine_per_bar(self):
+        """测试每根K线推入风险引擎的滚动窗口，权益曲线与回测净值一致"""
+        engine, _, results = self._run({'2024-01-02': [lambda b: b.order_target_percent('000001', 0.5)]})
+        curve = engine.risk_engine.equity_curve
+        assert np.allclose(curve, results['equity'].values)
+        risk = results['risk']
+        assert risk['periods'] == 4
+        assert risk['positions'] == 1 and risk['volatility'] > 0
+        assert risk['equity'] == pytest.approx(results['equity'].iloc[-1])
+
+    def test_invalid_range(self):
+        """测试回测区间内没有交易日"""
+        engine = BacktestEngine('2025-01-01', '2025-02-01')
+        with pytest.raises(ValueError):
+            engine.run_backtest(ScriptedStrategy({}), self.data)
+
+
+class TestPanelLoad:
+    """从数据库一次性加载面板的测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        from benchmarks.synthetic_db import SyntheticConfig, generate_synthetic_database, synthetic_trade_dates
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'synthetic.db')
+        self.config = SyntheticConfig(n_stocks=20, years=0.5, n_sectors=2)
+        generate_synthetic_database(self.db_path, self.config)
+        self.dates = synthetic_trade_dates(self.config)
+
+    def teardown_method(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_load_and_run(self):
+        """测试加载指定股票池的面板并运行回测"""
+        db = SqliteQuery(self.db_path)
+        codes = ['600000', '000001', '600002']
+        panel = MarketPanel.load(self.dates[20], self.dates[-1], codes, warmup_days=30, db_manager=db)
+        assert sorted(panel.codes) == sorted(codes)
+        assert panel.dates[0] < self.dates[20]
+
+        engine = BacktestEngine(self.dates[20], self.dates[-1], db_manager=db)
+        results = engine.run_backtest(ScriptedStrategy({self.dates[20]: [lambda b: b.buy('600000', 1000)]}),
+                                      stock_codes=codes)
+        assert results['equity'].index[0] == self.dates[20]
+        assert results['positions'] == {'600000': 1000}
+
+    def test_load_filters_in_sql(self):
+        """测试指定股票池时在 SQL 中分批过滤，只读取股票池的日线"""
+        db = SqliteQuery(self.db_path)
+        queries = []
+        execute_query = db.execute_query
+
+        def recording_query(query, params=None):
+            df = execute_query(query, params)
+            queries.append((query, params, len(df)))
+            return df
+
+        db.execute_query = recording_query
+        codes = ['600000', '000001', '600002', '000001', '999999']
+        panel = MarketPanel.load(self.dates[20], self.dates[-1], codes, warmup_days=30, db_manager=db, chunk_size=2)
+
+        assert sorted(panel.codes) == ['000001', '600000', '600002']
+        assert len(queries) == 2 and all('IN (' in query for query, _, _ in queries)
+        assert [params[2:] for _, params, _ in queries] == [('600000', '000001'), ('600002', '999999')]
+        full = MarketPanel.load(self.dates[20], self.dates[-1], warmup_days=30, db_manager=SqliteQuery(self.db_path))
+        assert sum(rows for _, _, rows in queries) < full.fields['close'].size
+        for code in panel.codes:
+            j, k = panel.code_index[code], full.code_index[code]
+            assert np.allclose(panel.fields['close'][:, j], full.fields['close'][:, k], equal_nan=True)
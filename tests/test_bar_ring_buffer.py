@@ -0,0 +1,186 @@
+"""
+分钟K线环形缓冲区测试
+
+测试环形覆盖、连续读取、K线修订、容量迁移以及15/30/60分钟K线的增量维护
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_management.bar_ring_buffer import BAR_COLUMNS, BarRingBuffer, IntradayBarStore, frame_to_bars
+
+
+def _make_5min(start='2024-01-02 09:35:00', periods=48, seed=0):
+    """生成连续的5分钟K线（跨越上午收盘和下午开盘）"""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=periods, freq='5min')
+    close = 10 + np.cumsum(rng.normal(0, 0.05, periods))
+    return pd.DataFrame({
+        'stock_code': '000001',
+        'trade_date': times.strftime('%Y-%m-%d'),
+        'trade_time': times.strftime('%Y-%m-%d %H:%M:%S'),
+        'open': close - 0.01,
+        'close': close,
+        'high': close + rng.uniform(0, 0.05, periods),
+        'low': close - rng.uniform(0.02, 0.05, periods),
+        'volume': rng.integers(100, 1000, periods).astype(float),
+    })
+
+
+class TestBarRingBuffer:
+    """环形缓冲区测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_wraparound_keeps_latest(self):
+        """测试超过容量后只保留最近的K线，读取为连续视图"""
+        path = os.path.join(self.temp_dir, '5min', '000001.npy')
+        buffer = BarRingBuffer(path, capacity=10)
+        bars = frame_to_bars(_make_5min(periods=25))
+        for bar in bars:
+            buffer.append(bar)
+
+        assert len(buffer) == 10
+        assert buffer.total_written == 25
+        last = buffer.last(4)
+        assert np.array_equal(last['ts'], bars['ts'][-4:])
+        assert np.array_equal(buffer.last()['close'], bars['close'][-10:])
+        assert not last.flags.writeable
+
+    def test_revision_and_stale_bars(self):
+        """测试相同时间的K线原位修订，更早的K线被忽略"""
+        buffer = BarRingBuffer(os.path.join(self.temp_dir, 'a.npy'), capacity=5)
+        bars = frame_to_bars(_make_5min(periods=3))
+        for bar in bars:
+            buffer.append(bar)
+
+        revised = bars[-1].copy()
+        revised['close'] = 99.0
+        assert buffer.append(revised)
+        assert not buffer.append(bars[0])
+        assert len(buffer) == 3
+        assert buffer.last(1)['close'][0] == 99.0
+
+    def test_persistence_and_resize(self):
+        """测试重新打开后数据保留，容量变化时迁移最近的K线"""
+        path = os.path.join(self.temp_dir, 'b.npy')
+        buffer = BarRingBuffer(path, capacity=8)
+        bars = frame_to_bars(_make_5min(periods=12))
+        for bar in bars:
+            buffer.append(bar)
+        buffer.flush()
+        del buffer
+
+        reopened = BarRingBuffer(path, capacity=8)
+        assert np.array_equal(reopened.last()['ts'], bars['ts'][-8:])
+        del reopened
+
+        resized = BarRingBuffer(path, capacity=5)
+        assert len(resized) == 5
+        assert np.array_equal(resized.last()['ts'], bars['ts'][-5:])
+
+
+class TestIntradayBarStore:
+    """分钟K线存储测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = IntradayBarStore(self.temp_dir, capacity=200)
+
+    def teardown_method(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    @pytest.mark.parametrize('timeframe,rule', [('15min', '15min'), ('30min', '30min'), ('60min', '60min')])
+    def test_incremental_matches_resample(self, timeframe, rule):
+        """测试逐批增量维护的派生K线与对全部5分钟数据重采样一致"""
+        df = _make_5min(periods=60)
+        # 模拟定时任务：每次获取最近5根（与上一次有重叠）
+        for end in range(5, len(df) + 1, 3):
+            self.store.append('000001', df.iloc[max(0, end - 5):end])
+        self.store.append('000001', df.tail(5))
+
+        expected = (df.assign(datetime=pd.to_datetime(df['trade_time'])).set_index('datetime')
+                    .resample(rule).agg({'open': 'first', 'high': 'max', 'low': 'min',
+                                         'close': 'last', 'volume': 'sum'}).dropna())
+        actual = self.store.get_frame('000001', timeframe=timeframe)
+
+        assert len(self.store.last('000001')) == 60
+        assert actual['trade_time'].tolist() == expected.index.strftime('%Y-%m-%d %H:%M:%S').tolist()
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            assert np.allclose(actual[column].values, expected[column].values)
+
+    def test_revision_updates_derived(self):
+        """测试修订最新5分钟K线时派生K线同步修正，成交量不重复累计"""
+        df = _make_5min(start='2024-01-02 10:05:00', periods=2)
+        self.store.append('000001', df)
+        revised = df.tail(1).copy()
+        revised['volume'] = 5000.0
+        revised['high'] = 20.0
+        self.store.append('000001', revised)
+
+        bar = self.store.get_frame('000001', timeframe='15min').iloc[-1]
+        assert bar['volume'] == df['volume'].iloc[0] + 5000.0
+        assert bar['high'] == 20.0
+        assert self.store.symbols() == ['000001']
+
+    def test_read_unknown_symbol(self):
+        """测试读取没有数据的股票返回空结果，不创建缓冲区文件"""
+        assert len(self.store.last('600000')) == 0
+        frame = self.store.get_frame('600000', 10, timeframe='30min')
+        assert frame.empty and list(frame.columns) == BAR_COLUMNS
+        assert self.store.symbols() == []
+        assert os.listdir(self.temp_dir) == []
+
+        self.store.append('000001', _make_5min(periods=3))
+        assert self.store.symbols() == ['000001']
+        assert len(self.store.last('000001', timeframe='15min')) == 2
+
+    def test_unknown_timeframe(self):
+        """测试不支持的派生周期"""
+        with pytest.raises(ValueError):
+            IntradayBarStore(self.temp_dir, timeframes=['7min'])
+
+
+class TestProviderBarStore:
+    """实时K线提供器使用环形缓冲区的测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        pytest.importorskip('schedule')
+        from data_management.realtime_kline_provider import RealtimeKlineProvider
+        self.temp_dir = tempfile.mkdtemp()
+        self.provider = RealtimeKlineProvider(db_path=os.path.join(self.temp_dir, 'quant.db'))
+        self.provider.max_5min_periods = 30
+
+    def teardown_method(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_save_and_read(self):
+        """测试保存5分钟数据后读取最近K线和派生周期"""
+        df = _make_5min(periods=40)
+        for end in range(5, 41, 5):
+            assert self.provider.save_5min_data('000001', df.iloc[end - 5:end])
+
+        recent = self.provider.get_5min_data_from_db('000001', limit=3)
+        assert recent['trade_time'].tolist() == df['trade_time'].tail(3).tolist()
+        assert len(self.provider.get_5min_data_from_db('000001')) == 30
+
+        converted = self.provider.convert_5min_to_other_timeframes('000001', ['30min', '7min'])
+        assert list(converted) == ['30min']
+        assert self.provider.convert_5min_to_other_timeframes('600000') == {}
+        assert self.provider.get_5min_data_from_db('600001').empty
+        assert self.provider.bar_store.symbols() == ['000001']
@@ -0,0 +1,171 @@
+"""
+并发批量获取引擎测试
+
+测试并发上限、超时、带退避重试、数据源回退和按完成顺序交付结果
+"""
+
+import os
+import tempfile
+import threading
+import time
+import pytest
+from data_management.concurrent_fetcher import ConcurrentFetcher, FetchSource, CallableSource
+
+
+class RecordingSource(FetchSource):
+    """记录同时进行的请求数的测试数据源"""
+
+    def __init__(self, name, delays=None, failures=0, empty=(), **kwargs):
+        self.name = name
+        self.delays = delays or {}
+        self.failures = failures
+        self.empty = set(empty)
+        self.active = 0
+        self.peak = 0
+        self.calls = {}
+        self._lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def fetch(self, key):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.calls[key] = self.calls.get(key, 0) + 1
+            call_no = self.calls[key]
+        try:
+            time.sleep(self.delays.get(key, 0.02))
+            if call_no <= self.failures:
+                raise ConnectionError("连接被重置")
+            if key in self.empty:
+                return None
+            return {'stock_code': key, 'current_price': 10.0, 'source': self.name}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class TestConcurrentFetcher:
+    """并发批量获取引擎测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.codes = [f"{600000 + i}" for i in range(12)]
+
+    def test_respects_source_concurrency_limit(self):
+        """测试单个数据源的并发数不超过上限"""
+        source = RecordingSource('stub', max_concurrency=3, retries=0)
+        fetcher = ConcurrentFetcher([source], max_workers=12)
+        results = fetcher.fetch_all(self.codes)
+        fetcher.close()
+
+        assert len(results) == 12
+        assert all(r.ok for r in results.values())
+        assert 1 < source.peak <= 3
+
+    def test_runs_concurrently(self):
+        """测试批量请求并发执行，总耗时远小于串行耗时"""
+        source = RecordingSource('stub', delays={c: 0.1 for c in self.codes}, max_concurrency=12, retries=0)
+        fetcher = ConcurrentFetcher([source])
+        start = time.perf_counter()
+        fetcher.fetch_all(self.codes)
+        elapsed = time.perf_counter() - start
+        fetcher.close()
+
+        assert elapsed < 0.1 * len(self.codes) / 2
+
+    def test_retry_with_backoff(self):
+        """测试失败后退避重试直到成功"""
+        source = RecordingSource('stub', failures=2, retries=2, backoff=0.05)
+        fetcher = ConcurrentFetcher([source])
+        start = time.perf_counter()
+        result = fetcher.fetch_all(['600000'])['600000']
+        elapsed = time.perf_counter() - start
+        fetcher.close()
+
+        assert result.ok
+        assert result.attempts == 3
+        # 两次退避：0.05 + 0.10
+        assert elapsed >= 0.15
+        assert fetcher.stats['stub']['errors'] == 2
+
+    def test_timeout_falls_back_to_next_source(self):
+        """测试主数据源超时后回退到备用数据源"""
+        slow = RecordingSource('slow', delays={'600000': 0.5}, timeout=0.05, retries=0)
+        backup = RecordingSource('backup', retries=0)
+        fetcher = ConcurrentFetcher([slow, backup])
+        result = fetcher.fetch_all(['600000'])['600000']
+        fetcher.close()
+
+        assert result.source == 'backup'
+        assert fetcher.stats['slow']['timeouts'] == 1
+
+    def test_slot_wait_bounded_by_timeout(self):
+        """测试并发名额被挂起的请求占满时，等待名额按超时处理而不是一直阻塞"""
+        hung = RecordingSource('hung', delays={'600000': 0.5, '600001': 0.5},
+                               max_concurrency=1, timeout=0.05, retries=0)
+        backup = RecordingSource('backup', retries=0)
+        fetcher = ConcurrentFetcher([hung, backup], max_workers=2)
+        start = time.perf_counter()
+        results = fetcher.fetch_all(['600000', '600001'])
+        elapsed = time.perf_counter() - start
+        fetcher.close()
+
+        assert all(r.source == 'backup' for r in results.values())
+        # 一个请求调用超时，另一个等待名额超时，都不会等到挂起的调用返回
+        assert fetcher.stats['hung']['timeouts'] == 2
+        assert sum(hung.calls.values()) == 1
+        assert elapsed < 0.4
+
+    def test_empty_result_falls_back_without_retry(self):
+        """测试无数据时不重试，直接回退到备用数据源"""
+        primary = RecordingSource('primary', empty={'600001'}, retries=3, backoff=0.01)
+        backup = RecordingSource('backup', retries=0)
+        fetcher = ConcurrentFetcher([primary, backup])
+        results = fetcher.fetch_all(['600000', '600001'])
+        fetcher.close()
+
+        assert results['600000'].source == 'primary'
+        assert results['600001'].source == 'backup'
+        assert primary.calls['600001'] == 1
+
+    def test_all_sources_failed(self):
+        """测试所有数据源都失败时返回错误信息"""
+        source = CallableSource('broken', lambda key: 1 / 0, retries=1, backoff=0.01)
+        fetcher = ConcurrentFetcher([source])
+        result = fetcher.fetch_all(['600000'])['600000']
+        fetcher.close()
+
+        assert not result.ok
+        assert result.attempts == 2
+        assert 'broken' in result.error
+
+    def test_results_delivered_as_completed(self):
+        """测试结果按完成顺序交付，慢请求不阻塞快请求"""
+        source = RecordingSource('stub', delays={'600000': 0.3, '600001': 0.01}, max_concurrency=2, retries=0)
+        fetcher = ConcurrentFetcher([source])
+        order = [r.key for r in fetcher.iter_fetch(['600000', '600001'])]
+        fetcher.close()
+
+        assert order == ['600001', '600000']
+
+
+class TestRealtimeQuotes:
+    """RealtimeKlineProvider 并发实时报价测试类"""
+
+    def test_get_realtime_quotes_with_fallback(self):
+        """测试实时报价并发获取并回退到备用数据源"""
+        pytest.importorskip('schedule')
+        from data_management.realtime_kline_provider import RealtimeKlineProvider
+
+        db_path = os.path.join(tempfile.mkdtemp(), 'test.db')
+        primary = RecordingSource('primary', empty={'000001'}, retries=0)
+        backup = RecordingSource('backup', retries=0)
+        provider = RealtimeKlineProvider(db_path=db_path, quote_sources=[primary, backup])
+
+        received = []
+        quotes = provider.get_realtime_quotes(['600000', '000001'], on_quote=lambda code, q: received.append(code))
+
+        assert set(quotes) == {'600000', '000001'}
+        assert quotes['000001']['source'] == 'backup'
+        assert quotes['600000']['current_price'] == 10.0
+        assert sorted(received) == ['000001', '600000']
@@ -0,0 +1,126 @@
+"""
+任务调度器测试
+
+测试依赖调度、内容寻址跳过、并行执行和部分失败后的重跑
+"""
+
+import os
+import time
+import tempfile
+import threading
+import pytest
+from core.utils.dag_runner import DagRunner, Task
+
+
+class TestDagRunner:
+    """任务调度器测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.state_path = os.path.join(tempfile.mkdtemp(), 'dag_state.json')
+        self.calls = []
+        self.source = {'version': 1}
+
+    def _build(self, fail_b: bool = False) -> DagRunner:
+        runner = DagRunner(state_path=self.state_path, max_workers=4)
+
+        def task_a(upstream):
+            self.calls.append('a')
+            return self.source['version']
+
+        def task_b(upstream):
+            self.calls.append('b')
+            if fail_b:
+                raise RuntimeError("b failed")
+            return upstream['a'] * 10
+
+        def task_c(upstream):
+            self.calls.append('c')
+            return upstream['a'] + 1
+
+        def task_d(upstream):
+            self.calls.append('d')
+            return (upstream['b'], upstream['c'])
+
+        runner.add_task(Task('a', task_a, fingerprint=lambda: self.source))
+        runner.add_task(Task('b', task_b, deps=['a']))
+        runner.add_task(Task('c', task_c, deps=['a']))
+        runner.add_task(Task('d', task_d, deps=['b', 'c']))
+        return runner
+
+    def test_runs_in_dependency_order(self):
+        """测试按依赖顺序运行并传递上游结果"""
+        results = self._build().run()
+        assert self.calls[0] == 'a' and self.calls[-1] == 'd'
+        assert results['d'].value == (10, 2)
+        assert all(r.status == 'success' for r in results.values())
+
+    def test_skips_up_to_date_tasks(self):
+        """测试输入未变化时跳过任务，输入变化时只重跑受影响的任务"""
+        self._build().run()
+        self.calls.clear()
+
+        results = self._build().run()
+        assert self.calls == []
+        assert all(r.status == 'skipped' for r in results.values())
+
+        self.source['version'] = 2
+        self._build().run()
+        assert sorted(self.calls) == ['a', 'b', 'c', 'd']
+
+    def test_partial_failure_only_reruns_failed_tasks(self):
+        """测试部分失败只阻塞下游，下次只重跑失败和被阻塞的任务"""
+        results = self._build(fail_b=True).run()
+        assert results['b'].status == 'failed'
+        assert results['c'].status == 'success'
+        assert results['d'].status == 'blocked'
+
+        self.calls.clear()
+        results = self._build().run()
+        assert sorted(self.calls) == ['b', 'd']
+        assert results['a'].status == 'skipped'
+        assert results['c'].status == 'skipped'
+
+    def test_independent_tasks_run_in_parallel(self):
+        """测试互不依赖的任务并行执行"""
+        runner = DagRunner(state_path=self.state_path, max_workers=2)
+        barrier = threading.Barrier(2, timeout=5)
+
+        def wait_for_peer(upstream):
+            barrier.wait()
+            return True
+
+        runner.add_task(Task('x', wait_for_peer))
+        runner.add_task(Task('y', wait_for_peer))
+        results = runner.run()
+        assert results['x'].status == 'success' and results['y'].status == 'success'
+        assert runner.get_task_state('x')['duration'] >= 0
+
+    def test_exclusive_tasks_do_not_overlap(self):
+        """测试同一互斥组的任务不会同时运行"""
+        runner = DagRunner(state_path=self.state_path, max_workers=3)
+        active, peak = [], []
+        lock = threading.Lock()
+
+        def write(upstream):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+            return True
+
+        for name in ('w1', 'w2', 'w3'):
+            runner.add_task(Task(name, write, exclusive='sqlite'))
+        results = runner.run()
+        assert all(r.status == 'success' for r in results.values())
+        assert max(peak) == 1
+
+    def test_cycle_detection(self):
+        """测试依赖环检测"""
+        runner = DagRunner(state_path=self.state_path)
+        runner.add_task(Task('a', lambda u: 1, deps=['b']))
+        runner.add_task(Task('b', lambda u: 1, deps=['a']))
+        with pytest.raises(ValueError):
+            runner.run()
@@ -0,0 +1,167 @@
+"""
+买入决策上下文测试
+
+测试批量加载各板块最新候选股、板块归属、CX持仓，以及ATR波动率缓存
+"""
+
+import os
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+from core.execution.decision_context import DecisionContext
+from core.execution.portfolio_manager import calculate_sector_used_amount, get_buy_stocks_from_db
+
+
+class StubAccount:
+    """只提供持仓和总权益的账户"""
+
+    def __init__(self, positions, total_equity=1000000.0):
+        self.positions = positions
+        self.total_equity = total_equity
+        self.equity_calls = 0
+
+    def get_total_equity(self):
+        self.equity_calls += 1
+        return self.total_equity
+
+
+def _position(amount, avg_cost):
+    return SimpleNamespace(total_amount=amount, avg_cost=avg_cost)
+
+
+class TestDecisionContext:
+    """买入决策上下文测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'selections.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE daily_selections (
+                trade_date TEXT, pool_name TEXT, stock_code TEXT, name TEXT, is_1bzl INTEGER,
+                总得分 REAL, 技术得分 REAL, 主力得分 REAL, 板块得分 REAL, 低BIAS得分 REAL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE cx_strategy_holdings (
+                stock_code TEXT, stock_name TEXT, source_pool TEXT,
+                buy_date TEXT, buy_price REAL, buy_quantity INTEGER
+            )
+        """)
+        rows = [
+            ('2024-01-02', 'alpha', '000001', '平安银行', 1, 80, 20, 20, 20, 20),
+            ('2024-01-03', 'alpha', '000002', '万科A', 1, 90, 30, 20, 20, 20),
+            ('2024-01-03', 'alpha', '600000', '浦发银行', 0, 70, 10, 20, 20, 20),
+            ('2024-01-03', 'beta', '300750', '宁德时代', 1, 60, 15, 15, 15, 15),
+        ]
+        conn.executemany("INSERT INTO daily_selections VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+        conn.execute("INSERT INTO cx_strategy_holdings VALUES ('688981', '中芯国际', 'beta', '2024-01-02', 50.0, 200)")
+        conn.commit()
+        conn.close()
+
+        self.account = StubAccount({
+            '000001': _position(1000, 10.0),
+            '300750': _position(100, 150.0),
+            '688981': _position(200, 50.0),
+        })
+        self.pool_configs = {'alpha': {'sector_initial_cap': 0.1}, 'beta': {'sector_initial_cap': 0.2}}
+
+    def teardown_method(self):
+        """测试后清理"""
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+        os.rmdir(self.temp_dir)
+
+    def _load(self, **kwargs):
+        return DecisionContext.load(self.account, self.db_path, '2024-01-03',
+                                    pool_configs=self.pool_configs, **kwargs)
+
+    def test_bulk_load(self):
+        """测试一次加载各板块最新日期、候选股和CX持仓"""
+        context = self._load()
+
+        assert context.pool_names == ['alpha', 'beta']
+        assert context.pool_latest_dates == {'alpha': '2024-01-03', 'beta': '2024-01-03'}
+        assert context.pool_selection('alpha')['stock_code'].tolist() == ['000002', '600000']
+        assert set(context.cx_holdings) == {'688981'}
+        assert context.total_equity == 1000000.0
+        assert self.account.equity_calls == 1
+        assert context.get_pool_config('beta') == {'sector_initial_cap': 0.2}
+
+    def test_pool_selection_copy_and_date(self):
+        """测试候选股返回副本，日期不一致时返回空表"""
+        context = self._load()
+
+        df = context.pool_selection('alpha')
+        df.loc[0, '总得分'] = 0
+        assert context.pool_selection('alpha')['总得分'].iloc[0] == 90
+        assert context.pool_selection('alpha', '2024-01-02').empty
+        assert not context.has_selection('alpha', '2024-01-02')
+        assert context.pool_selection('gamma').empty
+
+    def test_pool_members(self):
+        """测试板块归属包含历史日期的股票"""
+        context = self._load()
+
+        assert context.is_pool_member('alpha', '000001')
+        assert not context.is_pool_member('alpha', '300750')
+        assert context.is_pool_member('beta', '300750')
+
+    def test_volatility_memoized(self):
+        """测试同一只股票的ATR波动率只计算一次"""
+        calls = []
+
+        def volatility(stock_code, current_date):
+            calls.append((stock_code, current_date))
+            return 0.02
+
+        context = self._load(volatility_func=volatility)
+        for _ in range(3):
+            assert context.get_volatility('000002') == 0.02
+        assert context.get_volatility('600000', '2024-01-03') == 0.02
+        assert calls == [('000002', '2024-01-03'), ('600000', '2024-01-03')]
+
+    def test_sector_used_amount_matches_db(self):
+        """测试使用上下文计算的板块已用额度与逐只查询数据库一致"""
+        context = self._load()
+
+        for pool_name in ('alpha', 'beta'):
+            expected = calculate_sector_used_amount(pool_name, self.account, self.db_path)
+            actual = calculate_sector_used_amount(pool_name, self.account, self.db_path, context)
+            assert actual[0] == pytest.approx(expected[0])
+            assert actual[1] == expected[1]
+
+    def test_sector_used_amount_missing_buy_price(self):
+        """测试CX持仓记录缺少买入价格时仍计入板块已用额度"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE cx_strategy_holdings SET buy_price = NULL")
+        conn.commit()
+        conn.close()
+        context = self._load()
+
+        expected = calculate_sector_used_amount('beta', self.account, self.db_path)
+        actual = calculate_sector_used_amount('beta', self.account, self.db_path, context)
+        assert actual[0] == pytest.approx(100 * 150.0 + 200 * 50.0)
+        assert actual[1] == expected[1] == ['300750', '688981']
+        assert '买入价格: 50.00' in actual[2][1]['reason']
+
+    def test_sector_used_amount_error_raises(self):
+        """测试计算出错时抛出异常，不返回 0 额度"""
+        context = self._load()
+        self.account.positions['000001'] = _position(1000, None)
+
+        for ctx in (None, context):
+            with pytest.raises(TypeError):
+                calculate_sector_used_amount('alpha', self.account, self.db_path, ctx)
+
+    def test_buy_stocks_from_context(self):
+        """测试候选股筛选使用预加载数据，结果与直接查询一致"""
+        context = self._load()
+
+        expected, _ = get_buy_stocks_from_db('alpha', '2024-01-03', 1, 2, 0.5, db_path=self.db_path)
+        actual, _ = get_buy_stocks_from_db('alpha', '2024-01-03', 1, 2, 0.5, db_path=self.db_path, context=context)
+        assert actual == expected
@@ -0,0 +1,124 @@
+"""
+事件引擎高吞吐模式测试
+
+测试定长事件历史、按类型索引查询、批量分发、调试日志开关和吞吐量基准测试
+"""
+
+import logging
+import threading
+from datetime import datetime
+
+from core.event import Event, EventType, TickEvent
+from core.event_engine import EventEngine
+from benchmarks.event_engine_benchmark import run_benchmark
+
+
+def _tick(i):
+    return TickEvent(f'{i:06d}', 10.0 + i, 100)
+
+
+class TestEventEngineThroughput:
+    """事件引擎高吞吐模式测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.engine = EventEngine(max_history_size=5, batch_size=4)
+
+    def test_history_bounded(self):
+        """测试事件历史超过容量后只保留最近的事件"""
+        for i in range(12):
+            self.engine._dispatch_event(_tick(i))
+        history = self.engine.get_event_history()
+        assert len(history) == 5
+        assert [e.data['stock_code'] for e in history] == [f'{i:06d}' for i in range(7, 12)]
+
+    def test_history_by_type(self):
+        """测试按类型查询返回该类型最近的事件（按时间升序）"""
+        for i in range(8):
+            self.engine._dispatch_event(_tick(i))
+            if i % 3 == 0:
+                self.engine._dispatch_event(Event(EventType.SIGNAL, {'n': i}, datetime.now()))
+
+        signals = self.engine.get_event_history(EventType.SIGNAL, limit=2)
+        assert [e.data['n'] for e in signals] == [3, 6]
+        # 按类型的历史不受其他类型事件挤占
+        assert len(self.engine.get_event_history(EventType.SIGNAL)) == 3
+        assert self.engine.get_event_history(EventType.ORDER) == []
+        assert len(self.engine.get_event_history(EventType.TICK, limit=None)) == 5
+
+    def test_history_read_while_dispatching(self):
+        """测试事件循环写入历史时其他线程读取历史不会出错"""
+        engine = EventEngine(max_history_size=50)
+        errors = []
+        stop = threading.Event()
+
+        def reader():
+            while not stop.is_set():
+                try:
+                    engine.get_event_history(limit=None)
+                    engine.get_event_history(EventType.TICK, limit=20)
+                except RuntimeError as e:
+                    errors.append(e)
+                    return
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for i in range(20000):
+            engine._dispatch_event(_tick(i))
+        stop.set()
+        thread.join()
+        assert errors == []
+        assert len(engine.get_event_history(limit=None)) == 50
+
+    def test_batch_dispatch(self):
+        """测试事件循环批量分发且顺序不变"""
+        received = []
+        done = threading.Event()
+
+        def on_tick(event):
+            received.append(event.data['stock_code'])
+            if len(received) == 20:
+                done.set()
+
+        self.engine.register_listener(EventType.TICK, on_tick)
+        for i in range(20):
+            self.engine.put_event(_tick(i))
+        self.engine.start()
+        assert done.wait(timeout=5)
+        self.engine.stop()
+
+        assert received == [f'{i:06d}' for i in range(20)]
+        assert self.engine.stats['events'] == 20
+        assert 5 <= self.engine.stats['batches'] < 20
+
+    def test_unregister_during_dispatch(self):
+        """测试分发期间注销监听器不影响本次分发"""
+        calls = []
+
+        def first(event):
+            calls.append('first')
+            self.engine.unregister_listener(EventType.TICK, second)
+
+        def second(event):
+            calls.append('second')
+
+        self.engine.register_listener(EventType.TICK, first)
+        self.engine.register_listener(EventType.TICK, second)
+        self.engine._dispatch_event(_tick(0))
+        self.engine._dispatch_event(_tick(1))
+        assert calls == ['first', 'second', 'first']
+
+    def test_debug_logging_flag(self, caplog):
+        """测试逐事件调试日志默认关闭"""
+        with caplog.at_level(logging.DEBUG, logger='core.event_engine'):
+            self.engine.put_event(_tick(0))
+            assert not caplog.records
+            EventEngine(debug_logging=True).put_event(_tick(0))
+            assert any('放入事件' in r.getMessage() for r in caplog.records)
+
+    def test_benchmark(self):
+        """测试吞吐量基准测试的结果结构"""
+        results = run_benchmark(n_events=2000, history_size=100, history_queries=5)
+        assert results['legacy']['dispatched'] == 2000
+        assert results['current']['dispatched'] == 2000
+        assert results['speedup'] > 0
@@ -0,0 +1,95 @@
+"""
+事件对象测试
+
+测试 __slots__ 事件对象与旧接口兼容（data 字典、event_id、相等比较）、延迟生成 event_id、TICK 事件池复用和微基准测试
+"""
+
+import pickle
+from datetime import datetime
+
+import pytest
+
+from core.event import (
+    Event, EventType, TickEvent, TickEventPool, BarEvent, OrderEvent, SectorSelectionEvent
+)
+from core.event_engine import EventEngine
+from benchmarks.event_objects_benchmark import run_benchmark
+
+
+class TestEventObjects:
+    """事件对象测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.ts = datetime(2024, 1, 10, 9, 30, 0, 123456)
+
+    def test_data_and_attributes(self):
+        """测试 data 字典与属性一致"""
+        tick = TickEvent('000001', 10.5, 300, self.ts)
+        assert tick.data == {'stock_code': '000001', 'price': 10.5, 'volume': 300}
+        assert tick.data is tick.data
+        assert (tick.event_type, tick.timestamp) == (EventType.TICK, self.ts)
+        assert not hasattr(tick, '__dict__')
+
+        bar = BarEvent('000001', '2024-01-10', 10, 11, 12, 9, 500, self.ts)
+        assert bar.data['bar_data'] == {'open': 10, 'close': 11, 'high': 12, 'low': 9,
+                                        'volume': 500, 'trade_date': '2024-01-10'}
+        assert bar.bar_data is bar.data['bar_data']
+
+        selection = SectorSelectionEvent(['银行'], {'银行': 1.0}, self.ts)
+        assert selection.data['selected_sectors'] == ['银行']
+
+    def test_event_id_lazy(self):
+        """测试 event_id 在访问时生成，显式传入的 event_id 保留"""
+        tick = TickEvent('000001', 10.5, 300, self.ts)
+        assert tick._event_id is None
+        assert tick.event_id == 'tick_20240110_093000_123456'
+
+        event = Event(EventType.RISK, {'level': 'high'}, self.ts, event_id='risk-1')
+        assert event.event_id == 'risk-1'
+        assert Event(EventType.RISK, {}, self.ts).event_id == 'risk_20240110_093000_123456'
+
+    def test_equality_and_pickle(self):
+        """测试相等比较和序列化"""
+        a = Event(EventType.SIGNAL, {'n': 1}, self.ts)
+        assert a == Event(EventType.SIGNAL, {'n': 1}, self.ts)
+        assert a != Event(EventType.SIGNAL, {'n': 2}, self.ts)
+        assert a != TickEvent('000001', 1.0, 1, self.ts)
+
+        order = OrderEvent('000001', 'market', 100, price=10.0, direction='sell', timestamp=self.ts)
+        order.reason = '止损'
+        restored = pickle.loads(pickle.dumps(order))
+        assert restored == order
+        assert restored.data['reason'] == '止损'
+
+    def test_tick_pool_reuse(self):
+        """测试事件池循环复用对象，复用时清除缓存的 data 和 event_id"""
+        pool = TickEventPool(2)
+        first = pool.acquire('000001', 10.0, 100, self.ts)
+        assert first.data['price'] == 10.0 and first.event_id
+        second = pool.acquire('000002', 11.0, 100, self.ts)
+        third = pool.acquire('000003', 12.0, 200)
+
+        assert third is first and second is not first
+        assert third.data == {'stock_code': '000003', 'price': 12.0, 'volume': 200}
+        assert third.timestamp != self.ts
+        with pytest.raises(ValueError):
+            TickEventPool(0)
+
+    def test_engine_tick_pool(self):
+        """测试事件引擎使用事件池时不能记录事件历史"""
+        with pytest.raises(ValueError):
+            EventEngine(tick_pool_size=16)
+
+        engine = EventEngine(record_history=False, tick_pool_size=2)
+        engine.put_tick_event('000001', 10.0, 100)
+        engine.put_tick_event('000002', 10.0, 100)
+        engine.put_tick_event('000003', 10.0, 100)
+        assert engine.get_queue_size() == 3
+        assert engine.get_event_history() == []
+
+    def test_benchmark(self):
+        """测试微基准测试的结果结构"""
+        results = run_benchmark(n_events=2000, n_codes=10, memory_events=500)['results']
+        assert set(results) == {'legacy', 'slots', 'pool'}
+        assert results['slots']['bytes_per_event'] < results['legacy']['bytes_per_event']
@@ -0,0 +1,141 @@
+"""
+事件引擎优先级与工作线程池测试
+
+测试按事件类型优先级出队、耗时监听器使用工作线程池不阻塞事件循环、按股票有序处理以及队列深度和监听器耗时指标
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from core.event import Event, EventType, TickEvent
+from core.event_engine import EventEngine
+
+
+def _event(event_type, **data):
+    return Event(event_type, data, datetime.now())
+
+
+class TestEventPriority:
+    """事件优先级测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.engine = EventEngine()
+
+    def teardown_method(self):
+        """测试后清理"""
+        if self.engine.is_running():
+            self.engine.stop()
+
+    def _wait(self, predicate, timeout=5):
+        deadline = time.time() + timeout
+        while not predicate() and time.time() < deadline:
+            time.sleep(0.01)
+        return predicate()
+
+    def test_priority_order(self):
+        """测试订单 > TICK > BAR > 板块选择，同一优先级内保持放入顺序"""
+        received = []
+        for event_type in (EventType.ORDER, EventType.FILL, EventType.TICK, EventType.BAR,
+                           EventType.SECTOR_SELECTION):
+            self.engine.register_listener(event_type, lambda e: received.append((e.event_type, e.data['n'])))
+
+        self.engine.put_event(_event(EventType.SECTOR_SELECTION, n=0))
+        self.engine.put_event(_event(EventType.BAR, n=1))
+        self.engine.put_event(_event(EventType.TICK, n=2))
+        self.engine.put_event(_event(EventType.ORDER, n=3))
+        self.engine.put_event(_event(EventType.TICK, n=4))
+        self.engine.put_event(_event(EventType.FILL, n=5))
+        self.engine.start()
+        assert self._wait(lambda: len(received) == 6)
+
+        assert [n for _, n in received] == [3, 5, 2, 4, 1, 0]
+
+    def test_custom_priority(self):
+        """测试覆盖事件类型优先级"""
+        engine = EventEngine(priorities={EventType.BAR: 0})
+        assert engine.get_event_priority(EventType.BAR) == 0
+        engine.set_event_priority(EventType.TICK, 9)
+        assert engine.get_event_priority(EventType.TICK) == 9
+        assert engine.get_event_priority(EventType.ORDER) < engine.get_event_priority(EventType.STOCK_SELECTION)
+
+    def test_slow_listener_in_worker_pool(self):
+        """测试耗时的选股监听器在工作线程中执行，不阻塞TICK处理"""
+        release = threading.Event()
+        ticks = []
+        self.engine.register_listener(EventType.SECTOR_SELECTION, lambda e: release.wait(5), workers=1)
+        self.engine.register_listener(EventType.TICK, lambda e: ticks.append(e.data['stock_code']))
+        self.engine.start()
+
+        self.engine.put_event(_event(EventType.SECTOR_SELECTION, n=0))
+        self.engine.put_event(TickEvent('000001', 10.0, 100))
+        assert self._wait(lambda: ticks == ['000001'])
+
+        depths = self.engine.get_queue_depths()
+        assert depths['events'] == 0
+        assert any(key.startswith('sector_selection:') for key in depths)
+        release.set()
+
+    def test_in_order_per_symbol(self):
+        """测试多个工作线程时同一只股票的事件按放入顺序处理"""
+        seen = {}
+        lock = threading.Lock()
+
+        def on_tick(event):
+            time.sleep(0.0005)
+            with lock:
+                seen.setdefault(event.data['stock_code'], []).append(event.data['price'])
+
+        self.engine.register_listener(EventType.TICK, on_tick, workers=4)
+        self.engine.start()
+        for i in range(200):
+            self.engine.put_event(TickEvent(f'{i % 5:06d}', float(i), 100))
+        assert self._wait(lambda: sum(len(v) for v in seen.values()) == 200)
+
+        for prices in seen.values():
+            assert prices == sorted(prices)
+
+    def test_listener_metrics(self):
+        """测试监听器的调用次数、错误数和耗时指标"""
+        def fail(event):
+            raise RuntimeError("处理失败")
+
+        self.engine.register_listener(EventType.TICK, lambda e: time.sleep(0.002))
+        self.engine.register_listener(EventType.TICK, fail)
+        for i in range(3):
+            self.engine._dispatch_event(TickEvent('000001', 10.0, 100))
+
+        metrics = {m['listener']: m for m in self.engine.get_listener_metrics()}
+        slow = next(m for name, m in metrics.items() if 'lambda' in name)
+        assert slow['calls'] == 3 and slow['max_ms'] >= 2
+        assert metrics[fail.__qualname__]['errors'] == 3
+        assert self.engine.stats['listener_errors'] == 3
+
+    def test_pool_listener_errors_counted(self):
+        """测试工作线程池中的监听器异常同样计入 listener_errors"""
+        def fail(event):
+            raise RuntimeError("处理失败")
+
+        self.engine.register_listener(EventType.TICK, fail, workers=2)
+        self.engine.register_listener(EventType.BAR, fail)
+        for i in range(4):
+            self.engine._dispatch_event(TickEvent(f'{i:06d}', 10.0, 100))
+        self.engine._dispatch_event(_event(EventType.BAR, stock_code='000001'))
+
+        assert self._wait(lambda: self.engine.stats['listener_errors'] == 5)
+        tick = next(m for m in self.engine.get_listener_metrics() if m['event_type'] == 'tick')
+        assert tick['errors'] == 4
+        self.engine.unregister_listener(EventType.TICK, fail)
+
+    def test_unregister_pool_listener(self):
+        """测试注销使用工作线程池的监听器"""
+        def on_bar(event):
+            pass
+
+        self.engine.register_listener(EventType.BAR, on_bar, workers=2)
+        assert self.engine.get_listener_count(EventType.BAR) == 1
+        self.engine._dispatch_event(_event(EventType.BAR, stock_code='000001'))
+        self.engine.unregister_listener(EventType.BAR, on_bar)
+        assert self.engine.get_listener_count(EventType.BAR) == 0
+        assert self.engine.get_listener_metrics() == []
@@ -0,0 +1,164 @@
+"""
+回测历史K线快照测试
+
+测试快照与原先掩码切片结果一致、返回共享内存的只读视图、原地修改被拒绝、
+缓存命中与淘汰、实盘日期重新加载，以及 get_daily_data_for_backtest 的直接替换
+"""
+
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_management.history_snapshot import FrozenHistory, HistorySnapshotStore
+
+
+def _bars(n=30, start='2024-01-01'):
+    dates = pd.bdate_range(start, periods=n)
+    return pd.DataFrame({
+        'stock_code': '000001',
+        'trade_date': dates.strftime('%Y-%m-%d'),
+        'open': np.arange(n, dtype=float) + 10,
+        'high': np.arange(n, dtype=float) + 11,
+        'low': np.arange(n, dtype=float) + 9,
+        'close': np.arange(n, dtype=float) + 10.5,
+        'volume': np.arange(n) * 100,
+    })
+
+
+class CountingLoader:
+    """记录加载次数的加载函数"""
+
+    def __init__(self, df):
+        self.df = df
+        self.calls = 0
+
+    def __call__(self, stock_code, db_manager=None):
+        self.calls += 1
+        return self.df.copy()
+
+
+class FakeDb:
+    """只提供 db_path 的数据库管理器"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+
+class TestHistorySnapshot:
+    """历史K线快照测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.df = _bars()
+        self.loader = CountingLoader(self.df)
+        self.store = HistorySnapshotStore({'daily': self.loader}, max_entries=2)
+        self.db = FakeDb('a.db')
+
+    def test_matches_mask_slice(self):
+        """测试快照与原先的 to_datetime + 掩码 + copy 结果一致"""
+        for cutoff in ['2023-12-29', '2024-01-03', '2024-01-06', '2024-02-09', '2024-06-28']:
+            expected = self.df.copy()
+            expected['trade_date'] = pd.to_datetime(expected['trade_date'])
+            expected = expected[expected['trade_date'] <= pd.to_datetime(cutoff)].copy()
+            snapshot = self.store.snapshot('daily', '000001', cutoff, self.db)
+            pd.testing.assert_frame_equal(snapshot, expected)
+        assert self.loader.calls == 1
+
+    def test_readonly_view(self):
+        """测试快照共享底层内存且不可原地修改，新增列不影响缓存"""
+        history = self.store.history('daily', '000001', '2024-01-10', self.db)
+        snapshot = history.upto('2024-01-10')
+        assert len(snapshot) == 8
+        assert np.shares_memory(snapshot['close'].values, history.arrays['close'])
+
+        with pytest.raises(ValueError):
+            snapshot.loc[0, 'close'] = 0.0
+        with pytest.raises(ValueError):
+            snapshot['close'].values[0] = 0.0
+
+        snapshot['ma'] = snapshot['close'].rolling(2).mean()
+        snapshot['close'] = snapshot['close'] * 2
+        assert 'ma' not in self.store.snapshot('daily', '000001', '2024-01-10', self.db).columns
+        assert history.arrays['close'][0] == 10.5
+
+    def test_cache_and_eviction(self):
+        """测试按数据库区分缓存、最近最少使用淘汰和手动失效"""
+        self.store.snapshot('daily', '000001', '2024-01-10', self.db)
+        self.store.snapshot('daily', '000001', '2024-01-20', self.db)
+        assert self.loader.calls == 1
+        self.store.snapshot('daily', '000001', '2024-01-10', FakeDb('b.db'))
+        assert self.loader.calls == 2
+
+        # 缓存上限为 2，最早使用的 a.db/000001 被淘汰
+        self.store.snapshot('daily', '000002', '2024-01-10', self.db)
+        assert self.store.cache_info()['entries'] == 2
+        self.store.snapshot('daily', '000001', '2024-01-10', self.db)
+        assert self.loader.calls == 4
+
+        self.store.invalidate(['000002'])
+        assert self.store.cache_info()['entries'] == 1
+        with pytest.raises(ValueError):
+            self.store.snapshot('hourly', '000001', '2024-01-10', self.db)
+
+    def test_live_date_reloads(self):
+        """测试查询日期不早于加载当日时重新加载"""
+        today = date.today().strftime('%Y-%m-%d')
+        yesterday = (date.today() - timedelta(days=1)).strftime('%Y-%m-%d')
+        self.store.snapshot('daily', '000001', yesterday, self.db)
+        self.store.snapshot('daily', '000001', yesterday, self.db)
+        assert self.loader.calls == 1
+        self.store.snapshot('daily', '000001', today, self.db)
+        assert self.loader.calls == 2
+
+    def test_unsorted_and_empty(self):
+        """测试乱序历史按日期排序，空历史返回空 DataFrame"""
+        history = FrozenHistory(self.df.iloc[::-1])
+        assert history.upto('2024-01-02')['close'].tolist() == [10.5, 11.5]
+        assert FrozenHistory(pd.DataFrame()).upto('2024-01-02').empty
+
+
+class TestBacktestDataFunctions:
+    """data_processor 回测数据函数测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        from benchmarks.synthetic_db import SyntheticConfig, generate_synthetic_database, synthetic_trade_dates
+        from data_management.database_manager import DatabaseManager
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'synthetic.db')
+        config = SyntheticConfig(n_stocks=3, years=0.3, n_sectors=1)
+        generate_synthetic_database(self.db_path, config)
+        self.dates = synthetic_trade_dates(config)
+        self.original_db_path = DatabaseManager().db_path
+        DatabaseManager().switch_database(self.db_path)
+
+    def teardown_method(self):
+        """测试后清理"""
+        from data_management.database_manager import DatabaseManager
+        DatabaseManager().switch_database(self.original_db_path)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_drop_in(self):
+        """测试 get_daily_data_for_backtest 与直接从数据库截取的结果一致"""
+        from data_management.data_processor import (
+            backtest_snapshots, get_daily_data_for_backtest, get_multi_period_data_for_backtest,
+            load_daily_data_from_db
+        )
+        cutoff = self.dates[20]
+        expected = load_daily_data_from_db('600000')
+        expected['trade_date'] = pd.to_datetime(expected['trade_date'])
+        expected = expected[expected['trade_date'] <= pd.to_datetime(cutoff)]
+
+        snapshot = get_daily_data_for_backtest('600000', cutoff)
+        pd.testing.assert_frame_equal(snapshot, expected)
+        assert not snapshot['close'].values.flags.writeable
+
+        data_dict = get_multi_period_data_for_backtest('600000', cutoff)
+        assert set(data_dict) == {'daily', 'weekly', 'monthly'}
+        assert len(data_dict['daily']) == 21 and data_dict['weekly'].empty
+        backtest_snapshots.invalidate()
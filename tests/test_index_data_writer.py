@@ -0,0 +1,81 @@
+"""
+指数K线缓冲写入器测试
+
+测试缓冲、阈值触发写入、upsert 语义和写入统计
+"""
+
+import os
+import sqlite3
+import tempfile
+import pytest
+import pandas as pd
+from data_management.index_data_writer import IndexDataWriter
+
+
+def _index_frame(dates, close):
+    return pd.DataFrame({
+        'open': close, 'high': close, 'low': close, 'close': close, 'volume': [100] * len(dates)
+    }, index=dates)
+
+
+class TestIndexDataWriter:
+    """指数K线缓冲写入器测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.db_path = os.path.join(tempfile.mkdtemp(), 'test.db')
+        self.dates = ['2024-01-02', '2024-01-03', '2024-01-04']
+
+    def _read(self):
+        conn = sqlite3.connect(self.db_path)
+        df = pd.read_sql_query("SELECT * FROM index_k_daily ORDER BY index_code, trade_date", conn)
+        conn.close()
+        return df
+
+    def test_buffers_until_size_threshold(self):
+        """测试缓存达到行数阈值时才写入"""
+        writer = IndexDataWriter(db_path=self.db_path, max_rows=5, max_interval=3600)
+        writer.add_frame(_index_frame(self.dates, [1.0, 2.0, 3.0]), '801010.ZS', '农林牧渔指数')
+        assert writer.pending == 3
+        assert writer.stats.flushes == 0
+
+        writer.add_frame(_index_frame(self.dates, [4.0, 5.0, 6.0]), '801030.ZS', '基础化工指数')
+        assert writer.pending == 0
+        assert writer.stats.flushes == 1
+        assert writer.stats.triggers['size'] == 1
+        assert len(self._read()) == 6
+
+    def test_time_threshold_triggers_flush(self):
+        """测试距上次写入超过时间阈值时写入"""
+        writer = IndexDataWriter(db_path=self.db_path, max_rows=1000, max_interval=0)
+        writer.add_frame(_index_frame(self.dates, [1.0, 2.0, 3.0]), '801010.ZS', '农林牧渔指数')
+        assert writer.pending == 0
+        assert writer.stats.triggers['time'] == 1
+
+    def test_upsert_replaces_existing_rows(self):
+        """测试按 (index_code, trade_date) upsert，重复写入不产生重复行"""
+        with IndexDataWriter(db_path=self.db_path) as writer:
+            writer.add_frame(_index_frame(self.dates, [1.0, 2.0, 3.0]), '801010.ZS', '农林牧渔指数')
+        with IndexDataWriter(db_path=self.db_path) as writer:
+            writer.add_frame(_index_frame(self.dates[1:], [20.0, 30.0]), '801010.ZS', '农林牧渔指数',
+                             dates=['2024-01-04'])
+            # 同一键在缓存中只保留最后一次结果
+            writer.add_rows([('801010.ZS', '农林牧渔指数', '2024-01-02', 9.0, 9.0, 9.0, 9.0, 1)])
+            writer.add_rows([('801010.ZS', '农林牧渔指数', '2024-01-02', 10.0, 10.0, 10.0, 10.0, 1)])
+            assert writer.pending == 2
+
+        saved = self._read()
+        assert len(saved) == 3
+        assert saved['close'].tolist() == [10.0, 2.0, 30.0]
+        assert writer.stats.rows_added == 3
+        assert writer.stats.rows_written == 2
+
+    def test_date_filter_on_datetime_index(self):
+        """测试按字符串日期筛选 DatetimeIndex 的指数数据"""
+        import warnings
+        frame = _index_frame(pd.to_datetime(self.dates), [1.0, 2.0, 3.0])
+        with IndexDataWriter(db_path=self.db_path) as writer, warnings.catch_warnings():
+            warnings.simplefilter('error', FutureWarning)
+            assert writer.add_frame(frame, '801010.ZS', '农林牧渔指数', dates=['2024-01-03']) == 1
+        saved = self._read()
+        assert saved['trade_date'].tolist() == ['2024-01-03']
@@ -0,0 +1,118 @@
+"""
+延迟埋点测试
+
+测试 span / stopwatch / slot 记录、批量写入指标库、预算计算和 p50/p95/max 报表
+"""
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import pytest
+
+from core.utils.latency import LatencyRecorder, seconds_until_next
+
+
+class FakeClock:
+    """手动推进的计时函数"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class TestLatencyRecorder:
+    """延迟记录器测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.recorder = LatencyRecorder(db_path=os.path.join(self.temp_dir, 'metrics.db'), clock=self.clock,
+                                        now_func=lambda: datetime(2024, 1, 10, 10, 5))
+
+    def teardown_method(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_seconds_until_next(self):
+        """测试距下一个定时时间点的秒数"""
+        times = ['10:05', '10:39', '14:50']
+        assert seconds_until_next(times, datetime(2024, 1, 10, 10, 5)) == 34 * 60
+        assert seconds_until_next(times, datetime(2024, 1, 10, 14, 50)) is None
+
+    def test_slot_spans_and_report(self):
+        """测试时段内的 span 和 stopwatch 记录与按阶段/板块统计"""
+        @self.recorder.timed_slot('daily_buy', ['10:05', '10:39'])
+        def run():
+            for pool, cost in (('alpha', 1.0), ('beta', 3.0)):
+                with self.recorder.span('allocation', pool):
+                    self.clock.advance(cost)
+                watch = self.recorder.stopwatch(pool)
+                self.clock.advance(0.5)
+                watch.lap('data_load')
+                self.clock.advance(0.25)
+                watch.lap('signal')
+
+        run()
+        report = self.recorder.report()
+        alloc = report[report['stage'] == 'allocation'].set_index('pool')
+        assert alloc.loc['alpha', 'max_ms'] == pytest.approx(1000)
+        assert alloc.loc['beta', 'p50_ms'] == pytest.approx(3000)
+        assert set(report['slot']) == {'daily_buy'}
+        signal = report[(report['stage'] == 'signal') & (report['pool'] == 'beta')].iloc[0]
+        assert signal['p95_ms'] == pytest.approx(250)
+
+        slots = self.recorder.slot_report()
+        row = slots.iloc[0]
+        assert (row['slot'], row['slot_time'], row['runs']) == ('daily_buy', '10:05', 1)
+        assert row['max_ms'] == pytest.approx(5500)
+        assert row['budget_ms'] == pytest.approx(34 * 60 * 1000)
+
+    def test_percentiles_across_runs(self):
+        """测试多次执行的 p50 / p95 / max"""
+        for cost in range(1, 21):
+            with self.recorder.slot('daily_sell'):
+                with self.recorder.span('indicator', 'alpha'):
+                    self.clock.advance(cost / 1000)
+        row = self.recorder.report(slot='daily_sell').iloc[0]
+        assert row['count'] == 20
+        assert row['p50_ms'] == pytest.approx(10.5)
+        assert row['p95_ms'] == pytest.approx(19.05)
+        assert row['max_ms'] == pytest.approx(20)
+
+    def test_error_status(self):
+        """测试异常时记录 error 状态且异常照常抛出"""
+        with pytest.raises(RuntimeError):
+            with self.recorder.slot('cx_buy'):
+                with self.recorder.span('db_write'):
+                    raise RuntimeError("写入失败")
+        row = self.recorder.report().iloc[0]
+        assert row['errors'] == 1
+
+    def test_spans_outside_slot_flush_in_batches(self):
+        """测试时段之外的 span 累计到批量大小后才写入"""
+        recorder = LatencyRecorder(db_path=os.path.join(self.temp_dir, 'batch.db'), flush_size=3, clock=self.clock)
+        for _ in range(2):
+            with recorder.span('order_publish'):
+                self.clock.advance(0.01)
+        assert not os.path.exists(recorder.db_path)
+        with recorder.span('order_publish'):
+            self.clock.advance(0.01)
+        assert os.path.exists(recorder.db_path)
+        assert recorder.report().iloc[0]['count'] == 3
+
+    def test_disabled(self):
+        """测试关闭后不记录"""
+        recorder = LatencyRecorder(db_path=os.path.join(self.temp_dir, 'off.db'), enabled=False)
+        with recorder.slot('daily_buy'):
+            with recorder.span('allocation'):
+                pass
+        assert recorder.report().empty
+        assert not os.path.exists(recorder.db_path)
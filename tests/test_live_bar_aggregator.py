@@ -0,0 +1,160 @@
+"""
+实时K线聚合器测试
+
+测试5分钟K线/TICK增量更新当日日线、周线月线合成、跨日转入已收盘K线和历史只加载一次
+"""
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from core.event import TickEvent
+from data_management.live_bar_aggregator import LiveBarAggregator, period_start
+
+
+def _daily_history(dates, base=10.0):
+    return pd.DataFrame({
+        'stock_code': '000001',
+        'trade_date': dates,
+        'open': [base + i for i in range(len(dates))],
+        'close': [base + i + 0.5 for i in range(len(dates))],
+        'high': [base + i + 1 for i in range(len(dates))],
+        'low': [base + i - 1 for i in range(len(dates))],
+        'volume': [100.0] * len(dates),
+    })
+
+
+class HistoryLoader:
+    """记录调用次数的历史K线加载函数"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.calls = []
+
+    def __call__(self, stock_code, frequency, periods):
+        self.calls.append((stock_code, frequency))
+        return self.frames.get(frequency, pd.DataFrame())
+
+
+class TestLiveBarAggregator:
+    """实时K线聚合器测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        # 2024-01-10 为周三：本周已收盘 周一、周二
+        daily = _daily_history(['2024-01-05', '2024-01-08', '2024-01-09'])
+        weekly = _daily_history(['2023-12-29', '2024-01-05'])
+        monthly = _daily_history(['2023-12-29'])
+        self.loader = HistoryLoader({'daily': daily, 'weekly': weekly, 'monthly': monthly})
+        self.aggregator = LiveBarAggregator(self.loader)
+
+    def test_period_start(self):
+        """测试周期起始日期"""
+        assert period_start('2024-01-10', 'daily') == '2024-01-10'
+        assert period_start('2024-01-10', 'weekly') == '2024-01-08'
+        assert period_start('2024-01-10 15:00:00', 'monthly') == '2024-01-01'
+
+    def test_bars_update_daily_with_revision(self):
+        """测试5分钟K线更新当日日线，修订的K线不重复累计"""
+        agg = self.aggregator
+        agg.on_bar('000001', '2024-01-10 09:35', 20, 21, 19.5, 20.5, 10)
+        agg.on_bar('000001', '2024-01-10 09:40', 20.5, 22, 20, 21.5, 10)
+        agg.on_bar('000001', '2024-01-10 09:40', 20.5, 22.5, 20, 22, 15)
+        assert not agg.on_bar('000001', '2024-01-10 09:35', 1, 1, 1, 1, 1)
+
+        daily = agg.get_kline('000001', 'daily', periods=3)
+        assert daily['trade_date'].tolist() == ['2024-01-08', '2024-01-09', '2024-01-10']
+        live = daily.iloc[-1]
+        assert (live['open'], live['high'], live['low'], live['close'], live['volume']) == (20, 22.5, 19.5, 22, 25)
+        assert agg.is_complete('000001', '2024-01-10')
+
+    def test_weekly_monthly_from_daily(self):
+        """测试当周/当月K线由本周期已收盘日线加当日日线合成"""
+        agg = self.aggregator
+        agg.on_bar('000001', '2024-01-10 09:35', 20, 30, 5, 25, 50)
+
+        weekly = agg.get_kline('000001', 'weekly')
+        assert weekly['trade_date'].tolist() == ['2023-12-29', '2024-01-05', '2024-01-10']
+        live = weekly.iloc[-1]
+        # 本周：周一(open=11)、周二、周三(当日)
+        assert (live['open'], live['high'], live['low'], live['close'], live['volume']) == (11, 30, 5, 25, 250)
+
+        monthly = agg.get_kline('000001', 'monthly')
+        assert monthly['trade_date'].tolist() == ['2023-12-29', '2024-01-10']
+        assert monthly.iloc[-1]['open'] == 10 and monthly.iloc[-1]['volume'] == 350
+
+    def test_history_loaded_once(self):
+        """测试已收盘K线只从数据库加载一次"""
+        agg = self.aggregator
+        agg.on_bar('000001', '2024-01-10 09:35', 20, 21, 19, 20, 10)
+        for _ in range(3):
+            for frequency in ('daily', 'weekly', 'monthly'):
+                agg.get_kline('000001', frequency)
+        assert len(self.loader.calls) == 3
+
+    def test_day_rollover(self):
+        """测试跨日、跨周时当日日线和当周K线转为已收盘K线"""
+        agg = self.aggregator
+        agg.get_kline('000001')
+        agg.on_bar('000001', '2024-01-12 14:55', 20, 21, 19, 20, 10)   # 周五
+        agg.on_bar('000001', '2024-01-15 10:00', 30, 31, 29, 30, 5)    # 下周一，开盘后才开始
+
+        daily = agg.get_kline('000001', 'daily')
+        assert daily['trade_date'].tolist()[-2:] == ['2024-01-12', '2024-01-15']
+        weekly = agg.get_kline('000001', 'weekly')
+        assert weekly['trade_date'].tolist() == ['2023-12-29', '2024-01-05', '2024-01-12', '2024-01-15']
+        assert weekly.iloc[-2]['volume'] == 210
+        assert not agg.is_complete('000001', '2024-01-15')
+
+    def test_tick_events(self):
+        """测试TICK事件更新当日日线"""
+        agg = self.aggregator
+        agg.handle_tick_event(TickEvent('000001', 20.0, 100, datetime(2024, 1, 10, 9, 30, 1)))
+        agg.handle_tick_event(TickEvent('000001', 21.0, 50, datetime(2024, 1, 10, 9, 31)))
+        agg.handle_tick_event(TickEvent('000001', 19.0, 50, datetime(2024, 1, 10, 9, 32)))
+
+        bar = agg.live_bar('000001')
+        assert bar == {'stock_code': '000001', 'trade_date': '2024-01-10', 'open': 20.0,
+                       'high': 21.0, 'low': 19.0, 'close': 19.0, 'volume': 200.0}
+
+    def test_invalid_frequency(self):
+        """测试不支持的频率"""
+        with pytest.raises(ValueError):
+            self.aggregator.get_kline('000001', 'quarterly')
+
+
+class TestProviderLiveBars:
+    """实时K线提供器从内存返回分析K线的测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        pytest.importorskip('schedule')
+        from data_management.realtime_kline_provider import RealtimeKlineProvider
+        self.temp_dir = tempfile.mkdtemp()
+        self.provider = RealtimeKlineProvider(db_path=os.path.join(self.temp_dir, 'quant.db'))
+
+    def teardown_method(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_analysis_served_from_memory(self):
+        """测试当日5分钟数据完整时分析K线直接从内存返回"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        times = pd.date_range(f'{today} 09:35', periods=6, freq='5min')
+        df = pd.DataFrame({
+            'stock_code': '000001',
+            'trade_date': today,
+            'trade_time': times.strftime('%Y-%m-%d %H:%M:%S'),
+            'open': 10.0, 'close': 10.5, 'high': 11.0, 'low': 9.5, 'volume': 100.0,
+        })
+        # 分两次保存：第二次与第一次有重叠
+        self.provider.save_5min_data('000001', df.iloc[:4])
+        self.provider.save_5min_data('000001', df.iloc[2:])
+
+        kline = self.provider.get_kline_for_analysis('000001', 'daily')
+        assert kline['trade_date'].tolist() == [today]
+        assert kline.iloc[-1]['volume'] == 600.0
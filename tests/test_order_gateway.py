@@ -0,0 +1,164 @@
+"""
+QMT订单网关测试
+
+使用内存中的 Redis Stream 替代实现，测试批量发送、回执跟踪和阻塞等待确认
+"""
+
+import threading
+import time
+import pytest
+from core.execution.order_gateway import RedisOrderGateway
+
+
+class FakeRedis:
+    """内存中的 Redis Stream（decode_responses=True 的返回格式）"""
+
+    def __init__(self):
+        self.streams = {}
+        self.round_trips = 0
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def _add(self, name, fields):
+        self._seq += 1
+        message_id = f"{int(time.time() * 1000)}-{self._seq}"
+        self.streams.setdefault(name, []).append((message_id, {k: str(v) for k, v in fields.items()}))
+        return message_id
+
+    def xadd(self, name, fields, maxlen=None, approximate=True):
+        with self._cond:
+            self.round_trips += 1
+            message_id = self._add(name, fields)
+            self._cond.notify_all()
+            return message_id
+
+    def xrevrange(self, name, count=None):
+        self.round_trips += 1
+        return list(reversed(self.streams.get(name, [])))[:count]
+
+    def xread(self, streams, count=None, block=None):
+        self.round_trips += 1
+
+        def collect():
+            result = []
+            for name, last_id in streams.items():
+                last = tuple(int(x) for x in last_id.split('-'))
+                messages = [m for m in self.streams.get(name, [])
+                            if tuple(int(x) for x in m[0].split('-')) > last][:count]
+                if messages:
+                    result.append([name, messages])
+            return result
+
+        with self._cond:
+            result = collect()
+            if not result and block:
+                self._cond.wait_for(lambda: bool(collect()), timeout=block / 1000)
+                result = collect()
+            return result
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def close(self):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def xadd(self, name, fields, maxlen=None, approximate=True):
+        self.commands.append((name, fields))
+
+    def execute(self):
+        with self.redis._cond:
+            self.redis.round_trips += 1
+            ids = [self.redis._add(name, fields) for name, fields in self.commands]
+            self.redis._cond.notify_all()
+        return ids
+
+
+class TestRedisOrderGateway:
+    """QMT订单网关测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.redis = FakeRedis()
+        self.gateway = RedisOrderGateway(client=self.redis)
+
+    def _ack(self, order_id, status='filled', message=''):
+        self.redis.xadd('myredis:ack', {'order_id': order_id, 'status': status, 'message': message})
+
+    def test_batch_publish_single_round_trip(self):
+        """测试调仓订单一次pipeline往返发送"""
+        before = self.redis.round_trips
+        orders = [('buy', f"{600000 + i}", 100) for i in range(10)]
+        order_ids = self.gateway.publish_orders(orders)
+
+        assert self.redis.round_trips - before == 1
+        assert len(order_ids) == 10
+        messages = self.redis.streams['myredis']
+        assert messages[0][1] == {
+            'strategy': 'shipan', 'action': 'buy', 'stock': '600000.SH', 'amount': '100',
+            'order_id': order_ids[0], 'sent_at': messages[0][1]['sent_at']
+        }
+
+    def test_qmt_code_conversion(self):
+        """测试股票代码转换为QMT格式"""
+        assert RedisOrderGateway.to_qmt_code('600000') == '600000.SH'
+        assert RedisOrderGateway.to_qmt_code('000001') == '000001.SZ'
+        assert RedisOrderGateway.to_qmt_code('300750') == '300750.SZ'
+        assert RedisOrderGateway.to_qmt_code('830799') == '830799.BJ'
+
+    def test_ack_tracking(self):
+        """测试回执更新订单状态"""
+        first, second = self.gateway.publish_orders([('buy', '600000', 100), ('sell', '000001', 200)])
+        self._ack(first, 'filled')
+        self._ack(second, 'rejected', '可用数量不足')
+        self._ack('unknown', 'filled')
+
+        assert self.gateway.poll_acks() == 2
+        assert self.gateway.tickets[first].status == 'filled'
+        assert self.gateway.tickets[second].ack_message == '可用数量不足'
+        assert self.gateway.stats['rejected'] == 1
+        assert self.gateway.pending() == []
+
+    def test_ignores_acks_before_gateway_started(self):
+        """测试只处理网关建立之后的回执"""
+        self._ack('old-order', 'filled')
+        gateway = RedisOrderGateway(client=self.redis)
+        order_id = gateway.send('buy', '600000', 100)
+        self._ack(order_id)
+        assert gateway.poll_acks() == 1
+
+    def test_wait_for_acks_blocks_until_consumer_replies(self):
+        """测试等待确认：消费端回复后立即返回，无需固定sleep"""
+        order_ids = self.gateway.publish_orders([('buy', '600000', 100), ('buy', '000001', 100)])
+
+        def consumer():
+            for order_id in order_ids:
+                time.sleep(0.05)
+                self._ack(order_id, 'accepted')
+
+        thread = threading.Thread(target=consumer)
+        start = time.perf_counter()
+        thread.start()
+        statuses = self.gateway.wait_for_acks(order_ids, timeout=2.0)
+        elapsed = time.perf_counter() - start
+        thread.join()
+
+        assert statuses == {order_ids[0]: 'accepted', order_ids[1]: 'accepted'}
+        assert elapsed < 1.0
+
+    def test_wait_for_acks_timeout(self):
+        """测试等待确认超时后返回未确认状态"""
+        order_id = self.gateway.send('sell', '600000', 100)
+        statuses = self.gateway.wait_for_acks([order_id], timeout=0.1)
+        assert statuses == {order_id: 'sent'}
+        assert [t.order_id for t in self.gateway.pending()] == [order_id]
+
+    def test_invalid_action(self):
+        """测试未知交易方向"""
+        with pytest.raises(ValueError):
+            self.gateway.send('hold', '600000', 100)
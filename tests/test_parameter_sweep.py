@@ -0,0 +1,162 @@
+"""
+参数扫描运行器测试
+
+测试参数网格与滚动窗口展开、共享内存映射面板、进程池运行结果与单进程一致、断点续跑以及滚动窗口选优报表
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from applications.backtest.backtest_engine import MarketPanel
+from applications.backtest.parameter_sweep import (
+    SweepRunner, parameter_grid, walk_forward_windows, walk_forward_report, config_parameter_grid
+)
+from strategies.rank_rotation_strategy import RankRotationStrategy
+
+
+def _panel(n_days=160, n_stocks=12, seed=1):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2024-01-01', periods=n_days).strftime('%Y-%m-%d')
+    close = 10 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, (n_days, n_stocks)), axis=0))
+    fields = {'open': close * 0.998, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+              'volume': np.full(close.shape, 1e5)}
+    return MarketPanel(dates, [f'{600000 + i:06d}' for i in range(n_stocks)], fields)
+
+
+class CountingFactory:
+    """记录调用次数的策略工厂（仅用于单进程运行）"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, params):
+        self.calls += 1
+        return RankRotationStrategy(params)
+
+
+class TestSweepHelpers:
+    """参数网格和滚动窗口测试类"""
+
+    def test_parameter_grid(self):
+        """测试参数网格展开"""
+        combos = parameter_grid({'lookback': [10, 20], 'top_percentage': [0.1, 0.2, 0.3]})
+        assert len(combos) == 6
+        assert combos[0] == {'lookback': 10, 'top_percentage': 0.1}
+
+    def test_walk_forward_windows(self):
+        """测试滚动窗口和扩展窗口"""
+        dates = [f'2024-01-{d:02d}' for d in range(1, 31)]
+        windows = walk_forward_windows(dates, train_days=10, test_days=5)
+        assert len(windows) == 4
+        assert (windows[1]['train_start'], windows[1]['test_start'], windows[1]['test_end']) == \
+            ('2024-01-06', '2024-01-16', '2024-01-20')
+        anchored = walk_forward_windows(dates, train_days=10, test_days=5, anchored=True)
+        assert all(w['train_start'] == '2024-01-01' for w in anchored)
+
+    def test_config_parameter_grid(self):
+        """测试以配置文件当前取值为中心生成网格"""
+        grid = config_parameter_grid(scales=(0.5, 1.0))
+        assert {'CX_THRESHOLD', 'XUANGU_THRESHOLD', 'CX_TECH_SCORE_THRESHOLD',
+                'top_percentage', 'min_stocks', 'max_stocks'} <= set(grid)
+        assert all(isinstance(v, int) for v in grid['max_stocks'])
+
+        # 只生成策略使用的参数
+        grid = config_parameter_grid(keys=RankRotationStrategy.PARAMETER_KEYS)
+        assert set(grid) == {'top_percentage', 'min_stocks', 'max_stocks'}
+
+
+class TestSweepRunner:
+    """参数扫描运行器测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.panel = _panel()
+        self.grid = {'lookback': [5, 20], 'top_percentage': [0.2, 0.5], 'min_stocks': [2], 'max_stocks': [4]}
+
+    def teardown_method(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_resume(self):
+        """测试结果表包含参数、指标和耗时，重新运行时跳过已完成的单元"""
+        factory = CountingFactory()
+        path = os.path.join(self.temp_dir, 'sweep.db')
+        runner = SweepRunner(self.panel, factory, path, workers=0)
+        results = runner.run(self.grid, start_date='2024-02-01', end_date='2024-07-31')
+
+        assert len(results) == 4 and factory.calls == 4
+        assert {'lookback', 'top_percentage', 'total_return', 'sharpe_ratio', 'runtime_seconds'} <= set(results.columns)
+        assert results['error'].isna().all()
+        assert os.path.exists(os.path.join(self.temp_dir, 'sweep_panel', 'close.npy'))
+
+        # 扩大网格后只运行新增的单元
+        grid = dict(self.grid, lookback=[5, 20, 40])
+        results = SweepRunner(runner.panel_dir, factory, path, workers=0).run(
+            grid, start_date='2024-02-01', end_date='2024-07-31')
+        assert len(results) == 6 and factory.calls == 6
+
+    def test_cell_id_covers_factory_and_panel(self):
+        """测试更换策略工厂、面板股票池或面板数据后不复用结果库中的旧结果"""
+        path = os.path.join(self.temp_dir, 'sweep.db')
+        runner = SweepRunner(self.panel, RankRotationStrategy, path, workers=0)
+        runner.run(self.grid, start_date='2024-02-01', end_date='2024-07-31')
+        cells = runner.build_cells(self.grid, start_date='2024-02-01', end_date='2024-07-31')
+        assert {cell['cell_id'] for cell in cells} == runner.completed_cells()
+
+        factory = CountingFactory()
+        SweepRunner(runner.panel_dir, factory, path, workers=0).run(
+            self.grid, start_date='2024-02-01', end_date='2024-07-31')
+        assert factory.calls == 4
+
+        subset = MarketPanel(self.panel.dates, self.panel.codes[:6],
+                             {name: values[:, :6] for name, values in self.panel.fields.items()})
+        other = SweepRunner(subset, RankRotationStrategy, path, workers=0)
+        assert not {cell['cell_id'] for cell in other.build_cells(
+            self.grid, start_date='2024-02-01', end_date='2024-07-31')} & other.completed_cells()
+
+        # 日期和股票池不变，只修正了行情数据，保存到同一目录
+        revised = MarketPanel(self.panel.dates, self.panel.codes,
+                              dict(self.panel.fields, close=self.panel.fields['close'] * 1.01))
+        rerun = SweepRunner(revised, RankRotationStrategy, path, workers=0)
+        assert rerun.panel_dir == runner.panel_dir
+        assert rerun.panel_fingerprint['dates'] == runner.panel_fingerprint['dates']
+        assert rerun.panel_fingerprint['codes'] == runner.panel_fingerprint['codes']
+        assert not {cell['cell_id'] for cell in rerun.build_cells(
+            self.grid, start_date='2024-02-01', end_date='2024-07-31')} & rerun.completed_cells()
+
+    def test_process_pool_matches_serial(self):
+        """测试进程池（共享内存映射面板）与单进程运行结果一致"""
+        windows = walk_forward_windows(self.panel.dates, train_days=60, test_days=30, step_days=40)
+        serial = SweepRunner(self.panel, RankRotationStrategy, os.path.join(self.temp_dir, 'serial.db'),
+                             workers=0).run(self.grid, windows)
+        parallel = SweepRunner(self.panel, RankRotationStrategy, os.path.join(self.temp_dir, 'parallel.db'),
+                               workers=2).run(self.grid, windows)
+
+        assert len(serial) == len(parallel) == 4 * len(windows) * 2
+        merged = serial.merge(parallel, on='cell_id', suffixes=('_s', '_p'))
+        assert np.allclose(merged['final_equity_s'], merged['final_equity_p'])
+
+        report = walk_forward_report(parallel, self.grid.keys())
+        assert list(report['window']) == list(range(len(windows)))
+        assert {'lookback', 'train_sharpe_ratio', 'test_sharpe_ratio'} <= set(report.columns)
+
+    def test_rejects_unused_parameters(self):
+        """测试网格中含有策略不使用的参数时拒绝运行"""
+        runner = SweepRunner(self.panel, RankRotationStrategy, os.path.join(self.temp_dir, 'sweep.db'), workers=0)
+        with pytest.raises(ValueError, match='CX_THRESHOLD'):
+            runner.run(dict(self.grid, CX_THRESHOLD=[0.5, 0.6]), start_date='2024-02-01', end_date='2024-07-31')
+        assert runner.results().empty
+
+    def test_failed_cell_is_retried(self):
+        """测试失败的单元记录错误，重新运行时重试"""
+        path = os.path.join(self.temp_dir, 'sweep.db')
+        runner = SweepRunner(self.panel, RankRotationStrategy, path, workers=0)
+        results = runner.run([{'lookback': 'x'}], start_date='2024-02-01', end_date='2024-07-31')
+        assert results['error'].iloc[0].startswith('ValueError')
+        assert runner.completed_cells() == set()
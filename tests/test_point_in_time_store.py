@@ -0,0 +1,104 @@
+"""
+点位时间存储测试
+
+测试股本变更历史和成分股变更历史的存储与向前填充
+"""
+
+import os
+import tempfile
+import pytest
+import pandas as pd
+from data_management.point_in_time_store import PointInTimeStore, ShareHistory, MembershipHistory
+
+
+class TestShareHistory:
+    """股本变更历史测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.events = pd.DataFrame({
+            'stock_code': ['000001', '000001', '000002'],
+            'effective_date': ['2024-01-03', '2024-01-05', '2024-01-01'],
+            'shares': [100.0, 200.0, 50.0]
+        })
+        self.history = ShareHistory(self.events)
+        self.dates = pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05', '2024-01-08'])
+
+    def test_asof_uses_latest_change_point(self):
+        """测试按日期查询股本不使用未来数据"""
+        assert self.history.asof('2024-01-04')['000001'] == 100.0
+        assert self.history.asof('2024-01-05')['000001'] == 200.0
+        # 早于首个变更点时使用首个值
+        assert self.history.asof('2024-01-02')['000001'] == 100.0
+
+    def test_multiply_matches_dense_panel(self):
+        """测试惰性展开的乘法与稠密面板结果一致"""
+        close = pd.DataFrame({'000001': [1.0, 2.0, 3.0, 4.0, 5.0],
+                              '000002': [1.0, 1.0, 1.0, 1.0, 1.0]}, index=self.dates)
+        market_cap = self.history.multiply(close)
+        dense = close * self.history.expand(close.index, close.columns)
+
+        pd.testing.assert_frame_equal(market_cap, dense)
+        assert market_cap.loc['2024-01-04', '000001'] == 300.0
+        assert market_cap.loc['2024-01-08', '000001'] == 1000.0
+
+    def test_fill_missing_only_adds_unknown_stocks(self):
+        """测试回退股本值不会覆盖已有历史"""
+        self.history.fill_missing({'000001': 999.0, '000003': 10.0})
+        assert self.history.asof('2024-01-08')['000001'] == 200.0
+        assert self.history.asof('2024-01-08')['000003'] == 10.0
+        assert self.history.event_count == 4
+
+
+class TestMembershipHistory:
+    """成分股变更历史测试类"""
+
+    def test_apply_zeroes_non_member_periods(self):
+        """测试非成分股期间被置为0"""
+        membership = MembershipHistory(pd.DataFrame({
+            'stock_code': ['000001', '000001'],
+            'effective_date': ['2024-01-03', '2024-01-05'],
+            'is_member': [1, 0]
+        }))
+        dates = pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-05'])
+        panel = pd.DataFrame({'000001': [1.0, 1.0, 1.0], '000002': [1.0, 1.0, 1.0]}, index=dates)
+
+        result = membership.apply(panel)
+        assert result['000001'].tolist() == [0.0, 1.0, 0.0]
+        # 没有事件的股票视为始终是成分股
+        assert result['000002'].tolist() == [1.0, 1.0, 1.0]
+
+
+class TestPointInTimeStore:
+    """点位时间存储测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = PointInTimeStore(os.path.join(self.tmpdir, 'pit.db'))
+
+    def test_record_shares_changes_skips_unchanged(self):
+        """测试只保存真正的股本变更点"""
+        events = pd.DataFrame({
+            'stock_code': ['000001', '000001', '000001'],
+            'effective_date': ['2024-01-02', '2024-01-03', '2024-01-04'],
+            'shares': [100.0, 100.0, 120.0]
+        })
+        assert self.store.record_shares_changes(events) == 2
+        # 重复记录相同股本不会写入
+        assert self.store.record_shares_changes(events.tail(1)) == 0
+
+        history = self.store.load_share_history(['000001'], end_date='2024-01-03')
+        assert history.event_count == 1
+        assert history.asof('2024-01-10')['000001'] == 100.0
+
+    def test_snapshot_membership_records_differences(self):
+        """测试成分股快照只记录调入和调出"""
+        assert self.store.snapshot_membership('801170.SI', ['000001', '000002'], '2024-01-02') == 2
+        assert self.store.snapshot_membership('801170.SI', ['000001', '000002'], '2024-01-03') == 0
+        assert self.store.snapshot_membership('801170.SI', ['000001', '000003'], '2024-01-04') == 2
+
+        membership = self.store.load_membership('801170.SI')
+        codes = ['000001', '000002', '000003']
+        assert membership.members_asof('2024-01-03', codes) == ['000001', '000002']
+        assert membership.members_asof('2024-01-04', codes) == ['000001', '000003']
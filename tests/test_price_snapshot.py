@@ -0,0 +1,167 @@
+"""
+价格快照服务测试
+
+测试批量取价、有效期缓存、收盘后快照和账户从快照读取价格
+"""
+
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+import pytest
+from data_management.price_snapshot import PriceSnapshotService, is_trading_session, next_session_start
+from core.execution.account import Account
+
+
+class StubPrices:
+    """记录调用次数的取价函数"""
+
+    def __init__(self, prices):
+        self.prices = dict(prices)
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, code):
+        with self._lock:
+            self.calls[code] = self.calls.get(code, 0) + 1
+        return self.prices.get(code)
+
+
+class BlockingPrices(StubPrices):
+    """指定股票的取价阻塞到 release 被设置（模拟慢网络请求）"""
+
+    def __init__(self, prices, blocked):
+        super().__init__(prices)
+        self.blocked = set(blocked)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, code):
+        if code in self.blocked:
+            self.started.set()
+            assert self.release.wait(5)
+        return super().__call__(code)
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestPriceSnapshotService:
+    """价格快照服务测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.prices = StubPrices({'600000': 10.0, '000001': 12.5, '600519': 1500.0})
+        self.clock = Clock(datetime(2024, 6, 3, 10, 0, 0))  # 周一上午交易时段
+        self.service = PriceSnapshotService(price_func=self.prices, trading_ttl=3.0, now_func=self.clock)
+
+    def test_trading_session(self):
+        """测试交易时段判断"""
+        assert is_trading_session(datetime(2024, 6, 3, 10, 0))
+        assert not is_trading_session(datetime(2024, 6, 3, 12, 0))
+        assert not is_trading_session(datetime(2024, 6, 1, 10, 0))  # 周六
+        assert next_session_start(datetime(2024, 6, 3, 16, 0)) == datetime(2024, 6, 4, 9, 15)
+        assert next_session_start(datetime(2024, 6, 7, 16, 0)) == datetime(2024, 6, 10, 9, 15)
+
+    def test_cached_within_ttl(self):
+        """测试有效期内只请求一次"""
+        assert self.service.get_prices(['600000', '000001']) == {'600000': 10.0, '000001': 12.5}
+        self.clock.now = datetime(2024, 6, 3, 10, 0, 2)
+        assert self.service.get_price('600000') == 10.0
+        assert self.prices.calls == {'600000': 1, '000001': 1}
+
+        # 过期后重新获取
+        self.prices.prices['600000'] = 10.5
+        self.clock.now = datetime(2024, 6, 3, 10, 0, 4)
+        assert self.service.get_price('600000') == 10.5
+        assert self.prices.calls['600000'] == 2
+
+    def test_after_hours_snapshot_until_next_session(self):
+        """测试收盘后快照一直有效到下一个交易时段"""
+        self.clock.now = datetime(2024, 6, 3, 15, 30)
+        self.service.get_price('600000')
+        self.clock.now = datetime(2024, 6, 4, 9, 0)
+        self.service.get_price('600000')
+        assert self.prices.calls['600000'] == 1
+
+        self.clock.now = datetime(2024, 6, 4, 9, 16)
+        self.service.get_price('600000')
+        assert self.prices.calls['600000'] == 2
+
+    def test_watched_codes_refreshed_in_same_batch(self):
+        """测试监控列表中的股票随批量请求一起刷新"""
+        self.service.watch(['600519'])
+        self.service.get_price('600000')
+        assert self.service.stats['batches'] == 1
+        assert self.service.snapshot()['600519'] == 1500.0
+
+    def test_failed_fetch_keeps_previous_price(self):
+        """测试获取失败时沿用上一次的价格"""
+        self.service.get_price('600000')
+        self.prices.prices['600000'] = None
+        assert self.service.get_price('600000', force=True) == 10.0
+        assert self.service.get_price('999999') is None
+
+    def test_fetch_outside_lock_and_coalesced(self):
+        """测试网络请求期间可以读取新鲜快照，同一只股票的并发请求只发起一次"""
+        prices = BlockingPrices({'600000': 10.0, '000001': 12.5}, blocked=['600000'])
+        service = PriceSnapshotService(price_func=prices, trading_ttl=3.0, now_func=self.clock)
+        assert service.get_price('000001') == 12.5
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(service.get_price('600000'))) for _ in range(3)]
+        threads[0].start()
+        assert prices.started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+
+        # 慢请求进行中：新鲜快照的读取不被阻塞
+        reads = []
+        reader = threading.Thread(target=lambda: reads.extend([service.get_price('000001'), service.snapshot()]))
+        reader.start()
+        reader.join(2)
+        deadline = time.monotonic() + 5
+        while service.stats['coalesced'] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        prices.release.set()
+        assert reads == [12.5, {'000001': 12.5}]
+
+        for thread in threads:
+            thread.join(5)
+        assert results == [10.0, 10.0, 10.0]
+        assert prices.calls == {'000001': 1, '600000': 1}
+        assert service.stats['batches'] == 2
+        assert service.stats['coalesced'] == 2
+        assert not service._inflight
+
+
+class TestAccountPriceSnapshot:
+    """账户从价格快照读取价格测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.db_path = os.path.join(tempfile.mkdtemp(), 'account.db')
+        self.prices = StubPrices({'600000': 11.0, '000001': 9.0})
+        self.service = PriceSnapshotService(price_func=self.prices, trading_ttl=60.0,
+                                            now_func=lambda: datetime(2024, 6, 3, 10, 0))
+
+    def test_account_methods_share_snapshot(self):
+        """测试重构持仓、总权益和盈亏查询共用一次取价"""
+        account = Account(100000.0, db_path=self.db_path, price_service=self.service)
+        account.update_position('600000', 1000, 10.0, datetime(2024, 6, 3, 9, 40))
+        account.update_position('000001', 500, 10.0, datetime(2024, 6, 3, 9, 45))
+
+        equity = account.get_total_equity()
+        pnl = account.get_position_pnl('600000')
+        account.get_position_pnl('000001')
+
+        assert equity == pytest.approx(100000.0 - 10000 - 3 - 5000 - 3 + 11000 + 4500)
+        assert pnl['current_price'] == 11.0
+        assert self.prices.calls == {'600000': 1, '000001': 1}
+        account.close()
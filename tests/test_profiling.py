@@ -0,0 +1,168 @@
+"""
+策略回调与事件监听器耗时剖析测试
+
+测试剖析器统计调用次数/耗时/错误、采样 cProfile、报表导出，
+策略回调自动接入剖析（关闭时不记录，super() 嵌套只记录一次），以及事件引擎监听器统计的汇总
+"""
+
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+import pytest
+
+from core.event import Event, EventType
+from core.event_engine import EventEngine
+from core.utils.profiling import CallbackProfiler, get_profiler
+from strategies.base_strategy import BaseStrategy
+
+
+class EchoStrategy(BaseStrategy):
+    """记录收到的事件的策略"""
+
+    def __init__(self, name='echo'):
+        super().__init__(name)
+        self.bars = 0
+
+    def on_init(self):
+        pass
+
+    def on_bar(self, event):
+        self.bars += 1
+
+    def on_tick(self, event):
+        raise ValueError("tick")
+
+
+class DerivedStrategy(EchoStrategy):
+    """通过 super() 调用父类回调的策略"""
+
+    def on_bar(self, event):
+        super().on_bar(event)
+
+
+class TestCallbackProfiler:
+    """剖析器测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.profiler = CallbackProfiler(enabled=True, sample_every=2, output_dir=self.temp_dir)
+
+    def teardown_method(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_call_stats_and_export(self):
+        """测试调用次数、错误、采样次数以及 CSV/cProfile 导出"""
+        for i in range(5):
+            assert self.profiler.call('job', sum, [i, 1]) == i + 1
+        with pytest.raises(ZeroDivisionError):
+            self.profiler.call('bad', lambda: 1 / 0)
+
+        summary = self.profiler.summary().set_index('name')
+        assert summary.loc['job', 'calls'] == 5 and summary.loc['job', 'errors'] == 0
+        assert summary.loc['bad', 'errors'] == 1
+        assert summary['share'].sum() == pytest.approx(1.0)
+        assert self.profiler.samples == 2
+        assert 'function calls' in self.profiler.hotspots()
+
+        paths = self.profiler.export()
+        assert set(paths) == {'summary', 'cprofile'}
+        assert len(pd.read_csv(paths['summary'])) == 2
+
+    def test_listener_source(self):
+        """测试事件引擎监听器统计汇总到报表，引擎释放后来源自动失效"""
+        engine = EventEngine(profiler=self.profiler, name='engine')
+        engine.register_listener(EventType.BAR, lambda event: None)
+        for _ in range(3):
+            engine.put_event(Event(EventType.BAR, {}, None))
+        engine.process_pending()
+
+        summary = self.profiler.summary()
+        listener = summary[summary['kind'] == 'listener'].iloc[0]
+        assert listener['name'].startswith('engine:bar:') and listener['calls'] == 3
+        assert engine.get_listener_metrics()[0]['total_ms'] >= 0
+        # 第 2 次调用在 cProfile 下执行
+        assert self.profiler.samples == 1
+
+        del engine
+        assert self.profiler.summary().empty
+
+    def test_engines_reported_separately(self):
+        """测试多个同名事件引擎各自作为一个来源汇总，引擎释放后名称可复用"""
+        first = EventEngine(profiler=self.profiler)
+        second = EventEngine(profiler=self.profiler)
+        assert (first.name, second.name) == ('event_engine', 'event_engine#2')
+        for engine in (first, second):
+            engine.register_listener(EventType.BAR, lambda event: None)
+            engine.put_event(Event(EventType.BAR, {}, None))
+            engine.process_pending()
+
+        names = self.profiler.summary()['name']
+        assert names.str.startswith('event_engine:bar:').sum() == 1
+        assert names.str.startswith('event_engine#2:bar:').sum() == 1
+
+        del first
+        assert EventEngine(profiler=self.profiler).name == 'event_engine'
+
+
+class TestStrategyProfiling:
+    """策略回调剖析测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.profiler = get_profiler()
+        self.was_enabled = self.profiler.enabled
+        self.profiler.reset()
+
+    def teardown_method(self):
+        """测试后清理"""
+        self.profiler.enabled = self.was_enabled
+        self.profiler.reset()
+
+    def _callbacks(self):
+        summary = self.profiler.summary()
+        return summary[summary['kind'] == 'callback'].set_index('name')
+
+    def test_disabled_by_default(self):
+        """测试剖析器关闭时不记录"""
+        self.profiler.enabled = False
+        strategy = EchoStrategy()
+        strategy.on_bar(None)
+        assert strategy.bars == 1
+        assert self._callbacks().empty
+
+    def test_strategy_callbacks(self):
+        """测试按策略名和回调名统计，异常计入错误，super() 嵌套只记录一次"""
+        self.profiler.enabled = True
+        echo, derived = EchoStrategy('echo'), DerivedStrategy('derived')
+        for _ in range(3):
+            echo.on_bar(None)
+            derived.on_bar(None)
+        with pytest.raises(ValueError):
+            echo.on_tick(None)
+
+        callbacks = self._callbacks()
+        assert callbacks.loc['echo.on_bar', 'calls'] == 3
+        assert callbacks.loc['derived.on_bar', 'calls'] == 3
+        assert derived.bars == 3
+        assert callbacks.loc['echo.on_tick', 'errors'] == 1
+        assert DerivedStrategy.on_bar.__name__ == 'on_bar'
+
+    def test_strategy_listener_timed_once(self):
+        """测试注册为事件监听器的策略回调只按回调统计一次"""
+        self.profiler.enabled = True
+        strategy = EchoStrategy('listener')
+        engine = EventEngine(profiler=self.profiler)
+        engine.register_listener(EventType.BAR, strategy.on_bar)
+        for _ in range(3):
+            engine.put_event(Event(EventType.BAR, {}, None))
+        engine.process_pending()
+
+        summary = self.profiler.summary()
+        assert not summary['name'].str.startswith(f'{engine.name}:').any()
+        assert self._callbacks().loc['listener.on_bar', 'calls'] == 3
+        # 引擎自身的监听器指标不受影响
+        assert engine.get_listener_metrics()[0]['calls'] == 3
@@ -0,0 +1,187 @@
+"""
+组合风险指标引擎测试
+
+测试滚动窗口与 NumPy 全量计算一致、增量权益/回撤/集中度、周期收益率的滚动 VaR 和夏普
+与 RiskManager 的一次性计算一致，以及 RiskManager 对实盘 Account 的风险检查
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+
+from core.event_engine import EventEngine
+from core.execution.account import Account
+from core.execution.risk_manager import RiskManager
+from core.execution.risk_metrics import PortfolioRiskEngine, RollingWindow
+from data_management.price_snapshot import PriceSnapshotService
+
+
+class TestRollingWindow:
+    """滚动窗口测试类"""
+
+    def test_matches_numpy(self):
+        """测试滚动均值、标准差、分位数与对窗口直接计算一致"""
+        rng = np.random.default_rng(0)
+        data = rng.normal(0.001, 0.02, 1000)
+        window = RollingWindow(50)
+        for i, value in enumerate(data):
+            window.push(value)
+            expected = data[max(0, i - 49):i + 1]
+            if i % 97 == 0 or i == len(data) - 1:
+                assert np.array_equal(window.values(), expected)
+                assert window.mean() == pytest.approx(expected.mean(), abs=1e-12)
+                assert window.std() == pytest.approx(np.std(expected), rel=1e-9)
+                assert window.percentile(5) == pytest.approx(np.percentile(expected, 5))
+
+    def test_constant_series(self):
+        """测试常数序列的标准差为 0"""
+        window = RollingWindow(10)
+        for _ in range(25):
+            window.push(0.001)
+        assert window.std() == 0.0
+        with pytest.raises(ValueError):
+            RollingWindow(0)
+
+
+class TestPortfolioRiskEngine:
+    """组合风险指标引擎测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.engine = PortfolioRiskEngine(100000.0, window=20)
+        self.manager = RiskManager(account=None, risk_engine=self.engine)
+
+    def test_incremental_equity_and_concentration(self):
+        """测试成交和价格更新后的权益、回撤和集中度"""
+        engine = self.engine
+        engine.on_fill('600000', 1000, 10.0, commission=3)
+        engine.on_fill('600001', 2000, 20.0, commission=3)
+        assert engine.equity == pytest.approx(100000.0 - 6)
+        engine.on_price('600000', 12.0)
+        engine.on_price('600001', 15.0)
+
+        metrics = engine.metrics()
+        values = np.array([12000.0, 30000.0])
+        equity = 100000.0 - 6 - 10000 - 40000 + values.sum()
+        assert metrics['equity'] == pytest.approx(equity)
+        assert metrics['max_position_ratio'] == pytest.approx(30000.0 / equity)
+        assert metrics['concentration_hhi'] == pytest.approx(np.sum((values / values.sum()) ** 2))
+        assert metrics['max_drawdown'] == pytest.approx(100000.0 - 6 + 2000 - equity)
+        assert engine.metrics() is metrics
+
+        engine.on_fill('600001', -2000, 15.0)
+        assert engine.quantities == {'600000': 1000}
+        assert engine.metrics()['positions'] == 1
+
+    def test_matches_risk_manager(self):
+        """测试周期收益率的滚动 VaR、夏普和逐笔最大回撤与 RiskManager 的一次性计算一致"""
+        rng = np.random.default_rng(1)
+        prices = 10 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, 60)))
+        engine = self.engine
+        engine.on_fill('600000', 5000, prices[0])
+        marks = [engine.equity]
+        for price in prices:
+            engine.on_price('600000', price)
+            marks.append(engine.equity)
+            engine.close_period()
+
+        curve = engine.equity_curve
+        assert len(curve) == 60 and not curve.flags.writeable
+        returns = (curve[1:] / curve[:-1] - 1)[-20:]
+        metrics = engine.metrics()
+        assert metrics['var'] == pytest.approx(self.manager.calculate_var(returns))
+        assert metrics['sharpe_ratio'] == pytest.approx(self.manager.calculate_sharpe_ratio(returns), rel=1e-6)
+        drawdown = self.manager.calculate_max_drawdown(marks)
+        assert metrics['max_drawdown'] == pytest.approx(drawdown['max_drawdown'])
+        assert metrics['max_drawdown_ratio'] == pytest.approx(drawdown['max_drawdown_ratio'])
+
+        position = engine.position_metrics('600000')
+        price_returns = (prices[1:] / prices[:-1] - 1)[-20:]
+        assert position['periods'] == 20
+        assert position['var'] == pytest.approx(np.percentile(price_returns, 5))
+
+    def test_event_engine(self):
+        """测试订阅 TICK 和 FILL 事件"""
+        event_engine = EventEngine()
+        self.engine.attach(event_engine)
+        event_engine.put_fill_event('600000', 1000, 10.0, 'buy', 5.0)
+        event_engine.put_tick_event('600000', 11.0, 0)
+        event_engine.process_pending()
+        assert self.engine.quantities == {'600000': 1000}
+        assert self.engine.market_value == pytest.approx(11000.0)
+        assert self.engine.cash == pytest.approx(100000.0 - 10005.0)
+
+
+class TestRiskManager:
+    """风险管理器测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.prices = {'600000': 10.0}
+        service = PriceSnapshotService(price_func=self.prices.get)
+        self.account = Account(100000.0, db_path=os.path.join(self.temp_dir, 'test.db'), price_service=service)
+        self.account.order_buy('600000', 2000)
+
+    def teardown_method(self):
+        """测试后清理"""
+        self.account.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_account_risk_checks(self):
+        """测试基于实盘 Account 的持仓风险和总风险检查"""
+        manager = RiskManager(self.account, max_position_ratio=0.1, max_total_risk=0.5)
+        position = manager.check_position_risk('600000', 2000, 11.0)
+        equity = 100000.0 - 20000 - 3 + 22000
+        assert position['position_ratio'] == pytest.approx(22000 / equity)
+        assert not position['is_risk_ok']
+
+        total = manager.check_total_risk({'600000': 2000}, {'600000': 11.0})
+        assert total['is_risk_ok']
+        metrics = manager.get_risk_metrics({'600000': 11.0}, returns={'600000': [0.01, -0.02, 0.03]})
+        assert metrics['position_risks']['600000']['value'] == pytest.approx(22000.0)
+        # 检查用的价格不改变引擎按账户价格的标价
+        assert metrics['portfolio']['equity'] == pytest.approx(100000.0 - 3)
+        assert metrics['var_5pct'] == pytest.approx(np.percentile([0.01, -0.02, 0.03], 5))
+
+    def test_checks_leave_engine_unchanged(self):
+        """测试按拟下单价做的风险检查不改变引擎的标价、峰值和回撤"""
+        manager = RiskManager(self.account)
+        engine = manager.risk_engine
+        before = (engine.equity, engine.market_value, engine.equity_peak, engine.max_drawdown)
+
+        position = manager.check_position_risk('600000', 2000, 5.0)
+        assert position['position_ratio'] == pytest.approx(10000 / (100000.0 - 20000 - 3 + 10000))
+        manager.check_total_risk({'600000': 2000}, {'600000': 15.0})
+        manager.get_risk_metrics({'600000': 5.0})
+        assert (engine.equity, engine.market_value, engine.equity_peak, engine.max_drawdown) == before
+        assert manager.get_portfolio_metrics()['max_drawdown'] == 0.0
+
+    def test_vectorized_drawdown(self):
+        """测试向量化最大回撤与逐点计算一致"""
+        manager = RiskManager(self.account)
+        assert manager.calculate_max_drawdown([100, 120, 90, 130, 80, 140]) == \
+            {'max_drawdown': 50.0, 'max_drawdown_ratio': 50.0 / 130}
+        assert manager.calculate_max_drawdown([1, 2, 3]) == {'max_drawdown': 0.0, 'max_drawdown_ratio': 0.0}
+        assert manager.calculate_sharpe_ratio([0.01]) == 0.0
+
+    def test_engine_follows_account_fills(self):
+        """测试 RiskManager 创建后账户的成交会同步到风险引擎，回撤历史保留"""
+        manager = RiskManager(self.account)
+        manager.risk_engine.on_price('600000', 9.0)
+        drawdown = manager.get_portfolio_metrics()['max_drawdown']
+        assert drawdown > 0
+
+        self.prices['600001'] = 20.0
+        self.account.order_buy('600001', 1000)
+        self.account.update_position('600000', -2000, 9.0)
+        assert manager._positions() == {'600001': 1000}
+        cash = 100000.0 - 20000 - 3 - 20000 - 3 + 18000 - 3
+        metrics = manager.get_portfolio_metrics()
+        assert metrics['cash'] == pytest.approx(cash)
+        assert metrics['equity'] == pytest.approx(cash + 20000.0)
+        assert metrics['max_drawdown'] >= drawdown
+        assert not manager.risk_engine.sync_account(self.account)
@@ -0,0 +1,54 @@
+"""
+板块指数基准测试工具测试
+
+测试合成数据库的可复现性和基准结果的结构
+"""
+
+import os
+import sqlite3
+import tempfile
+import pytest
+import pandas as pd
+from benchmarks.synthetic_db import SyntheticConfig, generate_synthetic_database
+from benchmarks.sector_index_benchmark import run_benchmark, compare_results
+from data_management.database_manager import DatabaseManager
+
+
+class TestSectorIndexBenchmark:
+    """板块指数基准测试工具测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.config = SyntheticConfig(n_stocks=24, years=0.8, n_sectors=2, seed=7)
+
+    def test_synthetic_database_is_reproducible(self):
+        """测试相同参数生成完全相同的数据"""
+        paths = [os.path.join(self.tmpdir, f"db{i}.db") for i in range(2)]
+        summaries = [generate_synthetic_database(path, self.config) for path in paths]
+        assert summaries[0] == summaries[1]
+        assert summaries[0]['stocks'] == 24 and summaries[0]['sectors'] == 2
+
+        frames = []
+        for path in paths:
+            conn = sqlite3.connect(path)
+            frames.append(pd.read_sql_query("SELECT * FROM k_daily ORDER BY stock_code, trade_date", conn))
+            conn.close()
+        pd.testing.assert_frame_equal(frames[0], frames[1])
+
+    def test_run_benchmark_reports_all_stages(self):
+        """测试基准结果包含各阶段的耗时、吞吐量和分步耗时，且运行后恢复原数据库"""
+        original_db_path = DatabaseManager().db_path
+        results = run_benchmark(self.config, db_path=os.path.join(self.tmpdir, 'bench.db'), trace_memory=False)
+        assert DatabaseManager().db_path == original_db_path
+
+        stages = results['stages']
+        assert list(stages) == ['generate', 'full_build', 'incremental', 'refined', 'active_screener']
+        assert stages['full_build']['units'] > 0
+        # 每个板块增量更新一个交易日
+        assert stages['incremental']['units'] == self.config.n_sectors
+        assert set(stages['full_build']['breakdown']) == {'load', 'compute', 'write'}
+        assert results['config']['n_stocks'] == 24
+
+        report = compare_results(results, results)
+        assert 'full_build' in report and '1.00' in report
@@ -0,0 +1,69 @@
+"""
+板块MACD和成交量条件分析测试
+
+测试面板模式（一次性加载、向量化计算）与逐日模式的每日占比表完全一致，包括上市时间不足的股票
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import pandas as pd
+
+from benchmarks.synthetic_db import SyntheticConfig, generate_synthetic_database, synthetic_trade_dates
+from data_management.database_manager import DatabaseManager
+from applications.backtest.sector_macd_volume_analysis import (
+    analyze_conditions_loop, analyze_conditions_panel, get_trading_days
+)
+
+
+class TestSectorConditionsPanel:
+    """面板模式条件分析测试类"""
+
+    def setup_method(self):
+        """测试前准备：合成日线，按周聚合出周线，写入交易日历"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'synthetic.db')
+        config = SyntheticConfig(n_stocks=6, years=1.5, n_sectors=1)
+        generate_synthetic_database(self.db_path, config)
+        self.dates = synthetic_trade_dates(config)
+
+        self.original_db_path = DatabaseManager().db_path
+        DatabaseManager().switch_database(self.db_path)
+
+        with sqlite3.connect(self.db_path) as conn:
+            daily = pd.read_sql_query("SELECT stock_code, trade_date, open, high, low, close, volume FROM k_daily", conn)
+            self.stock_list = sorted(daily['stock_code'].unique())
+            # 第一只股票模拟次新股：只保留最近 60 个交易日
+            conn.execute("DELETE FROM k_daily WHERE stock_code = ? AND trade_date < ?",
+                         (self.stock_list[0], self.dates[-60]))
+
+            daily['week'] = pd.to_datetime(daily['trade_date']).dt.to_period('W')
+            weekly = daily.groupby(['stock_code', 'week']).agg(
+                trade_date=('trade_date', 'last'), open=('open', 'first'), high=('high', 'max'),
+                low=('low', 'min'), close=('close', 'last'), volume=('volume', 'sum')).reset_index()
+            weekly = weekly[~((weekly['stock_code'] == self.stock_list[0]) & (weekly['trade_date'] < self.dates[-60]))]
+            conn.executemany(
+                "INSERT INTO k_weekly (stock_code, trade_date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                weekly[['stock_code', 'trade_date', 'open', 'high', 'low', 'close', 'volume']].itertuples(index=False))
+            conn.executemany("INSERT INTO trade_calendar (trade_date, trade_status) VALUES (?, 1)",
+                             [(d,) for d in self.dates])
+
+    def teardown_method(self):
+        """测试后清理"""
+        DatabaseManager().switch_database(self.original_db_path)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_panel_matches_loop(self):
+        """测试面板模式与逐日模式结果一致"""
+        trading_days = get_trading_days(self.dates[-25], self.dates[-1])
+        assert len(trading_days) == 25
+
+        loop = analyze_conditions_loop(self.stock_list, trading_days)
+        panel = analyze_conditions_panel(self.stock_list, trading_days)
+
+        assert not loop.empty
+        # 次新股日线不足 50 根，不计入有效股票
+        assert loop['total_stocks'].max() == len(self.stock_list) - 1
+        pd.testing.assert_frame_equal(panel, loop, check_dtype=False)
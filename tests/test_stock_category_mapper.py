@@ -0,0 +1,97 @@
+"""
+股票分类指数映射器测试
+
+测试向量化的分类指数计算与逐日计算结果一致
+"""
+
+import os
+import sqlite3
+import tempfile
+import pytest
+import numpy as np
+import pandas as pd
+from data_management.stock_category_mapper import StockCategoryIndexMapper
+
+
+def _reference_index_kline(df_kline, index_code, index_name):
+    """逐日计算的参考实现"""
+    index_data = []
+    for trade_date, group in df_kline.groupby('trade_date'):
+        active_stocks = group[group['volume'] > 0]
+        if len(active_stocks) == 0:
+            continue
+        weights = active_stocks['close'] / active_stocks['close'].sum()
+        index_data.append({
+            'index_code': index_code,
+            'index_name': index_name,
+            'trade_date': trade_date,
+            'open': round((active_stocks['open'] * weights).sum(), 2),
+            'high': round((active_stocks['high'] * weights).sum(), 2),
+            'low': round((active_stocks['low'] * weights).sum(), 2),
+            'close': round((active_stocks['close'] * weights).sum(), 2),
+            'volume': int(active_stocks['volume'].sum())
+        })
+    return pd.DataFrame(index_data)
+
+
+class TestStockCategoryIndexMapper:
+    """股票分类指数映射器测试类"""
+
+    def setup_method(self):
+        """测试前准备：构建包含 stock_basic_pro 和 k_daily 的临时数据库"""
+        self.db_path = os.path.join(tempfile.mkdtemp(), 'test.db')
+        rng = np.random.default_rng(42)
+
+        stocks = [f"{i:06d}" for i in range(1, 13)]
+        categories = ['国企', 'B股', 'H股', '老股', '大高', '高价', '低价', '次新', '超强']
+        basic = pd.DataFrame({'stock_code': stocks, 'stock_name': [f"股票{s}" for s in stocks]})
+        for k, category in enumerate(categories):
+            basic[category] = [(i + k) % 3 == 0 for i in range(len(stocks))]
+
+        rows = []
+        for date in pd.bdate_range('2024-01-01', periods=30).strftime('%Y-%m-%d'):
+            for stock in stocks:
+                close = 10 + rng.random() * 5
+                volume = 0 if rng.random() < 0.1 else int(rng.integers(1000, 5000))
+                rows.append((stock, date, close * 0.99, close * 1.02, close * 0.97, close, volume))
+        self.kline = pd.DataFrame(rows, columns=['stock_code', 'trade_date', 'open', 'high', 'low', 'close', 'volume'])
+
+        conn = sqlite3.connect(self.db_path)
+        basic.to_sql('stock_basic_pro', conn, index=False)
+        self.kline.to_sql('k_daily', conn, index=False)
+        conn.close()
+
+        self.mapper = StockCategoryIndexMapper(db_path=self.db_path)
+        self.basic = basic
+
+    def test_calculate_index_kline_matches_reference(self):
+        """测试单个指数的向量化计算与逐日计算一致"""
+        stock_codes = self.basic.loc[self.basic['国企'], 'stock_code'].tolist()
+        result = self.mapper.calculate_index_kline(stock_codes, '100001.ZS', '国企指数')
+
+        expected = _reference_index_kline(
+            self.kline[self.kline['stock_code'].isin(stock_codes)], '100001.ZS', '国企指数'
+        )
+        assert list(result.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected, check_dtype=False)
+
+    def test_calculate_all_category_indices_single_pass(self):
+        """测试所有分类指数一次性计算并批量写入"""
+        all_index_data = self.mapper.calculate_all_category_indices(save_to_db=True)
+        assert set(all_index_data.keys()) == set(self.mapper.index_mapping.keys())
+
+        for category, index_data in all_index_data.items():
+            stock_codes = self.basic.loc[self.basic[category], 'stock_code'].tolist()
+            info = self.mapper.index_mapping[category]
+            expected = _reference_index_kline(
+                self.kline[self.kline['stock_code'].isin(stock_codes)], info['index_code'], info['index_name']
+            )
+            pd.testing.assert_frame_equal(index_data.reset_index(drop=True), expected, check_dtype=False)
+
+        # 重复执行时按 (index_code, trade_date) 替换，不产生重复行
+        self.mapper.calculate_all_category_indices(save_to_db=True)
+        conn = sqlite3.connect(self.db_path)
+        saved = pd.read_sql_query("SELECT index_code, trade_date FROM index_k_daily", conn)
+        conn.close()
+        assert len(saved) == sum(len(df) for df in all_index_data.values())
+        assert not saved.duplicated().any()
@@ -0,0 +1,100 @@
+"""
+逐笔止盈止损监控测试
+
+测试触发价布防、TICK 穿越判断、ORDER 事件发出和按账户持仓重新布防
+"""
+
+import time
+import pytest
+from core.event_engine import EventEngine
+from core.event import EventType, TickEvent
+from core.execution.stop_monitor import TickStopMonitor
+
+
+class FakePosition:
+    def __init__(self, avg_cost):
+        self.avg_cost = avg_cost
+
+
+class FakeAccount:
+    """只提供监控所需接口的账户"""
+
+    def __init__(self, holdings):
+        # holdings: {code: (avg_cost, closeable, today_bought)}
+        self.holdings = holdings
+        self.positions = {code: FakePosition(v[0]) for code, v in holdings.items()}
+
+    def get_closeable_amount(self, code):
+        return self.holdings[code][1]
+
+    def get_today_bought(self, code):
+        return self.holdings[code][2]
+
+
+class TestTickStopMonitor:
+    """逐笔止盈止损监控测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.engine = EventEngine()
+        self.monitor = TickStopMonitor(self.engine, profit_target=0.20, cx_profit_bonus=0.10, stop_loss=-0.15)
+        self.orders = []
+        self.engine.register_listener(EventType.ORDER, self.orders.append)
+
+    def teardown_method(self):
+        """测试后清理"""
+        if self.engine.is_running():
+            self.engine.stop()
+
+    def _ticks(self, *ticks):
+        self.engine.start()
+        for code, price in ticks:
+            self.engine.put_event(TickEvent(code, price, 0))
+        deadline = time.time() + 2
+        while self.engine.get_queue_size() and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+
+    def test_take_profit_and_stop_loss(self):
+        """测试止盈和止损触发"""
+        self.monitor.arm('600000', 10.0, 1000)
+        self.monitor.arm('000001', 10.0, 500)
+        self._ticks(('600000', 11.9), ('000001', 8.6), ('600000', 12.0), ('000001', 8.5))
+
+        assert [(o.stock_code, o.quantity, o.direction) for o in self.orders] == \
+            [('600000', 1000, 'sell'), ('000001', 500, 'sell')]
+        assert '止盈' in self.orders[0].data['reason']
+        assert '止损' in self.orders[1].data['reason']
+        assert self.monitor.symbols == []
+
+    def test_cx_holding_uses_higher_target(self):
+        """测试CX长线持仓使用30%的止盈目标"""
+        self.monitor.arm('600000', 10.0, 1000, is_cx=True)
+        self._ticks(('600000', 12.5))
+        assert self.orders == []
+        self._ticks(('600000', 13.0))
+        assert len(self.orders) == 1
+        assert '长线止盈' in self.orders[0].reason
+
+    def test_fires_once_and_ignores_unarmed(self):
+        """测试触发后撤防，不重复下单；未布防的股票不处理"""
+        self.monitor.arm('600000', 10.0, 1000)
+        self._ticks(('600000', 12.5), ('600000', 13.0), ('300750', 1.0))
+        assert len(self.orders) == 1
+        assert self.monitor.stats['checked'] == 1
+
+    def test_sync_positions_respects_t1_and_eligibility(self):
+        """测试按账户持仓布防：跳过今日买入和不在操作列表中的股票"""
+        account = FakeAccount({
+            '600000': (10.0, 1000, 0),
+            '000001': (10.0, 0, 500),      # 今日买入
+            '300750': (10.0, 200, 0),      # 不在操作列表中
+            '600519': (10.0, 100, 0),
+        })
+        armed = self.monitor.sync_positions(account, cx_holdings={'600519'},
+                                            eligible={'600000', '000001', '600519'})
+        assert armed == 2
+        assert sorted(self.monitor.symbols) == ['600000', '600519']
+
+        self._ticks(('600519', 12.5), ('600000', 12.5))
+        assert [o.stock_code for o in self.orders] == ['600000']
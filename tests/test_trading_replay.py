@@ -0,0 +1,233 @@
+"""
+实盘交易系统离线回放测试
+
+测试虚拟时钟、回放调度器、行情回放、订单桩、事件引擎同步处理，
+以及在合成数据库快照上回放尾盘并触发逐笔止损卖出
+"""
+
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from core.event import EventType
+from core.event_engine import EventEngine
+from applications.trading_replay import (
+    VirtualClock, ReplayScheduler, QuoteFeed, StubOrderSink, TradingDayReplay,
+    synthetic_quote_stream, virtual_datetime_class, check_regressions
+)
+
+
+class TestReplayComponents:
+    """回放组件测试类"""
+
+    def test_virtual_clock(self):
+        """测试虚拟时钟只前进，倍速模式按比例等待"""
+        slept = []
+        clock = VirtualClock(datetime(2024, 6, 3, 9, 30), speed=60.0, sleep=slept.append)
+        clock.advance_to(datetime(2024, 6, 3, 9, 31))
+        clock.advance_to(datetime(2024, 6, 3, 9, 30))
+        assert clock.now() == datetime(2024, 6, 3, 9, 31)
+        assert slept == [1.0]
+
+        virtual_datetime = virtual_datetime_class(clock)
+        assert virtual_datetime.now() == clock.now()
+        assert virtual_datetime.strptime('09:30', '%H:%M').hour == 9
+
+    def test_scheduler_order(self):
+        """测试同一时刻到期的任务按注册顺序执行，秒级任务按间隔重复"""
+        calls = []
+        scheduler = ReplayScheduler()
+        scheduler.every().day.at('09:31').do(calls.append, 'a')
+        scheduler.every().day.at('09:31').do(calls.append, 'b')
+        scheduler.every(30).seconds.do(calls.append, 'tick')
+        scheduler.every().day.at('09:00').do(calls.append, 'missed')
+        scheduler.start(datetime(2024, 6, 3, 9, 30))
+
+        end = datetime(2024, 6, 3, 9, 32)
+        while scheduler.next_run_time() <= end:
+            now = scheduler.next_run_time()
+            for job in scheduler.due_jobs(now):
+                job.job_func()
+                job.schedule_next(now)
+        assert calls == ['tick', 'a', 'b', 'tick', 'tick', 'tick']
+
+    def test_quote_feed(self):
+        """测试行情按时间应用并合成当日K线"""
+        quotes = pd.DataFrame({
+            'timestamp': pd.to_datetime(['2024-06-03 09:30:00', '2024-06-03 09:30:03', '2024-06-03 09:30:06']),
+            'stock_code': ['600000', '600000', '600000'],
+            'price': [10.0, 10.5, 9.8],
+            'volume': [100, 200, 300],
+        })
+        feed = QuoteFeed(quotes)
+        assert feed.price('600000') is None
+        assert feed.advance_to(datetime(2024, 6, 3, 9, 30, 4)) == 2
+        assert feed.price('600000') == 10.5
+        feed.advance_to(datetime(2024, 6, 3, 9, 31))
+        assert feed.intraday_bar('600000') == {'open': 10.0, 'high': 10.5, 'low': 9.8, 'close': 9.8, 'volume': 600}
+
+        synthetic = synthetic_quote_stream({'600000': 10.0, '600001': 20.0}, '2024-06-03', interval_seconds=60)
+        assert len(synthetic) == 2 * 242
+        assert synthetic['timestamp'].is_monotonic_increasing
+        assert synthetic.equals(synthetic_quote_stream({'600000': 10.0, '600001': 20.0}, '2024-06-03',
+                                                       interval_seconds=60))
+
+    def test_order_sink_and_regressions(self):
+        """测试订单桩记录虚拟时间并确认，基线对比发现延迟回归"""
+        clock = VirtualClock(datetime(2024, 6, 3, 10, 0))
+        sink = StubOrderSink(clock)
+        order_ids = sink.publish_orders([('buy', '600000', 100), {'action': 'sell', 'stock': '600001', 'amount': 200}])
+        assert sink.wait_for_acks(order_ids) == {order_ids[0]: 'accepted', order_ids[1]: 'accepted'}
+        assert sink.orders[1]['time'] == datetime(2024, 6, 3, 10, 0)
+        with pytest.raises(ValueError):
+            sink.send('short', '600000', 100)
+
+        baseline = {'jobs': {'slow': {'p95_ms': 10.0}, 'tiny': {'p95_ms': 1.0}}}
+        result = {'jobs': {'slow': {'p95_ms': 20.0}, 'tiny': {'p95_ms': 5.0}}}
+        assert len(check_regressions(result, baseline, tolerance=1.5)) == 1
+
+    def test_process_pending(self):
+        """测试事件引擎在调用线程中同步处理事件，包括处理中新产生的事件"""
+        engine = EventEngine()
+        received = []
+        engine.register_listener(EventType.TICK, lambda e: (received.append(e.stock_code),
+                                                            engine.put_order_event(e.stock_code, 'market', 100)))
+        engine.register_listener(EventType.ORDER, lambda e: received.append('order'))
+        engine.put_tick_event('600000', 10.0, 0)
+        assert engine.process_pending() == 2
+        assert received == ['600000', 'order']
+
+
+class TestTradingDayReplay:
+    """交易日回放测试类"""
+
+    def setup_method(self):
+        """测试前准备：合成数据库快照，写入操作股票和一笔历史持仓"""
+        from benchmarks.synthetic_db import SyntheticConfig, generate_synthetic_database, synthetic_trade_dates
+        self.temp_dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        # trading_system_new 导入时在当前目录创建 trading.log
+        os.chdir(self.temp_dir)
+        self.db_path = os.path.join(self.temp_dir, 'snapshot.db')
+        config = SyntheticConfig(n_stocks=3, years=0.3, n_sectors=1)
+        generate_synthetic_database(self.db_path, config)
+        dates = synthetic_trade_dates(config)
+        self.trade_date = dates[-1]
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE daily_selections (stock_code TEXT)")
+            conn.execute("INSERT INTO daily_selections VALUES ('600000')")
+            conn.execute("""CREATE TABLE positions_1000000 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            trade_code TEXT NOT NULL, trade_amount INTEGER NOT NULL, trade_price REAL NOT NULL,
+                            commission REAL NOT NULL, trade_time TEXT NOT NULL)""")
+            conn.execute("INSERT INTO positions_1000000 (trade_code, trade_amount, trade_price, commission, trade_time) "
+                         "VALUES ('600000', 1000, 10.0, 5.0, ?)", (f'{dates[-10]} 10:00:00',))
+
+    def teardown_method(self):
+        """测试后清理"""
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_stop_loss_replay(self, monkeypatch):
+        """测试尾盘回放：跌破止损线后在虚拟时间内卖出，15:10 停止并结算风险引擎，快照原文件不变"""
+        import applications.trading_system_new as system
+        live_risk_engine = system.RISK_ENGINE
+        closed = []
+        close_risk_period = system.close_risk_period
+
+        def record_close():
+            close_risk_period()
+            closed.append(system.RISK_ENGINE)
+
+        monkeypatch.setattr(system, 'close_risk_period', record_close)
+        day = self.trade_date
+        quotes = pd.DataFrame({
+            'timestamp': pd.to_datetime([f'{day} 14:55:00', f'{day} 14:56:00', f'{day} 14:57:00']),
+            'stock_code': '600000',
+            'price': [9.5, 8.0, 7.9],
+        })
+        replay = TradingDayReplay(day, db_snapshot=self.db_path, quotes=quotes, start_time='14:55',
+                                  work_dir=os.path.join(self.temp_dir, 'replay'))
+        result = replay.run()
+
+        assert result.virtual_seconds == 15 * 60
+        assert not result.job_errors
+        assert set(result.jobs['job']) == {'stop_trading_system', 'publish_position_ticks',
+                                           'execute_pending_stop_orders'}
+        assert result.events_processed > 0
+        assert len(result.trades) == 1
+        sell = result.trades.iloc[0]
+        assert (sell['trade_code'], sell['trade_amount'], sell['trade_price']) == ('600000', -1000, 8.0)
+        assert sell['trade_time'].startswith(f'{day} 14:56')
+
+        with sqlite3.connect(self.db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM positions_1000000").fetchone()[0] == 1
+
+        # 15:10 日终结算的是回放账户的风险引擎：卖出已同步，记录一个周期
+        assert len(closed) == 1 and closed[0] is not live_risk_engine
+        assert len(closed[0].equity_curve) == 1
+        assert closed[0].metrics()['positions'] == 0
+
+        assert system.ORDER_GATEWAY is None and not system.SHOULD_STOP
+        assert system.STOP_MONITOR.symbols == []
+        assert system.RISK_ENGINE is live_risk_engine
+
+    def test_analysis_slot_offline(self, monkeypatch):
+        """测试回放一个日线分析时点：CX 买入按回放行情定价，不访问网络，也不读取快照原文件和项目数据库"""
+        day = self.trade_date
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DROP TABLE daily_selections")
+            conn.execute("""CREATE TABLE daily_selections (id INTEGER PRIMARY KEY AUTOINCREMENT, pool_name TEXT NOT NULL,
+                            stock_code TEXT NOT NULL, name TEXT, trade_date TEXT NOT NULL, is_1bzl INTEGER DEFAULT 0,
+                            is_cx INTEGER DEFAULT 0, 总得分 REAL DEFAULT 0.0, 技术得分 REAL DEFAULT 0.0,
+                            主力得分 REAL DEFAULT 0.0, 板块得分 REAL DEFAULT 0.0, 低BIAS得分 REAL DEFAULT 0.0)""")
+            conn.executemany("INSERT INTO daily_selections (pool_name, stock_code, name, trade_date, is_1bzl, is_cx, 总得分) "
+                             "VALUES ('pool_a', ?, ?, ?, ?, ?, ?)",
+                             [('600000', 'A', day, 1, 0, 80.0), ('600001', 'B', day, 1, 1, 70.0)])
+            conn.execute("""CREATE TABLE cx_strategy_holdings (stock_code TEXT PRIMARY KEY, stock_name TEXT,
+                            source_pool TEXT, buy_date TEXT, buy_price REAL, buy_quantity INTEGER, updated_at TEXT)""")
+
+        # 模块导入时创建的全局账户会打开项目数据库，先于记录导入
+        import applications.trading_system_new  # noqa: F401
+        import core.execution.portfolio_manager as portfolio
+        forbidden = {os.path.abspath(self.db_path), os.path.abspath(portfolio.get_db_path())}
+        opened, network = [], []
+        real_connect = sqlite3.connect
+
+        def recording_connect(database, *args, **kwargs):
+            opened.append(os.path.abspath(str(database)))
+            return real_connect(database, *args, **kwargs)
+
+        def no_network(*args, **kwargs):
+            network.append(args)
+            raise OSError("回放不允许访问网络")
+
+        monkeypatch.setattr(sqlite3, 'connect', recording_connect)
+        monkeypatch.setattr(socket.socket, 'connect', no_network)
+        monkeypatch.setattr(socket, 'getaddrinfo', no_network)
+
+        quotes = pd.DataFrame({
+            'timestamp': pd.to_datetime([f'{day} 10:04:00', f'{day} 10:04:00']),
+            'stock_code': ['600000', '600001'],
+            'price': [10.2, 12.5],
+        })
+        replay = TradingDayReplay(day, db_snapshot=self.db_path, quotes=quotes, start_time='10:04', end_time='10:06',
+                                  work_dir=os.path.join(self.temp_dir, 'replay'))
+        result = replay.run()
+
+        assert {'run_cx_buy_analysis', 'run_daily_buy_analysis', 'run_daily_sell_analysis'} <= set(result.jobs['job'])
+        assert not result.job_errors
+        assert network == []
+        # 快照原文件只在复制副本时打开一次
+        assert opened.count(os.path.abspath(self.db_path)) == 1
+        assert not (set(opened) - {os.path.abspath(self.db_path)}) & forbidden
+
+        cx_buy = result.trades[result.trades['trade_code'] == '600001']
+        assert len(cx_buy) == 1 and cx_buy.iloc[0]['trade_price'] == 12.5
+        assert cx_buy.iloc[0]['trade_time'].startswith(f'{day} 10:05')
+        assert portfolio.get_latest_price.__module__ == 'data_management.data_processor'
@@ -0,0 +1,116 @@
+"""
+批量ATR波动率服务测试
+
+测试批量计算结果与逐只全量计算一致、日期截断、数据不足时的默认值和缓存
+"""
+
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.execution.volatility import VolatilityService, DEFAULT_VOLATILITY
+from core.utils.indicators import ATR
+
+
+class SqliteQuery:
+    """只提供 execute_query 的数据库管理器"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.calls = 0
+
+    def execute_query(self, query, params=None):
+        self.calls += 1
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
+
+
+def _make_bars(stock_code, days, seed):
+    rng = np.random.default_rng(seed)
+    close = 10 + np.cumsum(rng.normal(0, 0.3, days))
+    high = close + rng.uniform(0.05, 0.5, days)
+    low = close - rng.uniform(0.05, 0.5, days)
+    dates = pd.bdate_range('2024-01-01', periods=days).strftime('%Y-%m-%d')
+    return pd.DataFrame({'stock_code': stock_code, 'trade_date': dates, 'open': close,
+                         'close': close, 'high': high, 'low': low, 'volume': 1000})
+
+
+def _reference(df, period=14):
+    """原逐只计算口径：全量历史计算ATR后取最后一个值"""
+    atr, _ = ATR(df['close'].values, df['high'].values, df['low'].values, N=period)
+    return max(atr[-1] / df['close'].iloc[-1], 0.01)
+
+
+class TestVolatilityService:
+    """批量ATR波动率服务测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'k_daily.db')
+        self.bars = {
+            '000001': _make_bars('000001', 60, 1),
+            '600000': _make_bars('600000', 40, 2),
+            '300750': _make_bars('300750', 10, 3),
+        }
+        conn = sqlite3.connect(self.db_path)
+        pd.concat(self.bars.values()).to_sql('k_daily', conn, index=False)
+        conn.close()
+        self.db = SqliteQuery(self.db_path)
+        self.service = VolatilityService(self.db)
+
+    def teardown_method(self):
+        """测试后清理"""
+        os.remove(self.db_path)
+        os.rmdir(self.temp_dir)
+
+    def test_matches_full_history(self):
+        """测试只用最近N+1根日线的批量结果与全量逐只计算一致"""
+        date = '2024-02-20'
+        result = self.service.get_volatilities(['000001', '600000'], date)
+
+        for code in ('000001', '600000'):
+            df = self.bars[code]
+            expected = _reference(df[df['trade_date'] <= date])
+            assert result[code] == pytest.approx(expected)
+        assert self.db.calls == 1
+
+    def test_date_cutoff(self):
+        """测试不使用当前日期之后的数据"""
+        early = self.service.get_volatility('000001', '2024-02-01')
+        df = self.bars['000001']
+        assert early == pytest.approx(_reference(df[df['trade_date'] <= '2024-02-01']))
+
+    def test_insufficient_data(self):
+        """测试数据不足或无数据的股票使用默认波动率"""
+        result = self.service.get_volatilities(['300750', '999999'], '2024-03-29')
+        assert result == {'300750': DEFAULT_VOLATILITY, '999999': DEFAULT_VOLATILITY}
+
+    def test_cache_per_date_and_period(self):
+        """测试同一 (日期, 周期) 只查询缺失的股票"""
+        self.service.get_volatilities(['000001'], '2024-03-01')
+        self.service.get_volatilities(['000001', '600000'], '2024-03-01')
+        assert self.db.calls == 2
+        self.service.get_volatilities(['000001', '600000'], '2024-03-01')
+        assert self.db.calls == 2
+        assert self.service.stats['hits'] == 3
+
+        self.service.get_volatilities(['000001'], '2024-03-01', period=5)
+        self.service.get_volatilities(['000001'], '2024-03-04')
+        assert self.db.calls == 4
+
+    def test_cache_eviction(self):
+        """测试超出缓存组数后淘汰最早使用的日期"""
+        service = VolatilityService(self.db, max_cached_dates=2)
+        for date in ('2024-03-01', '2024-03-04', '2024-03-05'):
+            service.get_volatility('000001', date)
+        calls = self.db.calls
+        service.get_volatility('000001', '2024-03-01')
+        assert self.db.calls == calls + 1